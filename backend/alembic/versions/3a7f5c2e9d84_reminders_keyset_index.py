@@ -0,0 +1,31 @@
+"""Reminders keyset pagination index
+
+Revision ID: 3a7f5c2e9d84
+Revises: b8d4e2f61a37
+Create Date: 2026-10-19 01:02:36.118420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a7f5c2e9d84'
+down_revision: Union[str, None] = 'b8d4e2f61a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # id в конце индекса: страница по (time, id) читается из индекса без сортировки
+    op.drop_index('ix_reminders_user_id_time', table_name='reminders')
+    op.create_index('ix_reminders_user_id_time', 'reminders', ['user_id', 'time', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reminders_user_id_time', table_name='reminders')
+    op.create_index('ix_reminders_user_id_time', 'reminders', ['user_id', 'time'])
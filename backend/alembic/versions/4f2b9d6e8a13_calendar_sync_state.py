@@ -0,0 +1,33 @@
+"""Calendar sync state
+
+Revision ID: 4f2b9d6e8a13
+Revises: d5a8c3e1f046
+Create Date: 2026-10-18 23:04:51.176902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2b9d6e8a13'
+down_revision: Union[str, None] = 'd5a8c3e1f046'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('calendar_integrations', sa.Column('ctag', sa.String(length=255), nullable=True))
+    op.add_column('calendar_integrations', sa.Column('sync_token', sa.Text(), nullable=True))
+    op.add_column('calendar_integrations', sa.Column('event_etags', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('calendar_integrations', 'event_etags')
+    op.drop_column('calendar_integrations', 'sync_token')
+    op.drop_column('calendar_integrations', 'ctag')
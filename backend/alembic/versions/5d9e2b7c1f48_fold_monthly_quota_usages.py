@@ -0,0 +1,49 @@
+"""Fold current month quota usages of monthly resources
+
+Revision ID: 5d9e2b7c1f48
+Revises: 3a7f5c2e9d84
+Create Date: 2026-10-19 02:14:07.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9e2b7c1f48'
+down_revision: Union[str, None] = '3a7f5c2e9d84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Использование месячных ресурсов теперь копится в строке за первое число месяца
+    # (usage_period_start); дневные строки текущего месяца, записанные до этого,
+    # переносим туда, иначе лимит месяца отсчитывался бы заново
+    op.execute("""
+        WITH folded AS (
+            DELETE FROM quota_usages qu
+            USING resource_types rt
+            WHERE rt.id = qu.resource_type_id
+              AND rt.name LIKE '%\\_monthly'
+              AND qu.date > date_trunc('month', current_date)::date
+            RETURNING qu.user_id, qu.resource_type_id, qu.usage_value
+        )
+        INSERT INTO quota_usages (id, user_id, resource_type_id, date, usage_value)
+        SELECT gen_random_uuid(), user_id, resource_type_id, date_trunc('month', current_date)::date, sum(usage_value)
+        FROM folded
+        GROUP BY user_id, resource_type_id
+        ON CONFLICT ON CONSTRAINT unique_user_resource_date DO UPDATE
+        SET usage_value = quota_usages.usage_value + EXCLUDED.usage_value,
+            updated_at = now()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Свернутые строки не разделить обратно по дням; на старом коде использование
+    # месяца учитывается по-прежнему, через сумму строк месяца
+    pass
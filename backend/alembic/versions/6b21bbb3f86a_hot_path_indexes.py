@@ -0,0 +1,47 @@
+"""Hot path indexes
+
+Revision ID: 6b21bbb3f86a
+Revises: 27a3e92ba4d0
+Create Date: 2026-10-18 20:40:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b21bbb3f86a'
+down_revision: Union[str, None] = '27a3e92ba4d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Очередь на отправку: только активные, неотправленные и неудаленные напоминания
+    op.create_index(
+        'ix_reminders_due_time', 'reminders', ['time'],
+        postgresql_where=sa.text("status = 'ACTIVE' AND NOT notification_sent AND NOT removed"),
+    )
+    # Выборки по пользователю
+    op.create_index('ix_reminders_user_id_time', 'reminders', ['user_id', 'time'])
+    op.create_index('ix_habits_user_id', 'habits', ['user_id'])
+    op.create_index('ix_tags_user_id', 'tags', ['user_id'])
+    op.create_index('ix_user_roles_user_id_valid_from', 'user_roles', ['user_id', 'valid_from'])
+    op.create_index('ix_calendar_integrations_user_id', 'calendar_integrations', ['user_id'])
+    op.create_index('ix_neuro_images_user_id', 'neuro_images', ['user_id'])
+    # quota_usages(user_id, resource_type_id, date) и habit_progress(habit_id, record_date)
+    # уже покрыты уникальными ограничениями unique_user_resource_date и uq_habit_date
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_neuro_images_user_id', table_name='neuro_images')
+    op.drop_index('ix_calendar_integrations_user_id', table_name='calendar_integrations')
+    op.drop_index('ix_user_roles_user_id_valid_from', table_name='user_roles')
+    op.drop_index('ix_tags_user_id', table_name='tags')
+    op.drop_index('ix_habits_user_id', table_name='habits')
+    op.drop_index('ix_reminders_user_id_time', table_name='reminders')
+    op.drop_index('ix_reminders_due_time', table_name='reminders')
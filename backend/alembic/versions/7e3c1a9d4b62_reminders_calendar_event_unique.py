@@ -0,0 +1,43 @@
+"""Reminders calendar event unique index
+
+Revision ID: 7e3c1a9d4b62
+Revises: 4f2b9d6e8a13
+Create Date: 2026-10-18 23:41:17.302518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e3c1a9d4b62'
+down_revision: Union[str, None] = '4f2b9d6e8a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Прежняя синхронизация создавала новое напоминание, если событие вернулось после удаления:
+    # оставляем за событием неудаленное (или самое свежее) напоминание, остальные отвязываем
+    op.execute("""
+        UPDATE reminders r SET calendar_event_id = NULL
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY calendar_integration_id, calendar_event_id
+                ORDER BY removed, updated_at DESC, id
+            ) AS position
+            FROM reminders
+            WHERE calendar_integration_id IS NOT NULL AND calendar_event_id IS NOT NULL
+        ) duplicates
+        WHERE r.id = duplicates.id AND duplicates.position > 1
+    """)
+    op.create_index('uq_reminders_calendar_event', 'reminders',
+                    ['calendar_integration_id', 'calendar_event_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_reminders_calendar_event', table_name='reminders')
@@ -0,0 +1,29 @@
+"""Users timezone offset index
+
+Revision ID: 9c4e1f7a2b05
+Revises: 6b21bbb3f86a
+Create Date: 2026-10-18 22:05:41.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1f7a2b05'
+down_revision: Union[str, None] = '6b21bbb3f86a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Шарды утренней сводки: пользователи одного смещения по возрастанию id
+    op.create_index('ix_users_timezone_offset_id', 'users', ['timezone_offset', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_timezone_offset_id', table_name='users')
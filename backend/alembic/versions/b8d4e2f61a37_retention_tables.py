@@ -0,0 +1,61 @@
+"""Retention tables
+
+Revision ID: b8d4e2f61a37
+Revises: 7e3c1a9d4b62
+Create Date: 2026-10-19 00:18:42.611904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4e2f61a37'
+down_revision: Union[str, None] = '7e3c1a9d4b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('quota_usage_monthly',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('resource_type_id', sa.UUID(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('usage_value', sa.Numeric(precision=12, scale=4), nullable=False),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['resource_type_id'], ['resource_types.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'resource_type_id', 'month', name='uq_quota_usage_monthly')
+    )
+    op.create_table('habit_progress_archive',
+    sa.Column('habit_id', sa.UUID(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('completed_days', postgresql.BIT(length=366), nullable=False),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('habit_id', 'year', name='uq_habit_progress_archive')
+    )
+    # Поиск строк старше срока хранения
+    op.create_index('ix_quota_usages_date', 'quota_usages', ['date'])
+    op.create_index('ix_habit_progress_record_date', 'habit_progress', ['record_date'])
+    op.create_index('ix_user_roles_valid_to', 'user_roles', ['valid_to'],
+                    postgresql_where=sa.text('valid_to IS NOT NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_roles_valid_to', table_name='user_roles')
+    op.drop_index('ix_habit_progress_record_date', table_name='habit_progress')
+    op.drop_index('ix_quota_usages_date', table_name='quota_usages')
+    op.drop_table('habit_progress_archive')
+    op.drop_table('quota_usage_monthly')
@@ -0,0 +1,45 @@
+"""Achievement checkpoints
+
+Revision ID: d5a8c3e1f046
+Revises: 9c4e1f7a2b05
+Create Date: 2026-10-18 23:12:08.554310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8c3e1f046'
+down_revision: Union[str, None] = '9c4e1f7a2b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job_checkpoints',
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('checkpoint', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    # Пользователи, у которых изменились данные для достижений
+    op.create_index('ix_reminders_updated_at', 'reminders', ['updated_at'])
+    op.create_index('ix_habits_updated_at', 'habits', ['updated_at'])
+    op.create_index('ix_habit_progress_updated_at', 'habit_progress', ['updated_at'])
+    op.create_index('ix_users_updated_at', 'users', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_updated_at', table_name='users')
+    op.drop_index('ix_habit_progress_updated_at', table_name='habit_progress')
+    op.drop_index('ix_habits_updated_at', table_name='habits')
+    op.drop_index('ix_reminders_updated_at', table_name='reminders')
+    op.drop_table('job_checkpoints')
@@ -1,5 +1,6 @@
 import hashlib
 from datetime import timedelta, datetime
+from functools import lru_cache
 from os import environ
 
 from passlib.context import CryptContext
@@ -77,28 +78,86 @@ class DefaultSettings(BaseSettings):
     # CONSTANTS
     TAGS_MAX_LENGTH: int = 7  # for bot inline keyboard
 
+    # Утренняя сводка: пользователей на странице и одновременных отправок
+    MORNING_DIGEST_PAGE_SIZE: int = environ.get("MORNING_DIGEST_PAGE_SIZE", 500)
+    MORNING_DIGEST_SEND_CONCURRENCY: int = environ.get("MORNING_DIGEST_SEND_CONCURRENCY", 50)
+    # Сводка приходит в MORNING_DIGEST_LOCAL_HOUR по времени пользователя,
+    # расписание проверяет часовые пояса каждые MORNING_DIGEST_TICK_MINUTES минут
+    MORNING_DIGEST_LOCAL_HOUR: int = environ.get("MORNING_DIGEST_LOCAL_HOUR", 6)
+    MORNING_DIGEST_TICK_MINUTES: int = environ.get("MORNING_DIGEST_TICK_MINUTES", 15)
+
+    # Кеш пользователей для авторизации
+    USER_CACHE_TTL_SECONDS: float = environ.get("USER_CACHE_TTL_SECONDS", 30)
+    USER_CACHE_MAX_SIZE: int = environ.get("USER_CACHE_MAX_SIZE", 10000)
+
+    # Как долго держать в памяти справочник ролей, типов ресурсов и квот
+    QUOTA_DEFINITIONS_TTL_SECONDS: float = environ.get("QUOTA_DEFINITIONS_TTL_SECONDS", 300)
+    # Как часто сверять версию справочника с БД, чтобы увидеть синхронизацию из другого процесса
+    QUOTA_DEFINITIONS_CHECK_SECONDS: float = environ.get("QUOTA_DEFINITIONS_CHECK_SECONDS", 5)
+
+    # Проверка достижений: пользователей в пачке и запас по времени для транзакций,
+    # которые начались до предыдущей отметки, а зафиксировались после нее
+    ACHIEVEMENT_BATCH_SIZE: int = environ.get("ACHIEVEMENT_BATCH_SIZE", 500)
+    ACHIEVEMENT_CHECK_OVERLAP_SECONDS: float = environ.get("ACHIEVEMENT_CHECK_OVERLAP_SECONDS", 300)
+
     # Настройки Temporal
     TEMPORAL_HOST: str = environ.get("TEMPORAL_HOST", "localhost:7233")
     TEMPORAL_NAMESPACE: str = environ.get("TEMPORAL_NAMESPACE", "remindme")
     TEMPORAL_TASK_QUEUE: str = environ.get("TEMPORAL_TASK_QUEUE", "remindme-tasks")
+    CHECK_REMINDERS_WORKFLOW_ID: str = "check-reminders"
     ACTIVE_REMINDERS_LIMIT: int = environ.get("ACTIVE_REMINDERS_LIMIT", 1000)
+    # Режим отправки напоминаний: "child" — дочерний воркфлоу на каждое напоминание,
+    # "batch" — одна активность на пачку из REMINDERS_BATCH_SIZE напоминаний
+    REMINDERS_DISPATCH_MODE: str = environ.get("REMINDERS_DISPATCH_MODE", "child")
+    REMINDERS_BATCH_SIZE: int = environ.get("REMINDERS_BATCH_SIZE", 50)
     CLEANUP_DAYS_THRESHOLD: int = environ.get("CLEANUP_DAYS_THRESHOLD", 10)
+    CLEANUP_BATCH_SIZE: int = environ.get("CLEANUP_BATCH_SIZE", 1000)
+    # Сроки хранения: дневной расход квот сворачивается в месячный, отметки привычек
+    # уходят в годовой архив-битмап, истекшие роли удаляются
+    QUOTA_USAGE_RETENTION_DAYS: int = environ.get("QUOTA_USAGE_RETENTION_DAYS", 62)
+    HABIT_PROGRESS_RETENTION_DAYS: int = environ.get("HABIT_PROGRESS_RETENTION_DAYS", 400)
+    USER_ROLE_RETENTION_DAYS: int = environ.get("USER_ROLE_RETENTION_DAYS", 30)
     HABIT_IMAGE_CHARACTER: str = environ.get("HABIT_IMAGE_CHARACTER", "кот")
 
     # Настройки Telegram
     TELEGRAM_BOT_TOKEN: str = environ.get("BOT_TOKEN", "")
-    TELEGRAM_API_URL: str = "https://api.telegram.org/bot"
+    TELEGRAM_API_URL: str = environ.get("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+    # Лимиты Bot API: ~30 сообщений в секунду на бота и 1 сообщение в секунду в один чат
+    TELEGRAM_GLOBAL_RATE_LIMIT: float = environ.get("TELEGRAM_GLOBAL_RATE_LIMIT", 30)
+    TELEGRAM_CHAT_RATE_LIMIT: float = environ.get("TELEGRAM_CHAT_RATE_LIMIT", 1)
+    TELEGRAM_MAX_CONNECTIONS: int = environ.get("TELEGRAM_MAX_CONNECTIONS", 100)
+    TELEGRAM_MAX_RETRIES: int = environ.get("TELEGRAM_MAX_RETRIES", 3)
 
     # Настройки Yandex GPT
     YANDEX_GPT_MODEL_NAME: str = environ.get("YANDEX_GPT_MODEL_NAME", "yandexgpt-lite")
     YANDEX_GPT_MODEL_COST: float = environ.get("YANDEX_GPT_MODEL_COST", 0.2)
     YANDEX_CLOUD_AI_SECRET: str = environ.get("YANDEX_CLOUD_AI_SECRET", "")
+    # Подсчет токенов для оценки стоимости: "approximate" — локально, "remote" — через API tokenize
+    YANDEX_GPT_TOKENIZER_MODE: str = environ.get("YANDEX_GPT_TOKENIZER_MODE", "approximate")
+    # Запас к локальной оценке количества токенов (0.2 = +20%)
+    YANDEX_GPT_TOKENIZER_ERROR_MARGIN: float = environ.get("YANDEX_GPT_TOKENIZER_ERROR_MARGIN", 0.2)
     YANDEX_CLOUD_S3_BUCKET_NAME: str = environ.get("YANDEX_CLOUD_S3_BUCKET_NAME", "remindme-images-bucket")
     YANDEX_CLOUD_S3_KEY_ID: str = environ.get("YANDEX_CLOUD_S3_KEY_ID", "")
     YANDEX_CLOUD_S3_SECRET: str = environ.get("YANDEX_CLOUD_S3_SECRET", "")
     YANDEX_CLOUD_FOLDER: str = environ.get("YANDEX_CLOUD_FOLDER", "")
     YANDEX_ART_MODEL_COST: float = 2.2
 
+    # Пул потоков для блокирующих клиентов (SDK Яндекса, boto3, caldav)
+    OFFLOAD_MAX_WORKERS: int = environ.get("OFFLOAD_MAX_WORKERS", 32)
+
+    # Синхронизация календарей: одновременных запросов к одному серверу CalDAV,
+    # сколько хранить найденные календари интеграции, интеграций на странице и одновременно
+    CALDAV_PER_HOST_CONCURRENCY: int = environ.get("CALDAV_PER_HOST_CONCURRENCY", 4)
+    CALDAV_DISCOVERY_CACHE_TTL_SECONDS: float = environ.get("CALDAV_DISCOVERY_CACHE_TTL_SECONDS", 6 * 3600)
+    CALDAV_DISCOVERY_CACHE_MAX_SIZE: int = environ.get("CALDAV_DISCOVERY_CACHE_MAX_SIZE", 50000)
+    CALENDAR_SYNC_PAGE_SIZE: int = environ.get("CALENDAR_SYNC_PAGE_SIZE", 200)
+    CALENDAR_SYNC_CONCURRENCY: int = environ.get("CALENDAR_SYNC_CONCURRENCY", 32)
+    # Повторяющиеся события разворачиваются на HORIZON дней вперед с запасом REFRESH дней:
+    # серия загружается заново, когда до конца развернутого окна остается меньше горизонта
+    CALENDAR_EXPANSION_HORIZON_DAYS: int = environ.get("CALENDAR_EXPANSION_HORIZON_DAYS", 30)
+    CALENDAR_EXPANSION_REFRESH_DAYS: int = environ.get("CALENDAR_EXPANSION_REFRESH_DAYS", 7)
+    CALENDAR_EXPANSION_CACHE_MAX_SIZE: int = environ.get("CALENDAR_EXPANSION_CACHE_MAX_SIZE", 20000)
+
     # Настройки логирования
     LOG_LEVEL: str = environ.get("LOG_LEVEL", "INFO")
 
@@ -124,5 +183,13 @@ class DefaultSettings(BaseSettings):
         )
 
 
-def get_settings():
+@lru_cache(maxsize=1)
+def get_settings() -> DefaultSettings:
+    """Настройки процесса: создаются один раз и переиспользуются всеми вызовами."""
     return DefaultSettings()
+
+
+def reload_settings() -> DefaultSettings:
+    """Сбрасывает кеш и перечитывает настройки (для тестов и смены окружения)."""
+    get_settings.cache_clear()
+    return get_settings()
@@ -8,6 +8,7 @@ from yandex_cloud_ml_sdk import YCloudML
 
 from backend.config import get_settings
 from backend.control_plane.ai_clients.ai_provider import AIArtProvider, AILLMProvider
+from backend.control_plane.utils.offload import get_offloader, YANDEX_ART
 from .costs import YandexArtCostCalculator
 from ..prompts import PromptRegistry, RequestType
 from ...db.models import HabitInterval
@@ -56,6 +57,18 @@ class YandexArtProvider(AIArtProvider):
         Returns:
             bytes: Байты изображения
         """
+        # Генерация блокирует поток до завершения операции
+        return await get_offloader().run(
+            YANDEX_ART, self._generate_image_sync, prompts, width_ratio, height_ratio, seed
+        )
+
+    def _generate_image_sync(
+            self,
+            prompts: Union[str, List[Union[str, Dict[str, Any]]]],
+            width_ratio: int,
+            height_ratio: int,
+            seed: Optional[int]
+    ) -> bytes:
         model = self.sdk.models.image_generation(self.model_name)
 
         # Настраиваем модель
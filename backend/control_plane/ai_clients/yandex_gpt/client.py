@@ -8,6 +8,7 @@ from yandex_cloud_ml_sdk import YCloudML
 
 from backend.config import get_settings
 from backend.control_plane.utils import timeutils
+from backend.control_plane.utils.offload import get_offloader, YANDEX_GPT
 from .costs import YandexGptCostCalculator
 from ..ai_provider import AILLMProvider
 from ..prompts import PromptRegistry, RequestType
@@ -47,9 +48,9 @@ class YandexGptProvider(AILLMProvider):
                 "text": prompt,
             },
         ]
-        resp = self.sdk.models.completions(model_name=self.model_name, model_version=self.model_version) \
-            .configure(temperature=0.5) \
-            .run(messages)
+        model = self.sdk.models.completions(model_name=self.model_name, model_version=self.model_version) \
+            .configure(temperature=0.5)
+        resp = await get_offloader().run(YANDEX_GPT, model.run, messages)
         logger.debug("resp: %s", str(resp))
 
         usage = resp.usage.total_tokens
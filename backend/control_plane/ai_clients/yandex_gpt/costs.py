@@ -1,29 +1,67 @@
+import re
+
 from yandex_cloud_ml_sdk import YCloudML
 
+from backend.config import get_settings
 from backend.control_plane.ai_clients.ai_provider import AIProviderCostCalculator
+from backend.control_plane.utils.cache import TTLCache
+from backend.control_plane.utils.offload import get_offloader, YANDEX_GPT
+from .tokenizer import ApproximateTokenizer
 from ..prompts import RequestType, PromptRegistry
 
+TOKENIZER_REMOTE = "remote"
+TOKENIZER_APPROXIMATE = "approximate"
+
+# Системные промпты почти не меняются (в промпте времени меняется только текущая минута)
+SYSTEM_PROMPT_CACHE_SIZE = 256
+SYSTEM_PROMPT_CACHE_TTL_SECONDS = 3600
+
+# Текущее время в системном промпте заменяется для ключа кеша образцом того же формата:
+# число токенов от минуты не зависит, а ключ перестает меняться каждую минуту
+PROMPT_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}")
+PROMPT_TIMESTAMP_SAMPLE = "2000-01-01T00:00"
+
+
 class YandexGptCostCalculator(AIProviderCostCalculator):
-    def __init__(self, folder_id, auth, model_name, cost):
+    def __init__(self, folder_id, auth, model_name, cost, tokenizer_mode=None, error_margin=None):
         self.sdk = YCloudML(
             folder_id=folder_id,
             auth=auth
         )
         self.model_name = model_name
         self.cost_per_1k_tokens = cost
+        self.tokenizer_mode = tokenizer_mode or get_settings().YANDEX_GPT_TOKENIZER_MODE
+        self.approximate_tokenizer = ApproximateTokenizer(
+            error_margin=float(error_margin if error_margin is not None
+                               else get_settings().YANDEX_GPT_TOKENIZER_ERROR_MARGIN)
+        )
+        self.system_prompt_tokens = TTLCache(SYSTEM_PROMPT_CACHE_SIZE, SYSTEM_PROMPT_CACHE_TTL_SECONDS)
 
     async def calc_cost(self, prompt: str, request_type: RequestType) -> float:
         """Calculate cost including system prompt"""
         system_text = PromptRegistry.get_prompt(request_type)
-        combined_text = f"'role': 'system', 'text': '{system_text}'\ndelimiter\n'role': 'user', 'text': '{prompt}'"
-        token_count = await self._count_tokens(combined_text)
+        system_part = f"'role': 'system', 'text': '{system_text}'\ndelimiter\n"
+        user_part = f"'role': 'user', 'text': '{prompt}'"
+        token_count = await self._count_system_tokens(request_type, system_part) + await self._count_tokens(user_part)
         return await self.calc_cost_per_tokens(token_count)
 
     async def calc_cost_per_tokens(self, token_count: int) -> float:
         """Calculate cost per tokens"""
         return self.cost_per_1k_tokens * token_count / 1000
 
+    async def _count_system_tokens(self, request_type: RequestType, text: str) -> int:
+        """Количество токенов системного промпта, запоминается по типу запроса и шаблону без текущего времени"""
+        template = PROMPT_TIMESTAMP_RE.sub(PROMPT_TIMESTAMP_SAMPLE, text)
+        key = (self.tokenizer_mode, request_type, template)
+        token_count = self.system_prompt_tokens.get(key)
+        if token_count is None:
+            token_count = await self._count_tokens(template)
+            self.system_prompt_tokens.set(key, token_count)
+        return token_count
+
     async def _count_tokens(self, text: str) -> int:
+        if self.tokenizer_mode == TOKENIZER_APPROXIMATE:
+            return self.approximate_tokenizer.count(text)
         model = self.sdk.models.completions(self.model_name)
-        result = model.tokenize(text)
+        result = await get_offloader().run(YANDEX_GPT, model.tokenize, text)
         return len(result)
@@ -0,0 +1,25 @@
+import math
+import re
+
+
+class ApproximateTokenizer:
+    """
+    Оценка количества токенов без обращения к API.
+
+    Текст делится на слова и знаки препинания, слово считается как
+    len / chars_per_token токенов (с округлением вверх). К итогу добавляется
+    запас error_margin, чтобы предварительная проверка квот не занижала стоимость.
+    """
+
+    WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+    def __init__(self, chars_per_token: float = 4.0, error_margin: float = 0.2):
+        self.chars_per_token = chars_per_token
+        self.error_margin = error_margin
+
+    def count(self, text: str) -> int:
+        tokens = sum(
+            math.ceil(len(piece) / self.chars_per_token)
+            for piece in self.WORD_RE.findall(text)
+        )
+        return math.ceil(tokens * (1 + self.error_margin))
@@ -5,6 +5,7 @@ from fastapi import FastAPI
 
 from backend.config import get_settings, DefaultSettings
 from backend.control_plane.middlewares.log_request import start_debug_logging
+from backend.control_plane.middlewares.unit_of_work import UnitOfWorkMiddleware
 from backend.control_plane.routes import list_of_routes
 from backend.control_plane.utils.openapi_schema import custom_openapi
 
@@ -27,6 +28,7 @@ def get_app() -> FastAPI:
     )
     settings = get_settings()
     bind_routes(application, settings)
+    application.add_middleware(UnitOfWorkMiddleware)
     application.openapi_schema = custom_openapi(application)
     return application
 
@@ -1,10 +1,16 @@
+import asyncio
+import functools
+import logging
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from contextvars import ContextVar
+from typing import AsyncGenerator, Awaitable, Callable, List, Optional
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncConnection, async_sessionmaker
 
 from backend.config import get_settings
 
+logger = logging.getLogger("db_engine")
+
 
 class DatabaseEngine:
     @classmethod
@@ -31,9 +37,159 @@ engine, async_session_maker = DatabaseEngine.create(get_settings().DATABASE_URI,
                                                     pool_recycle=get_settings().SQL_POOL_RECYCLE)
 
 
+class UnitOfWork:
+    """
+    Единица работы запроса FastAPI или активности Temporal: одно подключение
+    из пула и одна транзакция на все репозитории.
+
+    Подключение берется при первом обращении к БД. Сессии репозиториев работают
+    в точках сохранения этой транзакции: их commit() освобождает точку сохранения,
+    rollback() откатывает только свою часть. Транзакция фиксируется один раз в конце.
+    На время долгих внешних вызовов подключение отпускается (см. release_connection).
+    Действия, которые должны видеть зафиксированные данные (сигналы воркфлоу),
+    откладываются до фиксации через after_commit.
+    """
+
+    def __init__(self):
+        self.owner = asyncio.current_task()
+        self.active = True
+        self._connection: Optional[AsyncConnection] = None
+        self._after_commit: List[Callable[[], Awaitable]] = []
+
+    def serves_current_task(self) -> bool:
+        # Одно подключение не выполняет запросы параллельно: задачи, запущенные
+        # через asyncio.gather и т.п., работают в своих сессиях вне единицы работы
+        return self.active and asyncio.current_task() is self.owner
+
+    async def connection(self) -> AsyncConnection:
+        if self._connection is None:
+            self._connection = await engine.connect()
+            await self._connection.begin()
+        return self._connection
+
+    def after_commit(self, callback: Callable[[], Awaitable]):
+        """Откладывает вызов корутинной функции callback до фиксации транзакции; при откате он отбрасывается"""
+        self._after_commit.append(callback)
+
+    async def _run_after_commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Ошибка действия после фиксации: {e}")
+
+    async def commit(self):
+        self.active = False
+        await self.release()
+
+    async def rollback(self):
+        self.active = False
+        self._after_commit = []
+        if self._connection is not None and self._connection.in_transaction():
+            await self._connection.rollback()
+
+    async def release(self):
+        """
+        Фиксирует сделанное и возвращает подключение в пул (следующее обращение к БД возьмет новое),
+        затем выполняет отложенные действия после фиксации
+        """
+        if self._connection is not None:
+            if self._connection.in_transaction():
+                await self._connection.commit()
+            await self._connection.close()
+            self._connection = None
+        await self._run_after_commit()
+
+    async def close(self):
+        self.active = False
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar("unit_of_work", default=None)
+
+
 @asynccontextmanager
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    """Асинхронный контекстный менеджер для получения сессии."""
+async def unit_of_work() -> AsyncGenerator[UnitOfWork, None]:
+    """
+    Открывает единицу работы для текущей задачи: при выходе без исключения
+    транзакция фиксируется, при исключении откатывается.
+    Вложенный вызов в той же задаче продолжает внешнюю единицу работы.
+    """
+    current = _unit_of_work.get()
+    if current is not None and current.serves_current_task():
+        yield current
+        return
+
+    uow = UnitOfWork()
+    token = _unit_of_work.set(uow)
+    try:
+        yield uow
+        await uow.commit()
+    except BaseException:
+        await uow.rollback()
+        raise
+    finally:
+        _unit_of_work.reset(token)
+        await uow.close()
+
+
+async def release_connection():
+    """
+    Отпускает подключение единицы работы текущей задачи перед долгим внешним вызовом
+    (ИИ-провайдер, Telegram): изменения до этой точки фиксируются, подключение
+    возвращается в пул и не простаивает в открытой транзакции. Следующее обращение
+    к БД возьмет подключение заново. Вне единицы работы ничего не делает.
+    """
+    uow = _unit_of_work.get()
+    if uow is not None and uow.serves_current_task():
+        await uow.release()
+
+
+async def run_after_commit(callback: Callable[[], Awaitable]):
+    """
+    Вызывает корутинную функцию callback после фиксации единицы работы текущей задачи,
+    а вне единицы работы — сразу
+    """
+    uow = _unit_of_work.get()
+    if uow is not None and uow.serves_current_task():
+        uow.after_commit(callback)
+    else:
+        await callback()
+
+
+def in_unit_of_work(func):
+    """Выполняет корутину (например, активность Temporal) в единице работы"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        async with unit_of_work():
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+@asynccontextmanager
+async def get_async_session(detached: bool = False) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Асинхронный контекстный менеджер для получения сессии.
+
+    Внутри единицы работы сессия использует ее подключение и транзакцию.
+    detached=True дает отдельную сессию со своей транзакцией — для записей,
+    которые должны фиксироваться сразу и не откатываться вместе с запросом
+    (например, учет квот).
+    """
+    uow = _unit_of_work.get()
+    if not detached and uow is not None and uow.serves_current_task():
+        connection = await uow.connection()
+        async with async_session_maker(bind=connection, join_transaction_mode="create_savepoint") as session:
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+        return
+
     async with async_session_maker() as session:
         # Транзакцией можно управлять здесь или в репозитории
         # async with session.begin(): # Если хотите авто-коммит/роллбек
@@ -10,12 +10,13 @@ from .base import (
 from .user import User
 from .tag import Tag
 from .reminder import Reminder, reminder_tags
-from .habit import Habit, HabitProgress
+from .habit import Habit, HabitProgress, HabitProgressArchive
 from .achievement import AchievementTemplate, UserAchievement
 from .neuro_image import NeuroImage
-from .quota import Quota, QuotaUsage, ResourceType
+from .quota import Quota, QuotaUsage, QuotaUsageMonthly, ResourceType
 from .role import Role, UserRole
 from .calendar import CalendarIntegration
+from .checkpoint import JobCheckpoint
 
 __all__ = [
     'BaseModel',
@@ -31,13 +32,16 @@ __all__ = [
     'reminder_tags',
     'Habit',
     'HabitProgress',
+    'HabitProgressArchive',
     'AchievementTemplate',
     'UserAchievement',
     'NeuroImage',
     'Quota',
     'QuotaUsage',
+    'QuotaUsageMonthly',
     'ResourceType',
     'Role',
     'UserRole',
     'CalendarIntegration',
+    'JobCheckpoint',
 ]
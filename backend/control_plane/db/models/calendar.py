@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Date, Integer, Enum, DateTime, func, ForeignKey, Text, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Date, Integer, Enum, DateTime, func, ForeignKey, Text, Boolean, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -14,9 +14,19 @@ class CalendarIntegration(BaseModel):
     password = Column(String(255))
     last_sync = Column(DateTime(timezone=True), nullable=True)
 
+    # Состояние инкрементальной синхронизации: ctag и sync-token коллекции,
+    # ETag и UID событий каждого объекта {href: {"etag": ..., "ids": [...]}}
+    ctag = Column(String(255), nullable=True)
+    sync_token = Column(Text, nullable=True)
+    event_etags = Column(JSONB, nullable=True)
+
     # Отношения
     user = relationship("User", back_populates="calendar_integrations")
     reminders = relationship("Reminder", back_populates="calendar_integration")
 
+    __table_args__ = (
+        Index('ix_calendar_integrations_user_id', 'user_id'),
+    )
+
     def __repr__(self):
         return f"<CalendarIntegration {self.caldav_url[:20]}... ({self.id})>"
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from .base import BaseModel
+
+
+class JobCheckpoint(BaseModel):
+    """Отметка, до которой периодическая задача уже обработала изменения"""
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String(255), nullable=False, unique=True)
+    checkpoint = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<JobCheckpoint {self.name}={self.checkpoint}>"
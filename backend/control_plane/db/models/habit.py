@@ -1,9 +1,9 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from typing import List
 
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import Column, Text, Date, Boolean, ForeignKey, Enum, Integer, UniqueConstraint, DateTime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Text, Date, Boolean, ForeignKey, Enum, Integer, UniqueConstraint, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID, BIT
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from .base import BaseModel, HabitInterval
@@ -32,6 +32,12 @@ class Habit(BaseModel):
                                     cascade="all, delete-orphan", lazy="selectin")  # lazy='...'?
     neuro_images = relationship("NeuroImage", back_populates="habit")
 
+    __table_args__ = (
+        Index('ix_habits_user_id', 'user_id'),
+        # Инкрементальная проверка достижений
+        Index('ix_habits_updated_at', 'updated_at'),
+    )
+
     def __repr__(self):
         return f"<Habit {self.text[:20]}... ({self.id})>"
 
@@ -156,7 +162,39 @@ class HabitProgress(BaseModel):
     # Ограничения
     __table_args__ = (
         UniqueConstraint('habit_id', 'record_date', name='uq_habit_date'),
+        # Инкрементальная проверка достижений
+        Index('ix_habit_progress_updated_at', 'updated_at'),
+        # Архивация старых отметок (retention)
+        Index('ix_habit_progress_record_date', 'record_date'),
     )
 
     def __repr__(self):
         return f"<HabitProgress habit={self.habit_id} date={self.record_date}>"
+
+
+# Битов в годовой битовой карте архива: по одному на день года, включая високосный
+ARCHIVE_YEAR_DAYS = 366
+
+
+class HabitProgressArchive(BaseModel):
+    """
+    Архив выполнения привычки за год: бит N (слева, с нуля) — выполнена ли
+    привычка в N+1-й день года. Заменяет строки habit_progress старше срока хранения.
+    """
+    __tablename__ = "habit_progress_archive"
+
+    habit_id = Column(UUID(as_uuid=True), ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
+    year = Column(Integer, nullable=False)
+    completed_days = Column(BIT(ARCHIVE_YEAR_DAYS), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('habit_id', 'year', name='uq_habit_progress_archive'),
+    )
+
+    def completed_dates(self) -> List[date]:
+        """Даты выполнения привычки из битовой карты"""
+        first_day = date(self.year, 1, 1)
+        return [first_day + timedelta(days=day) for day, bit in enumerate(str(self.completed_days)) if bit == "1"]
+
+    def __repr__(self):
+        return f"<HabitProgressArchive habit={self.habit_id} year={self.year}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, ForeignKey, Enum, Date
+from sqlalchemy import Column, String, Text, ForeignKey, Enum, Date, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .base import BaseModel, ImageRate, ImageStatus
@@ -21,5 +21,9 @@ class NeuroImage(BaseModel):
     habit = relationship("Habit", back_populates="neuro_images")
     reminder = relationship("Reminder", back_populates="neuro_images")
 
+    __table_args__ = (
+        Index('ix_neuro_images_user_id', 'user_id'),
+    )
+
     def __repr__(self):
         return f"<NeuroImage id={self.id}>"
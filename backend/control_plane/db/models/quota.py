@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Text, ForeignKey, Enum, DateTime, func, Integer, UniqueConstraint, Date, Numeric
+from sqlalchemy import Column, String, Text, ForeignKey, Enum, DateTime, func, Integer, UniqueConstraint, Date, Numeric, \
+    Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -49,7 +50,26 @@ class QuotaUsage(BaseModel):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'resource_type_id', 'date', name='unique_user_resource_date'),
+        # Свертка старых строк в помесячные (retention)
+        Index('ix_quota_usages_date', 'date'),
     )
 
     def __repr__(self):
         return f"<QuotaUsage {self.resource_type.name} - {self.usage_value}>"
+
+
+class QuotaUsageMonthly(BaseModel):
+    """Свернутое использование ресурса за месяц, старше срока хранения дневных строк"""
+    __tablename__ = 'quota_usage_monthly'
+
+    user_id = Column(UUID, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    resource_type_id = Column(UUID, ForeignKey('resource_types.id', ondelete="CASCADE"), nullable=False)
+    month = Column(Date, nullable=False)
+    usage_value = Column(Numeric(12, 4), nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'resource_type_id', 'month', name='uq_quota_usage_monthly'),
+    )
+
+    def __repr__(self):
+        return f"<QuotaUsageMonthly {self.month} - {self.usage_value}>"
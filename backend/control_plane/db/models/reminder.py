@@ -1,7 +1,8 @@
 import uuid
 from typing import List
 
-from sqlalchemy import Column, Text, DateTime, Boolean, ForeignKey, Enum, Table, String
+from sqlalchemy import Column, Text, DateTime, Boolean, ForeignKey, Enum, Table, String, Index
+from sqlalchemy import text as sql_text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.util import hybridproperty
@@ -37,6 +38,18 @@ class Reminder(BaseModel):
     neuro_images = relationship("NeuroImage", back_populates="reminder")
     calendar_integration = relationship("CalendarIntegration", back_populates="reminders")
 
+    __table_args__ = (
+        # Очередь на отправку (take_for_sending, get_next_reminder_time)
+        Index('ix_reminders_due_time', 'time',
+              postgresql_where=sql_text("status = 'ACTIVE' AND NOT notification_sent AND NOT removed")),
+        # Списки напоминаний пользователя с keyset-пагинацией по (time, id)
+        Index('ix_reminders_user_id_time', 'user_id', 'time', 'id'),
+        # Инкрементальная проверка достижений
+        Index('ix_reminders_updated_at', 'updated_at'),
+        # Сверка с календарем: одно напоминание на событие интеграции (ON CONFLICT)
+        Index('uq_reminders_calendar_event', 'calendar_integration_id', 'calendar_event_id', unique=True),
+    )
+
     def __repr__(self):
         return f"<Reminder {self.text[:20]}... ({self.id})>"
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Text, ForeignKey, Enum, Integer, DateTime, func
+from sqlalchemy import Column, String, Text, ForeignKey, Enum, Integer, DateTime, func, Index
+from sqlalchemy import text as sql_text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -29,5 +30,11 @@ class UserRole(BaseModel):
     user = relationship("User", back_populates="roles")
     role = relationship("Role", back_populates="users")
 
+    __table_args__ = (
+        Index('ix_user_roles_user_id_valid_from', 'user_id', 'valid_from'),
+        # Удаление истекших ролей (retention)
+        Index('ix_user_roles_valid_to', 'valid_to', postgresql_where=sql_text("valid_to IS NOT NULL")),
+    )
+
     def __repr__(self):
         return f"<UserRole {self.user_id} - {self.role_id}>"
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .base import BaseModel
@@ -16,5 +16,9 @@ class Tag(BaseModel):
     user = relationship("User", back_populates="tags")
     reminders = relationship("Reminder", secondary="reminder_tags", back_populates="_tags")
 
+    __table_args__ = (
+        Index('ix_tags_user_id', 'user_id'),
+    )
+
     def __repr__(self):
         return f"<Tag {self.name} ({self.id})>"
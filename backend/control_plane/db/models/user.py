@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Date, Integer, Enum, DateTime, func
+from sqlalchemy import Column, String, Date, Integer, Enum, DateTime, func, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .base import BaseModel, SexType
@@ -30,5 +30,12 @@ class User(BaseModel):
     quota_usages = relationship("QuotaUsage", back_populates="user")
     calendar_integrations = relationship("CalendarIntegration", back_populates="user")
 
+    __table_args__ = (
+        # Шарды утренней сводки по часовому поясу
+        Index('ix_users_timezone_offset_id', 'timezone_offset', 'id'),
+        # Инкрементальная проверка достижений
+        Index('ix_users_updated_at', 'updated_at'),
+    )
+
     def __repr__(self):
         return f"<User {self.username} ({self.id})>"
@@ -1,17 +1,32 @@
 """
 Репозиторий для работы с достижениями
 """
-from typing import Sequence, Optional
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Sequence, Optional, List, Dict, Any, Iterable
 from uuid import UUID
 
-from sqlalchemy import select, update, and_
+from sqlalchemy import select, update, and_, func, Integer, values, column, union
+from sqlalchemy.dialects.postgresql import insert, UUID as PG_UUID
 from sqlalchemy.future import select
 
 from ..engine import get_async_session
+from ..models import Habit, HabitProgress, Reminder, User
 from ..models.achievement import AchievementTemplate, UserAchievement
+from ..models.base import ReminderStatus
 from .base import BaseRepository
 
 
+@dataclass
+class AchievementProgress:
+    """Состояние достижения пользователя, вычисленное движком достижений"""
+    user_id: UUID
+    template_id: UUID
+    unlocked: bool
+    progress: int
+
+
 class AchievementTemplateRepository(BaseRepository[AchievementTemplate]):
     def __init__(self):
         super().__init__(AchievementTemplate)
@@ -48,3 +63,145 @@ class UserAchievementRepository(BaseRepository[UserAchievement]):
             )
             result = await session.execute(stmt)
             return result.scalars().one_or_none()
+
+    def changed_users_statement(self, since: Optional[datetime], until: datetime,
+                                after_user_id: Optional[UUID], limit: int):
+        """
+        Страница id пользователей (по возрастанию), у которых в (since, until] менялись
+        профиль, напоминания, привычки или отметки привычек. Без since — все пользователи.
+        """
+        if since is None:
+            changed = select(User.id.label("user_id")).subquery("changed_users")
+        else:
+            changed = union(
+                select(User.id.label("user_id")).where(User.updated_at > since, User.updated_at <= until),
+                select(Reminder.user_id).where(Reminder.updated_at > since, Reminder.updated_at <= until),
+                select(Habit.user_id).where(Habit.updated_at > since, Habit.updated_at <= until),
+                select(Habit.user_id).join(HabitProgress, HabitProgress.habit_id == Habit.id).where(
+                    HabitProgress.updated_at > since, HabitProgress.updated_at <= until
+                ),
+            ).subquery("changed_users")
+
+        stmt = select(changed.c.user_id)
+        if after_user_id is not None:
+            stmt = stmt.where(changed.c.user_id > after_user_id)
+        return stmt.order_by(changed.c.user_id).limit(limit)
+
+    async def get_changed_user_ids(self, since: Optional[datetime], until: datetime,
+                                   after_user_id: Optional[UUID], limit: int) -> List[UUID]:
+        """Страница пользователей, которым нужна проверка достижений"""
+        stmt = self.changed_users_statement(since, until, after_user_id, limit)
+        async with get_async_session() as session:
+            return list((await session.execute(stmt)).scalars().all())
+
+    def achievement_stats_statement(self, user_ids: List[UUID], profile_fields: Iterable[str]):
+        """
+        Один агрегирующий запрос со статистикой для условий достижений по пачке пользователей
+        """
+        reminders = select(
+            Reminder.user_id,
+            func.count().label("created_reminders"),
+            func.count().filter(Reminder.status == ReminderStatus.COMPLETED).label("completed_reminders"),
+        ).where(Reminder.user_id.in_(user_ids)).group_by(Reminder.user_id).subquery("reminder_stats")
+        habits = select(
+            Habit.user_id, func.count().label("created_habits")
+        ).where(Habit.user_id.in_(user_ids)).group_by(Habit.user_id).subquery("habit_stats")
+
+        return select(
+            User.id.label("user_id"),
+            User.telegram_id,
+            User.created_at,
+            func.coalesce(User.streak, 0).label("streak"),
+            func.coalesce(reminders.c.created_reminders, 0).label("created_reminders"),
+            func.coalesce(reminders.c.completed_reminders, 0).label("completed_reminders"),
+            func.coalesce(habits.c.created_habits, 0).label("created_habits"),
+            *(getattr(User, field).isnot(None).label(f"filled_{field}") for field in profile_fields),
+        ).select_from(User).outerjoin(
+            reminders, reminders.c.user_id == User.id
+        ).outerjoin(
+            habits, habits.c.user_id == User.id
+        ).where(User.id.in_(user_ids))
+
+    async def get_achievement_stats(self, user_ids: List[UUID], profile_fields: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Статистика пользователей для проверки достижений
+
+        Returns:
+            по словарю на пользователя: счетчики напоминаний и привычек,
+            дата регистрации и filled_<поле> для полей профиля
+        """
+        if not user_ids:
+            return []
+        stmt = self.achievement_stats_statement(user_ids, list(profile_fields))
+        async with get_async_session() as session:
+            result = await session.execute(stmt)
+            return [dict(row._mapping) for row in result]
+
+    async def apply_achievements(self, achievements: List[AchievementProgress],
+                                 experience: Dict[UUID, int], now: datetime) -> List[AchievementProgress]:
+        """
+        Применяет выдачу и прогресс достижений одним upsert и начисляет опыт за новые достижения.
+
+        Уже разблокированные достижения не меняются, прогресс только растет.
+        Всё выполняется в одной транзакции.
+
+        Args:
+            achievements: вычисленные состояния достижений
+            experience: опыт за каждый шаблон достижения
+            now: время разблокировки
+
+        Returns:
+            достижения, разблокированные этим вызовом
+        """
+        if not achievements:
+            return []
+
+        stmt = insert(UserAchievement).values([
+            {
+                "id": uuid.uuid4(),
+                "user_id": achievement.user_id,
+                "template_id": achievement.template_id,
+                "unlocked": achievement.unlocked,
+                "unlocked_at": now if achievement.unlocked else None,
+                "progress": achievement.progress,
+            }
+            for achievement in achievements
+        ])
+        existing = UserAchievement.__table__.c
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_user_achievement",
+            set_={
+                "unlocked": stmt.excluded.unlocked,
+                "unlocked_at": stmt.excluded.unlocked_at,
+                "progress": func.greatest(existing.progress, stmt.excluded.progress),
+                "updated_at": func.now(),
+            },
+            where=and_(
+                func.coalesce(existing.unlocked, False) == False,
+                (stmt.excluded.unlocked == True) | (stmt.excluded.progress > func.coalesce(existing.progress, 0)),
+            ),
+        ).returning(existing.user_id, existing.template_id, existing.unlocked, existing.progress)
+
+        async with get_async_session() as session:
+            rows = (await session.execute(stmt)).all()
+            granted = [
+                AchievementProgress(user_id=row.user_id, template_id=row.template_id,
+                                    unlocked=True, progress=row.progress)
+                for row in rows if row.unlocked
+            ]
+
+            bonuses: Dict[UUID, int] = {}
+            for achievement in granted:
+                bonuses[achievement.user_id] = bonuses.get(achievement.user_id, 0) + experience.get(
+                    achievement.template_id, 0)
+            if bonuses:
+                bonus_values = values(
+                    column("user_id", PG_UUID(as_uuid=True)), column("bonus", Integer), name="bonuses"
+                ).data(list(bonuses.items()))
+                await session.execute(
+                    update(User).where(User.id == bonus_values.c.user_id).values(
+                        experience=func.coalesce(User.experience, 0) + bonus_values.c.bonus
+                    )
+                )
+            await session.commit()
+        return granted
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import TypeVar, Generic, Type, Optional, Sequence, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -43,6 +44,16 @@ class BaseRepository(Generic[T]):
             result = await session.execute(stmt)
             return result.scalars().one_or_none()
 
+    async def get_by_model_ids(self, model_ids: List[UUID]) -> Sequence[T]:
+        if not model_ids:
+            return []
+        async with get_async_session() as session:
+            stmt = select(self.model).where(
+                getattr(self.model, "id").in_(model_ids)
+            )
+            result = await session.execute(stmt)
+            return result.scalars().all()
+
     async def get_models(self, user_id: UUID, **kwargs) -> Sequence[T]:
         async with get_async_session() as session:
             stmt = select(self.model).where(
@@ -89,29 +100,67 @@ class BaseRepository(Generic[T]):
         return result.scalars().first()
 
     async def delete_model(self, user_id: UUID, model_id: UUID) -> bool:
+        return bool(await self.delete_user_models(user_id=user_id, model_ids=[model_id]))
+
+    async def delete_user_models(self, user_id: UUID, model_ids: Sequence[UUID]) -> List[UUID]:
+        """
+        Удаляет записи пользователя одним DELETE ... WHERE id = ANY(:ids) AND user_id = :user_id RETURNING id.
+        Чужие и несуществующие id пропускаются.
+
+        Returns:
+            id удаленных записей
+        """
+        if not model_ids:
+            return []
+        model_id = getattr(self.model, "id")
         async with get_async_session() as session:
-            count_models = await self.count_models(user_id=user_id)
             stmt = delete(self.model).where(
                 and_(
-                    getattr(self.model, "id") == model_id
+                    model_id.in_(model_ids),
+                    getattr(self.model, "user_id") == user_id
                 )
-            )
-            await session.execute(stmt)
+            ).returning(model_id)
+            deleted = (await session.execute(stmt)).scalars().all()
             await session.commit()
-            return True if count_models - await self.count_models(user_id=user_id) else False
+            return list(deleted)
 
     async def delete_models(self, model_ids: List[UUID]) -> bool:
+        if not model_ids:
+            return True
         async with get_async_session() as session:
-            for model_id in model_ids:
-                stmt = delete(self.model).where(
-                    and_(
-                        getattr(self.model, "id") == model_id
-                    )
-                )
-                await session.execute(stmt)
+            stmt = delete(self.model).where(
+                getattr(self.model, "id").in_(model_ids)
+            )
+            await session.execute(stmt)
             await session.commit()
             return True
 
+    async def delete_removed_batch(self, removed_before: datetime, limit: int) -> int:
+        """
+        Окончательно удаляет пачку помеченных удаленными (removed) записей,
+        не менявшихся с removed_before. Для моделей с мягким удалением.
+
+        Returns:
+            число удаленных записей
+        """
+        model_id = getattr(self.model, "id")
+        batch = (
+            select(model_id)
+            .where(
+                getattr(self.model, "removed") == True,
+                getattr(self.model, "updated_at") < removed_before,
+            )
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with get_async_session() as session:
+            result = await session.execute(
+                delete(self.model).where(model_id.in_(batch.scalar_subquery())).returning(model_id)
+            )
+            deleted = len(result.all())
+            await session.commit()
+            return deleted
+
     async def count_models(self, user_id: UUID, **kwargs) -> int:
         async with get_async_session() as session:
             stmt = select(func.count()).select_from(self.model).where(
@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, func
-from datetime import date, timedelta
+from sqlalchemy import and_, func, or_
+from datetime import date, datetime, timedelta
 from typing import List, Optional, Dict, Sequence
 from uuid import UUID
 
@@ -24,3 +24,20 @@ class CalendarIntegrationRepository(BaseRepository[CalendarIntegration]):
             )
             result = await session.execute(stmt)
             return result.scalars().all()
+
+    async def get_due_integrations(self, synced_before: datetime, after_id: Optional[UUID],
+                                   limit: int) -> List[CalendarIntegration]:
+        """
+        Страница активных интеграций (по возрастанию id), которые не синхронизировались
+        с synced_before. Уже синхронизированные выпадают из выборки, поэтому повтор
+        страницы продолжает с несинхронизированных.
+        """
+        async with get_async_session() as session:
+            stmt = select(CalendarIntegration).where(
+                CalendarIntegration.active == True,
+                or_(CalendarIntegration.last_sync.is_(None), CalendarIntegration.last_sync < synced_before),
+            )
+            if after_id is not None:
+                stmt = stmt.where(CalendarIntegration.id > after_id)
+            result = await session.execute(stmt.order_by(CalendarIntegration.id).limit(limit))
+            return list(result.scalars().all())
@@ -0,0 +1,51 @@
+"""
+Репозиторий для отметок периодических задач
+"""
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from ..engine import get_async_session
+from ..models.checkpoint import JobCheckpoint
+from .base import BaseRepository
+
+
+class JobCheckpointRepository(BaseRepository[JobCheckpoint]):
+    def __init__(self):
+        super().__init__(JobCheckpoint)
+
+    async def get_checkpoint(self, name: str) -> Optional[datetime]:
+        """Отметка задачи name или None, если задача еще не отработала ни разу"""
+        async with get_async_session() as session:
+            stmt = select(JobCheckpoint.checkpoint).where(JobCheckpoint.name == name)
+            return (await session.execute(stmt)).scalar_one_or_none()
+
+    async def get_window(self, name: str):
+        """
+        Окно изменений для следующего запуска задачи: (отметка задачи, текущее время БД).
+        Время берется из БД, с которой сравниваются updated_at, а не с часов воркера.
+        """
+        async with get_async_session() as session:
+            stmt = select(
+                select(JobCheckpoint.checkpoint).where(JobCheckpoint.name == name).scalar_subquery(),
+                func.now(),
+            )
+            return (await session.execute(stmt)).one()
+
+    async def set_checkpoint(self, name: str, checkpoint: datetime) -> None:
+        """Сохраняет отметку; отметка не сдвигается назад"""
+        stmt = insert(JobCheckpoint).values(id=uuid.uuid4(), name=name, checkpoint=checkpoint)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[JobCheckpoint.name],
+            set_={
+                "checkpoint": func.greatest(JobCheckpoint.checkpoint, stmt.excluded.checkpoint),
+                "updated_at": func.now(),
+            },
+        )
+        async with get_async_session() as session:
+            await session.execute(stmt)
+            await session.commit()
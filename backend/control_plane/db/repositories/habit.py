@@ -1,32 +1,232 @@
 import datetime
-from typing import Sequence, List
+from typing import Sequence, List, Optional, Tuple, Dict
 from uuid import UUID
 
-from sqlalchemy import select, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, and_, delete, func, cast, case, Integer, Float, Date, Text, literal, literal_column, \
+    tuple_, union, union_all, true
+from sqlalchemy.dialects.postgresql import insert, BIT
+from sqlalchemy.orm import selectinload, noload
 
 from .base import BaseRepository
 from ..engine import get_async_session
-from ..models.habit import Habit, HabitProgress
-from ...schemas.habit import HabitSchemaResponse
+from ..models.base import HabitInterval
+from ..models.habit import Habit, HabitProgress, HabitProgressArchive, ARCHIVE_YEAR_DAYS
+from ...schemas.habit import HabitSchemaResponse, HabitSummarySchema, HabitProgressRecordSchema
 from ...schemas.requests.habit import HabitProgressSchemaPostRequest
 from ...utils import timeutils
 
+# Самое длинное окно, которое показывает Habit.progress (MONTHLY — 52 недели)
+PROGRESS_WINDOW = datetime.timedelta(weeks=52)
+
+# Дата отсчета номеров периодов привычек (понедельник, чтобы недели начинались с понедельника)
+PERIOD_EPOCH = datetime.date(2000, 1, 3)
+
+
+def habit_period_index(interval, day):
+    """Номер периода привычки (дня, недели или месяца), в который попадает дата day"""
+    days = cast(day - PERIOD_EPOCH, Integer)
+    return case(
+        (interval == HabitInterval.WEEKLY, days // 7),
+        (interval == HabitInterval.MONTHLY,
+         cast(func.extract("year", day) * 12 + func.extract("month", day), Integer)),
+        else_=days,
+    )
+
+
 class HabitRepository(BaseRepository[Habit]):
     def __init__(self):
         super().__init__(Habit)
 
-    async def find_habits_by_user_id(self, user_id: UUID) -> Sequence[HabitSchemaResponse]:
+    async def find_habits_by_user_id(self, user_id: UUID, limit: int,
+                                     after: Optional[Tuple[datetime.datetime, UUID]] = None,
+                                     interval: Optional[HabitInterval] = None,
+                                     removed: Optional[bool] = None) -> Sequence[HabitSchemaResponse]:
+        """
+        Страница привычек пользователя в порядке (created_at, id), начиная после позиции after.
+        Отметки прогресса загружаются только за окно, которое показывает Habit.progress.
+        """
+        progress_since = datetime.date.today() - PROGRESS_WINDOW
+        stmt = select(self.model).where(
+            and_(
+                getattr(self.model, "user_id") == user_id
+            )
+        ).options(
+            selectinload(self.model.progress_records.and_(HabitProgress.record_date >= progress_since))
+        ).order_by(self.model.created_at, self.model.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(tuple_(self.model.created_at, self.model.id) > tuple_(*after))
+        if interval is not None:
+            stmt = stmt.where(self.model.interval == interval)
+        if removed is not None:
+            stmt = stmt.where(self.model.removed == removed)
         async with get_async_session() as session:
-            stmt = select(self.model).where(
-                and_(
-                    getattr(self.model, "user_id") == user_id
-                )
-            ).options(selectinload(self.model.progress_records))  # Добавляем eager load
             result = await session.execute(stmt)
             response = result.scalars().all()
         return [HabitSchemaResponse.model_validate(obj) for obj in response]
 
+    async def find_habit_summaries(self, user_id: UUID, limit: int, today: datetime.date, window_days: int,
+                                   after: Optional[Tuple[datetime.datetime, UUID]] = None,
+                                   interval: Optional[HabitInterval] = None,
+                                   removed: Optional[bool] = None) -> List[HabitSummarySchema]:
+        """
+        Страница привычек пользователя в порядке (created_at, id) без отметок прогресса:
+        вместо них сводка, посчитанная в БД (см. progress_summary_statement)
+        """
+        stmt = select(self.model).where(
+            self.model.user_id == user_id
+        ).options(noload(self.model.progress_records)).order_by(self.model.created_at, self.model.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(tuple_(self.model.created_at, self.model.id) > tuple_(*after))
+        if interval is not None:
+            stmt = stmt.where(self.model.interval == interval)
+        if removed is not None:
+            stmt = stmt.where(self.model.removed == removed)
+        async with get_async_session() as session:
+            habits = (await session.execute(stmt)).scalars().all()
+            if not habits:
+                return []
+            summary_stmt = self.progress_summary_statement([habit.id for habit in habits], today, window_days)
+            summaries = {row.habit_id: row for row in await session.execute(summary_stmt)}
+        return [
+            HabitSummarySchema(
+                id=habit.id, user_id=habit.user_id, text=habit.text, interval=habit.interval,
+                custom_interval=habit.custom_interval, start_date=habit.start_date, end_date=habit.end_date,
+                removed=habit.removed, created_at=habit.created_at, updated_at=habit.updated_at,
+                current_streak=summaries[habit.id].current_streak, best_streak=summaries[habit.id].best_streak,
+                completion_rate=summaries[habit.id].completion_rate, recent_days=summaries[habit.id].recent_days,
+            )
+            for habit in habits
+        ]
+
+    @staticmethod
+    def _archived_days_select(*criteria):
+        """Дни выполнения (habit_id, day) из годовых битмапов архива, подходящих под criteria"""
+        series = func.generate_series(1, ARCHIVE_YEAR_DAYS).table_valued("day_number").render_derived(name="series")
+        return select(
+            HabitProgressArchive.habit_id,
+            (func.make_date(HabitProgressArchive.year, 1, 1, type_=Date) + (series.c.day_number - 1)).label("day"),
+        ).select_from(HabitProgressArchive).join(series, true()).where(
+            func.substring(HabitProgressArchive.completed_days, series.c.day_number, 1) == literal_column("B'1'"),
+            *criteria,
+        )
+
+    @classmethod
+    def _completed_days_subquery(cls, habit_ids, today):
+        """Дни выполнения привычек не позже today: живые отметки и дни из архива"""
+        recorded = select(HabitProgress.habit_id, HabitProgress.record_date.label("day")).where(
+            HabitProgress.habit_id.in_(habit_ids),
+            HabitProgress.completed == True,
+        )
+        archived = cls._archived_days_select(HabitProgressArchive.habit_id.in_(habit_ids))
+        completed = union(recorded, archived).subquery("all_completed")
+        return select(completed).where(completed.c.day <= today).subquery("completed")
+
+    @classmethod
+    def progress_summary_statement(cls, habit_ids: List[UUID], today: datetime.date, window_days: int):
+        """
+        Сводка прогресса привычек одним запросом, по строке на привычку:
+        current_streak и best_streak — серии выполненных периодов подряд (с учетом архива),
+        текущая серия продолжается, если выполнен текущий или предыдущий период;
+        completion_rate — доля выполненных периодов за последние window_days дней
+        (но не раньше start_date); recent_days — строка из '0' и '1' по дням окна, старые слева.
+        """
+        today = literal(today, Date)
+        first_day = today - (window_days - 1)
+        window_start = func.greatest(first_day, cast(Habit.start_date, Date))
+        done = cls._completed_days_subquery(habit_ids, today)
+
+        periods = select(
+            done.c.habit_id,
+            habit_period_index(Habit.interval, done.c.day).label("period_index"),
+            func.max(done.c.day).label("last_day"),
+        ).join(Habit, Habit.id == done.c.habit_id).group_by(done.c.habit_id, "period_index").subquery("periods")
+
+        # Подряд идущие периоды дают одинаковую разность номера периода и номера строки
+        islands = select(
+            periods.c.habit_id, periods.c.period_index,
+            (periods.c.period_index - func.row_number().over(
+                partition_by=periods.c.habit_id, order_by=periods.c.period_index
+            )).label("island")
+        ).subquery("islands")
+        runs = select(
+            islands.c.habit_id, func.count().label("length"), func.max(islands.c.period_index).label("last_period")
+        ).group_by(islands.c.habit_id, islands.c.island).subquery("runs")
+        current_period = habit_period_index(Habit.interval, today)
+        streaks = select(
+            runs.c.habit_id,
+            func.max(runs.c.length).label("best_streak"),
+            func.max(runs.c.length).filter(runs.c.last_period >= current_period - 1).label("current_streak"),
+        ).join(Habit, Habit.id == runs.c.habit_id).group_by(runs.c.habit_id).subquery("streaks")
+
+        in_window = select(
+            periods.c.habit_id, func.count().label("completed_periods")
+        ).join(Habit, Habit.id == periods.c.habit_id).where(
+            periods.c.last_day >= window_start
+        ).group_by(periods.c.habit_id).subquery("in_window")
+
+        # Бит дня в окне: первый день окна — самый левый бит
+        day_bit = literal_column(f"B'1'::bit({int(window_days)})", BIT(window_days)).op(">>")(done.c.day - first_day)
+        recent = select(
+            done.c.habit_id, func.bit_or(day_bit, type_=BIT(window_days)).label("days")
+        ).where(done.c.day >= first_day).group_by(done.c.habit_id).subquery("recent")
+
+        window_periods = current_period - habit_period_index(Habit.interval, window_start) + 1
+        completion_rate = case(
+            (window_periods > 0,
+             cast(func.coalesce(in_window.c.completed_periods, 0), Float) / window_periods),
+            else_=0.0,
+        )
+        return select(
+            Habit.id.label("habit_id"),
+            func.coalesce(streaks.c.current_streak, 0).label("current_streak"),
+            func.coalesce(streaks.c.best_streak, 0).label("best_streak"),
+            completion_rate.label("completion_rate"),
+            func.coalesce(cast(recent.c.days, Text), func.repeat("0", window_days)).label("recent_days"),
+        ).outerjoin(streaks, streaks.c.habit_id == Habit.id).outerjoin(
+            in_window, in_window.c.habit_id == Habit.id
+        ).outerjoin(recent, recent.c.habit_id == Habit.id).where(Habit.id.in_(habit_ids))
+
+    async def get_completed_days(self, today: datetime.date, habit_ids: Optional[List[UUID]] = None,
+                                 user_ids: Optional[List[UUID]] = None
+                                 ) -> List[Tuple[UUID, UUID, HabitInterval, datetime.date]]:
+        """
+        Дни выполнения привычек не позже today, включая архив, одним запросом.
+        Привычки выбираются по habit_ids или по владельцам user_ids.
+
+        Returns:
+            строки (habit_id, user_id, interval, day)
+        """
+        habits = habit_ids if habit_ids is not None else select(Habit.id).where(Habit.user_id.in_(user_ids))
+        done = self._completed_days_subquery(habits, today)
+        stmt = select(done.c.habit_id, Habit.user_id, Habit.interval, done.c.day).join(
+            Habit, Habit.id == done.c.habit_id
+        )
+        async with get_async_session() as session:
+            return list((await session.execute(stmt)).all())
+
+    async def get_progress_history(self, habit_id: UUID, limit: int,
+                                   before: Optional[datetime.date] = None) -> List[HabitProgressRecordSchema]:
+        """
+        Страница полной истории отметок привычки от новых к старым, начиная до даты before.
+        Дни из архива возвращаются как выполненные отметки.
+        """
+        recorded = select(
+            HabitProgress.habit_id, HabitProgress.record_date.label("day"), HabitProgress.completed
+        ).where(HabitProgress.habit_id == habit_id)
+        archive_criteria = [HabitProgressArchive.habit_id == habit_id]
+        if before is not None:
+            recorded = recorded.where(HabitProgress.record_date < before)
+            archive_criteria.append(HabitProgressArchive.year <= before.year)
+        archived = self._archived_days_select(*archive_criteria).add_columns(true().label("completed"))
+        history = union_all(recorded, archived).subquery("history")
+        # Дата отметки привычки уникальна (uq_habit_date), поэтому ключом страницы достаточно даты
+        stmt = select(history).order_by(history.c.day.desc()).limit(limit)
+        if before is not None:
+            stmt = stmt.where(history.c.day < before)
+        async with get_async_session() as session:
+            rows = (await session.execute(stmt)).all()
+        return [HabitProgressRecordSchema(record_date=row.day, completed=row.completed) for row in rows]
+
     async def create_habit(self, user_id: UUID, request: dict) -> HabitSchemaResponse:
         async with get_async_session() as session:
             obj = self.model(**request)
@@ -101,6 +301,70 @@ class HabitRepository(BaseRepository[Habit]):
             result = await session.execute(stmt)
             return result.scalars().all()
 
+    async def get_archived_completions(self, habit_id: UUID, start_date: datetime.date,
+                                       end_date: datetime.date) -> List[datetime.date]:
+        """Даты выполнения привычки за период из архива (отметки старше срока хранения)"""
+        async with get_async_session() as session:
+            stmt = select(HabitProgressArchive).where(
+                HabitProgressArchive.habit_id == habit_id,
+                HabitProgressArchive.year >= start_date.year,
+                HabitProgressArchive.year <= end_date.year,
+            ).order_by(HabitProgressArchive.year)
+            archives = (await session.execute(stmt)).scalars().all()
+        return [
+            day for archive in archives for day in archive.completed_dates()
+            if start_date <= day <= end_date
+        ]
+
+    @staticmethod
+    def archive_progress_statement(recorded_before: datetime.date, limit: int):
+        """
+        Переносит пачку отметок старше recorded_before в годовые битовые карты одним запросом:
+        DELETE ... RETURNING в CTE, группировка по привычке и году и upsert с побитовым OR.
+        Возвращает число перенесенных отметок.
+        """
+        batch = (
+            select(HabitProgress.id)
+            .where(HabitProgress.record_date < recorded_before)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        moved = (
+            delete(HabitProgress)
+            .where(HabitProgress.id.in_(batch.scalar_subquery()))
+            .returning(HabitProgress.habit_id, HabitProgress.record_date, HabitProgress.completed)
+            .cte("moved")
+        )
+        year = cast(func.extract("year", moved.c.record_date), Integer)
+        day_of_year = cast(func.extract("doy", moved.c.record_date), Integer)
+        empty_year = literal_column(f"B'0'::bit({ARCHIVE_YEAR_DAYS})", BIT(ARCHIVE_YEAR_DAYS))
+        first_day = literal_column(f"B'1'::bit({ARCHIVE_YEAR_DAYS})", BIT(ARCHIVE_YEAR_DAYS))
+        day_bit = case((moved.c.completed == True, first_day.op(">>")(day_of_year - 1)), else_=empty_year)
+
+        archived = insert(HabitProgressArchive).from_select(
+            [HabitProgressArchive.id, HabitProgressArchive.habit_id, HabitProgressArchive.year,
+             HabitProgressArchive.completed_days],
+            select(
+                func.gen_random_uuid(), moved.c.habit_id, year,
+                func.bit_or(day_bit, type_=BIT(ARCHIVE_YEAR_DAYS)),
+            ).group_by(moved.c.habit_id, year),
+        )
+        archived = archived.on_conflict_do_update(
+            constraint="uq_habit_progress_archive",
+            set_={
+                "completed_days": HabitProgressArchive.completed_days.op("|")(archived.excluded.completed_days),
+                "updated_at": func.now(),
+            },
+        ).cte("archived")
+        return select(func.count()).select_from(moved).add_cte(archived)
+
+    async def archive_progress(self, recorded_before: datetime.date, limit: int) -> int:
+        """Архивирует пачку старых отметок привычек; возвращает число перенесенных отметок"""
+        async with get_async_session() as session:
+            moved = (await session.execute(self.archive_progress_statement(recorded_before, limit))).scalar_one()
+            await session.commit()
+            return moved
+
     async def get_active_habits(self, user_id: UUID) -> Sequence[Habit]:
         response = await self.get_models(user_id=user_id, removed=False)
         return response
@@ -1,20 +1,148 @@
 import decimal
 import logging
+import time
+import uuid
+from dataclasses import dataclass, field
 from datetime import date
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, update, delete, and_, func, or_, case, literal, cast, Numeric, Date
+from sqlalchemy.dialects.postgresql import insert, UUID as PG_UUID
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.config import get_settings
 from backend.control_plane.db.engine import get_async_session
-from backend.control_plane.db.models import Quota, QuotaUsage, Role, User
+from backend.control_plane.db.models import Quota, QuotaUsage, QuotaUsageMonthly, Role, User
 from backend.control_plane.db.models.quota import ResourceType
 from backend.control_plane.db.repositories.base import BaseRepository
 from backend.control_plane.db.repositories.role import UserRoleRepository
+from backend.control_plane.db.types.roles import DEFAULT_ROLE
 
 logger = logging.getLogger("quota_repository")
 
+# Значение лимита, означающее отсутствие ограничения
+UNLIMITED = -1.0
+
+
+def usage_period_start(resource_type_name: str, day: date) -> date:
+    """
+    Дата строки quota_usages, в которой копится использование ресурса:
+    для месячных лимитов — первое число месяца, для остальных — сам день
+    """
+    if resource_type_name.endswith('_monthly'):
+        return day.replace(day=1)
+    return day
+
+
+def _to_decimal(value: float) -> decimal.Decimal:
+    return decimal.Decimal(str(value))
+
+
+@dataclass(frozen=True)
+class QuotaDefinitions:
+    """Снимок справочников: типы ресурсов, роли и лимиты ролей"""
+    resource_type_ids: Dict[str, UUID] = field(default_factory=dict)
+    role_ids: Dict[str, UUID] = field(default_factory=dict)
+    # resource_type_id -> {role_id: max_value}
+    limits: Dict[UUID, Dict[UUID, float]] = field(default_factory=dict)
+
+    @property
+    def default_role_id(self) -> Optional[UUID]:
+        return self.role_ids.get(DEFAULT_ROLE.lower())
+
+    def limits_for(self, resource_type_id: UUID) -> Dict[UUID, float]:
+        return self.limits.get(resource_type_id, {})
+
+
+class QuotaDefinitionCache:
+    """
+    Справочник квот в памяти процесса.
+
+    Раз в check_interval секунд сверяет с БД версию справочника — число строк и
+    последний updated_at ролей, типов ресурсов и квот — и перечитывает его, если
+    версия изменилась. Так синхронизация ролей и квот (CLI в отдельном процессе)
+    доходит до API и воркеров за check_interval, а не за TTL. Полностью справочник
+    перечитывается и по истечении TTL; invalidate() сбрасывает его в текущем процессе.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, check_interval: Optional[float] = None, timer=time.monotonic):
+        self.ttl = float(ttl if ttl is not None else get_settings().QUOTA_DEFINITIONS_TTL_SECONDS)
+        self.check_interval = float(check_interval if check_interval is not None
+                                    else get_settings().QUOTA_DEFINITIONS_CHECK_SECONDS)
+        self._timer = timer
+        self._definitions: Optional[QuotaDefinitions] = None
+        self._version: Optional[Tuple] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self.loads = 0
+
+    def invalidate(self):
+        self._definitions = None
+
+    async def get(self, force_reload: bool = False) -> QuotaDefinitions:
+        now = self._timer()
+        stale = force_reload or self._definitions is None or now - self._loaded_at >= self.ttl
+        if stale or now - self._checked_at >= self.check_interval:
+            async with get_async_session() as session:
+                version = await self.version(session)
+                if stale or version != self._version:
+                    self._definitions = await self.load(session)
+                    self._loaded_at = now
+                    self.loads += 1
+            self._version = version
+            self._checked_at = now
+        return self._definitions
+
+    @staticmethod
+    async def version(session: AsyncSession) -> Tuple:
+        """
+        Версия справочника одним запросом: удаление меняет число строк,
+        добавление и изменение — последний updated_at
+        """
+        columns = []
+        for model in (ResourceType, Role, Quota):
+            columns.append(select(func.count()).select_from(model).scalar_subquery())
+            columns.append(select(func.max(model.updated_at)).scalar_subquery())
+        return tuple((await session.execute(select(*columns))).one())
+
+    @staticmethod
+    async def load(session: AsyncSession) -> QuotaDefinitions:
+        resource_types = (await session.execute(select(ResourceType.name, ResourceType.id))).all()
+        roles = (await session.execute(select(Role.name, Role.id))).all()
+        quotas = (await session.execute(
+            select(Quota.resource_type_id, Quota.role_id, Quota.max_value)
+        )).all()
+
+        limits: Dict[UUID, Dict[UUID, float]] = {}
+        for resource_type_id, role_id, max_value in quotas:
+            limits.setdefault(resource_type_id, {})[role_id] = float(max_value)
+
+        return QuotaDefinitions(
+            resource_type_ids={name: rt_id for name, rt_id in resource_types},
+            role_ids={name: role_id for name, role_id in roles},
+            limits=limits,
+        )
+
+
+@dataclass
+class QuotaReserveResult:
+    """Результат резервирования нескольких ресурсов одним запросом"""
+    ok: bool
+    # Имя типа ресурса -> дата строки, в которую записано использование
+    periods: Dict[str, date] = field(default_factory=dict)
+    exceeded: Optional[str] = None
+    current_usage: Optional[float] = None
+    max_value: Optional[float] = None
+
+
+_quota_definition_cache = QuotaDefinitionCache()
+
+
+def get_quota_definition_cache() -> QuotaDefinitionCache:
+    return _quota_definition_cache
+
 
 class ResourceTypeRepository(BaseRepository[ResourceType]):
     def __init__(self):
@@ -41,76 +169,236 @@ class QuotaRepository(BaseRepository[Quota]):
 
         if not quota:
             # Безлимит, если квота не определена
-            return -1.0
+            return UNLIMITED
 
         return float(quota.max_value)
 
 
 class QuotaUsageRepository(BaseRepository[QuotaUsage]):
+    """
+    Учет использования квот. Изменения пишутся в отдельных сессиях (detached):
+    резерв должен быть виден параллельным запросам сразу и не держать блокировки
+    строк до конца единицы работы запроса.
+    """
+
     def __init__(self):
         super().__init__(QuotaUsage)
         self.quota_repo = QuotaRepository()
         self.user_role_repo = UserRoleRepository()
         self.resource_type_repo = ResourceTypeRepository()
+        self.definitions = get_quota_definition_cache()
+
+    async def _resolve_resource_type(self, resource_type_name: str) -> Tuple[QuotaDefinitions, Optional[UUID]]:
+        """Находит тип ресурса в справочнике; незнакомое имя — повод перечитать справочник"""
+        definitions = await self.definitions.get()
+        resource_type_id = definitions.resource_type_ids.get(resource_type_name)
+        if resource_type_id is None:
+            definitions = await self.definitions.get(force_reload=True)
+            resource_type_id = definitions.resource_type_ids.get(resource_type_name)
+        return definitions, resource_type_id
+
+    def _limit_expression(self, definitions: QuotaDefinitions, user_id: UUID, resource_type_id: UUID):
+        """
+        SQL-выражение лимита пользователя: лимиты ролей берутся из справочника,
+        активная роль выбирается подзапросом в том же запросе
+        """
+        limits = definitions.limits_for(resource_type_id)
+        if not limits or all(value == UNLIMITED for value in limits.values()):
+            return literal(_to_decimal(UNLIMITED), Numeric(10, 4))
+
+        role_id = self.user_role_repo.active_role_id_expression(user_id, definitions.default_role_id)
+        return case(
+            {role: _to_decimal(value) for role, value in limits.items()},
+            value=role_id,
+            else_=_to_decimal(UNLIMITED),
+        )
+
+    def _increment_statement(self, definitions: QuotaDefinitions, user_id: UUID, resource_type_id: UUID,
+                             period: date, increment: float, check_limit: bool = True):
+        """
+        INSERT ... ON CONFLICT (user_id, resource_type_id, date) DO UPDATE,
+        который увеличивает использование только если не превышен лимит.
+        Возвращает новое значение использования или ничего, если лимит превышен.
+        """
+        value = _to_decimal(increment)
+        stmt = insert(QuotaUsage)
+
+        if not check_limit:
+            stmt = stmt.values(
+                id=uuid.uuid4(),
+                user_id=user_id,
+                resource_type_id=resource_type_id,
+                date=period,
+                usage_value=value,
+            )
+            return stmt.on_conflict_do_update(
+                index_elements=[QuotaUsage.user_id, QuotaUsage.resource_type_id, QuotaUsage.date],
+                set_={"usage_value": QuotaUsage.usage_value + stmt.excluded.usage_value},
+            ).returning(QuotaUsage.usage_value)
+
+        quota_limit = select(
+            self._limit_expression(definitions, user_id, resource_type_id).label("max_value")
+        ).cte("quota_limit")
+        max_value = select(quota_limit.c.max_value).scalar_subquery()
+
+        row = select(
+            literal(uuid.uuid4(), PG_UUID(as_uuid=True)),
+            literal(user_id, PG_UUID(as_uuid=True)),
+            literal(resource_type_id, PG_UUID(as_uuid=True)),
+            literal(period, Date),
+            literal(value, Numeric(10, 4)),
+        ).where(or_(quota_limit.c.max_value < 0, literal(value, Numeric(10, 4)) <= quota_limit.c.max_value))
+
+        stmt = stmt.from_select(
+            [QuotaUsage.id, QuotaUsage.user_id, QuotaUsage.resource_type_id, QuotaUsage.date,
+             QuotaUsage.usage_value],
+            row,
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[QuotaUsage.user_id, QuotaUsage.resource_type_id, QuotaUsage.date],
+            set_={"usage_value": QuotaUsage.usage_value + stmt.excluded.usage_value},
+            where=or_(max_value < 0, QuotaUsage.usage_value + stmt.excluded.usage_value <= max_value),
+        ).returning(QuotaUsage.usage_value).add_cte(quota_limit)
+
+    async def reserve_resource_usage(self, user_id: UUID, resource_type_names: List[str],
+                                     amount: float) -> QuotaReserveResult:
+        """
+        Резервирует amount сразу по всем типам ресурсов.
+
+        Все строки использования увеличиваются одним INSERT ... ON CONFLICT DO UPDATE,
+        который блокирует их до конца транзакции. Если хоть один лимит превышен,
+        транзакция откатывается целиком — частичного списания не бывает.
+        """
+        definitions = await self.definitions.get()
+        if any(name not in definitions.resource_type_ids for name in resource_type_names):
+            definitions = await self.definitions.get(force_reload=True)
 
-    async def update_resource_usage(self, user_id: UUID, resource_type_name: str, increment_value: float = 1.0):
-        """Обновление использования ресурса"""
         today = date.today()
-        async with get_async_session() as session:
-            async with session.begin():
-                resource_type_obj = await self.resource_type_repo.get_resource_type_by_name(session, resource_type_name)
-                if not resource_type_obj:
-                    logger.error(f"Resource type {resource_type_name} not found")
-                    return False
-
-                existing = await session.execute(
-                    select(QuotaUsage).where(and_(
-                        QuotaUsage.user_id == user_id,
-                        QuotaUsage.resource_type_id == resource_type_obj.id,
-                        QuotaUsage.date == today
-                    ))
-                )
-
-                existing = existing.scalar_one_or_none()
-
-                if existing:
-                    existing.usage_value += decimal.Decimal.from_float(increment_value)
-                else:
-                    new_usage = QuotaUsage(
-                        user_id=user_id,
-                        resource_type_id=resource_type_obj.id,
-                        date=today,
-                        usage_value=decimal.Decimal.from_float(increment_value)
-                    )
-                    session.add(new_usage)
+        rows, names_by_id = [], {}
+        for name in resource_type_names:
+            resource_type_id = definitions.resource_type_ids.get(name)
+            if resource_type_id is None:
+                logger.warning(f"Resource type {name} not found")
+                return QuotaReserveResult(ok=False, exceeded=name)
+            names_by_id[resource_type_id] = name
+            rows.append({
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "resource_type_id": resource_type_id,
+                "date": usage_period_start(name, today),
+                "usage_value": _to_decimal(amount),
+            })
+
+        if not rows:
+            return QuotaReserveResult(ok=True)
+        periods = {name: row["date"] for name, row in zip(resource_type_names, rows)}
+
+        stmt = insert(QuotaUsage).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QuotaUsage.user_id, QuotaUsage.resource_type_id, QuotaUsage.date],
+            set_={"usage_value": QuotaUsage.usage_value + stmt.excluded.usage_value},
+        ).returning(
+            QuotaUsage.resource_type_id,
+            QuotaUsage.usage_value,
+            self.user_role_repo.active_role_id_expression(user_id, definitions.default_role_id),
+        )
+
+        async with get_async_session(detached=True) as session:
+            try:
+                for resource_type_id, usage_value, role_id in (await session.execute(stmt)).all():
+                    limit = definitions.limits_for(resource_type_id).get(role_id, UNLIMITED)
+                    if limit != UNLIMITED and float(usage_value) > limit:
+                        await session.rollback()
+                        return QuotaReserveResult(
+                            ok=False,
+                            exceeded=names_by_id[resource_type_id],
+                            current_usage=float(usage_value) - amount,
+                            max_value=limit,
+                        )
+                await session.commit()
+                return QuotaReserveResult(ok=True, periods=periods)
+            except SQLAlchemyError as e:
+                logger.error(f"Error in reserve_resource_usage: {e}")
+                return QuotaReserveResult(ok=False, exceeded=resource_type_names[0])
 
+    async def adjust_resource_usage(self, user_id: UUID, periods: Dict[str, date], delta: float) -> bool:
+        """
+        Корректирует зарезервированное использование на delta (может быть отрицательной)
+        сразу во всех строках periods, не опускаясь ниже нуля
+        """
+        if not periods or delta == 0:
+            return True
+
+        definitions = await self.definitions.get()
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "resource_type_id": definitions.resource_type_ids[name],
+                "date": period,
+                "usage_value": _to_decimal(max(delta, 0.0)),
+            }
+            for name, period in periods.items()
+            if name in definitions.resource_type_ids
+        ]
+        if not rows:
+            return False
+
+        stmt = insert(QuotaUsage).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QuotaUsage.user_id, QuotaUsage.resource_type_id, QuotaUsage.date],
+            set_={"usage_value": func.greatest(0, QuotaUsage.usage_value + _to_decimal(delta))},
+        )
+        async with get_async_session(detached=True) as session:
+            try:
+                await session.execute(stmt)
+                await session.commit()
                 return True
+            except SQLAlchemyError as e:
+                logger.error(f"Error in adjust_resource_usage: {e}")
+                return False
+
+    async def update_resource_usage(self, user_id: UUID, resource_type_name: str, increment_value: float = 1.0):
+        """Обновление использования ресурса (без проверки лимита)"""
+        definitions, resource_type_id = await self._resolve_resource_type(resource_type_name)
+        if not resource_type_id:
+            logger.error(f"Resource type {resource_type_name} not found")
+            return False
+
+        period = usage_period_start(resource_type_name, date.today())
+        async with get_async_session(detached=True) as session:
+            await session.execute(self._increment_statement(
+                definitions, user_id, resource_type_id, period, increment_value, check_limit=False
+            ))
+            await session.commit()
+            return True
 
     async def check_resource_limit(self, user_id: UUID, resource_type_name: str, increment_value: float = 1.0) -> bool:
         """Проверка, не превышен ли лимит ресурса"""
-        async with get_async_session() as session:
-            role_id = await self.user_role_repo.get_user_active_role(session, user_id)
-            resource_type = await self.resource_type_repo.get_resource_type_by_name(session, resource_type_name)
-
-            if not resource_type:
-                logger.error(f"Resource type {resource_type_name} not found")
-                return False
-
-            limit = await self.quota_repo.get_limit_for_resource(session, role_id, resource_type.id)
+        definitions, resource_type_id = await self._resolve_resource_type(resource_type_name)
+        if not resource_type_id:
+            logger.error(f"Resource type {resource_type_name} not found")
+            return False
+
+        # Проверка различных типов лимитов
+        conditions = [QuotaUsage.user_id == user_id, QuotaUsage.resource_type_id == resource_type_id]
+        if resource_type_name.endswith('_daily'):
+            conditions.append(QuotaUsage.date == func.current_date())
+        elif resource_type_name.endswith('_monthly'):
+            conditions.append(QuotaUsage.date >= func.date_trunc('month', func.current_date()))
+            conditions.append(QuotaUsage.date <= func.current_date())
+
+        current_usage = select(func.coalesce(func.sum(QuotaUsage.usage_value), 0)).where(
+            and_(*conditions)
+        ).scalar_subquery()
+        stmt = select(self._limit_expression(definitions, user_id, resource_type_id), current_usage)
 
-            if limit == -1.0:
-                return True
+        async with get_async_session() as session:
+            limit, usage = (await session.execute(stmt)).one()
 
-            # Проверка различных типов лимитов
-            if resource_type_name.endswith('_daily'):
-                current_usage = await self.get_user_daily_usage(session, user_id, resource_type.id)
-                return (current_usage + increment_value) <= limit
-            elif resource_type_name.endswith('_monthly'):
-                current_usage = await self.get_user_monthly_usage(session, user_id, resource_type.id)
-                return (current_usage + increment_value) <= limit
-            else:
-                current_usage = await self.get_user_resource_usage(session, user_id, resource_type.id)
-                return (current_usage + increment_value) <= limit
+        if float(limit) == UNLIMITED:
+            return True
+        return float(usage) + increment_value <= float(limit)
 
     async def get_user_daily_usage(self, session: AsyncSession, user_id: UUID, resource_type_id: UUID) -> float:
         """Get user's daily usage for a specific resource type"""
@@ -135,78 +423,82 @@ class QuotaUsageRepository(BaseRepository[QuotaUsage]):
 
     async def get_user_resource_usage(self, session: AsyncSession, user_id: UUID, resource_type_id: UUID) -> float:
         """Get user's total usage for a specific resource type (without time constraints)"""
-        stmt = select(func.coalesce(func.sum(QuotaUsage.usage_value), 0)).where(and_(
+        daily = select(func.coalesce(func.sum(QuotaUsage.usage_value), 0)).where(and_(
             QuotaUsage.user_id == user_id,
             QuotaUsage.resource_type_id == resource_type_id
-        ))
-        result = await session.execute(stmt)
+        )).scalar_subquery()
+        # Строки старше срока хранения свернуты в помесячные
+        monthly = select(func.coalesce(func.sum(QuotaUsageMonthly.usage_value), 0)).where(and_(
+            QuotaUsageMonthly.user_id == user_id,
+            QuotaUsageMonthly.resource_type_id == resource_type_id
+        )).scalar_subquery()
+        result = await session.execute(select(daily + monthly))
         return float(result.scalar_one())
 
+    @staticmethod
+    def rollup_usage_statement(used_before: date, limit: int):
+        """
+        Сворачивает пачку строк использования старше used_before в помесячные одним запросом:
+        DELETE ... RETURNING в CTE, суммирование по месяцу и upsert в quota_usage_monthly.
+        Возвращает число свернутых строк.
+        """
+        batch = (
+            select(QuotaUsage.id)
+            .where(QuotaUsage.date < used_before)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        moved = (
+            delete(QuotaUsage)
+            .where(QuotaUsage.id.in_(batch.scalar_subquery()))
+            .returning(QuotaUsage.user_id, QuotaUsage.resource_type_id, QuotaUsage.date, QuotaUsage.usage_value)
+            .cte("moved")
+        )
+        month = cast(func.date_trunc("month", moved.c.date), Date)
+        rolled = insert(QuotaUsageMonthly).from_select(
+            [QuotaUsageMonthly.id, QuotaUsageMonthly.user_id, QuotaUsageMonthly.resource_type_id,
+             QuotaUsageMonthly.month, QuotaUsageMonthly.usage_value],
+            select(
+                func.gen_random_uuid(), moved.c.user_id, moved.c.resource_type_id, month,
+                func.sum(moved.c.usage_value),
+            ).group_by(moved.c.user_id, moved.c.resource_type_id, month),
+        )
+        rolled = rolled.on_conflict_do_update(
+            constraint="uq_quota_usage_monthly",
+            set_={
+                "usage_value": QuotaUsageMonthly.usage_value + rolled.excluded.usage_value,
+                "updated_at": func.now(),
+            },
+        ).cte("rolled")
+        return select(func.count()).select_from(moved).add_cte(rolled)
+
+    async def rollup_usage(self, used_before: date, limit: int) -> int:
+        """Сворачивает пачку старых строк использования в помесячные; возвращает число свернутых строк"""
+        async with get_async_session() as session:
+            moved = (await session.execute(self.rollup_usage_statement(used_before, limit))).scalar_one()
+            await session.commit()
+            return moved
+
     async def check_and_increment_resource_usage(self, user_id: UUID, resource_type_name: str,
                                                  increment: float = 1.0) -> bool:
         """
         Атомарно проверяет, не превышен ли лимит ресурса, и увеличивает счетчик использования.
+
+        Проверка и увеличение выполняются одним INSERT ... ON CONFLICT DO UPDATE ... WHERE:
+        строка блокируется на время обновления, поэтому параллельные запросы не превысят лимит.
         """
-        async with get_async_session() as session:
+        definitions, resource_type_id = await self._resolve_resource_type(resource_type_name)
+        if not resource_type_id:
+            logger.warning(f"Resource type {resource_type_name} not found")
+            return False
+
+        period = usage_period_start(resource_type_name, date.today())
+        stmt = self._increment_statement(definitions, user_id, resource_type_id, period, increment)
+        async with get_async_session(detached=True) as session:
             try:
-                # Начинаем транзакцию
-                async with session.begin():
-                    # Сначала получаем resource_type
-                    resource_type = await self.resource_type_repo.get_resource_type_by_name(session, resource_type_name)
-
-                    if not resource_type:
-                        logger.warning(f"Resource type {resource_type_name} not found")
-                        return False
-
-                    # Получаем роль пользователя
-                    role_id = await self.user_role_repo.get_user_active_role(session, user_id)
-
-                    # Получаем максимальное значение квоты для данного типа ресурса
-                    max_value = await self.quota_repo.get_limit_for_resource(session, role_id, resource_type.id)
-
-                    # Если лимит -1, то он не ограничен
-                    if max_value == -1.0:
-                        return True
-
-                    # Получаем текущее использование
-                    today = date.today()
-                    usage_query = select(QuotaUsage.usage_value).where(and_(
-                        QuotaUsage.user_id == user_id,
-                        QuotaUsage.resource_type_id == resource_type.id,
-                        QuotaUsage.date == today
-                    ))
-                    usage_result = await session.execute(usage_query)
-                    current_usage = usage_result.scalar_one_or_none() or 0.0
-
-                    # Проверяем, не будет ли превышен лимит
-                    if float(current_usage) + increment > max_value:
-                        return False
-
-                    # Обновляем использование атомарно
-                    existing_usage = await session.execute(
-                        select(QuotaUsage).where(and_(
-                            QuotaUsage.user_id == user_id,
-                            QuotaUsage.resource_type_id == resource_type.id,
-                            QuotaUsage.date == today
-                        ))
-                    )
-                    existing_usage = existing_usage.scalar_one_or_none()
-
-                    if existing_usage:
-                        existing_usage.usage_value += decimal.Decimal.from_float(increment)
-                    else:
-                        # Создаем новую запись
-                        new_usage = QuotaUsage(
-                            user_id=user_id,
-                            resource_type_id=resource_type.id,
-                            date=today,
-                            usage_value=decimal.Decimal.from_float(increment)
-                        )
-                        session.add(new_usage)
-
-                    # Изменения сохраняются автоматически при выходе из транзакции
-                    return True
-
+                new_usage = (await session.execute(stmt)).scalar_one_or_none()
+                await session.commit()
+                return new_usage is not None
             except SQLAlchemyError as e:
                 logger.error(f"Error in check_and_increment_resource_count: {e}")
                 return False
@@ -216,32 +508,24 @@ class QuotaUsageRepository(BaseRepository[QuotaUsage]):
         """
         Атомарно уменьшает счетчик использования ресурса.
         """
-        async with get_async_session() as session:
-            try:
-                async with session.begin():
-                    today = date.today()
-                    resource_type = await self.resource_type_repo.get_resource_type_by_name(session, resource_type_name)
-
-                    if not resource_type:
-                        logger.warning(f"Resource type {resource_type_name} not found")
-                        return False
-
-                    existing_usage = await session.execute(
-                        select(QuotaUsage).where(and_(
-                            QuotaUsage.user_id == user_id,
-                            QuotaUsage.resource_type_id == resource_type.id,
-                            QuotaUsage.date == today
-                        ))
-                    )
-                    existing_usage = existing_usage.scalar_one_or_none()
-
-                    if existing_usage:
-                        # Уменьшаем значение, но не ниже 0
-                        existing_usage.usage_value = max(0.0, existing_usage.usage_value - decrement)
-
-                    # Изменения сохраняются автоматически при выходе из транзакции
-                    return True
+        definitions, resource_type_id = await self._resolve_resource_type(resource_type_name)
+        if not resource_type_id:
+            logger.warning(f"Resource type {resource_type_name} not found")
+            return False
+
+        period = usage_period_start(resource_type_name, date.today())
+        # Уменьшаем значение, но не ниже 0
+        stmt = update(QuotaUsage).where(and_(
+            QuotaUsage.user_id == user_id,
+            QuotaUsage.resource_type_id == resource_type_id,
+            QuotaUsage.date == period
+        )).values(usage_value=func.greatest(0, QuotaUsage.usage_value - _to_decimal(decrement)))
 
+        async with get_async_session(detached=True) as session:
+            try:
+                await session.execute(stmt)
+                await session.commit()
+                return True
             except SQLAlchemyError as e:
                 logger.error(f"Error in check_and_decrement_resource_count: {e}")
                 return False
@@ -250,19 +534,17 @@ class QuotaUsageRepository(BaseRepository[QuotaUsage]):
         """
         Получает текущее количество использованных ресурсов.
         """
+        definitions, resource_type_id = await self._resolve_resource_type(resource_type_name)
+        if not resource_type_id:
+            logger.warning(f"Resource type {resource_type_name} not found")
+            return 0.0
+
         async with get_async_session() as session:
             try:
-                today = date.today()
-                resource_type = await self.resource_type_repo.get_resource_type_by_name(session, resource_type_name)
-
-                if not resource_type:
-                    logger.warning(f"Resource type {resource_type_name} not found")
-                    return 0.0
-
                 query = select(QuotaUsage.usage_value).where(and_(
                     QuotaUsage.user_id == user_id,
-                    QuotaUsage.resource_type_id == resource_type.id,
-                    QuotaUsage.date == today
+                    QuotaUsage.resource_type_id == resource_type_id,
+                    QuotaUsage.date == usage_period_start(resource_type_name, date.today())
                 ))
                 result = await session.execute(query)
                 return float(result.scalar_one_or_none() or 0.0)
@@ -1,11 +1,15 @@
-from typing import Sequence, Annotated
+import uuid
+from dataclasses import dataclass
+from typing import Sequence, Annotated, Optional, List, Dict, Any, Tuple
 from uuid import UUID
 from fastapi import HTTPException
 from datetime import datetime, UTC
-from sqlalchemy import select, update, and_
+from sqlalchemy import select, update, and_, func, any_, all_, bindparam, literal_column, case, String, tuple_
+from sqlalchemy.dialects.postgresql import insert, ARRAY
 
 from ..engine import get_async_session
-from ..models.reminder import Reminder, ReminderStatus
+from ..models.calendar import CalendarIntegration
+from ..models.reminder import Reminder, ReminderStatus, reminder_tags
 from .base import BaseRepository
 from .tag import get_tag_repo
 from ..engine import get_async_session
@@ -16,6 +20,19 @@ from ...schemas.requests.reminder import ReminderMarkAsCompleteRequestSchema, Re
 from ...service.tag_service import TagService, get_tag_service
 from ...utils import timeutils
 
+# Сколько напоминаний вставляется одним INSERT (ограничение числа параметров запроса)
+RECONCILE_BATCH_SIZE = 1000
+# Расхождение времени события и напоминания, которое не считается изменением
+RECONCILE_TIME_TOLERANCE_SECONDS = 60
+
+
+@dataclass
+class CalendarEventReminder:
+    """Напоминание, вычисленное из события календаря"""
+    calendar_event_id: str
+    text: str
+    time: datetime
+
 
 class ReminderRepository(BaseRepository[Reminder]):
     def __init__(self):
@@ -26,7 +43,7 @@ class ReminderRepository(BaseRepository[Reminder]):
         tag_ids = request.pop("tags")
         reminder_id = request.pop("id")
 
-        async with await get_async_session() as session:
+        async with get_async_session() as session:
             response = await self.update_model(model_id=reminder_id, session=session, **request)
             if not response:
                 raise HTTPException(404, "Wrong entity for reminder_update")
@@ -39,6 +56,40 @@ class ReminderRepository(BaseRepository[Reminder]):
 
         return ReminderSchema.model_validate(response)
 
+    async def get_reminders_page(self, user_id: UUID, limit: int,
+                                 after: Optional[Tuple[datetime, UUID]] = None,
+                                 status: Optional[ReminderStatus] = ReminderStatus.ACTIVE,
+                                 time_from: Optional[datetime] = None,
+                                 time_to: Optional[datetime] = None,
+                                 tag_id: Optional[UUID] = None) -> Sequence[Reminder]:
+        """
+        Страница неудаленных напоминаний пользователя в порядке (time, id), начиная после позиции after.
+        Фильтры: статус, интервал времени [time_from, time_to) и тег.
+        """
+        stmt = (
+            select(Reminder)
+            .where(Reminder.user_id == user_id, Reminder.removed == False)
+            .order_by(Reminder.time, Reminder.id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(Reminder.time, Reminder.id) > tuple_(*after))
+        if status is not None:
+            stmt = stmt.where(Reminder.status == status)
+        if time_from is not None:
+            stmt = stmt.where(Reminder.time >= time_from)
+        if time_to is not None:
+            stmt = stmt.where(Reminder.time < time_to)
+        if tag_id is not None:
+            stmt = stmt.where(
+                select(reminder_tags.c.reminder_id)
+                .where(reminder_tags.c.reminder_id == Reminder.id, reminder_tags.c.tag_id == tag_id)
+                .exists()
+            )
+        async with get_async_session() as session:
+            result = await session.execute(stmt)
+            return result.scalars().all()
+
     async def get_active_reminders(self, user_id: UUID) -> Sequence[ReminderSchema]:
         response = await self.get_models(user_id=user_id, status=ReminderStatus.ACTIVE, removed=False)
         return [ReminderSchema.model_validate(reminder_response) for reminder_response in response]
@@ -49,7 +100,7 @@ class ReminderRepository(BaseRepository[Reminder]):
                               reminder: dict) -> ReminderSchema:
         tag_ids = reminder.pop("tags")
 
-        async with await get_async_session() as session:
+        async with get_async_session() as session:
             response = await self.create(user_id=user_id, session=session, **reminder)
 
             if not response:
@@ -66,6 +117,34 @@ class ReminderRepository(BaseRepository[Reminder]):
     async def mark_sent(self, reminder_id: UUID, sent=True) -> Reminder:
         return await self.update_model(model_id=reminder_id, notification_sent=sent)
 
+    async def mark_sent_many(self, reminder_ids: Sequence[UUID], sent=True) -> int:
+        if not reminder_ids:
+            return 0
+        async with get_async_session() as session:
+            stmt = (
+                update(Reminder)
+                .where(Reminder.id.in_(reminder_ids))
+                .values(notification_sent=sent)
+            )
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.rowcount
+
+    async def get_next_reminder_time(self) -> Optional[datetime]:
+        async with get_async_session() as session:
+            stmt = (
+                select(func.min(Reminder.time))
+                .where(
+                    and_(
+                        Reminder.status == ReminderStatus.ACTIVE,
+                        Reminder.notification_sent == False,
+                        Reminder.removed == False,
+                    )
+                )
+            )
+            result = await session.execute(stmt)
+            return result.scalar_one_or_none()
+
     async def take_for_sending(self, limit: int) -> Sequence[Reminder]:
         async with get_async_session() as session:
             async with session.begin():
@@ -97,4 +176,121 @@ class ReminderRepository(BaseRepository[Reminder]):
                 await session.execute(update_stmt)
                 await session.commit()
 
-                return reminders
\ No newline at end of file
+                return reminders
+
+    async def reconcile_calendar_events(
+            self,
+            user_id: UUID,
+            integration_id: UUID,
+            events: Sequence[CalendarEventReminder],
+            deleted_event_ids: Optional[Sequence[str]] = None,
+            present_event_ids: Optional[Sequence[str]] = None,
+            integration_values: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, int]:
+        """
+        Сверяет напоминания интеграции с событиями календаря в одной транзакции.
+
+        События вставляются многострочным INSERT ... ON CONFLICT (calendar_integration_id,
+        calendar_event_id): существующее напоминание обновляется, только если изменился
+        текст, время сдвинулось больше чем на минуту или оно было удалено.
+
+        Args:
+            events: напоминания для событий календаря
+            deleted_event_ids: ID удаленных событий — их напоминания помечаются удаленными
+            present_event_ids: все ID событий календаря — напоминания остальных событий
+                помечаются удаленными (полная синхронизация)
+            integration_values: поля интеграции, обновляемые в той же транзакции (last_sync и т.п.)
+
+        Returns:
+            счетчики created, updated, deleted, unchanged
+        """
+        # В одном INSERT ... ON CONFLICT строка не может обновиться дважды
+        by_event_id = {event.calendar_event_id: event for event in events}
+        results = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+        async with get_async_session() as session:
+            # Сначала удаления: если событие вернулось, upsert восстановит напоминание
+            for condition in self._calendar_removed_conditions(deleted_event_ids, present_event_ids):
+                deleted = await session.execute(
+                    update(Reminder)
+                    .where(
+                        Reminder.user_id == user_id,
+                        Reminder.calendar_integration_id == integration_id,
+                        Reminder.removed == False,
+                        condition,
+                    )
+                    .values(removed=True)
+                    .returning(Reminder.id)
+                )
+                results["deleted"] += len(deleted.all())
+
+            rows = list(by_event_id.values())
+            for start in range(0, len(rows), RECONCILE_BATCH_SIZE):
+                upserted = await session.execute(
+                    self._calendar_upsert_statement(user_id, integration_id, rows[start:start + RECONCILE_BATCH_SIZE])
+                )
+                for row in upserted:
+                    results["created" if row.inserted else "updated"] += 1
+            results["unchanged"] = len(rows) - results["created"] - results["updated"]
+
+            if integration_values:
+                await session.execute(
+                    update(CalendarIntegration)
+                    .where(CalendarIntegration.id == integration_id)
+                    .values(**integration_values)
+                )
+            await session.commit()
+        return results
+
+    @staticmethod
+    def _calendar_removed_conditions(deleted_event_ids: Optional[Sequence[str]],
+                                     present_event_ids: Optional[Sequence[str]]) -> list:
+        conditions = []
+        if deleted_event_ids:
+            conditions.append(Reminder.calendar_event_id == any_(
+                bindparam("deleted_event_ids", list(deleted_event_ids), type_=ARRAY(String))
+            ))
+        if present_event_ids is not None:
+            conditions.append(and_(
+                Reminder.calendar_event_id.is_not(None),
+                Reminder.calendar_event_id != all_(
+                    bindparam("present_event_ids", list(present_event_ids), type_=ARRAY(String))
+                ),
+            ))
+        return conditions
+
+    @staticmethod
+    def _calendar_upsert_statement(user_id: UUID, integration_id: UUID, events: Sequence[CalendarEventReminder]):
+        stmt = insert(Reminder).values([
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "text": event.text,
+                "time": event.time,
+                "status": ReminderStatus.ACTIVE,
+                "removed": False,
+                "notification_sent": False,
+                "calendar_event_id": event.calendar_event_id,
+                "calendar_integration_id": integration_id,
+            }
+            for event in events
+        ])
+        existing = Reminder.__table__.c
+        return stmt.on_conflict_do_update(
+            index_elements=[existing.calendar_integration_id, existing.calendar_event_id],
+            set_={
+                "text": stmt.excluded.text,
+                "time": stmt.excluded.time,
+                "removed": False,
+                # Восстановленное напоминание снова ждет отправки
+                "status": case((existing.removed == True, ReminderStatus.ACTIVE), else_=existing.status),
+                "notification_sent": case((existing.removed == True, False), else_=existing.notification_sent),
+                "updated_at": func.now(),
+            },
+            where=(
+                (existing.text != stmt.excluded.text)
+                | (func.abs(func.extract("epoch", existing.time - stmt.excluded.time))
+                   > RECONCILE_TIME_TOLERANCE_SECONDS)
+                | (existing.removed == True)
+            ),
+        ).returning(literal_column("xmax = 0").label("inserted"))
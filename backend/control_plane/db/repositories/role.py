@@ -1,8 +1,10 @@
+from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.control_plane.db.engine import get_async_session
 from backend.control_plane.db.models import Role, UserRole
 from backend.control_plane.db.repositories.base import BaseRepository
 from backend.control_plane.db.types.roles import DEFAULT_ROLE
@@ -18,6 +20,21 @@ class UserRoleRepository(BaseRepository[UserRole]):
     def __init__(self):
         super().__init__(UserRole)
 
+    def active_role_id_expression(self, user_id: UUID, default_role_id: UUID):
+        """
+        SQL-выражение с id активной роли пользователя (или роли по умолчанию),
+        чтобы встраивать выбор роли в другие запросы без отдельного обращения к БД
+        """
+        naive_now = timeutils.get_utc_now().replace(tzinfo=None)
+        active_role = select(UserRole.role_id).where(
+            and_(
+                UserRole.user_id == user_id,
+                UserRole.valid_from <= naive_now,
+                (UserRole.valid_to.is_(None) | (UserRole.valid_to >= naive_now))
+            )
+        ).order_by(UserRole.valid_from.desc()).limit(1).scalar_subquery()
+        return func.coalesce(active_role, default_role_id)
+
     async def get_user_active_role(self, session: AsyncSession, user_id: UUID) -> UUID:
         """Получение активной роли пользователя"""
         now = timeutils.get_utc_now()
@@ -48,3 +65,24 @@ class UserRoleRepository(BaseRepository[UserRole]):
             return basic_role.id
 
         return user_role.role_id
+
+    async def delete_expired_batch(self, expired_before: datetime, limit: int) -> int:
+        """
+        Удаляет пачку ролей, истекших раньше expired_before (valid_to без часового пояса, UTC)
+
+        Returns:
+            число удаленных ролей
+        """
+        batch = (
+            select(UserRole.id)
+            .where(UserRole.valid_to < expired_before)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with get_async_session() as session:
+            result = await session.execute(
+                delete(UserRole).where(UserRole.id.in_(batch.scalar_subquery())).returning(UserRole.id)
+            )
+            deleted = len(result.all())
+            await session.commit()
+            return deleted
@@ -32,7 +32,7 @@ class TagRepository(BaseRepository[Tag]):
     async def add_tags_to_reminder(self, tag_ids: Sequence[UUID], reminder_id: UUID, session=None):
         # TODO: add decorator for session provider or some better solution
         if not session:
-            async with await get_async_session() as session:
+            async with get_async_session() as session:
                 return await self.__add_tags_to_reminder(tag_ids, reminder_id, session)
         else:
             return await self.__add_tags_to_reminder(tag_ids, reminder_id, session)
@@ -1,14 +1,23 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
 from uuid import UUID
 
 from fastapi import HTTPException
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.future import select
+from sqlalchemy.sql import func
 
 from ..engine import get_async_session
+from ..models import Habit, Reminder
+from ..models.base import ReminderStatus
 from ..models.user import User
 from .base import BaseRepository
 from ...schemas.user import UserSchema, UserTelegramDataSchema
 
+# Смещение, которое модель User подставляет по умолчанию
+DEFAULT_TIMEZONE_OFFSET = 180
+
 
 class UserRepository(BaseRepository[User]):
     def __init__(self):
@@ -49,3 +58,78 @@ class UserRepository(BaseRepository[User]):
             await session.commit()
             await session.refresh(db_user)
             return UserSchema.model_validate(db_user)
+
+    def _timezone_offset_condition(self, timezone_offset: int):
+        # Пользователи без смещения живут по смещению по умолчанию
+        if timezone_offset == DEFAULT_TIMEZONE_OFFSET:
+            return or_(User.timezone_offset == timezone_offset, User.timezone_offset.is_(None))
+        return User.timezone_offset == timezone_offset
+
+    async def get_timezone_offsets(self, ranges: List[Tuple[int, int]]) -> List[int]:
+        """
+        Различные смещения пользователей, попадающие в полуинтервалы [start, end) из ranges
+        """
+        if not ranges:
+            return []
+        conditions = [and_(User.timezone_offset >= start, User.timezone_offset < end) for start, end in ranges]
+        if any(start <= DEFAULT_TIMEZONE_OFFSET < end for start, end in ranges):
+            conditions.append(User.timezone_offset.is_(None))
+
+        stmt = select(func.coalesce(User.timezone_offset, DEFAULT_TIMEZONE_OFFSET)).where(or_(*conditions)).distinct()
+        async with get_async_session() as session:
+            return sorted((await session.execute(stmt)).scalars().all())
+
+    def morning_digest_statement(self, timezone_offset: int, after_user_id: Optional[UUID], limit: int,
+                                 day_start: datetime, day_end: datetime):
+        """
+        Страница утренней сводки для пользователей с заданным смещением:
+        пользователи по возрастанию id (keyset-пагинация) с текстами напоминаний
+        на [day_start, day_end) и активных привычек
+        """
+        reminders = select(
+            func.array_agg(aggregate_order_by(Reminder.text, Reminder.time))
+        ).where(
+            and_(
+                Reminder.user_id == User.id,
+                Reminder.status == ReminderStatus.ACTIVE,
+                Reminder.removed == False,
+                Reminder.time >= day_start,
+                Reminder.time < day_end
+            )
+        ).scalar_subquery()
+        habits = select(
+            func.array_agg(aggregate_order_by(Habit.text, Habit.created_at))
+        ).where(
+            and_(
+                Habit.user_id == User.id,
+                Habit.removed == False
+            )
+        ).scalar_subquery()
+
+        stmt = select(User.id, User.telegram_id, reminders.label("reminders"), habits.label("habits")).where(
+            self._timezone_offset_condition(timezone_offset)
+        )
+        if after_user_id is not None:
+            stmt = stmt.where(User.id > after_user_id)
+        return stmt.order_by(User.id).limit(limit)
+
+    async def get_morning_digest_page(self, timezone_offset: int, after_user_id: Optional[UUID], limit: int,
+                                      day_start: datetime, day_end: datetime) -> List[dict]:
+        """
+        Утренняя сводка для страницы пользователей одним запросом.
+
+        Возвращаются все пользователи страницы, в том числе без задач,
+        чтобы курсор следующей страницы был id последнего из них.
+        """
+        stmt = self.morning_digest_statement(timezone_offset, after_user_id, limit, day_start, day_end)
+        async with get_async_session() as session:
+            rows = (await session.execute(stmt)).all()
+        return [
+            {
+                "user_id": row.id,
+                "telegram_id": row.telegram_id,
+                "reminders": row.reminders or [],
+                "habits": row.habits or [],
+            }
+            for row in rows
+        ]
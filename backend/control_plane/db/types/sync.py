@@ -13,6 +13,7 @@ from backend.control_plane.db.types.achievements import (
 )
 from backend.control_plane.db.models import Role, Quota, ResourceType as ResourceTypeModel, AchievementTemplate
 from backend.control_plane.db.models.base import AchievementCategory
+from backend.control_plane.db.repositories.quota import get_quota_definition_cache
 
 logger = logging.getLogger(__name__)
 
@@ -231,6 +232,9 @@ async def sync_roles_and_quotas(session: AsyncSession, dry_run: bool = False) ->
     # Применяем изменения
     if not dry_run:
         await session.commit()
+        # Справочник квот этого процесса перечитается при следующем обращении,
+        # остальные процессы увидят новую версию справочника при очередной сверке
+        get_quota_definition_cache().invalidate()
 
     return changes
 
@@ -0,0 +1,29 @@
+from backend.control_plane.db.engine import unit_of_work
+
+
+class UnitOfWorkMiddleware:
+    """
+    Выполняет каждый HTTP-запрос в единице работы: все репозитории используют
+    одно подключение и одну транзакцию. Транзакция фиксируется до отправки ответа,
+    поэтому клиент не увидит успешный ответ на незафиксированные изменения;
+    ответы с ошибкой (4xx/5xx) откатывают ее.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async with unit_of_work() as uow:
+            async def send_after_commit(message):
+                if message["type"] == "http.response.start" and uow.active:
+                    if message["status"] < 400:
+                        await uow.commit()
+                    else:
+                        await uow.rollback()
+                await send(message)
+
+            await self.app(scope, receive, send_after_commit)
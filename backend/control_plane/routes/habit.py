@@ -1,14 +1,19 @@
-from typing import Annotated
+from typing import Annotated, Optional, Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from fastapi.params import Body
 
+from backend.control_plane.db.models import HabitInterval
+from backend.control_plane.schemas.habit import HabitPageSchema, HabitSummaryPageSchema, HabitProgressPageSchema
+
 from backend.control_plane.schemas.requests.habit import HabitSchemaPostRequest, HabitSchemaPutRequest, \
     HabitProgressSchemaPostRequest
 from backend.control_plane.schemas.user import UserSchema
-from backend.control_plane.service.habit_service import HabitService, get_habit_service
+from backend.control_plane.service.habit_service import HabitService, get_habit_service, \
+    DEFAULT_SUMMARY_WINDOW_DAYS, MAX_SUMMARY_WINDOW_DAYS
 from backend.control_plane.utils.auth import get_authorized_user
+from backend.control_plane.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 habit_router = APIRouter(
     prefix="/habit",
@@ -21,9 +26,23 @@ habit_router = APIRouter(
 )
 async def habits_get(
         habit_service: Annotated[HabitService, Depends(get_habit_service)],
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+        cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+        interval: Optional[HabitInterval] = Query(None, description="Периодичность привычек"),
+        removed: Optional[bool] = Query(None, description="Признак удаления"),
+        summary: bool = Query(True, description="Сводка прогресса вместо отметок (история — /habit/{id}/progress)"),
+        window_days: int = Query(DEFAULT_SUMMARY_WINDOW_DAYS, ge=1, le=MAX_SUMMARY_WINDOW_DAYS,
+                                 description="Окно сводки в днях"),
         user: UserSchema = Depends(get_authorized_user)
-):
-    return await habit_service.find_habits_by_user_id(user_id=user.id)
+) -> Union[HabitSummaryPageSchema, HabitPageSchema]:
+    if summary:
+        return await habit_service.find_habit_summaries(
+            user_id=user.id, limit=limit, cursor=cursor, interval=interval, removed=removed,
+            window_days=window_days, timezone_offset=user.timezone_offset,
+        )
+    return await habit_service.find_habits_by_user_id(
+        user_id=user.id, limit=limit, cursor=cursor, interval=interval, removed=removed
+    )
 
 
 @habit_router.post(
@@ -64,6 +83,21 @@ async def habit_delete(
     return await habit_service.remove_habit(user_id=user.id, model_id=habit_id)
 
 
+@habit_router.get(
+    path="/{habit_id}/progress"
+)
+async def habit_progress_get(
+        habit_service: Annotated[HabitService, Depends(get_habit_service)],
+        habit_id: UUID,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+        cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+        user: UserSchema = Depends(get_authorized_user)
+) -> HabitProgressPageSchema:
+    return await habit_service.get_habit_progress_history(
+        user_id=user.id, habit_id=habit_id, limit=limit, cursor=cursor
+    )
+
+
 @habit_router.post(
     path="/{habit_id}/progress"
 )
@@ -1,15 +1,20 @@
-from typing import Annotated, Sequence
+from datetime import date
+from typing import Annotated, Sequence, Optional
 from uuid import UUID
 
 from aiohttp.web_response import Response
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Query
+
+from backend.control_plane.db.models import ReminderStatus
 
 from backend.control_plane.schemas.requests.reminder import ReminderMarkAsCompleteRequestSchema, \
     ReminderAddSchemaRequest
+from backend.control_plane.schemas.reminder import ReminderPageSchema
 from backend.control_plane.schemas.user import UserSchema
 from backend.control_plane.service.reminder_service import get_reminder_service, RemindersService
 from backend.control_plane.schemas import ReminderToEditTimeRequestSchema, ReminderToEditRequestSchema, ReminderSchema
 from backend.control_plane.utils.auth import get_authorized_user
+from backend.control_plane.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 reminder_router = APIRouter(
     prefix="/reminder",
@@ -44,9 +49,18 @@ async def reminder_add(
 )
 async def reminders_get_active(
         reminder_service: Annotated[RemindersService, Depends(get_reminder_service)],
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+        cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+        status: Optional[ReminderStatus] = Query(ReminderStatus.ACTIVE, description="Статус напоминаний"),
+        date_from: Optional[date] = Query(None, description="Первый день (в часовом поясе пользователя)"),
+        date_to: Optional[date] = Query(None, description="Последний день (в часовом поясе пользователя)"),
+        tag_id: Optional[UUID] = Query(None, description="Только напоминания с тегом"),
         user: UserSchema = Depends(get_authorized_user)
-) -> Sequence[ReminderSchema]:
-    reminders = await reminder_service.reminders_get_active(user_id=user.id)
+) -> ReminderPageSchema:
+    reminders = await reminder_service.reminders_get_active(
+        user_id=user.id, limit=limit, cursor=cursor, status=status,
+        date_from=date_from, date_to=date_to, tag_id=tag_id,
+    )
     return reminders
 
 
@@ -17,7 +17,7 @@ async def update_user(
         user_service: Annotated[UserService, Depends(get_user_service)],
         user: UserSchema = Depends(get_authorized_user)
 ):
-    return user_service.update_user(request=user)
+    return await user_service.update_user(request=user)
 
 
 @user_router.get("/")
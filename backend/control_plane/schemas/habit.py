@@ -29,3 +29,44 @@ class HabitSchemaResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class HabitPageSchema(BaseModel):
+    items: List[HabitSchemaResponse] = Field(..., description="Привычки страницы")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (None, если страница последняя)")
+
+
+class HabitSummarySchema(BaseModel):
+    id: UUID = Field(...)
+    user_id: UUID = Field(..., description="ID пользователя")
+    text: str = Field(..., description="Текст привычки")
+
+    interval: HabitInterval = Field(..., description="Периодичность привычки")
+    custom_interval: Optional[str] = Field(None, description="Пользовательский период (для period=custom)")
+
+    current_streak: int = Field(..., description="Текущая серия выполненных периодов")
+    best_streak: int = Field(..., description="Лучшая серия выполненных периодов")
+    completion_rate: float = Field(..., description="Доля выполненных периодов за окно сводки")
+    recent_days: str = Field(..., description="Выполнение по дням окна сводки: '1' — выполнено, старые дни слева")
+
+    start_date: date = Field(..., description="Дата начала")
+    end_date: Optional[date] = Field(None, description="Дата окончания")
+    removed: bool = Field(..., description="Признак удаления")
+
+    created_at: Optional[datetime] = Field(..., description="Время создания")
+    updated_at: Optional[datetime] = Field(..., description="Время последнего обновления")
+
+
+class HabitSummaryPageSchema(BaseModel):
+    items: List[HabitSummarySchema] = Field(..., description="Сводки привычек страницы")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (None, если страница последняя)")
+
+
+class HabitProgressRecordSchema(BaseModel):
+    record_date: date = Field(..., description="Дата отметки")
+    completed: bool = Field(..., description="Выполнена или нет")
+
+
+class HabitProgressPageSchema(BaseModel):
+    items: List[HabitProgressRecordSchema] = Field(..., description="Отметки страницы, от новых к старым")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (None, если страница последняя)")
@@ -30,3 +30,8 @@ class ReminderSchema(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ReminderPageSchema(BaseModel):
+    items: List[ReminderSchema] = Field(..., description="Напоминания страницы")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (None, если страница последняя)")
@@ -1,18 +1,68 @@
-from typing import Sequence
+from typing import Sequence, Optional
 from uuid import UUID
 
+from fastapi import HTTPException
+
+from backend.control_plane.db.models import HabitInterval
 from backend.control_plane.db.repositories.habit import HabitRepository
-from backend.control_plane.schemas.habit import HabitSchemaResponse
+from backend.control_plane.schemas.habit import HabitSchemaResponse, HabitPageSchema, HabitSummaryPageSchema, \
+    HabitProgressPageSchema
 from backend.control_plane.schemas.requests.habit import HabitSchemaPostRequest, HabitSchemaPutRequest, \
     HabitProgressSchemaPostRequest
+from backend.control_plane.utils import timeutils
+from backend.control_plane.utils.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+
+# Окно сводки прогресса по умолчанию и максимальное (укладывается в срок хранения отметок)
+DEFAULT_SUMMARY_WINDOW_DAYS = 30
+MAX_SUMMARY_WINDOW_DAYS = 366
 
 
 class HabitService:
     def __init__(self):
         self.repo = HabitRepository()
 
-    async def find_habits_by_user_id(self, user_id: UUID) -> Sequence[HabitSchemaResponse]:
-        return await self.repo.find_habits_by_user_id(user_id=user_id)
+    async def find_habits_by_user_id(self, user_id: UUID, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                     interval: Optional[HabitInterval] = None,
+                                     removed: Optional[bool] = None) -> HabitPageSchema:
+        # Лишняя запись показывает, есть ли следующая страница
+        habits = await self.repo.find_habits_by_user_id(
+            user_id=user_id, limit=limit + 1, after=decode_cursor(cursor), interval=interval, removed=removed
+        )
+        next_cursor = None
+        if len(habits) > limit:
+            habits = habits[:limit]
+            next_cursor = encode_cursor(habits[-1].created_at, habits[-1].id)
+        return HabitPageSchema(items=habits, next_cursor=next_cursor)
+
+    async def find_habit_summaries(self, user_id: UUID, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                   interval: Optional[HabitInterval] = None, removed: Optional[bool] = None,
+                                   window_days: int = DEFAULT_SUMMARY_WINDOW_DAYS,
+                                   timezone_offset: int = 0) -> HabitSummaryPageSchema:
+        # Серии и окно считаются по сегодняшнему дню пользователя
+        today = timeutils.convert_utc_to_user_timezone(timeutils.get_utc_now(), timezone_offset).date()
+        habits = await self.repo.find_habit_summaries(
+            user_id=user_id, limit=limit + 1, today=today, window_days=window_days,
+            after=decode_cursor(cursor), interval=interval, removed=removed,
+        )
+        next_cursor = None
+        if len(habits) > limit:
+            habits = habits[:limit]
+            next_cursor = encode_cursor(habits[-1].created_at, habits[-1].id)
+        return HabitSummaryPageSchema(items=habits, next_cursor=next_cursor)
+
+    async def get_habit_progress_history(self, user_id: UUID, habit_id: UUID, limit: int = DEFAULT_PAGE_SIZE,
+                                         cursor: Optional[str] = None) -> HabitProgressPageSchema:
+        if not await self.repo.count_models(user_id, id=habit_id):
+            raise HTTPException(404, "Habit not found")
+        after = decode_cursor(cursor, require_id=False)
+        records = await self.repo.get_progress_history(
+            habit_id=habit_id, limit=limit + 1, before=after[0].date() if after else None
+        )
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            next_cursor = encode_cursor(records[-1].record_date)
+        return HabitProgressPageSchema(items=records, next_cursor=next_cursor)
 
     async def create_habit(self, user_id: UUID, request: HabitSchemaPostRequest) -> HabitSchemaResponse:
         return await self.repo.create_habit(user_id=user_id, request=request.model_dump())
@@ -24,7 +74,7 @@ class HabitService:
         return HabitSchemaResponse.model_validate(response)
 
     async def remove_habit(self, user_id: UUID, model_id: UUID) -> bool:
-        return await self.repo.delete_model(user_id=user_id, model_id=model_id)
+        return bool(await self.repo.delete_user_models(user_id=user_id, model_ids=[model_id]))
 
     async def habit_get(self, model_id: UUID) -> HabitSchemaResponse:
         response = await self.repo.get_by_model_id(model_id=model_id)
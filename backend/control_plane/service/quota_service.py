@@ -1,15 +1,58 @@
 import logging
+from datetime import date
+from typing import Dict, Optional
 from uuid import UUID
 
 from backend.control_plane.ai_clients import default_llm_ai_provider, default_art_ai_provider, AIProvider
 from backend.control_plane.ai_clients.prompts import RequestType
-from backend.control_plane.db.repositories.quota import QuotaUsageRepository
+from backend.control_plane.db.repositories.quota import QuotaUsageRepository, usage_period_start
 from backend.control_plane.db.types.quotas import get_quotas_for_request_type
 from backend.control_plane.exceptions.quota import QuotaExceededException
 
 logger = logging.getLogger("quota_service")
 
 
+class QuotaReservation:
+    """
+    Резерв квоты под один запрос: стоимость уже списана по всем типам ресурсов запроса.
+
+    commit(actual_cost) доводит списание до фактической стоимости,
+    rollback() возвращает резерв. При использовании как async-контекста
+    резерв откатывается, если блок завершился исключением.
+    """
+
+    def __init__(self, repo: QuotaUsageRepository, user_id: UUID, request_type: RequestType, cost: float,
+                 periods: Dict[str, date]):
+        self.repo = repo
+        self.user_id = user_id
+        self.request_type = request_type
+        self.cost = cost
+        self.periods = periods
+        self.closed = False
+
+    async def commit(self, actual_cost: Optional[float] = None):
+        if self.closed:
+            return
+        self.closed = True
+        if actual_cost is not None and actual_cost != self.cost:
+            await self.repo.adjust_resource_usage(self.user_id, self.periods, actual_cost - self.cost)
+
+    async def rollback(self):
+        if self.closed:
+            return
+        self.closed = True
+        await self.repo.adjust_resource_usage(self.user_id, self.periods, -self.cost)
+
+    async def __aenter__(self) -> "QuotaReservation":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            await self.rollback()
+        else:
+            await self.commit()
+
+
 class QuotaService:
     def __init__(self):
         self.repo = QuotaUsageRepository()
@@ -44,19 +87,53 @@ class QuotaService:
                     requested_value=request_cost
                 )
 
-    async def update_ai_llm_request_usage(self, user_id: UUID, request_type: RequestType, token_count: int,
-                                          custom_ai_provider: AIProvider = None):
+    async def calc_ai_llm_cost(self, token_count: int, custom_ai_provider: AIProvider = None) -> float:
         """
-        Обновляет использование ресурсов после запроса к ИИ
+        Стоимость запроса к ИИ по фактическому количеству токенов
         """
         cost_calculator = self.ai_llm_provider.cost_calculator
         if custom_ai_provider is not None:
             cost_calculator = custom_ai_provider.cost_calculator
-        request_cost = await cost_calculator.calc_cost_per_tokens(token_count)
-        resource_types = get_quotas_for_request_type(request_type)
+        return await cost_calculator.calc_cost_per_tokens(token_count)
 
-        for resource_type in resource_types:
-            await self._update_resource_type_usage(user_id, resource_type.value, request_cost)
+    async def update_ai_llm_request_usage(self, user_id: UUID, request_type: RequestType, token_count: int,
+                                          custom_ai_provider: AIProvider = None):
+        """
+        Обновляет использование ресурсов после запроса к ИИ
+        """
+        request_cost = await self.calc_ai_llm_cost(token_count, custom_ai_provider)
+        today = date.today()
+        periods = {
+            resource_type.value: usage_period_start(resource_type.value, today)
+            for resource_type in get_quotas_for_request_type(request_type)
+        }
+        await self.repo.adjust_resource_usage(user_id, periods, request_cost)
+
+    async def reserve(self, user_id: UUID, request_type: RequestType, cost: float) -> QuotaReservation:
+        """
+        Проверяет и списывает cost сразу по всем квотам типа запроса (дневным и месячным).
+
+        Raises:
+            QuotaExceededException: если превышена хотя бы одна квота; ничего не списывается
+        """
+        resource_types = [resource_type.value for resource_type in get_quotas_for_request_type(request_type)]
+        result = await self.repo.reserve_resource_usage(user_id, resource_types, cost)
+        if not result.ok:
+            raise QuotaExceededException(
+                quota_type=result.exceeded,
+                user_id=user_id,
+                requested_value=cost,
+                current_usage=result.current_usage,
+                max_value=result.max_value
+            )
+        return QuotaReservation(self.repo, user_id, request_type, cost, result.periods)
+
+    async def reserve_ai_llm_request(self, user_id: UUID, request_type: RequestType, prompt: str) -> QuotaReservation:
+        """
+        Резервирует оценку стоимости запроса к ИИ; фактическая стоимость передается в commit()
+        """
+        request_cost = await self.ai_llm_provider.cost_calculator.calc_cost(prompt, request_type)
+        return await self.reserve(user_id, request_type, request_cost)
 
     async def check_and_increment_resource(self, user_id: UUID, resource_type: str, increment: int = 1) -> bool:
         """
@@ -78,19 +155,7 @@ class QuotaService:
         Проверяет и увеличивает использование ресурсов AI Art.
         """
         request_cost = await self.ai_art_provider.cost_calculator.calc_cost("", request_type)
-        resource_types = get_quotas_for_request_type(request_type)
-
-        # TODO: fix monthly quota updates before daily and then gets QuotaException
-        for resource_type in resource_types:
-            result = await self.repo.check_and_increment_resource_usage(user_id, resource_type.value, request_cost)
-            if not result:
-                current_usage = await self.repo.get_current_resource_usage(user_id, resource_type.value)
-                raise QuotaExceededException(
-                    quota_type=resource_type.value,
-                    user_id=user_id,
-                    requested_value=request_cost,
-                    current_usage=current_usage
-                )
+        await self.reserve(user_id, request_type, request_cost)
         return True
 
     async def decrement_resource(self, user_id: UUID, resource_type: str, decrement: int = 1) -> bool:
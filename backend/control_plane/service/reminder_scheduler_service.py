@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from temporalio.client import Client
+
+from backend.config import get_settings
+from backend.control_plane.db.engine import run_after_commit
+
+logger = logging.getLogger("reminder_scheduler_service")
+
+
+class ReminderSchedulerService:
+    """
+    Будит воркфлоу проверки напоминаний сигналом, когда напоминание
+    создано или перенесено, чтобы он перевзвел таймер раньше запланированного
+    """
+
+    SIGNAL_NAME = "reminders_changed"
+    SIGNAL_TIMEOUT_SECONDS = 2
+    # Сколько не пытаться подключиться к Temporal заново после неудачи
+    CONNECT_BACKOFF_SECONDS = 30
+
+    def __init__(self):
+        self._client: Optional[Client] = None
+        self._lock = asyncio.Lock()
+        self._connect_failed_at: Optional[float] = None
+
+    async def _get_client(self) -> Client:
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    settings = get_settings()
+                    self._client = await Client.connect(settings.TEMPORAL_HOST, namespace=settings.TEMPORAL_NAMESPACE)
+        return self._client
+
+    async def _signal(self, reminder_time: Optional[datetime]) -> None:
+        client = await self._get_client()
+        handle = client.get_workflow_handle(get_settings().CHECK_REMINDERS_WORKFLOW_ID)
+        await handle.signal(self.SIGNAL_NAME, reminder_time.isoformat() if reminder_time else None)
+
+    async def notify_changed(self, reminder_time: Optional[datetime] = None) -> None:
+        """
+        Отправляет сигнал reminders_changed после фиксации текущей единицы работы:
+        разбуженный воркфлоу должен прочитать уже новое время напоминания.
+        """
+        await run_after_commit(lambda: self._notify(reminder_time))
+
+    async def _notify(self, reminder_time: Optional[datetime]) -> None:
+        """
+        Ошибки сигнала не пробрасываются: воркфлоу в любом случае просыпается
+        не реже MAX_WAKEUP_INTERVAL. После неудачного подключения к Temporal сигналы
+        пропускаются CONNECT_BACKOFF_SECONDS, чтобы не задерживать каждый запрос.
+        """
+        if self._client is None and self._connect_failed_at is not None \
+                and time.monotonic() - self._connect_failed_at < self.CONNECT_BACKOFF_SECONDS:
+            return
+        try:
+            await asyncio.wait_for(self._signal(reminder_time), timeout=self.SIGNAL_TIMEOUT_SECONDS)
+        except Exception as e:
+            if self._client is None:
+                self._connect_failed_at = time.monotonic()
+            logger.warning(f"Failed to signal reminders workflow: {str(e)}")
+
+
+_reminder_scheduler_service = ReminderSchedulerService()
+
+
+def get_reminder_scheduler_service():
+    return _reminder_scheduler_service
@@ -1,20 +1,24 @@
 import datetime
 import logging
-from typing import Sequence
+from typing import Sequence, Optional
 from uuid import UUID
 
 from backend.control_plane.ai_clients import default_llm_ai_provider
 from backend.control_plane.ai_clients.prompts import RequestType
+from backend.control_plane.db.engine import release_connection
 from backend.control_plane.db.models import ReminderStatus
 from backend.control_plane.db.repositories.reminder import ReminderRepository
 from backend.control_plane.db.repositories.user import UserRepository
 from backend.control_plane.exceptions.quota import QuotaExceededException
 from backend.control_plane.schemas import ReminderSchema
+from backend.control_plane.schemas.reminder import ReminderPageSchema
 from backend.control_plane.schemas.requests.reminder import ReminderToEditRequestSchema, \
     ReminderMarkAsCompleteRequestSchema, ReminderToEditTimeRequestSchema, ReminderAddSchemaRequest
 from backend.control_plane.service.quota_service import get_quota_service
+from backend.control_plane.service.reminder_scheduler_service import get_reminder_scheduler_service
 from backend.control_plane.service.tag_service import get_tag_service
 from backend.control_plane.utils import timeutils
+from backend.control_plane.utils.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
 
 logger = logging.getLogger("reminder_service")
 
@@ -25,55 +29,64 @@ class RemindersService:
         self.user_repo = UserRepository()
         self.quota_service = get_quota_service()
         self.ai_provider = default_llm_ai_provider
+        self.scheduler = get_reminder_scheduler_service()
 
     async def reminder_get(self, reminder_id: UUID):
         return await self.repo.get_by_model_id(model_id=reminder_id)
 
     async def reminder_update(self, reminder: ReminderToEditRequestSchema) -> ReminderSchema:
         request = reminder.model_dump(exclude_unset=True, exclude_none=True)
-        return await self.repo.reminder_update(request=request)
+        if "time" in request:
+            # Новое время — напоминание должно быть отправлено заново
+            request["notification_sent"] = False
+        response = await self.repo.reminder_update(request=request)
+        if "time" in request:
+            await self.scheduler.notify_changed(response.time)
+        return response
 
     async def reminder_remove(self, user_id: UUID, reminder_id: UUID) -> bool:
-        return await self.repo.delete_model(user_id=user_id, model_id=reminder_id)
+        return bool(await self.repo.delete_user_models(user_id=user_id, model_ids=[reminder_id]))
 
     async def reminder_create(self, user_id: UUID, reminder: ReminderAddSchemaRequest) -> ReminderSchema:
         # Missing time in request means that we need an AI help without creation in DB
         if reminder.time is None:
             return await self.create_with_ai_predicted_time(user_id=user_id, reminder_text=reminder.text)
         # Otherwise create reminder in DB and return it
-        user = await self.user_repo.get_user(user_id)
+        user = await self.user_repo.get_by_model_id(user_id)
         reminder.time = timeutils.convert_user_timezone_to_utc(reminder.time, user.timezone_offset)
 
         request = reminder.model_dump(exclude_unset=True, exclude_none=True)
-        return await self.repo.reminder_create(user_id=user_id, reminder=request)
+        response = await self.repo.reminder_create(user_id=user_id, reminder=request)
+        await self.scheduler.notify_changed(response.time)
+        return response
 
     async def create_with_ai_predicted_time(self, user_id: UUID, reminder_text: str) -> ReminderSchema:
-        user = await self.user_repo.get_user(user_id=user_id)
+        user = await self.user_repo.get_by_model_id(user_id)
+        # Ответ ИИ ждем без подключения к БД: резерв квоты пишется в отдельной сессии
+        await release_connection()
         try:
-            # Проверяем лимиты
-            await self.quota_service.check_ai_llm_request_limit(
+            # Резервируем оценку стоимости по всем квотам запроса
+            reservation = await self.quota_service.reserve_ai_llm_request(
                 user_id,
                 RequestType.PREDICT_REMINDER_TIME,
                 reminder_text
             )
 
-            # Запрашиваем предсказание времени
-            reminder_time, token_count = await self.ai_provider.predict_reminder_time(
-                user.timezone_offset,
-                reminder_text
-            )
+            async with reservation:
+                # Запрашиваем предсказание времени
+                reminder_time, token_count = await self.ai_provider.predict_reminder_time(
+                    user.timezone_offset,
+                    reminder_text
+                )
 
-            # Обновляем использование ресурсов
-            await self.quota_service.update_ai_llm_request_usage(
-                user_id,
-                RequestType.PREDICT_REMINDER_TIME,
-                token_count
-            )
+                # Списываем фактическую стоимость
+                await reservation.commit(await self.quota_service.calc_ai_llm_cost(token_count))
 
             return ReminderSchema(
                 user_id=user_id,
                 text=reminder_text,
                 time=reminder_time,
+                tags=[],
             )
         except QuotaExceededException as e:
             logger.warning(f"Quota exceeded: {str(e)}")
@@ -88,12 +101,38 @@ class RemindersService:
                 time=timeutils.convert_utc_to_user_timezone(
                     timeutils.get_utc_now() + datetime.timedelta(minutes=30),
                     user.timezone_offset
-                )
+                ),
+                tags=[],
             )
 
-    async def reminders_get_active(self, user_id: UUID) -> Sequence[ReminderSchema]:
-        response = await self.repo.get_models(user_id=user_id, status=ReminderStatus.ACTIVE, removed=False)
-        return [ReminderSchema.model_validate(reminder_response) for reminder_response in response]
+    async def reminders_get_active(self, user_id: UUID, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                   status: Optional[ReminderStatus] = ReminderStatus.ACTIVE,
+                                   date_from: Optional[datetime.date] = None, date_to: Optional[datetime.date] = None,
+                                   tag_id: Optional[UUID] = None) -> ReminderPageSchema:
+        """
+        Страница напоминаний пользователя. date_from/date_to — дни в часовом поясе пользователя (включительно).
+        """
+        time_from = time_to = None
+        if date_from or date_to:
+            user = await self.user_repo.get_by_model_id(user_id)
+            if date_from:
+                time_from, _ = timeutils.get_user_day_bounds(date_from, user.timezone_offset)
+            if date_to:
+                _, time_to = timeutils.get_user_day_bounds(date_to, user.timezone_offset)
+
+        # Лишняя запись показывает, есть ли следующая страница
+        reminders = await self.repo.get_reminders_page(
+            user_id, limit + 1, after=decode_cursor(cursor), status=status,
+            time_from=time_from, time_to=time_to, tag_id=tag_id,
+        )
+        next_cursor = None
+        if len(reminders) > limit:
+            reminders = reminders[:limit]
+            next_cursor = encode_cursor(reminders[-1].time, reminders[-1].id)
+        return ReminderPageSchema(
+            items=[ReminderSchema.model_validate(reminder) for reminder in reminders],
+            next_cursor=next_cursor,
+        )
 
     async def mark_as_complete(self, reminder: ReminderMarkAsCompleteRequestSchema) -> ReminderSchema:
         reminder = reminder.model_dump(exclude_unset=True, exclude_none=True)  # delete None fields
@@ -102,7 +141,8 @@ class RemindersService:
 
     async def postpone(self, reminder: ReminderToEditTimeRequestSchema) -> ReminderSchema:
         reminder = reminder.model_dump(exclude_unset=True, exclude_none=True)  # delete None fields
-        response = await self.repo.update_model(model_id=reminder["id"], **reminder)
+        response = await self.repo.update_model(model_id=reminder["id"], notification_sent=False, **reminder)
+        await self.scheduler.notify_changed(response.time)
         return ReminderSchema.model_validate(response)
 
 
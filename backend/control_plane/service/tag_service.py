@@ -31,7 +31,7 @@ class TagService:
         return TagSchema.model_validate(response)
 
     async def delete_tag(self, user_id: UUID, tag_id: UUID) -> bool:
-        return await self.repo.delete_model(user_id=user_id, model_id=tag_id)
+        return bool(await self.repo.delete_user_models(user_id=user_id, model_ids=[tag_id]))
 
     async def delete_tag_from_reminder(self, tag_id: UUID, reminder_id: UUID):
         return await self.repo.delete_tag_from_reminder(tag_id=tag_id, reminder_id=reminder_id)
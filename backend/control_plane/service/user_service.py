@@ -2,22 +2,62 @@ from uuid import UUID
 
 from fastapi import HTTPException
 
+from backend.config import get_settings
+from backend.control_plane.db.engine import run_after_commit
 from backend.control_plane.db.repositories.user import UserRepository
 from backend.control_plane.schemas.user import UserTelegramDataSchema, UserSchema
+from backend.control_plane.utils.cache import TTLCache
 
 
 class UserService:
     def __init__(self):
         self.repo = UserRepository()
+        self.cache: TTLCache[UserSchema] = TTLCache(
+            maxsize=int(get_settings().USER_CACHE_MAX_SIZE),
+            ttl=float(get_settings().USER_CACHE_TTL_SECONDS),
+        )
 
     async def get_user(self, user_id: UUID) -> UserSchema | None:
         response = await self.repo.get_by_model_id(user_id)
         return UserSchema.model_validate(response)
 
+    async def get_cached_user(self, user_id: UUID | str) -> UserSchema | None:
+        """
+        Пользователь для авторизации запросов: берется из TTL+LRU кеша,
+        при промахе читается из БД.
+        """
+        key = str(user_id)
+        if (user := self.cache.get(key)) is not None:
+            return user
+
+        version = self.cache.version
+        response = await self.repo.get_by_model_id(UUID(key))
+        if response is None:
+            return None
+
+        user = UserSchema.model_validate(response)
+        self.cache.set(key, user, version=version)
+        return user
+
+    async def invalidate_user(self, user_id: UUID | str) -> None:
+        """
+        Сбрасывает пользователя из кеша после фиксации единицы работы: иначе параллельный
+        запрос успел бы закешировать еще не измененную строку под новой версией кеша.
+        """
+        async def invalidate():
+            self.cache.invalidate(str(user_id))
+
+        await run_after_commit(invalidate)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
     async def update_user(self, request: UserSchema) -> UserSchema:
         user = request.model_dump(exclude_unset=True)
         user_id = user.pop('id')
-        return await self.repo.update_user(user_id=user_id, user=user)
+        updated = await self.repo.update_user(user_id=user_id, user=user)
+        await self.invalidate_user(user_id)
+        return updated
 
     async def _get_user_by_telegram_id(self, telegram_id: str) -> UserSchema | None:
         user = await self.repo.get_user_by_telegram_id(telegram_id)
@@ -33,14 +73,18 @@ class UserService:
         """
 
         if not (user_to_update := await self._get_user_by_telegram_id(telegram_id=user_tg.id)):
-            return await self.repo.create_user_from_telegram_data(user_tg)
+            created = await self.repo.create_user_from_telegram_data(user_tg)
+            await self.invalidate_user(created.id)
+            return created
 
         return await self.update_user_from_telegram_data(user_to_update)
 
     async def update_user_from_telegram_data(self, user_to_update: UserSchema) -> UserSchema:
         user = user_to_update.model_dump(exclude_unset=True)
         user_id = user.pop('id')
-        return UserSchema.model_validate(await self.repo.update_user(user_id, user))
+        updated = UserSchema.model_validate(await self.repo.update_user(user_id, user))
+        await self.invalidate_user(user_id)
+        return updated
 
 
 _user_service = UserService()
@@ -6,6 +6,9 @@ import os
 
 from backend.control_plane.ai_clients import AIProviderFactory, YandexGptProvider
 from backend.control_plane.ai_clients.prompts import RequestType
+from backend.control_plane.ai_clients.yandex_gpt import YandexGptCostCalculator
+from backend.control_plane.ai_clients.yandex_gpt.costs import TOKENIZER_REMOTE, TOKENIZER_APPROXIMATE
+from backend.control_plane.ai_clients.yandex_gpt.tokenizer import ApproximateTokenizer
 from backend.control_plane.utils import timeutils
 
 
@@ -80,3 +83,43 @@ async def test_predict_reminder_time(use_real_api):
                 print(
                     f"Real API test passed for '{case['prompt']}': {timeutils.format_datetime_for_user(predicted, user_timezone_offset)}")
 
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_tokens_are_memoized():
+    """
+    Системный промпт токенизируется один раз, по сети считается только текст пользователя
+    """
+    calculator = YandexGptCostCalculator("folder", "auth", "yandexgpt-lite", 0.2, tokenizer_mode=TOKENIZER_REMOTE)
+    fixed_now = datetime.datetime(2025, 4, 19, 12, 0, tzinfo=datetime.timezone.utc)
+
+    with patch('backend.control_plane.utils.timeutils.get_utc_now', return_value=fixed_now), \
+            patch.object(calculator, '_count_tokens', AsyncMock(return_value=100)) as count_tokens:
+        first = await calculator.calc_cost('через час вынести мусор', RequestType.PREDICT_REMINDER_TIME)
+        second = await calculator.calc_cost('завтра в 10 позвонить маме', RequestType.PREDICT_REMINDER_TIME)
+
+    assert first == second == 0.2 * 200 / 1000
+    assert count_tokens.await_count == 3
+    assert calculator.system_prompt_tokens.stats()["hits"] == 1
+
+    # Через несколько минут промпт содержит другое время, но токенизируется только текст пользователя
+    later = fixed_now + datetime.timedelta(minutes=7)
+    with patch('backend.control_plane.utils.timeutils.get_utc_now', return_value=later), \
+            patch.object(calculator, '_count_tokens', AsyncMock(return_value=100)) as count_tokens:
+        await calculator.calc_cost('через час вынести мусор', RequestType.PREDICT_REMINDER_TIME)
+
+    assert count_tokens.await_count == 1
+    assert calculator.system_prompt_tokens.stats()["size"] == 1
+
+
+@pytest.mark.asyncio
+async def test_approximate_tokenizer_works_offline():
+    calculator = YandexGptCostCalculator("folder", "auth", "yandexgpt-lite", 0.2,
+                                         tokenizer_mode=TOKENIZER_APPROXIMATE, error_margin=0.5)
+    calculator.sdk = None  # Никаких обращений к API
+
+    cost = await calculator.calc_cost('через час вынести мусор', RequestType.PREDICT_REMINDER_TIME)
+
+    assert cost > 0
+    # Запас увеличивает оценку
+    assert ApproximateTokenizer(error_margin=0.5).count("вынести мусор") > ApproximateTokenizer(error_margin=0).count("вынести мусор")
@@ -0,0 +1,66 @@
+import os
+import time
+import timeit
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import jwt
+import pytest
+
+from backend.config import DefaultSettings, get_settings, reload_settings
+from backend.control_plane.schemas.user import UserSchema
+from backend.control_plane.service.user_service import UserService
+from backend.control_plane.utils.auth import get_authorized_user
+
+ITERATIONS = 2000
+
+
+def test_get_settings_is_cached():
+    """get_settings возвращает один и тот же объект, reload_settings — новый"""
+    settings = get_settings()
+    assert get_settings() is settings
+
+    os.environ["LOG_LEVEL"] = "DEBUG"
+    try:
+        reloaded = reload_settings()
+        assert reloaded is not settings
+        assert reloaded.LOG_LEVEL == "DEBUG"
+        assert get_settings() is reloaded
+    finally:
+        os.environ.pop("LOG_LEVEL")
+        reload_settings()
+
+
+def test_get_settings_microbenchmark():
+    """Кешированный get_settings на порядок быстрее создания DefaultSettings"""
+    cached = timeit.timeit(get_settings, number=ITERATIONS)
+    uncached = timeit.timeit(DefaultSettings, number=ITERATIONS)
+    print(f"\nget_settings: cached={cached / ITERATIONS * 1e6:.2f}us uncached={uncached / ITERATIONS * 1e6:.2f}us")
+    assert cached * 10 < uncached
+
+
+@pytest.mark.asyncio
+async def test_get_authorized_user_microbenchmark():
+    """Замер зависимости авторизации: пользователь читается из БД один раз, дальше из кеша"""
+    settings = reload_settings()
+    settings.SECRET_KEY = "benchmark-secret"
+    user = UserSchema(id=uuid.uuid4(), username="benchmark", telegram_id="1")
+    user_service = UserService()
+    user_service.repo = MagicMock(get_by_model_id=AsyncMock(return_value=user))
+    token = jwt.encode(
+        {"user_id": str(user.id), "exp": int(time.time()) + 3600},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+
+    try:
+        started = time.perf_counter()
+        for _ in range(ITERATIONS):
+            assert (await get_authorized_user(user_service, token)).id == user.id
+        elapsed = time.perf_counter() - started
+    finally:
+        reload_settings()
+
+    print(f"\nget_authorized_user: {elapsed / ITERATIONS * 1e6:.2f}us per call, cache={user_service.cache_stats()}")
+    assert user_service.repo.get_by_model_id.await_count == 1
+    assert user_service.cache_stats()["hits"] == ITERATIONS - 1
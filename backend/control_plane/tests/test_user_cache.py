@@ -0,0 +1,90 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from backend.control_plane.schemas.user import UserSchema, UserTelegramDataSchema
+from backend.control_plane.service.user_service import UserService
+from backend.control_plane.utils.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    timer.now = 6
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_skips_stale_version():
+    """Значение, прочитанное до инвалидации, не попадает в кеш"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    version = cache.version
+    cache.invalidate("a")
+    cache.set("a", "stale", version=version)
+
+    assert cache.get("a") is None
+
+
+def make_service(user: UserSchema) -> UserService:
+    service = UserService()
+    service.repo = MagicMock(
+        get_by_model_id=AsyncMock(return_value=user),
+        update_user=AsyncMock(return_value=user),
+        get_user_by_telegram_id=AsyncMock(return_value=None),
+        create_user_from_telegram_data=AsyncMock(return_value=user),
+    )
+    return service
+
+
+@pytest.mark.asyncio
+async def test_cached_user_is_invalidated_on_update():
+    user = UserSchema(id=uuid.uuid4(), username="cached", telegram_id="1")
+    service = make_service(user)
+
+    await service.get_cached_user(user.id)
+    await service.get_cached_user(str(user.id))
+    assert service.repo.get_by_model_id.await_count == 1
+
+    await service.update_user(user)
+    await service.get_cached_user(user.id)
+    assert service.repo.get_by_model_id.await_count == 2
+    assert service.cache_stats()["hits"] == 1
+    assert service.cache_stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_user_is_invalidated_on_telegram_login():
+    user = UserSchema(id=uuid.uuid4(), username="cached", telegram_id="1")
+    service = make_service(user)
+
+    await service.get_cached_user(user.id)
+    await service.create_user_from_telegram_data(
+        UserTelegramDataSchema(id="1", first_name="a", username="cached", auth_date=1, hash="x")
+    )
+    await service.get_cached_user(user.id)
+    assert service.repo.get_by_model_id.await_count == 2
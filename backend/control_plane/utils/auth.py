@@ -16,11 +16,12 @@ async def get_authorized_user(
         user_service: Annotated[UserService, Depends(get_user_service)],
         token: str = Depends(get_settings().OAUTH2_SCHEME)
 ) -> UserSchema:
+    settings = get_settings()
     try:
         payload = jwt.decode(
             token,
-            get_settings().SECRET_KEY,
-            algorithms=[get_settings().ALGORITHM],
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM],
             options={"verify_exp": True}
         )
     except jwt.ExpiredSignatureError:
@@ -32,7 +33,7 @@ async def get_authorized_user(
     if not user_id:
         raise HTTPException(401, "Can't get user_id from payload")
 
-    user = await user_service.get_user(user_id)
+    user = await user_service.get_cached_user(user_id)
     if not user:
         raise HTTPException(401, "User not found")
 
@@ -0,0 +1,148 @@
+"""
+Вынос блокирующих вызовов (SDK Яндекса, boto3, caldav) из event loop в пул потоков
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from backend.config import get_settings
+
+logger = logging.getLogger("offload")
+
+R = TypeVar("R")
+
+# Бэкенды с блокирующими клиентами
+YANDEX_GPT = "yandex_gpt"
+YANDEX_ART = "yandex_art"
+S3 = "s3"
+CALDAV = "caldav"
+
+
+@dataclass
+class BackendLimits:
+    """
+    Сколько вызовов бэкенда выполняется одновременно и сколько ждать ответа (в секундах).
+    per_key ограничивает одновременные вызовы с одним ключом (например, к одному хосту).
+    """
+    concurrency: int
+    timeout: float
+    per_key: Optional[int] = None
+
+
+DEFAULT_BACKEND_LIMITS: Dict[str, BackendLimits] = {
+    YANDEX_GPT: BackendLimits(concurrency=8, timeout=60),
+    # Генерация изображения ждет завершения отложенной операции
+    YANDEX_ART: BackendLimits(concurrency=4, timeout=300),
+    S3: BackendLimits(concurrency=8, timeout=60),
+    # Серверы CalDAV разные: медленный хост не должен занимать все слоты
+    CALDAV: BackendLimits(concurrency=24, timeout=120, per_key=4),
+}
+
+
+class Offloader:
+    """
+    Общий ограниченный пул потоков для блокирующих вызовов.
+
+    Для каждого бэкенда действует свой лимит одновременных вызовов (лишние ждут
+    в event loop, не занимая потоки) и свой таймаут. По таймауту ожидание
+    прерывается, но поток завершит вызов сам — поэтому пул ограничен.
+    """
+
+    def __init__(self, max_workers: int, limits: Optional[Dict[str, BackendLimits]] = None):
+        self.max_workers = max_workers
+        self.limits = dict(DEFAULT_BACKEND_LIMITS if limits is None else limits)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Семафоры привязаны к event loop, поэтому храним их отдельно для каждого loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Semaphore]]" = \
+            weakref.WeakKeyDictionary()
+
+    def configure(self, backend: str, concurrency: int, timeout: float, per_key: Optional[int] = None):
+        self.limits[backend] = BackendLimits(concurrency=concurrency, timeout=timeout, per_key=per_key)
+        for semaphores in self._semaphores.values():
+            stale = [k for k in semaphores if k == backend or (isinstance(k, tuple) and k[0] == backend)]
+            for semaphore_key in stale:
+                semaphores.pop(semaphore_key)
+
+    def _executor_instance(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="offload")
+        return self._executor
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop, backend: str,
+                   key: Optional[Hashable] = None) -> asyncio.Semaphore:
+        semaphores = self._semaphores.setdefault(loop, {})
+        semaphore_key = backend if key is None else (backend, key)
+        if semaphore_key not in semaphores:
+            limits = self.limits[backend]
+            semaphores[semaphore_key] = asyncio.Semaphore(limits.concurrency if key is None else limits.per_key)
+        return semaphores[semaphore_key]
+
+    async def run(self, backend: str, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """
+        Выполняет func(*args, **kwargs) в пуле потоков с лимитами бэкенда
+
+        Raises:
+            asyncio.TimeoutError: если вызов не уложился в таймаут бэкенда
+        """
+        return await self.run_keyed(backend, None, func, *args, **kwargs)
+
+    async def run_keyed(self, backend: str, key: Optional[Hashable], func: Callable[..., R],
+                        *args: Any, **kwargs: Any) -> R:
+        """
+        Как run, но дополнительно ограничивает одновременные вызовы с ключом key
+        лимитом per_key бэкенда (если он задан)
+        """
+        if backend not in self.limits:
+            raise ValueError(f"Unknown offload backend: {backend}")
+
+        loop = asyncio.get_running_loop()
+        if key is not None and self.limits[backend].per_key:
+            # Сначала ждем свой ключ, чтобы очередь к медленному хосту не занимала общие слоты
+            async with self._semaphore(loop, backend, key):
+                return await self._run(loop, backend, func, *args, **kwargs)
+        return await self._run(loop, backend, func, *args, **kwargs)
+
+    async def _run(self, loop: asyncio.AbstractEventLoop, backend: str, func: Callable[..., R],
+                   *args: Any, **kwargs: Any) -> R:
+        call = functools.partial(contextvars.copy_context().run, functools.partial(func, *args, **kwargs))
+        async with self._semaphore(loop, backend):
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self._executor_instance(), call),
+                    timeout=self.limits[backend].timeout
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Вызов {backend} не завершился за {self.limits[backend].timeout} с")
+                raise
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_offloader: Optional[Offloader] = None
+
+
+def get_offloader() -> Offloader:
+    global _offloader
+    if _offloader is None:
+        settings = get_settings()
+        _offloader = Offloader(int(settings.OFFLOAD_MAX_WORKERS))
+        caldav_limits = _offloader.limits[CALDAV]
+        _offloader.configure(CALDAV, caldav_limits.concurrency, caldav_limits.timeout,
+                             per_key=int(settings.CALDAV_PER_HOST_CONCURRENCY))
+    return _offloader
+
+
+def shutdown_offloader():
+    """Останавливает общий пул (при остановке воркера и в тестах)"""
+    global _offloader
+    if _offloader is not None:
+        _offloader.shutdown()
+        _offloader = None
@@ -0,0 +1,47 @@
+"""
+Курсоры keyset-пагинации для списков API
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+
+# Размер страницы по умолчанию и максимальный
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(position: date, model_id: Optional[UUID] = None) -> str:
+    """
+    Кодирует позицию последней записи страницы в непрозрачный курсор.
+    model_id не нужен, если ключ сортировки уникален сам по себе
+    """
+    payload = json.dumps([position.isoformat(), str(model_id) if model_id else None])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str], require_id: bool = True) -> Optional[Tuple[datetime, Optional[UUID]]]:
+    """
+    Возвращает позицию (значение ключа сортировки, id), после которой начинается страница
+
+    Args:
+        require_id: курсор должен содержать id — для сортировки по неуникальному ключу (time, id)
+
+    Raises:
+        HTTPException: 400, если курсор поврежден
+    """
+    if not cursor:
+        return None
+    try:
+        position, model_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(position, str) or not (model_id is None or isinstance(model_id, str)):
+            raise ValueError("Invalid cursor types")
+        if require_id and model_id is None:
+            raise ValueError("Cursor has no id")
+        return datetime.fromisoformat(position), UUID(model_id) if model_id is not None else None
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
@@ -1,4 +1,6 @@
 import datetime
+from typing import Tuple
+
 import pytz
 
 # Форматы для преобразования строк в даты и обратно
@@ -72,6 +74,24 @@ def convert_user_timezone_to_utc(
     return dt.astimezone(pytz.UTC)
 
 
+def get_user_day_bounds(
+        day: datetime.date,
+        timezone_offset: int
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Границы дня пользователя в UTC
+
+    Args:
+        day: дата в timezone пользователя
+        timezone_offset: смещение в минутах от UTC
+
+    Returns:
+        Tuple[datetime, datetime]: начало дня и начало следующего дня в UTC
+    """
+    day_start = convert_user_timezone_to_utc(datetime.datetime.combine(day, datetime.time()), timezone_offset)
+    return day_start, day_start + datetime.timedelta(days=1)
+
+
 def parse_string_in_user_timezone(
         date_string: str,
         timezone_offset: int,
@@ -1,161 +1,243 @@
 """
 Активности для синхронизации с календарем
 """
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 from temporalio import activity
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from uuid import UUID
 
-from backend.control_plane.db.repositories.reminder import ReminderRepository
+from backend.config import get_settings
+from backend.control_plane.db.repositories.reminder import ReminderRepository, CalendarEventReminder
 from backend.control_plane.db.repositories.calendar import CalendarIntegrationRepository
-from backend.control_plane.db.models.base import ReminderStatus
 from backend.control_plane.db.repositories.user import UserRepository
-from backend.data_plane.services.calendar_service import CalendarService
+from backend.data_plane.services.calendar_service import CalendarService, CalendarChanges, needs_expansion, \
+    occurrence_time
 from backend.data_plane.services.telegram_service import TelegramService
 
 logger = logging.getLogger("calendar_sync_activities")
 
 SYNC_INTERVAL_MINUTES = 30
+# Сколько самых медленных интеграций страницы попадает в отчет
+SLOWEST_REPORTED = 5
 
-@activity.defn
-async def get_users_for_calendar_sync() -> List[Dict[str, Any]]:
-    """
-    Получает список пользователей с активными интеграциями календаря для синхронизации
-    """
-    logger.info("Получение списка пользователей для синхронизации календаря")
-    cal_integration_repo = CalendarIntegrationRepository()
 
-    # Получаем все активные интеграции
-    all_integrations = await cal_integration_repo.get_all_models(active=True)
+def _latency_summary(latencies: Dict[str, float]) -> Dict[str, Any]:
+    """Перцентили и самые медленные интеграции страницы (в миллисекундах)"""
+    if not latencies:
+        return {"p50": 0, "p95": 0, "max": 0, "slowest": []}
+    values = sorted(latencies.values())
 
-    users_data = []
-    for integration in all_integrations:
-        # Проверяем, прошло ли достаточно времени с последней синхронизации
-        should_sync = True
-        if integration.last_sync:
-            time_since_last_sync = datetime.now(timezone.utc) - integration.last_sync
-            if time_since_last_sync < timedelta(minutes=SYNC_INTERVAL_MINUTES):
-                should_sync = False
-
-        if should_sync:
-            users_data.append({
-                "user_id": str(integration.user_id),
-                "integration_id": str(integration.id),
-                "caldav_url": integration.caldav_url,
-                "login": integration.login,
-                "password": integration.password
-            })
-
-    return users_data
+    def percentile(q: float) -> int:
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000)
+
+    slowest = sorted(latencies.items(), key=lambda item: item[1], reverse=True)[:SLOWEST_REPORTED]
+    return {
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "max": round(values[-1] * 1000),
+        "slowest": [{"integration_id": key, "latency_ms": round(value * 1000)} for key, value in slowest],
+    }
 
 
 @activity.defn
-async def fetch_calendar_events(user_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+async def sync_calendar_integrations(cursor: Optional[str] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
     """
-    Получает события из календаря пользователя
+    Синхронизирует страницу интеграций, которым пора синхронизироваться
+
+    Интеграции страницы синхронизируются одновременно (не больше CALENDAR_SYNC_CONCURRENCY),
+    запросы к одному серверу CalDAV дополнительно ограничены CALDAV_PER_HOST_CONCURRENCY.
+    Синхронизация инкрементальная: при неизменном ctag интеграция пропускается (not_modified),
+    иначе загружаются только изменившиеся объекты календаря.
+    События не проходят через историю воркфлоу: получение и сверка выполняются здесь же.
+
+    Returns:
+        next_cursor — id последней интеграции страницы (None, если страница последняя),
+        счетчики интеграций и напоминаний, latency_ms — задержки синхронизации интеграций
     """
-    logger.info(f"Получение событий календаря для пользователя {user_data['user_id']}")
+    settings = get_settings()
+    page_size = int(page_size or settings.CALENDAR_SYNC_PAGE_SIZE)
+    semaphore = asyncio.Semaphore(int(settings.CALENDAR_SYNC_CONCURRENCY))
 
-    try:
-        # Создаем сервис для работы с календарем
-        calendar_service = CalendarService(
-            caldav_url=user_data["caldav_url"],
-            username=user_data["login"],
-            password=user_data["password"]
-        )
+    synced_before = datetime.now(timezone.utc) - timedelta(minutes=SYNC_INTERVAL_MINUTES)
+    integrations = await CalendarIntegrationRepository().get_due_integrations(
+        synced_before, UUID(cursor) if cursor else None, page_size
+    )
+    logger.info(f"Синхронизация календарей: {len(integrations)} интеграций на странице")
+
+    totals = {"integrations": len(integrations), "synced": 0, "not_modified": 0, "failed": 0,
+              "created": 0, "updated": 0, "deleted": 0, "unchanged": 0, "errors": 0}
+    latencies: Dict[str, float] = {}
+
+    async def sync_one(integration):
+        integration_data = {
+            "user_id": str(integration.user_id),
+            "integration_id": str(integration.id),
+            "caldav_url": integration.caldav_url,
+            "login": integration.login,
+            "password": integration.password,
+            "ctag": integration.ctag,
+            "sync_token": integration.sync_token,
+            "event_etags": integration.event_etags,
+        }
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                changes = await fetch_calendar_changes(integration_data)
+                if changes.unchanged:
+                    # ctag не изменился — напоминания сверять не нужно
+                    await CalendarIntegrationRepository().update_model(
+                        model_id=integration.id, last_sync=datetime.now(timezone.utc)
+                    )
+                    totals["synced"] += 1
+                    totals["not_modified"] += 1
+                    return
+                events, removed_ids, sync_state = apply_calendar_changes(integration_data["event_etags"], changes)
+                results = await sync_calendar_events(
+                    integration_data["user_id"], integration_data["integration_id"], events,
+                    deleted_event_ids=None if changes.full else removed_ids,
+                    sync_state=sync_state,
+                )
+                totals["synced"] += 1
+                for key in ("created", "updated", "deleted", "unchanged", "errors"):
+                    totals[key] += results[key]
+            except Exception as e:
+                totals["failed"] += 1
+                try:
+                    await handle_sync_errors(integration_data["user_id"], integration_data["integration_id"], str(e))
+                except Exception as handle_error:
+                    logger.error(f"Ошибка обработки сбоя синхронизации {integration.id}: {handle_error}")
+            finally:
+                latencies[str(integration.id)] = time.perf_counter() - started
+                logger.info(
+                    f"Синхронизация календаря интеграции {integration.id} заняла "
+                    f"{latencies[str(integration.id)] * 1000:.0f} мс"
+                )
+                if activity.in_activity():
+                    activity.heartbeat(len(latencies))
 
-        # Определяем диапазон дат для синхронизации
-        start_date = datetime.now(timezone.utc) - timedelta(days=7)  # Неделя назад
-        end_date = datetime.now(timezone.utc) + timedelta(days=30)  # Месяц вперед
+    await asyncio.gather(*(sync_one(integration) for integration in integrations))
 
-        # Получаем события из всех календарей пользователя
-        # Не указываем calendar_id, чтобы сервис использовал первый доступный календарь
-        events = await calendar_service.get_events(
-            start_date=start_date,
-            end_date=end_date
-        )
+    return {
+        "next_cursor": str(integrations[-1].id) if len(integrations) == page_size else None,
+        **totals,
+        "latency_ms": _latency_summary(latencies),
+    }
 
-        # Преобразуем объекты, которые не поддерживают JSON сериализацию
-        serializable_events = []
-        for event in events:
-            # Копируем событие, чтобы не менять оригинал
-            serialized_event = {}
 
-            # Обрабатываем каждое поле
-            for key, value in event.items():
-                # Преобразуем datetime объекты в строки
-                if isinstance(value, datetime):
-                    serialized_event[key] = value.isoformat()
-                # Преобразуем URL объекты в строки
-                elif key == 'url' and hasattr(value, '__str__'):
-                    serialized_event[key] = str(value)
-                # Другие типы данных копируем как есть
-                else:
-                    serialized_event[key] = value
+async def fetch_calendar_changes(user_data: Dict[str, Any]) -> CalendarChanges:
+    """
+    Получает изменения календаря пользователя с прошлой синхронизации
 
-            # Добавляем информацию о пользователе и интеграции
-            serialized_event["user_id"] = user_data["user_id"]
-            serialized_event["integration_id"] = user_data["integration_id"]
+    Raises:
+        Exception: если календарь недоступен — сверять с пустым списком нельзя,
+        иначе все напоминания интеграции будут удалены
+    """
+    logger.info(f"Получение изменений календаря для пользователя {user_data['user_id']}")
 
-            serializable_events.append(serialized_event)
+    # Сервис переиспользует подключение и найденные календари интеграции
+    calendar_service = CalendarService(
+        caldav_url=user_data["caldav_url"],
+        username=user_data["login"],
+        password=user_data["password"]
+    )
+    event_etags = user_data.get("event_etags") or {}
+    known_etags = {href: entry["etag"] for href, entry in event_etags.items()}
+    # Неизменные серии загружаются заново, только когда развернутое окно перестает покрывать горизонт
+    refresh_hrefs = [
+        href for href, entry in event_etags.items()
+        if entry.get("expanded_until") and needs_expansion(datetime.fromisoformat(entry["expanded_until"]))
+    ]
+    return await calendar_service.get_changes(
+        user_data.get("ctag"), user_data.get("sync_token"), known_etags, refresh_hrefs
+    )
 
-        return serializable_events
 
-    except Exception as e:
-        logger.error(f"Ошибка при получении событий из календаря: {str(e)}")
-        return []
+def apply_calendar_changes(
+        event_etags: Optional[Dict[str, Dict[str, Any]]],
+        changes: CalendarChanges
+) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, Any]]:
+    """
+    Накладывает изменения календаря на сохраненное состояние объектов
+
+    Args:
+        event_etags: {href: {"etag": ..., "ids": [...], "expanded_until": ...}} с прошлой синхронизации;
+            expanded_until — конец окна, в котором развернута повторяющаяся серия
+        changes: изменения от CalendarService.get_changes
+
+    Returns:
+        события изменившихся объектов, ID событий, которых больше нет в календаре,
+        и новое состояние синхронизации интеграции
+    """
+    state = dict(event_etags or {})
+    removed_ids = set()
+    for href in changes.deleted:
+        entry = state.pop(href, None)
+        if entry:
+            removed_ids.update(entry["ids"])
+
+    events = []
+    recurring = set(changes.recurring)
+    for href, href_events in changes.events.items():
+        ids = list(dict.fromkeys(event["id"] for event in href_events if event.get("id")))
+        previous = state.get(href)
+        if previous:
+            # Из объекта могли убрать часть событий (например, исключения повторения).
+            # Вхождения, ушедшие из окна в прошлое, не удалены — их напоминания остаются
+            removed_ids.update(
+                event_id for event_id in set(previous["ids"]) - set(ids)
+                if not _expired_occurrence(event_id, changes)
+            )
+        state[href] = {"etag": changes.etags.get(href), "ids": ids}
+        if href in recurring:
+            state[href]["expanded_until"] = changes.window[1].isoformat()
+        events.extend(href_events)
+
+    # Событие могли перенести в другой объект — его напоминание не удаляем
+    present_ids = {event_id for entry in state.values() for event_id in entry["ids"]}
+    sync_state = {"ctag": changes.ctag, "sync_token": changes.sync_token, "event_etags": state}
+    return events, sorted(removed_ids - present_ids), sync_state
+
+
+def _expired_occurrence(event_id: str, changes: CalendarChanges) -> bool:
+    started_at = occurrence_time(event_id)
+    return started_at is not None and changes.window is not None and started_at < changes.window[0]
+
 
 @activity.defn
 async def sync_calendar_events(
         user_id: str,
         integration_id: str,
-        events: List[Dict[str, Any]]
+        events: List[Dict[str, Any]],
+        deleted_event_ids: Optional[List[str]] = None,
+        sync_state: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Синхронизирует события из календаря с напоминаниями
+
+    Args:
+        events: события (при полной синхронизации — все события календаря)
+        deleted_event_ids: ID удаленных событий при инкрементальной синхронизации;
+            None — events содержит весь календарь, остальные напоминания удаляются
+        sync_state: ctag, sync_token и event_etags, которые сохраняются вместе с last_sync
     """
     logger.info(f"Синхронизация {len(events)} событий календаря для пользователя {user_id}")
 
-    reminder_repo = ReminderRepository()
-    cal_integration_repo = CalendarIntegrationRepository()
-
-    user_uuid = UUID(user_id)
-    integration_uuid = UUID(integration_id)
-
-    # Получаем все напоминания пользователя, связанные с календарем
-    existing_reminders = await reminder_repo.get_models(
-        user_id=user_uuid,
-        calendar_integration_id=integration_uuid,
-        removed=False
-    )
-
-    # Создаем словарь существующих напоминаний по ID события в календаре
-    existing_by_event_id = {
-        reminder.calendar_event_id: reminder
-        for reminder in existing_reminders
-        if reminder.calendar_event_id
-    }
-
-    results = {
-        "created": 0,
-        "updated": 0,
-        "deleted": 0,
-        "unchanged": 0,
-        "errors": 0
-    }
-
-    # Множество ID событий из календаря для проверки удаленных напоминаний
-    calendar_event_ids = set()
+    errors = 0
+    now = datetime.now(timezone.utc)
+    # Все ID событий календаря: напоминания прошедших событий тоже не удаляются
+    calendar_event_ids = []
+    reminders = []
 
-    # Обрабатываем полученные события
     for event in events:
         event_id = event.get("id")
         if not event_id:
             logger.warning(f"Событие без ID: {event}")
             continue
 
-        calendar_event_ids.add(event_id)
+        calendar_event_ids.append(event_id)
         event_start = event.get("start")
 
         # Преобразуем строку ISO в datetime, если это строка
@@ -164,11 +246,11 @@ async def sync_calendar_events(
                 event_start = datetime.fromisoformat(event_start)
             except ValueError as e:
                 logger.error(f"Ошибка при преобразовании даты: {str(e)}")
-                results["errors"] += 1
+                errors += 1
                 continue
 
         # Если старт события не указан или в прошлом, пропускаем
-        if not event_start or (isinstance(event_start, datetime) and event_start < datetime.now(timezone.utc)):
+        if not event_start or event_start < now:
             continue
 
         # Формируем текст напоминания
@@ -181,64 +263,20 @@ async def sync_calendar_events(
                 description = description[:97] + "..."
             reminder_text += f" ({description})"
 
-        # Проверяем, существует ли напоминание для этого события
-        if event_id in existing_by_event_id:
-            # Обновляем существующее напоминание
-            reminder = existing_by_event_id[event_id]
-
-            # Проверяем, нужно ли обновление
-            if (reminder.text != reminder_text or
-                    (abs((reminder.time - event_start).total_seconds()) > 60 if isinstance(event_start,
-                                                                                       datetime) else True)):
-
-                try:
-                    await reminder_repo.update_model(
-                        model_id=reminder.id,
-                        text=reminder_text,
-                        time=event_start
-                    )
-                    results["updated"] += 1
-                except Exception as e:
-                    logger.error(f"Ошибка при обновлении напоминания: {str(e)}")
-                    results["errors"] += 1
-            else:
-                results["unchanged"] += 1
-        else:
-            # Создаем новое напоминание
-            try:
-                await reminder_repo.create(
-                    user_id=user_uuid,
-                    text=reminder_text,
-                    time=event_start,
-                    status=ReminderStatus.ACTIVE,
-                    calendar_event_id=event_id,
-                    calendar_integration_id=integration_uuid
-                )
-                results["created"] += 1
-            except Exception as e:
-                logger.error(f"Ошибка при создании напоминания: {str(e)}")
-                results["errors"] += 1
-
-    # Проверяем напоминания, которых больше нет в календаре
-    for reminder in existing_reminders:
-        if reminder.calendar_event_id and reminder.calendar_event_id not in calendar_event_ids:
-            try:
-                # Помечаем напоминание как удаленное
-                await reminder_repo.update_model(
-                    model_id=reminder.id,
-                    removed=True
-                )
-                results["deleted"] += 1
-            except Exception as e:
-                logger.error(f"Ошибка при удалении напоминания: {str(e)}")
-                results["errors"] += 1
-
-    # Обновляем время последней синхронизации в интеграции
-    await cal_integration_repo.update_model(
-        model_id=integration_uuid,
-        last_sync=datetime.now(timezone.utc)
+        reminders.append(CalendarEventReminder(calendar_event_id=event_id, text=reminder_text, time=event_start))
+
+    # Создание, обновление и удаление напоминаний и время последней синхронизации — одна транзакция.
+    # Состояние синхронизации сохраняем, только если все события обработаны, иначе ошибочные события потеряются
+    integration_values = {"last_sync": now, **(sync_state if sync_state and not errors else {})}
+    results = await ReminderRepository().reconcile_calendar_events(
+        user_id=UUID(user_id),
+        integration_id=UUID(integration_id),
+        events=reminders,
+        deleted_event_ids=deleted_event_ids,
+        present_event_ids=calendar_event_ids if deleted_event_ids is None else None,
+        integration_values=integration_values,
     )
-    return results
+    return {**results, "errors": errors}
 
 
 @activity.defn
@@ -262,8 +300,8 @@ async def handle_sync_errors(user_id: str, integration_id: str, error: str) -> N
     integration = await cal_integration_repo.get_by_model_id(integration_uuid)
     if not integration:
         return
-    user = await user_repo.get_user(integration.user_id)
-    if user and user.id:
+    user = await user_repo.get_by_model_id(integration.user_id)
+    if user and user.telegram_id:
         telegram_service = TelegramService()
         message = (
             f"⚠️ *Ошибка синхронизации календаря*\n\n"
@@ -271,7 +309,78 @@ async def handle_sync_errors(user_id: str, integration_id: str, error: str) -> N
             f"в личном кабинете."
         )
         await telegram_service.send_message(
-            integration.user.id,
+            user.telegram_id,
             message,
             parse_mode="Markdown"
         )
+
+
+# Активности прежней синхронизации через UserCalendarSyncWorkflow на каждого пользователя.
+# Остаются зарегистрированными, пока не завершатся процессы, запущенные до перехода на страницы
+
+@activity.defn
+async def get_users_for_calendar_sync() -> List[Dict[str, Any]]:
+    """
+    Получает список пользователей с активными интеграциями календаря для синхронизации
+    """
+    logger.info("Получение списка пользователей для синхронизации календаря")
+    repo = CalendarIntegrationRepository()
+    page_size = int(get_settings().CALENDAR_SYNC_PAGE_SIZE)
+    synced_before = datetime.now(timezone.utc) - timedelta(minutes=SYNC_INTERVAL_MINUTES)
+
+    users_data = []
+    after_id = None
+    while True:
+        integrations = await repo.get_due_integrations(synced_before, after_id, page_size)
+        users_data.extend({
+            "user_id": str(integration.user_id),
+            "integration_id": str(integration.id),
+            "caldav_url": integration.caldav_url,
+            "login": integration.login,
+            "password": integration.password
+        } for integration in integrations)
+        if len(integrations) < page_size:
+            return users_data
+        after_id = integrations[-1].id
+
+
+@activity.defn
+async def fetch_calendar_events(user_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Получает события из календаря пользователя (полная выборка без ctag и ETag)
+
+    Raises:
+        Exception: если календарь недоступен — сверять с пустым списком нельзя,
+        иначе все напоминания интеграции будут удалены
+    """
+    logger.info(f"Получение событий календаря для пользователя {user_data['user_id']}")
+
+    calendar_service = CalendarService(
+        caldav_url=user_data["caldav_url"],
+        username=user_data["login"],
+        password=user_data["password"]
+    )
+
+    # Определяем диапазон дат для синхронизации
+    start_date = datetime.now(timezone.utc) - timedelta(days=7)  # Неделя назад
+    end_date = datetime.now(timezone.utc) + timedelta(days=30)  # Месяц вперед
+    events = await calendar_service.get_events(start_date=start_date, end_date=end_date)
+
+    # Преобразуем объекты, которые не поддерживают JSON сериализацию
+    serializable_events = []
+    for event in events:
+        serialized_event = {}
+        for key, value in event.items():
+            if isinstance(value, datetime):
+                serialized_event[key] = value.isoformat()
+            elif key == 'url' and hasattr(value, '__str__'):
+                serialized_event[key] = str(value)
+            else:
+                serialized_event[key] = value
+
+        # Добавляем информацию о пользователе и интеграции
+        serialized_event["user_id"] = user_data["user_id"]
+        serialized_event["integration_id"] = user_data["integration_id"]
+        serializable_events.append(serialized_event)
+
+    return serializable_events
@@ -23,6 +23,7 @@ from backend.control_plane.exceptions.quota import QuotaExceededException
 from backend.control_plane.schemas.habit import HabitSchemaResponse
 from backend.control_plane.service.quota_service import QuotaService
 from backend.control_plane.utils import timeutils
+from backend.data_plane.services.habit_analytics import compute_habit_stats
 from backend.data_plane.services.s3_service import YandexStorageService
 from backend.data_plane.services.telegram_service import TelegramService
 
@@ -49,36 +50,31 @@ async def update_illustrate_habit_quota(user_id: UUID) -> bool:
 
 
 @activity.defn
-async def get_habit_completion_rate(habit_id: UUID, interval: HabitInterval) -> float:
-    habits_repo = HabitRepository()
+async def get_habits_completion_rates(habits: List[dict]) -> Dict[str, float]:
+    """
+    Доля выполнения сразу для всех привычек: одним запросом дней выполнения
+    и одним проходом пакетной аналитики
 
+    Args:
+        habits: привычки с полями id и interval
+
+    Returns:
+        доля выполнения по id привычки
+    """
+    intervals = {UUID(str(habit["id"])): HabitInterval(habit["interval"]) for habit in habits}
+    if not intervals:
+        return {}
     today = timeutils.get_utc_now().date()
-    period_start = today - timedelta(weeks=4) # месяц
-    if interval == HabitInterval.WEEKLY:
-        period_start = today - timedelta(weeks=6*4) # полгода
-    elif interval == HabitInterval.MONTHLY:
-        period_start = today - timedelta(weeks=12*4) # год
-
-    progress = await habits_repo.get_progress_for_period(habit_id, period_start, today)
-
-    # Расчет прогресса
-    if interval == HabitInterval.DAILY:
-        expected = (today - period_start).days + 1
-        done = sum(1 for d in progress if period_start <= d.record_date.python_value <= today)
-    elif interval == HabitInterval.WEEKLY:
-        week_starts = [period_start + timedelta(days=i) for i in range(0, (today - period_start).days + 1) if
-                       (period_start + timedelta(days=i)).weekday() == 0]
-        expected = len(week_starts)
-        done = sum(1 for d in progress if period_start <= d.record_date.python_value <= today)
-    else:
-        month_starts = [period_start + timedelta(days=i) for i in range(0, (today - period_start).days + 1) if
-                       (period_start + timedelta(days=i)).day == 1]
-        expected = len(month_starts)
-        done = sum(1 for d in progress if period_start <= d.record_date.python_value <= today)
-
-    completion_rate = done / expected if expected else 0
-
-    return completion_rate
+    rows = await HabitRepository().get_completed_days(today, habit_ids=list(intervals))
+    stats = compute_habit_stats(intervals, ((row.habit_id, row.day) for row in rows), today)
+    return {str(habit_id): habit_stats.completion_rate for habit_id, habit_stats in stats.items()}
+
+
+@activity.defn
+async def get_habit_completion_rate(habit_id: UUID, interval: HabitInterval) -> float:
+    # Оставлена для уже запущенных рабочих процессов; новые используют get_habits_completion_rates
+    rates = await get_habits_completion_rates([{"id": habit_id, "interval": interval}])
+    return rates[str(habit_id)]
 
 @activity.defn
 async def generate_and_save_image(user_id: UUID, habit_text: str, completion_rate: float) -> Tuple[str, int]:
@@ -93,7 +89,7 @@ async def generate_and_save_image(user_id: UUID, habit_text: str, completion_rat
 
     # Сразу сохраняем в S3
     s3_service = YandexStorageService()
-    image_url = s3_service.save_image(bytearray(im_bytes), f"habit_images/{user_id}")
+    image_url = await s3_service.save_image_async(bytearray(im_bytes), f"habit_images/{user_id}")
 
     return image_url, count_tokens
 
@@ -2,101 +2,127 @@
 Активности для обслуживания
 """
 import logging
-import asyncio
-from datetime import datetime, timedelta
-from pyexpat.errors import messages
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from temporalio import activity
-from typing import List, Dict, Any
-from uuid import UUID
 
-from backend.bot.routers.start import habits
+from backend.config import get_settings
 from backend.control_plane.db.repositories.habit import HabitRepository
+from backend.control_plane.db.repositories.quota import QuotaUsageRepository
 from backend.control_plane.db.repositories.reminder import ReminderRepository
-
-logger = logging.getLogger("morning_message_activities")
-
-@activity.defn
-async def get_removed_reminders() -> List[str]:
+from backend.control_plane.db.repositories.role import UserRoleRepository
+
+logger = logging.getLogger("maintenance_activities")
+
+# Какие помеченные удаленными сущности чистятся окончательно
+CLEANUP_REPOSITORIES = {
+    "reminders": ReminderRepository,
+    "habits": HabitRepository,
+}
+
+
+def _quota_usage_cutoff(today: date, days: int) -> date:
+    # Сворачиваем только целые месяцы: текущий период квоты остается в дневных записях
+    return (today - timedelta(days=days)).replace(day=1)
+
+
+# Что делать со старыми записями: kind -> (настройка срока, порог по сегодняшней дате, пачка)
+RETENTION_POLICIES: Dict[str, Any] = {
+    "quota_usages": (
+        "QUOTA_USAGE_RETENTION_DAYS",
+        _quota_usage_cutoff,
+        lambda cutoff, limit: QuotaUsageRepository().rollup_usage(date.fromisoformat(cutoff), limit),
+    ),
+    "habit_progress": (
+        "HABIT_PROGRESS_RETENTION_DAYS",
+        lambda today, days: today - timedelta(days=days),
+        lambda cutoff, limit: HabitRepository().archive_progress(date.fromisoformat(cutoff), limit),
+    ),
+    "user_roles": (
+        "USER_ROLE_RETENTION_DAYS",
+        lambda today, days: datetime.combine(today - timedelta(days=days), datetime.min.time()),
+        lambda cutoff, limit: UserRoleRepository().delete_expired_batch(datetime.fromisoformat(cutoff), limit),
+    ),
+}
+
+
+async def _run_batches(
+        name: str,
+        cutoff: str,
+        batch: Callable[[str, int], Awaitable[int]],
+        batch_size: int,
+        cutoff_key: str = "cutoff",
+        count_key: str = "processed",
+) -> Dict[str, Any]:
     """
-    Returns IDs of reminders marked for removal.
+    Выполняет batch(cutoff, batch_size) в отдельных транзакциях, пока пачка не вернется неполной.
+
+    После каждой пачки в heartbeat сохраняется прогресс: повторная попытка продолжает
+    с тем же порогом и досчитывает обработанные записи, а не начинает счет заново.
     """
-    logger.info("Fetching reminders marked for removal")
-    try:
-        reminders_repo = ReminderRepository()
-        removed_reminders = await reminders_repo.get_all_models(removed=True)
-        return [rr.id for rr in removed_reminders]
-    except Exception as e:
-        logger.error(f"Error fetching removed reminders: {str(e)}")
-        return []
+    progress = {cutoff_key: cutoff, count_key: 0, "batches": 0}
+    if activity.in_activity() and activity.info().heartbeat_details:
+        progress = activity.info().heartbeat_details[0]
+        logger.info(f"Продолжаем {name}: уже обработано {progress[count_key]}")
 
+    while True:
+        processed = await batch(progress[cutoff_key], batch_size)
+        progress[count_key] += processed
+        progress["batches"] += 1
+        if activity.in_activity():
+            activity.heartbeat(progress)
+        if processed < batch_size:
+            break
 
-@activity.defn
-async def get_removed_habits() -> List[str]:
-    """
-    Returns IDs of habits marked for removal.
-    """
-    logger.info("Fetching habits marked for removal")
-    try:
-        habits_repo = HabitRepository()
-        removed_habits = await habits_repo.get_all_models(removed=True)
-        return [rh.id for rh in removed_habits]
-    except Exception as e:
-        logger.error(f"Error fetching removed habits: {str(e)}")
-        return []
+    logger.info(f"{name}: обработано {progress[count_key]} записей за {progress['batches']} пачек")
+    return progress
 
 
 @activity.defn
-async def delete_reminders(reminder_ids: List[UUID]) -> Dict[str, Any]:
-    """
-    Permanently deletes reminders with the given IDs.
+async def delete_removed_items(kind: str, batch_size: Optional[int] = None) -> Dict[str, Any]:
     """
-    if not reminder_ids:
-        return {"count": 0, "success": True}
-
-    logger.info(f"Deleting {len(reminder_ids)} reminders")
-    try:
-        # Delete in batches to avoid overwhelming the database
-        batch_size = 100
-        deleted_count = 0
+    Окончательно удаляет сущности kind, помеченные удаленными больше CLEANUP_DAYS_THRESHOLD дней назад.
 
-        reminders_repo = ReminderRepository()
+    Удаление идет пачками по batch_size в отдельных транзакциях, пока пачки не закончатся.
 
-        for i in range(0, len(reminder_ids), batch_size):
-            batch_ids = reminder_ids[i:i + batch_size]
-            await reminders_repo.delete_models(batch_ids)
-            deleted_count += batch_size
+    Returns:
+        deleted — сколько записей удалено, batches — сколько пачек выполнено
+    """
+    settings = get_settings()
+    repo = CLEANUP_REPOSITORIES[kind]()
+    removed_before = datetime.now(timezone.utc) - timedelta(days=int(settings.CLEANUP_DAYS_THRESHOLD))
 
-        logger.info(f"Successfully deleted {deleted_count} reminders")
-        return {"count": deleted_count, "success": True}
-    except Exception as e:
-        logger.error(f"Error deleting reminders: {str(e)}")
-        return {"count": 0, "success": False, "error": str(e)}
+    progress = await _run_batches(
+        f"Очистка {kind}",
+        removed_before.isoformat(),
+        lambda cutoff, limit: repo.delete_removed_batch(datetime.fromisoformat(cutoff), limit),
+        int(batch_size or settings.CLEANUP_BATCH_SIZE),
+        cutoff_key="removed_before",
+        count_key="deleted",
+    )
+    return {"deleted": progress["deleted"], "batches": progress["batches"]}
 
 
 @activity.defn
-async def delete_habits(habit_ids: List[UUID]) -> Dict[str, Any]:
+async def apply_retention(kind: str, batch_size: Optional[int] = None) -> Dict[str, Any]:
     """
-    Permanently deletes habits with the given IDs.
+    Применяет срок хранения к записям kind (см. RETENTION_POLICIES):
+    quota_usages сворачиваются в месячные суммы, habit_progress переносится
+    в годовой архив, истекшие user_roles удаляются.
+
+    Returns:
+        processed — сколько записей обработано, batches — сколько пачек выполнено
     """
-    if not habit_ids:
-        return {"count": 0, "success": True}
-
-    logger.info(f"Deleting {len(habit_ids)} habits")
-    try:
-        # Delete in batches to avoid overwhelming the database
-        batch_size = 100
-        deleted_count = 0
-
-        habits_repo = HabitRepository()
-
-        for i in range(0, len(habit_ids), batch_size):
-            batch_ids = habit_ids[i:i + batch_size]
-            await habits_repo.delete_models(batch_ids)
-            deleted_count += batch_size
-
-        logger.info(f"Successfully deleted {deleted_count} habits")
-        return {"count": deleted_count, "success": True}
-    except Exception as e:
-        logger.error(f"Error deleting habits: {str(e)}")
-        return {"count": 0, "success": False, "error": str(e)}
+    settings = get_settings()
+    setting, cutoff_for, batch = RETENTION_POLICIES[kind]
+    today = datetime.now(timezone.utc).date()
+    cutoff = cutoff_for(today, int(getattr(settings, setting)))
+
+    progress = await _run_batches(
+        f"Срок хранения {kind}",
+        cutoff.isoformat(),
+        batch,
+        int(batch_size or settings.CLEANUP_BATCH_SIZE),
+    )
+    return {"processed": progress["processed"], "batches": progress["batches"]}
@@ -1,113 +1,107 @@
 """
-Активности для работы с привычками
+Активности для утренней сводки
 """
-import logging
 import asyncio
-from datetime import datetime, timedelta
-from pyexpat.errors import messages
+import logging
+from datetime import date
+from typing import List, Dict, Any, Optional
+from uuid import UUID
 
 from temporalio import activity
-from typing import List, Dict, Any
-from uuid import UUID
 
-from backend.control_plane.db.repositories.habit import HabitRepository
-from backend.control_plane.db.repositories.reminder import ReminderRepository
-from backend.control_plane.db.repositories.user import UserRepository
-from backend.control_plane.db.models.base import ReminderStatus
 from backend.config import get_settings
+from backend.control_plane.db.repositories.user import UserRepository
+from backend.control_plane.utils import timeutils
 from backend.data_plane.services.telegram_service import TelegramService
 
 logger = logging.getLogger("morning_message_activities")
 
 
-@activity.defn
-async def get_active_users() -> List[UUID]:
-    logger.info("Получение списка пользователей")
-    user_repo = UserRepository()
-    users = await user_repo.get_all_models()
-    return list(map(lambda user: user.id, users))
-
-
-@activity.defn
-async def check_today_habits(user_id: UUID) -> List[Dict[str, Any]]:
-    """
-    Проверяет привычки, которые должны быть выполнены сегодня
-    """
-    logger.info("Проверка активных привычек")
-    habits_repo = HabitRepository()
-
-    # Получаем активные напоминания в ближайшем временном окне
-    active_habits = await habits_repo.get_active_habits(user_id=user_id)
-
-    # Формируем список напоминаний для отправки
-    habits_to_send = []
-    for habit in active_habits:
-        habit_data = {
-            "id": str(habit.id),
-            "user_id": str(habit.user_id),
-            "text": habit.text
-        }
-        habits_to_send.append(habit_data)
-
-    return habits_to_send
-
-
-@activity.defn
-async def check_today_reminders(user_id: UUID) -> List[Dict[str, Any]]:
-    """
-    Проверяет напоминания, которые должны быть отправлены сегодня
-    """
-    logger.info("Проверка активных напоминаний")
-    reminder_repo = ReminderRepository()
-
-    # Получаем активные напоминания в ближайшем временном окне
-    active_reminders = await reminder_repo.get_active_reminders(user_id=user_id)
-
-    # Формируем список напоминаний для отправки
-    reminders_to_send = []
-    for reminder in active_reminders:
-        if reminder.time.date() != datetime.now().date():
-            continue
-        reminder_data = {
-            "id": str(reminder.id),
-            "user_id": str(reminder.user_id),
-            "text": reminder.text,
-            "time": reminder.time.isoformat()
-        }
-        reminders_to_send.append(reminder_data)
-
-    return reminders_to_send
-
-@activity.defn
-async def send_telegram_message(user_id: str, reminders: List[Dict[str, Any]], habits: List[Dict[str, Any]]):
-    """
-    Отправляет сообщение через Telegram
-    """
-    logger.info(f"Отправка утреннего уведомления для пользователя {user_id}")
-
-    user_repo = UserRepository()
-    user = await user_repo.get_by_model_id(UUID(user_id))
-
-    # Формируем текст сообщения
+def _build_digest_message(reminders: List[str], habits: List[str]) -> str:
+    """Формирует текст утренней сводки"""
     reminders_string = ""
     habits_string = ""
     if len(reminders):
         reminders_string = "🎯 Задачи на сегодня:\n"
         for reminder in reminders:
             # TODO: зачеркивать если выполнено
-            reminders_string += f"– {reminder["text"]}\n"
+            reminders_string += f"– {reminder}\n"
     if len(habits):
         if len(reminders):
             habits_string = "🧩 Привычки:\n"
         else:
             habits_string = "🧩 Привычки на сегодня:\n"
         for habit in habits:
-            habits_string += f"– {habit["text"]}\n"
-    message = f"{reminders_string}\n{habits_string}\n✨ Хорошего и продуктивного дня!"
+            habits_string += f"– {habit}\n"
+    return f"{reminders_string}\n{habits_string}\n✨ Хорошего и продуктивного дня!"
 
-    # Отправляем сообщение
-    telegram_service = TelegramService()
-    await telegram_service.send_message(
-        user.telegram_id,
-        message
+
+@activity.defn
+async def get_morning_timezone_offsets(ranges: List[List[int]]) -> List[int]:
+    """Смещения пользователей из полуинтервалов [start, end), которым пора отправить сводку"""
+    return await UserRepository().get_timezone_offsets([(start, end) for start, end in ranges])
+
+
+@activity.defn
+async def send_morning_digest_page(timezone_offset: int, local_date: str,
+                                   cursor: Optional[str] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Отправляет утреннюю сводку одной странице пользователей с заданным смещением.
+    В сводку попадают напоминания на local_date по времени пользователя.
+
+    Страница читается одним запросом, сообщения отправляются пачками по
+    MORNING_DIGEST_SEND_CONCURRENCY одновременно. После каждой пачки активность
+    сообщает в heartbeat id последнего обработанного пользователя, и повторная
+    попытка продолжает с него, не отправляя сводку дважды.
+
+    Returns:
+        next_cursor — id последнего пользователя страницы (None, если страница последняя),
+        users — пользователей на странице, sent/failed — отправлено/не отправлено сводок
+    """
+    settings = get_settings()
+    page_size = int(page_size or settings.MORNING_DIGEST_PAGE_SIZE)
+    concurrency = int(settings.MORNING_DIGEST_SEND_CONCURRENCY)
+
+    day_start, day_end = timeutils.get_user_day_bounds(date.fromisoformat(local_date), timezone_offset)
+    users = await UserRepository().get_morning_digest_page(
+        timezone_offset, UUID(cursor) if cursor else None, page_size, day_start, day_end
     )
+
+    resume_after = None
+    if activity.in_activity() and activity.info().heartbeat_details:
+        resume_after = UUID(activity.info().heartbeat_details[0])
+
+    digests = [
+        user for user in users
+        if (user["reminders"] or user["habits"]) and (resume_after is None or user["user_id"] > resume_after)
+    ]
+    logger.info(f"Утренняя сводка: {len(digests)} сообщений на странице из {len(users)} пользователей")
+
+    telegram_service = TelegramService()
+
+    async def send_one(user: Dict[str, Any]) -> bool:
+        try:
+            await telegram_service.send_message(
+                user["telegram_id"],
+                _build_digest_message(user["reminders"], user["habits"])
+            )
+        except Exception as e:
+            logger.error(f"Ошибка отправки утренней сводки пользователю {user['user_id']}: {e}")
+            return False
+        return True
+
+    sent = failed = 0
+    for start in range(0, len(digests), concurrency):
+        chunk = digests[start:start + concurrency]
+        results = await asyncio.gather(*(send_one(user) for user in chunk))
+        sent += sum(results)
+        failed += len(results) - sum(results)
+        if activity.in_activity():
+            activity.heartbeat(str(chunk[-1]["user_id"]))
+
+    return {
+        "next_cursor": str(users[-1]["user_id"]) if len(users) == page_size else None,
+        "users": len(users),
+        "sent": sent,
+        "failed": failed,
+    }
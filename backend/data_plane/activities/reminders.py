@@ -5,7 +5,7 @@ import logging
 import asyncio
 from datetime import datetime, timedelta
 from temporalio import activity
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from uuid import UUID
 
 from backend.control_plane.db.repositories.reminder import ReminderRepository
@@ -41,16 +41,11 @@ async def check_active_reminders() -> List[Dict[str, Any]]:
 
     return reminders_to_send
 
-@activity.defn
-async def send_telegram_notification(user_id: str, reminder_id: str, text: str, time: str):
+def _build_notification(reminder_id: str, text: str, time: str):
     """
-    Отправляет уведомление о напоминании через Telegram
+    Формирует текст уведомления и клавиатуру действий для напоминания
     """
-    logger.info(f"Отправка уведомления для напоминания {reminder_id}")
-
     reminder_time = datetime.fromisoformat(time)
-    user_repo = UserRepository()
-    user = await user_repo.get_by_model_id(UUID(user_id))
 
     # Формируем текст сообщения
     message = f"🔔 Напоминание: {text}\n⏰ Время: {reminder_time.strftime('%H:%M')}"
@@ -61,15 +56,78 @@ async def send_telegram_notification(user_id: str, reminder_id: str, text: str,
         [{"text": "⏰ Отложить на 15 минут", "callback_data": f"reminder_postpone:{reminder_id}:15"}],
         [{"text": "⏰ Отложить на 1 час", "callback_data": f"reminder_postpone:{reminder_id}:60"}]
     ]
+    return message, {"inline_keyboard": buttons}
+
+
+@activity.defn
+async def get_next_reminder_time() -> Optional[str]:
+    """
+    Возвращает время ближайшего неотправленного напоминания (ISO) или None
+    """
+    reminder_repo = ReminderRepository()
+    next_time = await reminder_repo.get_next_reminder_time()
+    return next_time.isoformat() if next_time else None
+
+
+@activity.defn
+async def send_telegram_notification(user_id: str, reminder_id: str, text: str, time: str):
+    """
+    Отправляет уведомление о напоминании через Telegram
+    """
+    logger.info(f"Отправка уведомления для напоминания {reminder_id}")
+
+    user_repo = UserRepository()
+    user = await user_repo.get_by_model_id(UUID(user_id))
+
+    message, reply_markup = _build_notification(reminder_id, text, time)
 
     # Отправляем сообщение
     telegram_service = TelegramService()
     await telegram_service.send_message(
         user.telegram_id,
         message,
-        reply_markup={"inline_keyboard": buttons}
+        reply_markup=reply_markup
     )
 
+
+@activity.defn
+async def send_telegram_notifications_batch(reminders: List[Dict[str, Any]]) -> List[bool]:
+    """
+    Отправляет пачку уведомлений о напоминаниях конкурентно в рамках одной активности
+
+    Ошибка отправки отдельного напоминания не роняет активность: результат
+    возвращается вектором успехов в том же порядке, что и входной список,
+    а откат делает воркфлоу только для неудачных напоминаний.
+    """
+    logger.info(f"Отправка пачки из {len(reminders)} уведомлений")
+
+    user_repo = UserRepository()
+    user_ids = {UUID(reminder["user_id"]) for reminder in reminders}
+    users = {user.id: user for user in await user_repo.get_by_model_ids(list(user_ids))}
+
+    telegram_service = TelegramService()
+
+    async def send_one(reminder: Dict[str, Any]) -> bool:
+        user = users.get(UUID(reminder["user_id"]))
+        if user is None:
+            logger.warning(f"Пользователь {reminder['user_id']} для напоминания {reminder['id']} не найден")
+            return False
+
+        message, reply_markup = _build_notification(reminder["id"], reminder["text"], reminder["time"])
+        try:
+            await telegram_service.send_message(
+                user.telegram_id,
+                message,
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            logger.error(f"Ошибка отправки напоминания {reminder['id']}: {e}")
+            return False
+        return True
+
+    return list(await asyncio.gather(*(send_one(reminder) for reminder in reminders)))
+
+
 @activity.defn
 async def abort_sent(reminder_id: str):
     """
@@ -79,3 +137,14 @@ async def abort_sent(reminder_id: str):
 
     reminder_repo = ReminderRepository()
     await reminder_repo.mark_sent(UUID(reminder_id), sent=False)
+
+
+@activity.defn
+async def abort_sent_batch(reminder_ids: List[str]) -> int:
+    """
+    Выставляет sent=False сразу для нескольких напоминаний
+    """
+    logger.info(f"Отмена отправки {len(reminder_ids)} напоминаний")
+
+    reminder_repo = ReminderRepository()
+    return await reminder_repo.mark_sent_many([UUID(reminder_id) for reminder_id in reminder_ids], sent=False)
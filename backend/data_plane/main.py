@@ -8,6 +8,8 @@ from backend.data_plane.utils.schedulers import ensure_workflows_running
 from backend.config import get_settings
 from backend.data_plane import activities
 from backend.data_plane import workflows
+from backend.data_plane.services.telegram_service import close_telegram_client
+from backend.control_plane.utils.offload import shutdown_offloader
 
 # Настройка логирования
 logging.basicConfig(
@@ -37,46 +39,51 @@ async def main():
             workflows.reminders.CheckRemindersWorkflow,
             workflows.reminders.SendReminderNotificationWorkflow,
             workflows.morning.MorningMessageWorkflow,
+            workflows.morning.MorningDigestShardWorkflow,
             workflows.habits.StartImagesGenerationWorkflow,
             workflows.habits.GenerateHabitImageWorkflow,
             workflows.achievements.CheckUserAchievementsWorkflow,
-            workflows.achievements.ProcessUserAchievementsWorkflow,
             workflows.calendar.SyncCalendarsWorkflow,
             workflows.calendar.UserCalendarSyncWorkflow,
             workflows.maintenance.CleanupRemovedItemsWorkflow,
         ],
         activities=[
             activities.reminders.check_active_reminders,
+            activities.reminders.get_next_reminder_time,
             activities.reminders.send_telegram_notification,
             activities.reminders.abort_sent,
-            activities.morning.get_active_users,
-            activities.morning.check_today_habits,
-            activities.morning.check_today_reminders,
-            activities.morning.send_telegram_message,
+            activities.reminders.send_telegram_notifications_batch,
+            activities.reminders.abort_sent_batch,
+            activities.morning.get_morning_timezone_offsets,
+            activities.morning.send_morning_digest_page,
             activities.habits.check_active_habits,
             activities.habits.update_illustrate_habit_quota,
             activities.habits.get_habit_completion_rate,
+            activities.habits.get_habits_completion_rates,
             activities.habits.generate_and_save_image,
             activities.habits.update_describe_habit_text_quota,
             activities.habits.save_image_to_db,
-            activities.achievements.grant_achievement,
-            activities.achievements.get_users_for_achievement_check,
-            activities.achievements.check_user_achievements,
-            activities.achievements.update_achievement_progress,
+            activities.achievements.get_achievement_check_window,
+            activities.achievements.check_changed_users_achievements,
+            activities.achievements.save_achievement_checkpoint,
+            activities.calendar.sync_calendar_integrations,
             activities.calendar.get_users_for_calendar_sync,
             activities.calendar.fetch_calendar_events,
             activities.calendar.sync_calendar_events,
             activities.calendar.handle_sync_errors,
-            activities.maintenance.get_removed_habits,
-            activities.maintenance.get_removed_reminders,
-            activities.maintenance.delete_habits,
-            activities.maintenance.delete_reminders,
+            activities.maintenance.delete_removed_items,
+            activities.maintenance.apply_retention,
         ],
     )
 
     # Запуск воркеров
     logger.info(f"Запуск worker'а на очереди {get_settings().TEMPORAL_TASK_QUEUE}")
-    await worker.run()
+    try:
+        await worker.run()
+    finally:
+        # Общий HTTP-клиент Telegram живет столько же, сколько воркер
+        await close_telegram_client()
+        shutdown_offloader()
 
 
 if __name__ == "__main__":
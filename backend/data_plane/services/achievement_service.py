@@ -0,0 +1,201 @@
+"""
+Движок достижений: вычисляет выдачу и прогресс достижений для пачки пользователей
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from backend.control_plane.db.engine import release_connection
+from backend.control_plane.db.models.achievement import AchievementTemplate
+from backend.control_plane.db.models.base import HabitInterval
+from backend.control_plane.db.repositories.achievement import (
+    AchievementProgress,
+    AchievementTemplateRepository,
+    UserAchievementRepository,
+)
+from backend.control_plane.db.repositories.habit import HabitRepository
+from backend.control_plane.db.types.achievements import ACHIEVEMENT_CONDITIONS, ACHIEVEMENT_EXPERIENCE
+from backend.data_plane.services.habit_analytics import compute_habit_stats
+from backend.data_plane.services.telegram_service import TelegramService
+
+logger = logging.getLogger("achievement_service")
+
+# Опыт за достижение, для которого он не задан
+DEFAULT_EXPERIENCE = 50
+
+# Условия-счетчики: ключ условия -> поле статистики пользователя
+COUNTER_CONDITIONS: Dict[str, str] = {
+    "created_reminders": "created_reminders",
+    "completed_reminders": "completed_reminders",
+    # Время выполнения не хранится, поэтому считаем все выполненные напоминания выполненными вовремя
+    "completed_on_time": "completed_reminders",
+    "daily_streak": "streak",
+    "created_habits": "created_habits",
+    "daily_habit_streak": "daily_habit_streak",
+    "weekly_habit_streak": "weekly_habit_streak",
+    "monthly_habit_streak": "monthly_habit_streak",
+}
+
+# Поле статистики с лучшей серией привычек каждого интервала
+HABIT_STREAK_FIELDS: Dict[HabitInterval, str] = {
+    HabitInterval.DAILY: "daily_habit_streak",
+    HabitInterval.WEEKLY: "weekly_habit_streak",
+    HabitInterval.MONTHLY: "monthly_habit_streak",
+}
+
+# Поля профиля, которые проверяют условия profile_fields_filled
+PROFILE_FIELDS: Tuple[str, ...] = tuple(sorted({
+    field
+    for conditions in ACHIEVEMENT_CONDITIONS.values()
+    for field in conditions.get("profile_fields_filled", [])
+}))
+
+
+def _progress(current: int, required: int) -> int:
+    """Процент прогресса"""
+    return min(100, int((current / required) * 100) if required > 0 else 0)
+
+
+def evaluate_condition(conditions: Dict[str, Any], stats: Dict[str, Any], now: datetime) -> Optional[Tuple[bool, int]]:
+    """
+    Проверяет условие достижения по статистике пользователя
+
+    Returns:
+        (выполнено ли условие, прогресс в процентах) или None, если условие не поддерживается
+    """
+    for key, stat in COUNTER_CONDITIONS.items():
+        if key in conditions:
+            current, required = stats[stat], conditions[key]
+            return current >= required, _progress(current, required)
+
+    if "registered_before" in conditions:
+        # Для "Первопроходца" прогресс либо 0%, либо 100%
+        cutoff_date = datetime.fromisoformat(conditions["registered_before"]).date()
+        granted = stats["created_at"] is not None and stats["created_at"].date() <= cutoff_date
+        return granted, 100 if granted else 0
+
+    if "profile_fields_filled" in conditions:
+        fields = conditions["profile_fields_filled"]
+        filled = sum(1 for field in fields if stats.get(f"filled_{field}"))
+        return filled == len(fields), _progress(filled, len(fields))
+
+    if "active_days" in conditions:
+        # Количество дней с момента регистрации
+        active_days = (now - stats["created_at"]).days if stats["created_at"] else 0
+        return active_days >= conditions["active_days"], _progress(active_days, conditions["active_days"])
+
+    return None
+
+
+class AchievementService:
+    """Проверка достижений пачками пользователей"""
+
+    def __init__(self):
+        self.template_repo = AchievementTemplateRepository()
+        self.user_achievement_repo = UserAchievementRepository()
+        self.habit_repo = HabitRepository()
+
+    @staticmethod
+    def _conditions(template: AchievementTemplate) -> Dict[str, Any]:
+        if template.name in ACHIEVEMENT_CONDITIONS:
+            return ACHIEVEMENT_CONDITIONS[template.name]
+        return json.loads(template.condition) if template.condition else {}
+
+    def evaluate(self, stats: Sequence[Dict[str, Any]], templates: Sequence[AchievementTemplate],
+                 now: datetime) -> List[AchievementProgress]:
+        """
+        Вычисляет состояние всех достижений для всех пользователей пачки в памяти.
+        Достижения без прогресса пропускаются — отсутствие записи означает 0%.
+        """
+        conditions = [(template, self._conditions(template)) for template in templates]
+        achievements = []
+        for user_stats in stats:
+            for template, template_conditions in conditions:
+                result = evaluate_condition(template_conditions, user_stats, now)
+                if result is None:
+                    continue
+                granted, progress = result
+                if granted or progress > 0:
+                    achievements.append(AchievementProgress(
+                        user_id=user_stats["user_id"],
+                        template_id=template.id,
+                        unlocked=granted,
+                        # Полный прогресс при выдаче
+                        progress=100 if granted else progress,
+                    ))
+        return achievements
+
+    async def get_stats(self, user_ids: List[UUID], now: datetime) -> List[Dict[str, Any]]:
+        """
+        Статистика пачки пользователей: счетчики одним агрегирующим запросом и лучшие
+        серии привычек по интервалам — пакетной аналитикой по дням выполнения всех привычек пачки
+        """
+        stats = await self.user_achievement_repo.get_achievement_stats(user_ids, PROFILE_FIELDS)
+        if not stats:
+            return stats
+        rows = await self.habit_repo.get_completed_days(now.date(), user_ids=user_ids)
+        habits = {row.habit_id: (row.user_id, row.interval) for row in rows}
+        habit_stats = compute_habit_stats(
+            {habit_id: interval for habit_id, (_, interval) in habits.items()},
+            ((row.habit_id, row.day) for row in rows),
+            now.date(),
+        )
+
+        streaks: Dict[Tuple[UUID, HabitInterval], int] = {}
+        for habit_id, (user_id, interval) in habits.items():
+            key = (user_id, interval)
+            streaks[key] = max(streaks.get(key, 0), habit_stats[habit_id].best_streak)
+        for user_stats in stats:
+            for interval, field in HABIT_STREAK_FIELDS.items():
+                user_stats[field] = streaks.get((user_stats["user_id"], interval), 0)
+        return stats
+
+    async def process_users(self, user_ids: List[UUID], now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Проверяет достижения пачки пользователей: статистика (см. get_stats),
+        вычисление условий в памяти и один upsert; новым обладателям достижений
+        отправляется уведомление
+
+        Returns:
+            users — пользователей в пачке, evaluated — достижений с ненулевым прогрессом, granted — выданных
+        """
+        now = now or datetime.now(timezone.utc)
+        templates = await self.template_repo.get_all_models()
+        stats = await self.get_stats(user_ids, now)
+
+        achievements = self.evaluate(stats, templates, now)
+        experience = {
+            template.id: ACHIEVEMENT_EXPERIENCE.get(template.name, DEFAULT_EXPERIENCE) for template in templates
+        }
+        granted = await self.user_achievement_repo.apply_achievements(achievements, experience, now)
+        # Уведомляем о зафиксированных достижениях, не держа подключение на время запросов к Telegram
+        await release_connection()
+
+        await self._notify(granted, {row["user_id"]: row["telegram_id"] for row in stats},
+                           {template.id: template for template in templates}, experience)
+        return {"users": len(stats), "evaluated": len(achievements), "granted": len(granted)}
+
+    async def _notify(self, granted: List[AchievementProgress], telegram_ids: Dict[UUID, str],
+                      templates: Dict[UUID, AchievementTemplate], experience: Dict[UUID, int]):
+        telegram_service = TelegramService()
+
+        async def notify_one(achievement: AchievementProgress):
+            telegram_id = telegram_ids.get(achievement.user_id)
+            if not telegram_id:
+                return
+            template = templates[achievement.template_id]
+            message = (
+                f"🏆 Поздравляем! Вы получили достижение:\n\n"
+                f"*{template.name}*\n\n"
+                f"{template.description}\n\n"
+                f"+{experience[achievement.template_id]} очков опыта!"
+            )
+            try:
+                await telegram_service.send_message(telegram_id, message, parse_mode="Markdown")
+            except Exception as e:
+                logger.error(f"Ошибка уведомления о достижении пользователю {achievement.user_id}: {e}")
+
+        await asyncio.gather(*(notify_one(achievement) for achievement in granted))
@@ -2,13 +2,216 @@
 Сервис для работы с календарями через CalDAV протокол с поддержкой разных серверов
 """
 import caldav
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, TypeVar, Tuple, Sequence
+from datetime import datetime, time, timedelta, timezone
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+import icalendar
+import recurring_ical_events
+from caldav.lib.error import AuthorizationError
+from lxml import etree
+
 from backend.config import get_settings
+from backend.control_plane.utils.cache import TTLCache
+from backend.control_plane.utils.offload import get_offloader, CALDAV
 
 logger = logging.getLogger("caldav_calendar_service")
 
+R = TypeVar("R")
+
+DAV_NS = "DAV:"
+CALDAV_NS = "urn:ietf:params:xml:ns:caldav"
+CALENDARSERVER_NS = "http://calendarserver.org/ns/"
+# Сколько объектов запрашивать одним calendar-multiget
+MULTIGET_BATCH_SIZE = 100
+# ID вхождения повторяющегося события: UID#исходное время вхождения
+OCCURRENCE_SEPARATOR = "#"
+# Окно разворачивания сдвигается раз в сутки, дольше хранить развернутые серии незачем
+EXPANSION_CACHE_TTL_SECONDS = 24 * 3600
+
+CTAG_PROPFIND = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:" xmlns:cs="http://calendarserver.org/ns/">'
+    '<d:prop><cs:getctag/><d:sync-token/></d:prop>'
+    '</d:propfind>'
+)
+ETAG_PROPFIND = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop><d:getetag/></d:prop></d:propfind>'
+)
+
+
+class SyncTokenExpired(Exception):
+    """Сервер больше не принимает sync-token — нужна полная синхронизация"""
+
+
+@dataclass
+class CalendarChanges:
+    """
+    Изменения коллекции календаря с прошлой синхронизации
+
+    unchanged — ctag не изменился, запросы объектов не выполнялись;
+    full — получен полный список объектов (первая синхронизация);
+    etags/events — ETag и события изменившихся или новых объектов по href;
+    deleted — href удаленных объектов;
+    recurring — href загруженных повторяющихся серий, развернутых в окне window.
+    """
+    ctag: Optional[str]
+    sync_token: Optional[str]
+    unchanged: bool = False
+    full: bool = False
+    etags: Dict[str, str] = field(default_factory=dict)
+    events: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    deleted: List[str] = field(default_factory=list)
+    recurring: List[str] = field(default_factory=list)
+    window: Optional[Tuple[datetime, datetime]] = None
+
+
+def _xml_text(element, path: str) -> Optional[str]:
+    found = element.find(path)
+    return found.text if found is not None and found.text is not None else None
+
+
+def _event_time(value) -> Optional[datetime]:
+    """Время события в UTC: событие на весь день начинается в полночь, время без зоны считается UTC"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def expansion_window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Окно разворачивания повторяющихся событий: с начала текущих суток (UTC) на горизонт и запас"""
+    settings = get_settings()
+    now = now or datetime.now(timezone.utc)
+    start = datetime.combine(now.astimezone(timezone.utc).date(), time(), tzinfo=timezone.utc)
+    days = int(settings.CALENDAR_EXPANSION_HORIZON_DAYS) + int(settings.CALENDAR_EXPANSION_REFRESH_DAYS)
+    return start, start + timedelta(days=days)
+
+
+def needs_expansion(expanded_until: datetime, now: Optional[datetime] = None) -> bool:
+    """Развернутая серия перестала покрывать горизонт — ее нужно развернуть заново"""
+    start, _ = expansion_window(now)
+    return expanded_until < start + timedelta(days=int(get_settings().CALENDAR_EXPANSION_HORIZON_DAYS))
+
+
+def occurrence_id(uid: str, recurrence_id) -> str:
+    """Стабильный ID вхождения: не зависит от переноса вхождения и от окна разворачивания"""
+    if isinstance(recurrence_id, datetime):
+        stamp = _event_time(recurrence_id).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    else:
+        stamp = recurrence_id.strftime("%Y%m%d")
+    return f"{uid}{OCCURRENCE_SEPARATOR}{stamp}"
+
+
+def occurrence_time(event_id: str) -> Optional[datetime]:
+    """Исходное время вхождения по его ID (None — событие не повторяющееся)"""
+    _, separator, stamp = event_id.rpartition(OCCURRENCE_SEPARATOR)
+    if not separator:
+        return None
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%d"):
+        try:
+            return datetime.strptime(stamp, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def _event_info(href: str, vevent, event_id: str) -> Dict[str, Any]:
+    return {
+        "id": event_id,
+        "summary": str(vevent.get("summary", "Без названия")),
+        "start": _event_time(vevent.decoded("dtstart", None)),
+        "end": _event_time(vevent.decoded("dtend", None)),
+        "location": str(vevent.get("location", "")),
+        "description": str(vevent.get("description", "")),
+        "url": href,
+    }
+
+
+def parse_calendar_object(href: str, data: str,
+                          window: Tuple[datetime, datetime]) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    События VEVENT одного объекта календаря в формате get_events
+
+    Повторяющиеся события (RRULE/RDATE) разворачиваются во вхождения внутри window
+    с учетом EXDATE и перенесенных вхождений (RECURRENCE-ID).
+
+    Returns:
+        события и признак повторяющейся серии
+    """
+    calendar = icalendar.Calendar.from_ical(data)
+    vevents = calendar.walk("VEVENT")
+    if not any("RRULE" in vevent or "RDATE" in vevent for vevent in vevents):
+        return [_event_info(href, vevent, str(vevent.get("uid", ""))) for vevent in vevents], False
+
+    result = []
+    for occurrence in recurring_ical_events.of(calendar).between(*window):
+        uid = str(occurrence.get("uid", ""))
+        recurrence_id = occurrence.decoded("recurrence-id", None) or occurrence.decoded("dtstart")
+        result.append(_event_info(href, occurrence, occurrence_id(uid, recurrence_id)))
+    return result, True
+
+
+_expansions: Optional[TTLCache[Tuple[List[Dict[str, Any]], bool]]] = None
+
+
+def get_expansion_cache() -> TTLCache[Tuple[List[Dict[str, Any]], bool]]:
+    """Развернутые объекты календаря по (href, ETag, окно): неизменная серия не разворачивается повторно"""
+    global _expansions
+    if _expansions is None:
+        _expansions = TTLCache(
+            maxsize=int(get_settings().CALENDAR_EXPANSION_CACHE_MAX_SIZE),
+            ttl=EXPANSION_CACHE_TTL_SECONDS,
+        )
+    return _expansions
+
+
+def expand_calendar_object(href: str, etag: Optional[str], data: str,
+                           window: Tuple[datetime, datetime]) -> Tuple[List[Dict[str, Any]], bool]:
+    """parse_calendar_object с кешем по ETag объекта (без ETag — по содержимому)"""
+    version = etag or hashlib.sha256(data.encode()).hexdigest()
+    key = (href, version, window)
+    cache = get_expansion_cache()
+    cached = cache.get(key)
+    if cached is None:
+        cached = parse_calendar_object(href, data, window)
+        cache.set(key, cached)
+    events, recurring = cached
+    return [dict(event) for event in events], recurring
+
+
+@dataclass
+class CalDAVConnection:
+    """Клиент CalDAV интеграции и найденные у нее календари (None — поиск еще не выполнялся)"""
+    client: caldav.DAVClient
+    calendars: Optional[List[Any]] = None
+
+
+_connections: Optional[TTLCache[CalDAVConnection]] = None
+
+
+def get_connection_cache() -> TTLCache[CalDAVConnection]:
+    """
+    Кеш подключений: клиент (с его HTTP-сессией) и результат поиска principal/календарей
+    переиспользуются между синхронизациями одной интеграции
+    """
+    global _connections
+    if _connections is None:
+        settings = get_settings()
+        _connections = TTLCache(
+            maxsize=int(settings.CALDAV_DISCOVERY_CACHE_MAX_SIZE),
+            ttl=float(settings.CALDAV_DISCOVERY_CACHE_TTL_SECONDS),
+        )
+    return _connections
+
 
 class CalendarService:
     """Сервис для получения событий из календаря через CalDAV протокол"""
@@ -25,22 +228,231 @@ class CalendarService:
         self.url = caldav_url
         self.username = username
         self.password = password
-        self.client = None
-        self._connect()
+        # Запросы к одному серверу ограничиваются лимитом CALDAV_PER_HOST_CONCURRENCY
+        self.host = urlparse(caldav_url).hostname or caldav_url
+        # Смена пароля или логина дает новую запись в кеше
+        self.cache_key = (caldav_url, username, hashlib.sha256((password or "").encode()).hexdigest())
+        self.connection = get_connection_cache().get(self.cache_key)
+        if self.connection is None:
+            self.connection = CalDAVConnection(client=self._connect())
+            get_connection_cache().set(self.cache_key, self.connection)
+
+    @property
+    def client(self) -> caldav.DAVClient:
+        return self.connection.client
 
-    def _connect(self):
+    def _connect(self) -> caldav.DAVClient:
         """Создание подключения к CalDAV серверу пользователя"""
         try:
-            self.client = caldav.DAVClient(
+            client = caldav.DAVClient(
                 url=self.url,
                 username=self.username,
                 password=self.password
             )
             logger.info(f"Успешное подключение к CalDAV серверу {self.url} для пользователя {self.username}")
+            return client
         except Exception as e:
             logger.error(f"Ошибка подключения к CalDAV серверу {self.url}: {str(e)}")
             raise
 
+    def invalidate(self):
+        """Сбрасывает кеш подключения: при следующей синхронизации календари будут найдены заново"""
+        get_connection_cache().invalidate(self.cache_key)
+
+    async def _run(self, func: Callable[..., R], *args: Any) -> R:
+        """Выполняет блокирующий вызов caldav в пуле потоков с лимитом на хост"""
+        return await get_offloader().run_keyed(CALDAV, self.host, func, *args)
+
+    def _discover_calendars(self) -> List[Any]:
+        """Календари пользователя: principal() и calendars() выполняются только при промахе кеша"""
+        if self.connection.calendars is None:
+            self.connection.calendars = self.client.principal().calendars()
+        return self.connection.calendars
+
+    def _find_calendar(self, calendar_id: Optional[str]):
+        calendars = self._discover_calendars()
+        if calendar_id:
+            # Поиск календаря по ID
+            calendar = next((cal for cal in calendars if cal.id == calendar_id), None)
+            if not calendar:
+                raise ValueError(f"Календарь с ID {calendar_id} не найден")
+            return calendar
+        # Если ID не указан, берем первый календарь
+        if not calendars:
+            raise ValueError("Доступные календари не найдены")
+        return calendars[0]
+
+    async def get_changes(self, ctag: Optional[str], sync_token: Optional[str],
+                          known_etags: Dict[str, str], refresh_hrefs: Sequence[str] = ()) -> CalendarChanges:
+        """
+        Инкрементальная синхронизация первого календаря пользователя
+
+        Если ctag коллекции не изменился, выполняется один PROPFIND. Иначе изменившиеся
+        href берутся из REPORT sync-collection по sync_token (или, если сервер его
+        не поддерживает, сравнением ETag из PROPFIND), и только они загружаются
+        через calendar-multiget. Повторяющиеся серии разворачиваются в окне expansion_window.
+
+        Args:
+            ctag: ctag коллекции с прошлой синхронизации
+            sync_token: sync-token коллекции с прошлой синхронизации
+            known_etags: ETag объектов с прошлой синхронизации по href
+            refresh_hrefs: неизменные серии, окно разворачивания которых устарело
+        """
+        return await self._run(self._get_changes_sync, ctag, sync_token, known_etags, refresh_hrefs)
+
+    def _get_changes_sync(self, ctag: Optional[str], sync_token: Optional[str],
+                          known_etags: Dict[str, str], refresh_hrefs: Sequence[str] = ()) -> CalendarChanges:
+        try:
+            window = expansion_window()
+            url = str(self._find_calendar(None).url)
+            collection = self._propfind(url, CTAG_PROPFIND, depth=0)
+            own = collection.get(urlparse(url).path) or next(iter(collection.values()), {})
+            new_ctag = own.get(f"{{{CALENDARSERVER_NS}}}getctag")
+            server_token = own.get(f"{{{DAV_NS}}}sync-token")
+
+            if ctag and new_ctag == ctag:
+                if not refresh_hrefs:
+                    return CalendarChanges(ctag=ctag, sync_token=sync_token, unchanged=True)
+                # Коллекция не менялась, но серии нужно развернуть дальше
+                changes = CalendarChanges(ctag=ctag, sync_token=sync_token, window=window)
+                self._load(changes, url, list(refresh_hrefs), known_etags)
+                return changes
+
+            changes = CalendarChanges(ctag=new_ctag, sync_token=server_token, full=not known_etags, window=window)
+            changed = None
+            if sync_token and server_token and known_etags:
+                try:
+                    changed, deleted, changes.sync_token = self._sync_collection(url, sync_token)
+                    changes.deleted = [href for href in deleted if href in known_etags]
+                except SyncTokenExpired:
+                    logger.info(f"sync-token календаря {url} устарел, выполняем полную синхронизацию")
+            if changed is None:
+                # Первая синхронизация, устаревший токен или сервер без sync-collection:
+                # сравниваем ETag всех объектов с сохраненными
+                if server_token:
+                    listing, _, changes.sync_token = self._sync_collection(url, "")
+                else:
+                    listing = self._list_etags(url)
+                changes.deleted = [href for href in known_etags if href not in listing]
+                changed = {href: etag for href, etag in listing.items() if known_etags.get(href) != etag}
+
+            deleted = set(changes.deleted)
+            hrefs = list(dict.fromkeys([*changed, *(href for href in refresh_hrefs if href not in deleted)]))
+            self._load(changes, url, hrefs, known_etags)
+            return changes
+        except Exception as e:
+            logger.error(f"Ошибка инкрементальной синхронизации календаря: {str(e)}")
+            # Календарь могли удалить или переместить — в следующий раз ищем заново
+            self.invalidate()
+            raise
+
+    def _request(self, url: str, method: str, body: str, depth: int):
+        response = self.client.request(url, method, body, {
+            "Depth": str(depth),
+            "Content-Type": 'application/xml; charset="utf-8"',
+        })
+        raw = response.raw
+        return response.status, raw.encode() if isinstance(raw, str) else raw
+
+    @staticmethod
+    def _responses(raw: bytes):
+        root = etree.fromstring(raw)
+        return root, root.findall(f"{{{DAV_NS}}}response")
+
+    def _propfind(self, url: str, body: str, depth: int) -> Dict[str, Dict[str, Optional[str]]]:
+        """Свойства со статусом 200 по href"""
+        status, raw = self._request(url, "PROPFIND", body, depth)
+        if status >= 400:
+            raise ValueError(f"PROPFIND {url} вернул {status}")
+        result = {}
+        for response in self._responses(raw)[1]:
+            props = {}
+            for propstat in response.findall(f"{{{DAV_NS}}}propstat"):
+                if " 200 " not in (_xml_text(propstat, f"{{{DAV_NS}}}status") or ""):
+                    continue
+                for prop in propstat.find(f"{{{DAV_NS}}}prop"):
+                    props[prop.tag] = prop.text
+            result[_xml_text(response, f"{{{DAV_NS}}}href")] = props
+        return result
+
+    def _list_etags(self, url: str) -> Dict[str, str]:
+        """ETag всех объектов коллекции (для серверов без sync-collection)"""
+        collection_path = urlparse(url).path
+        return {
+            href: props[f"{{{DAV_NS}}}getetag"]
+            for href, props in self._propfind(url, ETAG_PROPFIND, depth=1).items()
+            if href.rstrip("/") != collection_path.rstrip("/") and props.get(f"{{{DAV_NS}}}getetag")
+        }
+
+    def _sync_collection(self, url: str, sync_token: str) -> Tuple[Dict[str, Optional[str]], List[str], Optional[str]]:
+        """
+        REPORT sync-collection (RFC 6578)
+
+        Returns:
+            ETag изменившихся объектов по href, href удаленных объектов, новый sync-token
+
+        Raises:
+            SyncTokenExpired: сервер отверг токен
+        """
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<d:sync-collection xmlns:d="DAV:">'
+            f'<d:sync-token>{escape(sync_token)}</d:sync-token>'
+            '<d:sync-level>1</d:sync-level>'
+            '<d:prop><d:getetag/></d:prop>'
+            '</d:sync-collection>'
+        )
+        try:
+            status, raw = self._request(url, "REPORT", body, depth=1)
+        except AuthorizationError as e:
+            # Ответ 403 на устаревший токен (RFC 6578) клиент caldav выбрасывает исключением
+            raise SyncTokenExpired(url) from e
+        if status in (403, 409) or (status >= 400 and b"valid-sync-token" in raw):
+            raise SyncTokenExpired(url)
+        if status >= 400:
+            raise ValueError(f"REPORT sync-collection {url} вернул {status}")
+
+        root, responses = self._responses(raw)
+        changed, deleted = {}, []
+        for response in responses:
+            href = _xml_text(response, f"{{{DAV_NS}}}href")
+            if " 404 " in (_xml_text(response, f"{{{DAV_NS}}}status") or ""):
+                deleted.append(href)
+            elif not href.endswith("/"):
+                changed[href] = _xml_text(response, f".//{{{DAV_NS}}}getetag")
+        return changed, deleted, _xml_text(root, f"{{{DAV_NS}}}sync-token")
+
+    def _load(self, changes: CalendarChanges, url: str, hrefs: List[str], known_etags: Dict[str, str]):
+        changes.etags, changes.events, changes.recurring = self._multiget(url, hrefs, changes.window)
+        # Объект удалили между листингом и загрузкой
+        changes.deleted += [href for href in hrefs if href not in changes.etags and href in known_etags]
+
+    def _multiget(self, url: str, hrefs: List[str], window: Tuple[datetime, datetime]
+                  ) -> Tuple[Dict[str, str], Dict[str, List[Dict[str, Any]]], List[str]]:
+        """Загружает объекты calendar-multiget пачками: ETag, события по href и href повторяющихся серий"""
+        etags, events, recurring = {}, {}, []
+        for start in range(0, len(hrefs), MULTIGET_BATCH_SIZE):
+            body = (
+                '<?xml version="1.0" encoding="utf-8"?>'
+                '<c:calendar-multiget xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav">'
+                '<d:prop><d:getetag/><c:calendar-data/></d:prop>'
+                + "".join(f"<d:href>{escape(href)}</d:href>" for href in hrefs[start:start + MULTIGET_BATCH_SIZE])
+                + '</c:calendar-multiget>'
+            )
+            status, raw = self._request(url, "REPORT", body, depth=1)
+            if status >= 400:
+                raise ValueError(f"REPORT calendar-multiget {url} вернул {status}")
+            for response in self._responses(raw)[1]:
+                href = _xml_text(response, f"{{{DAV_NS}}}href")
+                data = _xml_text(response, f".//{{{CALDAV_NS}}}calendar-data")
+                if data is None:
+                    continue
+                etags[href] = _xml_text(response, f".//{{{DAV_NS}}}getetag")
+                events[href], is_recurring = expand_calendar_object(href, etags[href], data, window)
+                if is_recurring:
+                    recurring.append(href)
+        return etags, events, recurring
+
     async def get_calendars(self) -> List[Dict[str, Any]]:
         """
         Получает список доступных календарей пользователя
@@ -48,9 +460,11 @@ class CalendarService:
         Returns:
             List[Dict]: Список календарей с их информацией
         """
+        return await self._run(self._get_calendars_sync)
+
+    def _get_calendars_sync(self) -> List[Dict[str, Any]]:
         try:
-            principal = self.client.principal()
-            calendars = principal.calendars()
+            calendars = self._discover_calendars()
 
             result = []
             for calendar in calendars:
@@ -83,53 +497,40 @@ class CalendarService:
         Returns:
             List[Dict]: Список событий календаря
         """
+        return await self._run(self._get_events_sync, calendar_id, start_date, end_date)
+
+    def _get_events_sync(
+            self,
+            calendar_id: Optional[str],
+            start_date: Optional[datetime],
+            end_date: Optional[datetime]
+    ) -> List[Dict[str, Any]]:
         try:
             if start_date is None:
-                start_date = datetime.now()
+                start_date = datetime.now(timezone.utc)
 
             if end_date is None:
                 end_date = start_date + timedelta(days=7)
 
-            principal = self.client.principal()
-
             # Получаем нужный календарь
-            if calendar_id:
-                # Поиск календаря по ID
-                calendars = principal.calendars()
-                calendar = next((cal for cal in calendars if cal.id == calendar_id), None)
-                if not calendar:
-                    raise ValueError(f"Календарь с ID {calendar_id} не найден")
-            else:
-                # Если ID не указан, берем первый календарь
-                calendars = principal.calendars()
-                if not calendars:
-                    raise ValueError("Доступные календари не найдены")
-                calendar = calendars[0]
+            calendar = self._find_calendar(calendar_id)
 
             # Получаем события за указанный период
             events = calendar.date_search(start=start_date, end=end_date)
 
+            window = (_event_time(start_date), _event_time(end_date))
             result = []
             for event in events:
-                event_data = event.data
-                vevents = event.vobject_instance.vevent_list
-
-                for vevent in vevents:
-                    event_info = {
-                        "id": getattr(vevent, "uid", "").value if hasattr(vevent, "uid") else "",
-                        "summary": getattr(vevent, "summary", "").value if hasattr(vevent, "summary") else "Без названия",
-                        "start": getattr(vevent, "dtstart", None).value if hasattr(vevent, "dtstart") else None,
-                        "end": getattr(vevent, "dtend", None).value if hasattr(vevent, "dtend") else None,
-                        "location": getattr(vevent, "location", "").value if hasattr(vevent, "location") else "",
-                        "description": getattr(vevent, "description", "").value if hasattr(vevent, "description") else "",
-                        "url": event.url,
-                    }
-                    result.append(event_info)
+                # Повторяющиеся серии разворачиваются во вхождения внутри периода
+                occurrences, _ = expand_calendar_object(str(event.url), None, event.data, window)
+                result.extend(occurrences)
 
             return result
 
         except Exception as e:
             logger.error(f"Ошибка получения событий из календаря: {str(e)}")
+            # Календарь могли удалить или переместить — в следующий раз ищем заново
+            self.invalidate()
             raise
 
     async def get_event_details(self, calendar_id: str, event_id: str) -> Dict[str, Any]:
@@ -143,13 +544,11 @@ class CalendarService:
         Returns:
             Dict: Детали события
         """
-        try:
-            principal = self.client.principal()
-            calendars = principal.calendars()
-            calendar = next((cal for cal in calendars if cal.id == calendar_id), None)
+        return await self._run(self._get_event_details_sync, calendar_id, event_id)
 
-            if not calendar:
-                raise ValueError(f"Календарь с ID {calendar_id} не найден")
+    def _get_event_details_sync(self, calendar_id: str, event_id: str) -> Dict[str, Any]:
+        try:
+            calendar = self._find_calendar(calendar_id)
 
             # Поиск события по ID
             for event in calendar.events():
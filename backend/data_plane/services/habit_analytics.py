@@ -0,0 +1,135 @@
+"""
+Пакетная аналитика привычек: доля выполнения и серии сразу для многих привычек.
+
+Дни выполнения всех привычек приходят одним запросом (HabitRepository.get_completed_days)
+и обрабатываются массивами NumPy за один проход, без циклов по привычкам и дням.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, Mapping, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from backend.control_plane.db.models.base import HabitInterval
+from backend.control_plane.db.repositories.habit import PERIOD_EPOCH
+
+# За какой срок до сегодняшнего дня считается доля выполнения для каждого интервала
+COMPLETION_WINDOWS: Dict[HabitInterval, timedelta] = {
+    HabitInterval.DAILY: timedelta(weeks=4),  # месяц
+    HabitInterval.WEEKLY: timedelta(weeks=6 * 4),  # полгода
+    HabitInterval.MONTHLY: timedelta(weeks=12 * 4),  # год
+}
+
+# Коды интервалов в массивах; CUSTOM считается по дням, как и в запросах серий
+_WEEKLY, _MONTHLY = 1, 2
+_INTERVAL_CODES = {HabitInterval.WEEKLY: _WEEKLY, HabitInterval.MONTHLY: _MONTHLY}
+
+_EPOCH = np.datetime64(PERIOD_EPOCH, "D")
+
+
+@dataclass
+class HabitStats:
+    """Показатели привычки на сегодняшний день"""
+    completion_rate: float
+    current_streak: int
+    best_streak: int
+
+
+def period_indexes(interval_codes: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    Номера периодов (дня, недели с понедельника или месяца), в которые попадают даты days.
+
+    Args:
+        interval_codes: код интервала привычки для каждой даты
+        days: даты, datetime64[D]
+    """
+    day_numbers = (days - _EPOCH).astype(np.int64)
+    months = days.astype("datetime64[M]").astype(np.int64)
+    return np.select(
+        [interval_codes == _WEEKLY, interval_codes == _MONTHLY],
+        [day_numbers // 7, months],
+        default=day_numbers,
+    )
+
+
+def _first_of_each(habits: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """Маска первых вхождений пар (привычка, период) в отсортированных массивах"""
+    first = np.ones(len(habits), dtype=bool)
+    first[1:] = (habits[1:] != habits[:-1]) | (periods[1:] != periods[:-1])
+    return first
+
+
+def compute_habit_stats(habits: Mapping[UUID, HabitInterval], completed: Iterable[Tuple[UUID, date]],
+                        today: date) -> Dict[UUID, HabitStats]:
+    """
+    Доля выполнения и серии для всех привычек habits за один проход.
+
+    Серия — выполненные периоды подряд; текущая серия продолжается, если выполнен
+    текущий или предыдущий период. Доля выполнения — выполненные периоды окна
+    COMPLETION_WINDOWS[interval] к числу периодов, которых касается окно.
+
+    Args:
+        habits: интервал каждой привычки
+        completed: дни выполнения (habit_id, день); дни чужих привычек и после today не учитываются
+        today: сегодняшний день
+
+    Returns:
+        показатели каждой привычки из habits
+    """
+    habit_ids = list(habits)
+    positions = {habit_id: position for position, habit_id in enumerate(habit_ids)}
+    codes = np.array([_INTERVAL_CODES.get(habits[habit_id], 0) for habit_id in habit_ids], dtype=np.int64)
+    today_day = np.datetime64(today, "D")
+    window_starts = np.array(
+        [today - COMPLETION_WINDOWS.get(habits[habit_id], COMPLETION_WINDOWS[HabitInterval.DAILY])
+         for habit_id in habit_ids],
+        dtype="datetime64[D]",
+    )
+
+    rows = [(positions[habit_id], day) for habit_id, day in completed if habit_id in positions]
+    owner = np.fromiter((position for position, _ in rows), dtype=np.int64, count=len(rows))
+    days = np.array([day for _, day in rows], dtype="datetime64[D]")
+    keep = days <= today_day
+    owner, days = owner[keep], days[keep]
+    periods = period_indexes(codes[owner], days)
+
+    # Сортировка по (привычка, период): дни одного периода идут подряд
+    order = np.lexsort((periods, owner))
+    owner, periods, days = owner[order], periods[order], days[order]
+
+    # Доля выполнения: уникальные периоды с днями в окне
+    in_window = days >= window_starts[owner]
+    window_owner, window_periods = owner[in_window], periods[in_window]
+    done = np.bincount(window_owner[_first_of_each(window_owner, window_periods)], minlength=len(habit_ids))
+    current_periods = period_indexes(codes, np.full(len(habit_ids), today_day))
+    expected = current_periods - period_indexes(codes, window_starts) + 1
+    rates = np.divide(done, expected, out=np.zeros(len(habit_ids)), where=expected > 0)
+
+    # Серии: подряд идущие периоды одной привычки
+    first = _first_of_each(owner, periods)
+    owner, periods = owner[first], periods[first]
+    run_starts = np.ones(len(owner), dtype=bool)
+    run_starts[1:] = (owner[1:] != owner[:-1]) | (periods[1:] - periods[:-1] != 1)
+    run_lengths = np.bincount(np.cumsum(run_starts) - 1)
+    run_owner = owner[run_starts]
+    # Конец серии — перед началом следующей; первый элемент всегда начало, поэтому сдвиг отмечает и последний
+    run_last_periods = periods[np.roll(run_starts, -1)]
+
+    best = np.zeros(len(habit_ids), dtype=np.int64)
+    np.maximum.at(best, run_owner, run_lengths)
+    # Последняя серия привычки — текущая, если дошла до текущего или предыдущего периода
+    last_runs = np.ones(len(run_owner), dtype=bool)
+    last_runs[:-1] = run_owner[1:] != run_owner[:-1]
+    alive = last_runs & (run_last_periods >= current_periods[run_owner] - 1)
+    current = np.zeros(len(habit_ids), dtype=np.int64)
+    current[run_owner[alive]] = run_lengths[alive]
+
+    return {
+        habit_id: HabitStats(
+            completion_rate=float(rates[position]),
+            current_streak=int(current[position]),
+            best_streak=int(best[position]),
+        )
+        for habit_id, position in positions.items()
+    }
@@ -9,6 +9,7 @@ import logging
 from typing import Optional
 
 from backend.config import get_settings
+from backend.control_plane.utils.offload import get_offloader, S3
 
 logger = logging.getLogger("storage_service")
 
@@ -71,6 +72,18 @@ class YandexStorageService:
             logger.error(f"Ошибка при загрузке файла в хранилище: {str(e)}")
             raise
 
+    async def save_image_async(
+            self,
+            image_bytes: bytes,
+            prefix: str = "images",
+            content_type: str = "image/jpeg",
+            extension: str = "jpeg"
+    ) -> str:
+        """
+        То же, что save_image, но загрузка выполняется в пуле потоков, не блокируя event loop
+        """
+        return await get_offloader().run(S3, self.save_image, image_bytes, prefix, content_type, extension)
+
     def delete_file(self, object_key: str) -> bool:
         """
         Удаляет файл из хранилища
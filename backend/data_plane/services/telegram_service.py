@@ -2,8 +2,10 @@
 Сервис для работы с Telegram API
 """
 import aiohttp
+import asyncio
 import logging
 import json
+import time
 from typing import Dict, Any, Optional
 from backend.config import get_settings
 import certifi
@@ -12,6 +14,131 @@ import ssl
 logger = logging.getLogger("telegram_service")
 ssl_context = ssl.create_default_context(cafile=certifi.where())
 
+# Сколько ждать по умолчанию, если Telegram вернул 429 без retry_after
+DEFAULT_RETRY_AFTER = 1.0
+# После какого числа чатов чистить неактивные bucket'ы
+MAX_CHAT_BUCKETS = 10000
+CHAT_BUCKET_IDLE_SECONDS = 60.0
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity накопленных"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self, now: float, idle_seconds: float) -> bool:
+        return not self._lock.locked() and now - self.updated > idle_seconds
+
+    async def acquire(self):
+        # Ожидающие обслуживаются по очереди за счет блокировки
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TelegramRateLimiter:
+    """
+    Ограничитель отправки: общий bucket на бота, отдельный bucket на каждый чат
+    и глобальная пауза после ответа 429
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._paused_until = 0.0
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                now = time.monotonic()
+                for key in [k for k, b in self._chat_buckets.items() if b.is_idle(now, CHAT_BUCKET_IDLE_SECONDS)]:
+                    del self._chat_buckets[key]
+            # В один чат — без всплесков
+            bucket = TokenBucket(self.chat_rate, capacity=1.0)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def pause(self, seconds: float):
+        """Приостанавливает все отправки на seconds (backpressure по 429)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _wait_pause(self):
+        while (delay := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+    async def acquire(self, chat_id: str):
+        await self._wait_pause()
+        await self._chat_bucket(str(chat_id)).acquire()
+        await self.global_bucket.acquire()
+        # Пауза могла начаться, пока ждали токены
+        await self._wait_pause()
+
+
+class TelegramClient:
+    """Общий на воркер HTTP-клиент Telegram: пул соединений и лимиты отправки"""
+
+    def __init__(self):
+        settings = get_settings()
+        self.limiter = TelegramRateLimiter(
+            float(settings.TELEGRAM_GLOBAL_RATE_LIMIT),
+            float(settings.TELEGRAM_CHAT_RATE_LIMIT)
+        )
+        self.max_connections = int(settings.TELEGRAM_MAX_CONNECTIONS)
+        self.max_retries = int(settings.TELEGRAM_MAX_RETRIES)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_telegram_client: Optional[TelegramClient] = None
+
+
+def get_telegram_client() -> TelegramClient:
+    global _telegram_client
+    if _telegram_client is None:
+        _telegram_client = TelegramClient()
+    return _telegram_client
+
+
+async def close_telegram_client():
+    """Закрывает общий клиент (при остановке воркера и в тестах)"""
+    global _telegram_client
+    if _telegram_client is not None:
+        await _telegram_client.close()
+        _telegram_client = None
+
+
+def _parse_retry_after(response_text: str) -> float:
+    try:
+        return float(json.loads(response_text)["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return DEFAULT_RETRY_AFTER
+
 
 class TelegramService:
     """Сервис для отправки сообщений через Telegram Bot API"""
@@ -30,6 +157,9 @@ class TelegramService:
         """
         Отправляет сообщение пользователю через Telegram
 
+        Соблюдает лимиты Bot API и при ответе 429 ждет retry_after,
+        приостанавливая все отправки воркера.
+
         Args:
             chat_id: ID чата/пользователя
             text: Текст сообщения
@@ -48,10 +178,18 @@ class TelegramService:
         if reply_markup:
             data["reply_markup"] = json.dumps(reply_markup)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=data, ssl=ssl_context) as response:
-                if response.status != 200:
-                    response_text = await response.text()
-                    raise ValueError(f"Ошибка отправки сообщения в Telegram: {response.status} - {response_text}")
+        client = get_telegram_client()
+        for attempt in range(client.max_retries + 1):
+            await client.limiter.acquire(chat_id)
+            async with client.session().post(url, data=data, ssl=ssl_context) as response:
+                if response.status == 200:
+                    return True
+
+                response_text = await response.text()
+                if response.status == 429 and attempt < client.max_retries:
+                    retry_after = _parse_retry_after(response_text)
+                    logger.warning(f"Telegram 429 для чата {chat_id}, повтор через {retry_after} с")
+                    client.limiter.pause(retry_after)
+                    continue
 
-                return True
+                raise ValueError(f"Ошибка отправки сообщения в Telegram: {response.status} - {response_text}")
@@ -0,0 +1,146 @@
+"""
+Локальный фейковый Telegram Bot API для нагрузочного тестирования отправки.
+
+Принимает sendMessage, соблюдает лимиты Telegram (на бота и на чат)
+и при их превышении отвечает 429 с retry_after, как настоящий API.
+
+Запуск сервера:
+    python -m backend.data_plane.tests.fake_telegram_server serve --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot python -m backend.data_plane.main
+
+Нагрузка через TelegramService против запущенного сервера:
+    python -m backend.data_plane.tests.fake_telegram_server load --port 8081 --messages 600 --chats 100
+"""
+import argparse
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from aiohttp import web
+
+
+class FakeTelegramServer:
+    """Фейковый Bot API со счетчиками принятых и отклоненных сообщений"""
+
+    def __init__(self, global_rate: int = 30, chat_rate: float = 1.0, retry_after: int = 1,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.global_rate = global_rate
+        self.chat_interval = 1.0 / chat_rate
+        self.retry_after = retry_after
+        self.host = host
+        self.port = port
+        self.accepted = 0
+        self.rejected = 0
+        self.forced_429 = 0  # Сколько ближайших запросов отклонить принудительно
+        self._window = deque()
+        self._last_by_chat: Dict[str, float] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    def _too_many(self, chat_id: str, now: float) -> bool:
+        if self.forced_429 > 0:
+            self.forced_429 -= 1
+            return True
+        while self._window and now - self._window[0] >= 1.0:
+            self._window.popleft()
+        if len(self._window) >= self.global_rate:
+            return True
+        last = self._last_by_chat.get(chat_id)
+        # Небольшой допуск на дрожание таймеров клиента
+        return last is not None and now - last < self.chat_interval * 0.5
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        chat_id = str(data.get("chat_id"))
+        now = time.monotonic()
+
+        if self._too_many(chat_id, now):
+            self.rejected += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+
+        self._window.append(now)
+        self._last_by_chat[chat_id] = now
+        self.accepted += 1
+        return web.json_response({"ok": True, "result": {"message_id": self.accepted, "chat": {"id": chat_id}}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self.send_message)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Узнаем реальный порт, если был запрошен 0
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def run_load(api_url: str, messages: int, chats: int) -> Dict[str, float]:
+    """Отправляет messages сообщений в chats чатов через TelegramService"""
+    from backend.data_plane.services.telegram_service import TelegramService, close_telegram_client
+
+    service = TelegramService()
+    service.api_url = f"{api_url}load-test-token"
+    started = time.monotonic()
+    results = await asyncio.gather(
+        *(service.send_message(str(i % chats), f"load message {i}") for i in range(messages)),
+        return_exceptions=True,
+    )
+    elapsed = time.monotonic() - started
+    await close_telegram_client()
+
+    failed = sum(1 for result in results if isinstance(result, BaseException))
+    return {
+        "messages": messages,
+        "failed": failed,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round((messages - failed) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def _serve(args):
+    server = FakeTelegramServer(global_rate=args.global_rate, chat_rate=args.chat_rate, port=args.port)
+    await server.start()
+    print(f"Fake Telegram API: {server.api_url}")
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print(f"accepted={server.accepted} rejected={server.rejected}")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковый Telegram Bot API")
+    parser.add_argument("command", choices=["serve", "load"])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--global-rate", type=int, default=30)
+    parser.add_argument("--chat-rate", type=float, default=1.0)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(_serve(args))
+    else:
+        print(asyncio.run(run_load(f"http://127.0.0.1:{args.port}/bot", args.messages, args.chats)))
+
+
+if __name__ == "__main__":
+    main()
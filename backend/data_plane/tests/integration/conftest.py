@@ -28,7 +28,8 @@ from temporalio.worker import Worker
 # --- Project Imports (Adjust paths as needed) ---
 # Import workflows and activities to register them with the worker
 from backend.data_plane.workflows.reminders import CheckRemindersWorkflow, SendReminderNotificationWorkflow
-from backend.data_plane.activities.reminders import check_active_reminders, send_telegram_notification, abort_sent
+from backend.data_plane.activities.reminders import check_active_reminders, get_next_reminder_time, \
+    send_telegram_notification, abort_sent
 from backend.control_plane.db.models.base import BaseModel as SQLAlchemyBaseModel # Import your SQLAlchemy Base
 from backend.config import get_settings # We might need original settings for DB connection
 
@@ -208,7 +209,7 @@ async def reminder_worker(
                 temporal_client,
                 task_queue="integration-test-reminders-queue",
                 workflows=[CheckRemindersWorkflow, SendReminderNotificationWorkflow],
-                activities=[check_active_reminders, send_telegram_notification, abort_sent],
+                activities=[check_active_reminders, get_next_reminder_time, send_telegram_notification, abort_sent],
             )
             worker_task = asyncio.create_task(worker.run())
             print("Temporal worker started.")
@@ -0,0 +1,145 @@
+# tests/integration/test_achievements.py
+"""
+Движок достижений: счетчики пачки пользователей одним запросом, серии привычек
+одним запросом дней выполнения,
+выдача и прогресс одним upsert, опыт начисляется только за новые достижения,
+повторная проверка касается только пользователей с изменившимися данными.
+"""
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch, AsyncMock
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select, text, update, func
+
+from backend.control_plane.db.models import User, UserAchievement, AchievementTemplate, Reminder
+from backend.control_plane.db.repositories import achievement as achievement_module
+from backend.control_plane.db.repositories import checkpoint as checkpoint_module
+from backend.control_plane.db.repositories import habit as habit_module
+from backend.control_plane.db.repositories.checkpoint import JobCheckpointRepository
+from backend.control_plane.db.types.sync import sync_achievements
+from backend.data_plane.services.achievement_service import AchievementService
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+
+@pytest_asyncio.fixture
+async def achievement_service(test_session_maker):
+    @asynccontextmanager
+    async def session_factory():
+        async with test_session_maker() as session:
+            yield session
+
+    async with test_session_maker() as session:
+        await sync_achievements(session)
+        await session.commit()
+
+    with patch.object(achievement_module, "get_async_session", session_factory), \
+            patch.object(checkpoint_module, "get_async_session", session_factory), \
+            patch.object(habit_module, "get_async_session", session_factory), \
+            patch("backend.control_plane.db.repositories.base.get_async_session", session_factory), \
+            patch("backend.data_plane.services.telegram_service.TelegramService.send_message", AsyncMock()):
+        yield AchievementService()
+
+
+@pytest_asyncio.fixture
+async def achievement_user(test_session_maker):
+    async with test_session_maker() as session:
+        name = f"achievements-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name, first_name="Имя", experience=0)
+        session.add(user)
+        await session.commit()
+
+        await session.execute(text("""
+            INSERT INTO reminders (id, user_id, text, time, status, removed, notification_sent)
+            SELECT gen_random_uuid(), :user_id, 'r', now(),
+                   CASE WHEN g <= 12 THEN 'COMPLETED'::reminderstatus ELSE 'ACTIVE'::reminderstatus END, false, true
+            FROM generate_series(1, 30) g
+        """), {"user_id": user.id})
+        habit_id = uuid4()
+        await session.execute(text("""
+            INSERT INTO habits (id, user_id, text, interval, start_date, removed)
+            VALUES (:habit_id, :user_id, 'h', 'DAILY', now(), false)
+        """), {"habit_id": habit_id, "user_id": user.id})
+        # 15 дней подряд, разрыв и еще 3 дня: лучшая серия — 15
+        start = date(2026, 1, 1)
+        days = [start + timedelta(days=g) for g in range(15)] + [start + timedelta(days=40 + g) for g in range(3)]
+        for day in days:
+            await session.execute(text("""
+                INSERT INTO habit_progress (id, habit_id, record_date, completed)
+                VALUES (gen_random_uuid(), :habit_id, :day, true)
+            """), {"habit_id": habit_id, "day": day})
+        await session.commit()
+        return user
+
+
+async def test_stats_in_two_queries(achievement_service, achievement_user, test_db_engine):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(test_db_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        stats = await achievement_service.get_stats([achievement_user.id], datetime.now(timezone.utc))
+    finally:
+        event.remove(test_db_engine.sync_engine, "before_cursor_execute", listener)
+
+    # Счетчики и дни выполнения привычек
+    assert len(statements) == 2
+    assert stats[0]["created_reminders"] == 30
+    assert stats[0]["completed_reminders"] == 12
+    assert stats[0]["created_habits"] == 1
+    assert stats[0]["daily_habit_streak"] == 15
+    assert stats[0]["filled_first_name"] and not stats[0]["filled_last_name"]
+
+
+async def test_grants_once_and_keeps_progress(achievement_service, achievement_user, test_session_maker):
+    first = await achievement_service.process_users([achievement_user.id])
+    second = await achievement_service.process_users([achievement_user.id])
+
+    # creator_beginner, creator_intermediate, finisher_beginner, daily_streak
+    assert first["granted"] == 4
+    assert second["granted"] == 0
+
+    async with test_session_maker() as session:
+        user = await session.get(User, achievement_user.id)
+        assert user.experience == 50 + 150 + 100 + 400
+
+        rows = (await session.execute(
+            select(AchievementTemplate.name, UserAchievement.unlocked, UserAchievement.progress)
+            .join(UserAchievement, UserAchievement.template_id == AchievementTemplate.id)
+            .where(UserAchievement.user_id == achievement_user.id)
+        )).all()
+    achievements = {name: (unlocked, progress) for name, unlocked, progress in rows}
+    assert achievements["creator_intermediate"] == (True, 100)
+    assert achievements["creator_master"] == (False, 30)
+    assert achievements["profile_complete"] == (False, 25)
+
+
+async def test_only_changed_users_are_checked(achievement_service, achievement_user, test_session_maker):
+    async with test_session_maker() as session:
+        name = f"idle-{uuid4().hex[:8]}"
+        idle_user = User(telegram_id=name, username=name)
+        session.add(idle_user)
+        await session.commit()
+        since = (await session.execute(select(func.now()))).scalar_one()
+
+    async with test_session_maker() as session:
+        await session.execute(
+            update(Reminder).where(Reminder.user_id == achievement_user.id).values(text="изменено")
+        )
+        await session.commit()
+        until = (await session.execute(select(func.now()))).scalar_one()
+
+    repo = achievement_service.user_achievement_repo
+    changed = await repo.get_changed_user_ids(since, until, None, 100)
+    assert achievement_user.id in changed
+    assert idle_user.id not in changed
+    # Без отметки проверяются все пользователи
+    assert idle_user.id in await repo.get_changed_user_ids(None, until, None, 10000)
+
+    checkpoints = JobCheckpointRepository()
+    name = f"test-{uuid4().hex[:8]}"
+    await checkpoints.set_checkpoint(name, until)
+    await checkpoints.set_checkpoint(name, since)
+    assert await checkpoints.get_checkpoint(name) == until
@@ -0,0 +1,110 @@
+# tests/integration/test_calendar_reconcile.py
+"""
+Сверка напоминаний с календарем: весь календарь применяется в одной транзакции
+многострочным upsert и set-based удалением, счетчики совпадают с прежними.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from backend.control_plane.db.models import User, Reminder, CalendarIntegration
+from backend.control_plane.db.repositories import reminder as reminder_module
+from backend.control_plane.db.repositories.reminder import ReminderRepository, CalendarEventReminder
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+EVENTS = 300
+
+
+@pytest_asyncio.fixture
+async def reconcile(test_session_maker):
+    sessions = []
+
+    @asynccontextmanager
+    async def session_factory():
+        async with test_session_maker() as session:
+            sessions.append(session)
+            yield session
+
+    async with test_session_maker() as session:
+        name = f"calendar-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name)
+        session.add(user)
+        await session.flush()
+        integration = CalendarIntegration(user_id=user.id, caldav_url="https://caldav.example.com/", active=True)
+        session.add(integration)
+        await session.commit()
+
+    with patch.object(reminder_module, "get_async_session", session_factory):
+        yield user, integration, sessions
+
+
+def calendar(start: datetime, count: int = EVENTS, summary: str = "Событие"):
+    return [
+        CalendarEventReminder(calendar_event_id=f"event-{i}", text=f"{summary} {i}", time=start + timedelta(hours=i))
+        for i in range(count)
+    ]
+
+
+async def reminders(test_session_maker, integration_id):
+    async with test_session_maker() as session:
+        result = await session.execute(
+            select(Reminder).where(Reminder.calendar_integration_id == integration_id)
+        )
+        return {reminder.calendar_event_id: reminder for reminder in result.scalars()}
+
+
+async def test_full_sync_in_one_transaction(reconcile, test_session_maker):
+    user, integration, sessions = reconcile
+    repo = ReminderRepository()
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    events = calendar(start)
+    ids = [event.calendar_event_id for event in events]
+    synced_at = datetime.now(timezone.utc)
+
+    created = await repo.reconcile_calendar_events(
+        user.id, integration.id, events, present_event_ids=ids, integration_values={"last_sync": synced_at}
+    )
+    assert created == {"created": EVENTS, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert len(sessions) == 1
+
+    # Время сдвинулось меньше чем на минуту — не изменение
+    events[0].time += timedelta(seconds=30)
+    events[1].text = "Перенесли"
+    events[2].time += timedelta(hours=2)
+    result = await repo.reconcile_calendar_events(
+        user.id, integration.id, events[:-1], present_event_ids=ids[:-1]
+    )
+    assert result == {"created": 0, "updated": 2, "deleted": 1, "unchanged": EVENTS - 3}
+    assert len(sessions) == 2
+
+    stored = await reminders(test_session_maker, integration.id)
+    assert len(stored) == EVENTS
+    assert stored["event-1"].text == "Перенесли"
+    assert stored[ids[-1]].removed
+    async with test_session_maker() as session:
+        assert (await session.get(CalendarIntegration, integration.id)).last_sync == synced_at
+
+
+async def test_delta_sync_and_restore(reconcile, test_session_maker):
+    user, integration, _ = reconcile
+    repo = ReminderRepository()
+    events = calendar(datetime.now(timezone.utc) + timedelta(days=1), count=3)
+    await repo.reconcile_calendar_events(user.id, integration.id, events, present_event_ids=["event-0", "event-1", "event-2"])
+
+    # Инкрементальная синхронизация трогает только переданные события
+    result = await repo.reconcile_calendar_events(user.id, integration.id, [], deleted_event_ids=["event-0"])
+    assert result == {"created": 0, "updated": 0, "deleted": 1, "unchanged": 0}
+
+    # Вернувшееся событие восстанавливает то же напоминание, а не создает дубликат
+    result = await repo.reconcile_calendar_events(user.id, integration.id, [events[0], events[0]])
+    assert result == {"created": 0, "updated": 1, "deleted": 0, "unchanged": 0}
+
+    stored = await reminders(test_session_maker, integration.id)
+    assert len(stored) == 3
+    assert not any(reminder.removed for reminder in stored.values())
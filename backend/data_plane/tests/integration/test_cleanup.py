@@ -0,0 +1,71 @@
+# tests/integration/test_cleanup.py
+"""
+Очистка помеченных удаленными сущностей: пачки удаляются одним DELETE ... RETURNING,
+счетчики точные, свежие и неудаленные записи не затрагиваются.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from backend.control_plane.db.models import User
+from backend.control_plane.db.repositories.habit import HabitRepository
+from backend.control_plane.db.repositories.reminder import ReminderRepository
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+
+@pytest_asyncio.fixture
+async def cleanup_user(test_session_maker):
+    @asynccontextmanager
+    async def session_factory():
+        async with test_session_maker() as session:
+            yield session
+
+    async with test_session_maker() as session:
+        name = f"cleanup-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name)
+        session.add(user)
+        await session.commit()
+
+        # 25 старых удаленных, 5 свежих удаленных и 5 старых активных напоминаний
+        await session.execute(text("""
+            INSERT INTO reminders (id, user_id, text, time, removed, updated_at)
+            SELECT gen_random_uuid(), :user_id, 'cleanup', now(), g <= 30,
+                   CASE WHEN g BETWEEN 26 AND 30 THEN now() ELSE now() - interval '30 days' END
+            FROM generate_series(1, 35) g
+        """), {"user_id": user.id})
+        await session.execute(text("""
+            INSERT INTO habits (id, user_id, text, interval, start_date, removed, updated_at)
+            SELECT gen_random_uuid(), :user_id, 'cleanup', 'DAILY', now(), true, now() - interval '30 days'
+            FROM generate_series(1, 3) g
+        """), {"user_id": user.id})
+        await session.commit()
+
+    with patch("backend.control_plane.db.repositories.base.get_async_session", session_factory):
+        yield user
+
+
+async def remaining(test_session_maker, table: str, user_id) -> int:
+    async with test_session_maker() as session:
+        return (await session.execute(
+            text(f"SELECT count(*) FROM {table} WHERE user_id = :user_id"), {"user_id": user_id}
+        )).scalar_one()
+
+
+async def test_delete_removed_batches(cleanup_user, test_session_maker):
+    removed_before = datetime.now(timezone.utc) - timedelta(days=10)
+    repo = ReminderRepository()
+
+    batches = []
+    while not batches or batches[-1] == 10:
+        batches.append(await repo.delete_removed_batch(removed_before, 10))
+
+    assert batches == [10, 10, 5]
+    assert await remaining(test_session_maker, "reminders", cleanup_user.id) == 10
+    assert await HabitRepository().delete_removed_batch(removed_before, 10) == 3
+    assert await remaining(test_session_maker, "habits", cleanup_user.id) == 0
@@ -0,0 +1,117 @@
+# tests/integration/test_habit_summary.py
+"""
+Сводка прогресса привычек считается в БД: серии (с учетом архива), доля выполненных
+периодов за окно и битовая строка последних дней; полная история — отдельными страницами.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from backend.control_plane.db import engine as engine_module
+from backend.control_plane.db.models import User, Habit, HabitProgress, HabitInterval
+from backend.control_plane.db.repositories.habit import PERIOD_EPOCH
+from backend.control_plane.service.habit_service import HabitService
+from backend.control_plane.utils import timeutils
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+WINDOW = 30
+
+
+@pytest_asyncio.fixture
+async def summary_user(test_session_maker):
+    today = timeutils.get_utc_now().date()
+    async with test_session_maker() as session:
+        name = f"summary-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name, timezone_offset=0)
+        session.add(user)
+        await session.flush()
+
+        start = datetime.combine(today - timedelta(days=400), datetime.min.time())
+        daily, weekly, idle = [
+            Habit(user_id=user.id, text=text_, interval=interval, start_date=start)
+            for text_, interval in [("daily", HabitInterval.DAILY), ("weekly", HabitInterval.WEEKLY),
+                                    ("idle", HabitInterval.DAILY)]
+        ]
+        session.add_all([daily, weekly, idle])
+        await session.flush()
+        # Текущая серия из трех дней, серия из пяти дней раньше и пропущенный день между ними
+        days = [0, 1, 2, 10, 11, 12, 13, 14]
+        session.add_all([
+            HabitProgress(habit_id=daily.id, record_date=today - timedelta(days=day), completed=True)
+            for day in days
+        ] + [
+            HabitProgress(habit_id=daily.id, record_date=today - timedelta(days=5), completed=False),
+            HabitProgress(habit_id=weekly.id, record_date=today - timedelta(days=7), completed=True),
+            HabitProgress(habit_id=weekly.id, record_date=today - timedelta(days=14), completed=True),
+        ])
+        await session.flush()
+        # Лучшая серия — семь дней в архиве 2001 года
+        await session.execute(text(f"""
+            INSERT INTO habit_progress_archive (id, habit_id, year, completed_days)
+            VALUES (gen_random_uuid(), :habit_id, 2001, B'{"1" * 7 + "0" * 359}')
+        """), {"habit_id": daily.id})
+        await session.commit()
+
+    with patch.object(engine_module, "async_session_maker", test_session_maker):
+        yield user, today, daily, weekly, idle, days
+
+
+async def test_summary_page(summary_user):
+    user, today, daily, weekly, idle, days = summary_user
+    service = HabitService()
+
+    page = await service.find_habit_summaries(user.id, window_days=WINDOW)
+    summaries = {summary.id: summary for summary in page.items}
+    assert page.next_cursor is None
+    assert set(summaries) == {daily.id, weekly.id, idle.id}
+
+    summary = summaries[daily.id]
+    assert (summary.current_streak, summary.best_streak) == (3, 7)
+    assert summary.completion_rate == pytest.approx(len(days) / WINDOW)
+    assert summary.recent_days == "".join(
+        "1" if WINDOW - 1 - i in days else "0" for i in range(WINDOW)
+    )
+
+    week = lambda day: (day - PERIOD_EPOCH).days // 7
+    summary = summaries[weekly.id]
+    assert (summary.current_streak, summary.best_streak) == (2, 2)
+    assert summary.completion_rate == pytest.approx(2 / (week(today) - week(today - timedelta(days=WINDOW - 1)) + 1))
+
+    summary = summaries[idle.id]
+    assert (summary.current_streak, summary.best_streak, summary.completion_rate) == (0, 0, 0)
+    assert summary.recent_days == "0" * WINDOW
+
+    first = await service.find_habit_summaries(user.id, limit=2, window_days=WINDOW)
+    second = await service.find_habit_summaries(user.id, limit=2, cursor=first.next_cursor, window_days=WINDOW)
+    assert [summary.id for summary in first.items + second.items] == list(summaries)
+
+
+async def test_progress_history_pages(summary_user):
+    user, today, daily, _, _, days = summary_user
+    service = HabitService()
+
+    records, cursor = [], None
+    while True:
+        page = await service.get_habit_progress_history(user.id, daily.id, limit=4, cursor=cursor)
+        records.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    # Отметки и дни из архива, от новых к старым
+    assert len(records) == len(days) + 1 + 7
+    assert [record.record_date for record in records] == sorted((record.record_date for record in records),
+                                                                reverse=True)
+    assert [record.completed for record in records].count(False) == 1
+    assert records[-1].record_date == datetime(2001, 1, 1).date()
+
+    stranger = uuid4()
+    with pytest.raises(HTTPException) as error:
+        await service.get_habit_progress_history(stranger, daily.id)
+    assert error.value.status_code == 404
@@ -0,0 +1,124 @@
+# tests/integration/test_pagination.py
+"""
+Keyset-пагинация списков: страницы по (time, id) без пропусков и повторов,
+фильтры по дням пользователя, тегу и статусу выполняются в БД.
+"""
+import base64
+import json
+from datetime import datetime, date, timedelta, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+from backend.control_plane.db import engine as engine_module
+from backend.control_plane.db.models import User, Reminder, ReminderStatus, Tag, Habit, HabitProgress, HabitInterval
+from backend.control_plane.service.habit_service import HabitService
+from backend.control_plane.service.reminder_service import RemindersService
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+# Полдень первого дня в UTC+3
+START = datetime(2026, 5, 1, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def paged_user(test_session_maker):
+    async with test_session_maker() as session:
+        name = f"pages-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name, timezone_offset=180)
+        session.add(user)
+        await session.flush()
+
+        tag = Tag(user_id=user.id, name="cats", emoji="🐈")
+        # По два напоминания на одно время: порядок внутри времени задает id
+        reminders = [
+            Reminder(user_id=user.id, text=f"day {i // 2}", time=START + timedelta(days=i // 2))
+            for i in range(10)
+        ]
+        reminders[3]._tags = [tag]
+        reminders[4].status = ReminderStatus.COMPLETED
+        reminders[5].removed = True
+        habits = [
+            Habit(user_id=user.id, text=f"habit {i}", start_date=datetime(2025, 1, 1),
+                  interval=HabitInterval.WEEKLY if i == 2 else HabitInterval.DAILY)
+            for i in range(3)
+        ]
+        session.add_all([tag, *reminders, *habits])
+        await session.flush()
+        today = date.today()
+        session.add_all([
+            HabitProgress(habit_id=habits[0].id, record_date=today - timedelta(days=2 * 365), completed=True),
+            HabitProgress(habit_id=habits[0].id, record_date=today - timedelta(days=1), completed=True),
+        ])
+        await session.commit()
+
+    with patch.object(engine_module, "async_session_maker", test_session_maker):
+        yield user, tag, reminders, habits
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+async def test_reminder_pages(paged_user):
+    user, tag, reminders, _ = paged_user
+    service = RemindersService()
+
+    seen, cursor = [], None
+    while True:
+        page = await service.reminders_get_active(user.id, limit=3, cursor=cursor)
+        seen.extend(reminder.id for reminder in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    expected = sorted(
+        (reminder for i, reminder in enumerate(reminders) if i not in (4, 5)),
+        key=lambda reminder: (reminder.time, reminder.id),
+    )
+    assert seen == [reminder.id for reminder in expected]
+
+    # Поврежденный курсор, id не строкой и курсор без id для сортировки по (time, id)
+    for cursor in ["not-a-cursor", raw_cursor([START.isoformat(), 5]), raw_cursor([5, None]),
+                   raw_cursor([START.isoformat(), None])]:
+        with pytest.raises(HTTPException) as error:
+            await service.reminders_get_active(user.id, cursor=cursor)
+        assert error.value.status_code == 400
+
+
+async def test_reminder_filters(paged_user):
+    user, tag, reminders, _ = paged_user
+    service = RemindersService()
+
+    # Второй день пользователя (UTC+3)
+    page = await service.reminders_get_active(user.id, date_from=date(2026, 5, 2), date_to=date(2026, 5, 2))
+    assert {reminder.id for reminder in page.items} == {reminders[2].id, reminders[3].id}
+
+    page = await service.reminders_get_active(user.id, tag_id=tag.id)
+    assert [reminder.id for reminder in page.items] == [reminders[3].id]
+
+    page = await service.reminders_get_active(user.id, status=ReminderStatus.COMPLETED)
+    assert [reminder.id for reminder in page.items] == [reminders[4].id]
+    assert page.next_cursor is None
+
+
+async def test_habit_pages(paged_user):
+    user, _, _, habits = paged_user
+    service = HabitService()
+
+    first = await service.find_habits_by_user_id(user.id, limit=2)
+    second = await service.find_habits_by_user_id(user.id, limit=2, cursor=first.next_cursor)
+    assert second.next_cursor is None
+    assert sorted(habit.id for habit in first.items + second.items) == sorted(habit.id for habit in habits)
+
+    weekly = await service.find_habits_by_user_id(user.id, interval=HabitInterval.WEEKLY)
+    assert [habit.id for habit in weekly.items] == [habits[2].id]
+
+    # Прогресс строится по отметкам окна, как и раньше
+    page = await service.find_habits_by_user_id(user.id, limit=10)
+    progress = next(habit for habit in page.items if habit.id == habits[0].id).progress
+    completed = [item["date"] for item in progress if item["completed"]]
+    assert completed == [date.today() - timedelta(days=1)]
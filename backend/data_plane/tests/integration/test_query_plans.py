@@ -0,0 +1,196 @@
+# tests/integration/test_query_plans.py
+"""
+Проверка планов горячих запросов: на заполненной БД ни один из них
+не должен делать Seq Scan по большим таблицам.
+"""
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, and_, text, tuple_, literal
+from sqlalchemy.dialects import postgresql
+
+from backend.control_plane.db.models import Reminder, Habit, HabitProgress, QuotaUsage, Tag, UserRole
+from backend.control_plane.db.models.base import ReminderStatus
+from backend.control_plane.db.repositories.achievement import UserAchievementRepository
+from backend.control_plane.db.repositories.user import UserRepository
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+USERS = 300
+REMINDERS_PER_USER = 60
+HABITS_PER_USER = 5
+PROGRESS_DAYS = 60
+QUOTA_DAYS = 60
+
+SEED_SQL = [
+    f"""
+    INSERT INTO users (id, telegram_id, username)
+    SELECT gen_random_uuid(), 'plan-' || g, 'plan-user-' || g FROM generate_series(1, {USERS}) g
+    """,
+    # Почти все напоминания уже отправлены или выполнены — как в живой базе
+    f"""
+    INSERT INTO reminders (id, user_id, text, time, status, removed, notification_sent)
+    SELECT gen_random_uuid(), u.id, 'plan reminder', now() - (g || ' hours')::interval,
+           CASE WHEN g % 3 = 0 THEN 'COMPLETED'::reminderstatus ELSE 'ACTIVE'::reminderstatus END,
+           g % 50 = 0, g > 2
+    FROM users u CROSS JOIN generate_series(1, {REMINDERS_PER_USER}) g
+    WHERE u.telegram_id LIKE 'plan-%'
+    """,
+    f"""
+    INSERT INTO habits (id, user_id, text, interval, start_date, removed)
+    SELECT gen_random_uuid(), u.id, 'plan habit ' || g, 'DAILY', now() - interval '90 days', false
+    FROM users u CROSS JOIN generate_series(1, {HABITS_PER_USER}) g
+    WHERE u.telegram_id LIKE 'plan-%'
+    """,
+    f"""
+    INSERT INTO habit_progress (id, habit_id, record_date, completed)
+    SELECT gen_random_uuid(), h.id, current_date - g, g % 2 = 0
+    FROM habits h CROSS JOIN generate_series(0, {PROGRESS_DAYS - 1}) g
+    WHERE h.text LIKE 'plan habit%'
+    """,
+    f"""
+    INSERT INTO tags (id, user_id, name, emoji)
+    SELECT gen_random_uuid(), u.id, 'plan tag ' || g, '🏷'
+    FROM users u CROSS JOIN generate_series(1, 5) g
+    WHERE u.telegram_id LIKE 'plan-%'
+    """,
+    """
+    INSERT INTO resource_types (id, name) VALUES
+        (gen_random_uuid(), 'plan_rt_a'), (gen_random_uuid(), 'plan_rt_b'), (gen_random_uuid(), 'plan_rt_c')
+    """,
+    f"""
+    INSERT INTO quota_usages (id, user_id, resource_type_id, date, usage_value)
+    SELECT gen_random_uuid(), u.id, rt.id, current_date - g, 1
+    FROM users u CROSS JOIN resource_types rt CROSS JOIN generate_series(0, {QUOTA_DAYS - 1}) g
+    WHERE u.telegram_id LIKE 'plan-%' AND rt.name LIKE 'plan_rt_%'
+    """,
+    "INSERT INTO roles (id, name) VALUES (gen_random_uuid(), 'plan_role')",
+    """
+    INSERT INTO user_roles (id, user_id, role_id, valid_from)
+    SELECT gen_random_uuid(), u.id, r.id, now() - (g || ' days')::interval
+    FROM users u CROSS JOIN roles r CROSS JOIN generate_series(1, 3) g
+    WHERE u.telegram_id LIKE 'plan-%' AND r.name = 'plan_role'
+    """,
+    "ANALYZE",
+]
+
+# Таблицы, по которым последовательное сканирование недопустимо
+LARGE_TABLES = {"reminders", "habits", "habit_progress", "tags", "quota_usages", "user_roles"}
+
+
+@pytest_asyncio.fixture
+async def seeded_session(db_session):
+    for statement in SEED_SQL:
+        await db_session.execute(text(statement))
+    yield db_session
+
+
+async def pick(session, sql: str):
+    return (await session.execute(text(sql))).scalar_one()
+
+
+def seq_scans(plan_node) -> list:
+    """Возвращает таблицы, которые план читает последовательным сканированием"""
+    found = []
+    if plan_node.get("Node Type") == "Seq Scan" and plan_node.get("Relation Name") in LARGE_TABLES:
+        found.append(plan_node["Relation Name"])
+    for child in plan_node.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def explain(session, stmt) -> dict:
+    compiled = stmt.compile(dialect=postgresql.asyncpg.dialect(), compile_kwargs={"literal_binds": True})
+    result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def test_hot_queries_use_indexes(seeded_session):
+    session = seeded_session
+    user_id = await pick(session, "SELECT id FROM users WHERE telegram_id = 'plan-1'")
+    habit_id = await pick(session, "SELECT id FROM habits WHERE text LIKE 'plan habit%' LIMIT 1")
+    resource_type_id = await pick(session, "SELECT id FROM resource_types WHERE name = 'plan_rt_a'")
+    now = datetime.now(timezone.utc)
+    today = date.today()
+
+    queries = {
+        # ReminderRepository.take_for_sending
+        "due_reminders": select(Reminder).where(
+            and_(
+                Reminder.status == ReminderStatus.ACTIVE,
+                Reminder.notification_sent == False,
+                Reminder.removed == False,
+                Reminder.time <= now,
+            )
+        ).limit(1000).with_for_update(skip_locked=True),
+        # RemindersService.reminders_get_active (страница после курсора)
+        "user_reminders": select(Reminder).where(
+            Reminder.user_id == user_id,
+            Reminder.status == ReminderStatus.ACTIVE,
+            Reminder.removed == False,
+            tuple_(Reminder.time, Reminder.id) > tuple_(
+                literal(now - timedelta(days=1), Reminder.time.type), literal(user_id, Reminder.id.type)
+            ),
+        ).order_by(Reminder.time, Reminder.id).limit(51),
+        "user_habits": select(Habit).where(Habit.user_id == user_id),
+        "user_tags": select(Tag).where(Tag.user_id == user_id),
+        # QuotaUsageRepository.get_user_daily_resource_usage
+        "daily_quota_usage": select(QuotaUsage).where(
+            QuotaUsage.user_id == user_id,
+            QuotaUsage.resource_type_id == resource_type_id,
+            QuotaUsage.date == today,
+        ),
+        # HabitRepository.get_progress_for_period
+        "habit_progress_period": select(HabitProgress).where(
+            HabitProgress.habit_id == habit_id,
+            HabitProgress.record_date >= today - timedelta(days=30),
+            HabitProgress.record_date <= today,
+        ),
+        # UserRoleRepository.get_user_active_role
+        "active_role": select(UserRole).where(
+            UserRole.user_id == user_id,
+            UserRole.valid_from <= now.replace(tzinfo=None),
+        ).order_by(UserRole.valid_from.desc()),
+        # UserRepository.get_morning_digest_page
+        "morning_digest_page": UserRepository().morning_digest_statement(
+            180, None, 500, now - timedelta(hours=12), now + timedelta(hours=12)
+        ),
+        # UserAchievementRepository.get_achievement_stats
+        "achievement_stats": UserAchievementRepository().achievement_stats_statement(
+            [user_id], ["first_name", "last_name"]
+        ),
+        # UserAchievementRepository.get_changed_user_ids: за час меняется малая доля строк,
+        # а все строки засева созданы сейчас, поэтому окно берем до засева
+        "achievement_changed_users": UserAchievementRepository().changed_users_statement(
+            now - timedelta(days=1, hours=1), now - timedelta(days=1), None, 500
+        ),
+        # BaseRepository.delete_removed_batch (очистка удаленных напоминаний)
+        "cleanup_removed_reminders": select(Reminder.id).where(
+            Reminder.removed == True,
+            Reminder.updated_at < now - timedelta(days=10),
+        ).limit(1000).with_for_update(skip_locked=True),
+        # Срок хранения: QuotaUsageRepository.rollup_usage, HabitRepository.archive_progress,
+        # UserRoleRepository.delete_expired_batch
+        "retention_quota_usages": select(QuotaUsage.id).where(
+            QuotaUsage.date < (today - timedelta(days=62)).replace(day=1)
+        ).limit(1000).with_for_update(skip_locked=True),
+        "retention_habit_progress": select(HabitProgress.id).where(
+            HabitProgress.record_date < today - timedelta(days=400)
+        ).limit(1000).with_for_update(skip_locked=True),
+        "retention_user_roles": select(UserRole.id).where(
+            UserRole.valid_to < now.replace(tzinfo=None) - timedelta(days=30)
+        ).limit(1000).with_for_update(skip_locked=True),
+    }
+
+    failures = {}
+    for name, stmt in queries.items():
+        scanned = seq_scans(await explain(session, stmt))
+        if scanned:
+            failures[name] = scanned
+
+    assert not failures, f"Seq Scan в горячих запросах: {failures}"
@@ -0,0 +1,175 @@
+# tests/integration/test_quota_usage.py
+"""
+Проверка квот одним запросом: параллельные запросы не превышают лимит,
+на каждую проверку приходится одно обращение к БД, а резерв по нескольким
+квотам списывается целиком или не списывается вовсе.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+
+from backend.control_plane.ai_clients.prompts import RequestType
+from backend.control_plane.db.models import User
+from backend.control_plane.db.repositories import quota as quota_module
+from backend.control_plane.db.repositories.quota import QuotaUsageRepository, QuotaDefinitionCache
+from backend.control_plane.db.types.sync import sync_roles_and_quotas
+from backend.control_plane.exceptions.quota import QuotaExceededException
+from backend.control_plane.service.quota_service import QuotaService
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+
+@pytest_asyncio.fixture
+async def quota_repo(test_session_maker):
+    @asynccontextmanager
+    async def session_factory(detached=False):
+        async with test_session_maker() as session:
+            yield session
+
+    with patch.object(quota_module, "get_async_session", session_factory):
+        async with test_session_maker() as session:
+            await sync_roles_and_quotas(session)
+        repo = QuotaUsageRepository()
+        repo.definitions = QuotaDefinitionCache(ttl=60)
+        yield repo
+
+
+@pytest_asyncio.fixture
+async def quota_user(test_session_maker):
+    async with test_session_maker() as session:
+        name = f"quota-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name)
+        session.add(user)
+        await session.commit()
+        return user
+
+
+async def test_concurrent_increments_respect_limit(quota_repo, quota_user, test_db_engine):
+    await quota_repo.definitions.get()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(test_db_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        # У базовой роли не больше 3 активных привычек
+        results = await asyncio.gather(*(
+            quota_repo.check_and_increment_resource_usage(quota_user.id, "active_habits_count", 1)
+            for _ in range(10)
+        ))
+    finally:
+        event.remove(test_db_engine.sync_engine, "before_cursor_execute", listener)
+
+    assert sum(results) == 3
+    assert len(statements) == 10
+    assert await quota_repo.get_current_resource_usage(quota_user.id, "active_habits_count") == 3.0
+
+
+async def test_monthly_usage_is_accumulated_per_month(quota_repo, quota_user, test_session_maker):
+    name = "ai_predict_reminder_time_monthly"
+    # Запрос больше лимита не создает строку использования
+    assert not await quota_repo.check_and_increment_resource_usage(quota_user.id, name, 100)
+    assert await quota_repo.check_and_increment_resource_usage(quota_user.id, name, 1.5)
+    assert await quota_repo.check_and_increment_resource_usage(quota_user.id, name, 1.5)
+    assert not await quota_repo.check_and_increment_resource_usage(quota_user.id, name, 0.5)
+
+    async with test_session_maker() as session:
+        rows = (await session.execute(
+            text("SELECT date, usage_value FROM quota_usages WHERE user_id = :user_id"),
+            {"user_id": quota_user.id},
+        )).all()
+    assert len(rows) == 1
+    assert rows[0].date.day == 1
+    assert float(rows[0].usage_value) == 3.0
+
+
+async def test_premium_role_limit_is_resolved_in_query(quota_repo, quota_user, test_session_maker):
+    async with test_session_maker() as session:
+        await session.execute(text(
+            "INSERT INTO user_roles (id, user_id, role_id, valid_from) "
+            "SELECT gen_random_uuid(), :user_id, id, now() - interval '1 day' FROM roles WHERE name = 'premium'"
+        ), {"user_id": quota_user.id})
+        await session.commit()
+
+    results = [
+        await quota_repo.check_and_increment_resource_usage(quota_user.id, "active_habits_count", 1)
+        for _ in range(5)
+    ]
+    assert all(results)
+
+
+async def usage_by_type(session_maker, user_id) -> dict:
+    async with session_maker() as session:
+        rows = (await session.execute(text(
+            "SELECT r.name, q.usage_value FROM quota_usages q "
+            "JOIN resource_types r ON r.id = q.resource_type_id WHERE q.user_id = :user_id"
+        ), {"user_id": user_id})).all()
+    return {name: float(value) for name, value in rows}
+
+
+async def test_reserve_is_all_or_nothing(quota_repo, quota_user, test_session_maker):
+    service = QuotaService()
+    service.repo = quota_repo
+    # Месячная квота почти исчерпана: дневная не должна списаться
+    await quota_repo.update_resource_usage(quota_user.id, "ai_predict_reminder_time_monthly", 2.995)
+
+    with pytest.raises(QuotaExceededException) as exc_info:
+        await service.reserve(quota_user.id, RequestType.PREDICT_REMINDER_TIME, 0.01)
+
+    assert exc_info.value.quota_type == "ai_predict_reminder_time_monthly"
+    usage = await usage_by_type(test_session_maker, quota_user.id)
+    assert usage == {"ai_predict_reminder_time_monthly": 2.995}
+
+
+async def test_reservation_commit_and_rollback_adjust_usage(quota_repo, quota_user, test_session_maker):
+    service = QuotaService()
+    service.repo = quota_repo
+
+    reservation = await service.reserve(quota_user.id, RequestType.PREDICT_REMINDER_TIME, 0.01)
+    await reservation.commit(0.004)
+    assert await usage_by_type(test_session_maker, quota_user.id) == {
+        "ai_predict_reminder_time_daily": 0.004,
+        "ai_predict_reminder_time_monthly": 0.004,
+    }
+
+    with pytest.raises(RuntimeError):
+        async with await service.reserve(quota_user.id, RequestType.PREDICT_REMINDER_TIME, 0.006):
+            raise RuntimeError("AI request failed")
+    assert await usage_by_type(test_session_maker, quota_user.id) == {
+        "ai_predict_reminder_time_daily": 0.004,
+        "ai_predict_reminder_time_monthly": 0.004,
+    }
+
+
+async def test_definitions_reload_when_changed_elsewhere(quota_repo, test_session_maker):
+    clock = [0.0]
+    cache = QuotaDefinitionCache(ttl=300, check_interval=5, timer=lambda: clock[0])
+    definitions = await cache.get()
+    resource_type_id = definitions.resource_type_ids["active_habits_count"]
+    role_id = definitions.default_role_id
+
+    # До интервала сверки БД не читается, неизмененная версия не перечитывает справочник
+    clock[0] = 1
+    await cache.get()
+    clock[0] = 6
+    await cache.get()
+    assert cache.loads == 1
+
+    # Синхронизация квот из другого процесса
+    async with test_session_maker() as session:
+        await session.execute(text(
+            "UPDATE quotas SET max_value = 42, updated_at = clock_timestamp() "
+            "WHERE resource_type_id = :resource_type_id AND role_id = :role_id"
+        ), {"resource_type_id": resource_type_id, "role_id": role_id})
+        await session.commit()
+
+    clock[0] = 12
+    definitions = await cache.get()
+    assert cache.loads == 2
+    assert definitions.limits_for(resource_type_id)[role_id] == 42
+
+    async with test_session_maker() as session:
+        await sync_roles_and_quotas(session)
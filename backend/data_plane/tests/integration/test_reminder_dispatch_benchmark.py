@@ -0,0 +1,173 @@
+# tests/integration/test_reminder_dispatch_benchmark.py
+"""
+Бенчмарк режимов отправки напоминаний: дочерний воркфлоу на каждое
+напоминание против пакетной активности.
+
+Сравнивает количество событий в истории Temporal и время доставки пачки
+напоминаний. Активности подменяются заглушками с теми же именами, поэтому
+измеряются только накладные расходы оркестрации.
+
+Запуск:
+    pytest data_plane/tests/integration/test_reminder_dispatch_benchmark.py -s -m integration
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import pytest
+from temporalio import activity
+from temporalio.worker import Worker
+
+from backend.data_plane.workflows.reminders import (
+    CheckRemindersWorkflow,
+    SendReminderNotificationWorkflow,
+    DISPATCH_MODE_CHILD,
+    DISPATCH_MODE_BATCH,
+)
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+REMINDERS_COUNT = 200
+BATCH_SIZE = 50
+TASK_QUEUE = "benchmark-reminders-dispatch-queue"
+
+
+class DispatchBench:
+    """Заглушки активностей с подсчетом доставленных напоминаний"""
+
+    def __init__(self, reminders: List[Dict[str, Any]]):
+        self.reminders = reminders
+        self.taken = False
+        self.sent = set()
+        self.all_sent = asyncio.Event()
+
+    def _mark(self, reminder_id: str):
+        self.sent.add(reminder_id)
+        if len(self.sent) == len(self.reminders):
+            self.all_sent.set()
+
+    def activities(self):
+        @activity.defn(name="check_active_reminders")
+        async def check_active_reminders() -> List[Dict[str, Any]]:
+            # Отдаем напоминания только один раз, как take_for_sending
+            if self.taken:
+                return []
+            self.taken = True
+            return self.reminders
+
+        @activity.defn(name="get_next_reminder_time")
+        async def get_next_reminder_time() -> Optional[str]:
+            return None
+
+        @activity.defn(name="send_telegram_notification")
+        async def send_telegram_notification(user_id: str, reminder_id: str, text: str, time: str):
+            self._mark(reminder_id)
+
+        @activity.defn(name="send_telegram_notifications_batch")
+        async def send_telegram_notifications_batch(reminders: List[Dict[str, Any]]) -> List[bool]:
+            for reminder in reminders:
+                self._mark(reminder["id"])
+            return [True] * len(reminders)
+
+        @activity.defn(name="abort_sent")
+        async def abort_sent(reminder_id: str):
+            pass
+
+        @activity.defn(name="abort_sent_batch")
+        async def abort_sent_batch(reminder_ids: List[str]) -> int:
+            return len(reminder_ids)
+
+        return [
+            check_active_reminders,
+            get_next_reminder_time,
+            send_telegram_notification,
+            send_telegram_notifications_batch,
+            abort_sent,
+            abort_sent_batch,
+        ]
+
+
+async def count_history_events(client, workflow_id: str, run_id: str = None) -> int:
+    handle = client.get_workflow_handle(workflow_id, run_id=run_id)
+    count = 0
+    async for _ in handle.fetch_history_events():
+        count += 1
+    return count
+
+
+async def wait_children_closed(client, workflow_ids: List[str], timeout: float = 60.0):
+    """Ждет завершения дочерних воркфлоу, чтобы их история была полной"""
+    deadline = time.monotonic() + timeout
+    for workflow_id in workflow_ids:
+        handle = client.get_workflow_handle(workflow_id)
+        await asyncio.wait_for(handle.result(), timeout=max(0.1, deadline - time.monotonic()))
+
+
+async def run_dispatch(client, dispatch_mode: str) -> Dict[str, Any]:
+    reminders = [
+        {
+            "id": str(uuid4()),
+            "user_id": str(uuid4()),
+            "text": f"Benchmark reminder {i}",
+            "time": datetime.now(timezone.utc).isoformat(),
+        }
+        for i in range(REMINDERS_COUNT)
+    ]
+    bench = DispatchBench(reminders)
+    workflow_id = f"benchmark-check-reminders-{dispatch_mode}-{uuid4()}"
+
+    async with Worker(
+        client,
+        task_queue=TASK_QUEUE,
+        workflows=[CheckRemindersWorkflow, SendReminderNotificationWorkflow],
+        activities=bench.activities(),
+        max_concurrent_activities=BATCH_SIZE,
+    ):
+        started = time.monotonic()
+        handle = await client.start_workflow(
+            CheckRemindersWorkflow.run,
+            args=[0, dispatch_mode, BATCH_SIZE],
+            id=workflow_id,
+            task_queue=TASK_QUEUE,
+        )
+        await asyncio.wait_for(bench.all_sent.wait(), timeout=120)
+        latency = time.monotonic() - started
+
+        children_events = 0
+        if dispatch_mode == DISPATCH_MODE_CHILD:
+            child_ids = [f"send_reminder_{reminder['id']}" for reminder in reminders]
+            await wait_children_closed(client, child_ids)
+            for child_id in child_ids:
+                children_events += await count_history_events(client, child_id)
+
+        parent_events = await count_history_events(client, workflow_id, handle.first_execution_run_id)
+        await handle.terminate("benchmark finished")
+
+    return {
+        "mode": dispatch_mode,
+        "reminders": REMINDERS_COUNT,
+        "latency_s": round(latency, 3),
+        "parent_events": parent_events,
+        "children_events": children_events,
+        "total_events": parent_events + children_events,
+    }
+
+
+async def test_reminder_dispatch_benchmark(temporal_client):
+    """
+    Бенчмарк: пакетный режим должен порождать заметно меньше событий
+    в истории Temporal, чем дочерний воркфлоу на каждое напоминание.
+    """
+    child = await run_dispatch(temporal_client, DISPATCH_MODE_CHILD)
+    batch = await run_dispatch(temporal_client, DISPATCH_MODE_BATCH)
+
+    for result in (child, batch):
+        print(
+            f"\n[{result['mode']:>5}] reminders={result['reminders']} "
+            f"latency={result['latency_s']}s events={result['total_events']} "
+            f"(parent={result['parent_events']}, children={result['children_events']})"
+        )
+
+    assert batch["total_events"] < child["total_events"]
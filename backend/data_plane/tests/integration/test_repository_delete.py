@@ -0,0 +1,71 @@
+# tests/integration/test_repository_delete.py
+"""
+Удаление через репозиторий: один DELETE ... RETURNING на любой список id,
+записи других пользователей не затрагиваются.
+"""
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select
+
+from backend.control_plane.db.models import User, Tag
+from backend.control_plane.service.tag_service import TagService
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+
+@pytest_asyncio.fixture
+async def tag_owners(test_session_maker):
+    @asynccontextmanager
+    async def session_factory():
+        async with test_session_maker() as session:
+            yield session
+
+    async with test_session_maker() as session:
+        users = []
+        for _ in range(2):
+            name = f"delete-{uuid4().hex[:8]}"
+            user = User(telegram_id=name, username=name)
+            session.add(user)
+            users.append(user)
+        await session.flush()
+        tags = {
+            user.id: [Tag(user_id=user.id, name=f"tag {i}", emoji="t") for i in range(3)]
+            for user in users
+        }
+        session.add_all([tag for user_tags in tags.values() for tag in user_tags])
+        await session.commit()
+
+    with patch("backend.control_plane.db.repositories.base.get_async_session", session_factory):
+        yield users, tags
+
+
+async def test_delete_scoped_to_user(tag_owners, test_db_engine, test_session_maker):
+    (owner, stranger), tags = tag_owners
+    service = TagService()
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(test_db_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        # Чужой тег не удаляется
+        assert not await service.delete_tag(owner.id, tags[stranger.id][0].id)
+        assert await service.delete_tag(owner.id, tags[owner.id][0].id)
+        assert not await service.delete_tag(owner.id, tags[owner.id][0].id)
+
+        statements.clear()
+        ids = [tag.id for tag in tags[owner.id][1:]] + [tags[stranger.id][1].id, uuid4()]
+        deleted = await service.repo.delete_user_models(owner.id, ids)
+    finally:
+        event.remove(test_db_engine.sync_engine, "before_cursor_execute", listener)
+
+    assert sorted(deleted) == sorted(tag.id for tag in tags[owner.id][1:])
+    assert [statement.split()[0] for statement in statements] == ["DELETE"]
+
+    async with test_session_maker() as session:
+        left = (await session.execute(
+            select(Tag.user_id).where(Tag.user_id.in_([owner.id, stranger.id]))
+        )).scalars().all()
+    assert left == [stranger.id] * 3
@@ -0,0 +1,155 @@
+# tests/integration/test_retention.py
+"""
+Срок хранения: дневной расход квот сворачивается в месячные суммы, отметки привычек
+переносятся в годовой битмап, истекшие роли удаляются — пачками, без потери данных.
+"""
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, text
+
+from backend.control_plane.db.models import User, UserRole, QuotaUsageMonthly
+from backend.control_plane.db.repositories import habit as habit_module
+from backend.control_plane.db.repositories import quota as quota_module
+from backend.control_plane.db.repositories import role as role_module
+from backend.control_plane.db.repositories.habit import HabitRepository
+from backend.control_plane.db.repositories.quota import QuotaUsageRepository
+from backend.control_plane.db.repositories.role import UserRoleRepository
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+# Даты заведомо старше любых данных других тестов
+START = date(1999, 1, 1)
+
+
+@pytest_asyncio.fixture
+async def retention(test_session_maker):
+    @asynccontextmanager
+    async def session_factory():
+        async with test_session_maker() as session:
+            yield session
+
+    async with test_session_maker() as session:
+        name = f"retention-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name)
+        session.add(user)
+        await session.commit()
+
+        ids = {"user": user.id}
+        ids["habit"] = (await session.execute(text("""
+            INSERT INTO habits (id, user_id, text, interval, start_date, removed)
+            VALUES (gen_random_uuid(), :user_id, 'retention', 'DAILY', now(), false) RETURNING id
+        """), {"user_id": user.id})).scalar_one()
+        ids["resource_type"] = (await session.execute(text("""
+            INSERT INTO resource_types (id, name) VALUES (gen_random_uuid(), :name) RETURNING id
+        """), {"name": name})).scalar_one()
+        ids["role"] = (await session.execute(text("""
+            INSERT INTO roles (id, name) VALUES (gen_random_uuid(), :name) RETURNING id
+        """), {"name": name})).scalar_one()
+        await session.commit()
+
+    with patch.object(habit_module, "get_async_session", session_factory), \
+            patch.object(quota_module, "get_async_session", session_factory), \
+            patch.object(role_module, "get_async_session", session_factory):
+        yield ids
+
+
+async def run_batches(batch, cutoff, limit: int):
+    batches = []
+    while not batches or batches[-1] == limit:
+        batches.append(await batch(cutoff, limit))
+    return batches
+
+
+async def test_quota_usage_rollup(retention, test_session_maker):
+    params = {"user_id": retention["user"], "resource_type_id": retention["resource_type"], "start": START}
+    # Январь и февраль 1999 года по 1.5 в день
+    insert_usage = text("""
+        INSERT INTO quota_usages (id, user_id, resource_type_id, date, usage_value)
+        SELECT gen_random_uuid(), :user_id, :resource_type_id, CAST(:start AS date) + g, 1.5
+        FROM generate_series(0, 58) g
+    """)
+    async with test_session_maker() as session:
+        await session.execute(insert_usage, params)
+        await session.commit()
+
+    repo = QuotaUsageRepository()
+    assert await run_batches(repo.rollup_usage, date(1999, 3, 1), 25) == [25, 25, 9]
+
+    # Повторная свертка того же месяца прибавляется к уже свернутой сумме
+    async with test_session_maker() as session:
+        await session.execute(text("""
+            INSERT INTO quota_usages (id, user_id, resource_type_id, date, usage_value)
+            VALUES (gen_random_uuid(), :user_id, :resource_type_id, :start, 2)
+        """), params)
+        await session.commit()
+    assert await repo.rollup_usage(date(1999, 3, 1), 25) == 1
+
+    async with test_session_maker() as session:
+        monthly = (await session.execute(
+            select(QuotaUsageMonthly.month, QuotaUsageMonthly.usage_value)
+            .where(QuotaUsageMonthly.user_id == retention["user"])
+            .order_by(QuotaUsageMonthly.month)
+        )).all()
+        assert [(month, float(value)) for month, value in monthly] == [
+            (date(1999, 1, 1), 31 * 1.5 + 2),
+            (date(1999, 2, 1), 28 * 1.5),
+        ]
+        # Общий расход учитывает и свернутые месяцы
+        usage = await repo.get_user_resource_usage(session, retention["user"], retention["resource_type"])
+        assert usage == 59 * 1.5 + 2
+
+
+async def test_habit_progress_archive(retention, test_session_maker):
+    # Каждая третья отметка выполнена, плюс 366-й день високосного 2000 года
+    async with test_session_maker() as session:
+        await session.execute(text("""
+            INSERT INTO habit_progress (id, habit_id, record_date, completed)
+            SELECT gen_random_uuid(), :habit_id, CAST(:start AS date) + g, g % 3 = 0 OR g = 730
+            FROM generate_series(0, 730) g
+        """), {"habit_id": retention["habit"], "start": START})
+        await session.commit()
+
+    repo = HabitRepository()
+    # Пачки режут годы на части: битмапы одного года объединяются
+    assert await run_batches(repo.archive_progress, date(2001, 1, 1), 200) == [200, 200, 200, 131]
+
+    expected = [START + timedelta(days=g) for g in range(0, 731, 3)] + [date(2000, 12, 31)]
+    archived = await repo.get_archived_completions(retention["habit"], START, date(2000, 12, 31))
+    assert archived == expected
+    assert date(2000, 12, 31) in archived
+    assert await repo.get_archived_completions(retention["habit"], date(2000, 3, 1), date(2000, 3, 10)) == [
+        day for day in expected if date(2000, 3, 1) <= day <= date(2000, 3, 10)
+    ]
+
+    async with test_session_maker() as session:
+        left = (await session.execute(
+            text("SELECT count(*) FROM habit_progress WHERE habit_id = :habit_id"), {"habit_id": retention["habit"]}
+        )).scalar_one()
+        assert left == 0
+
+
+async def test_expired_roles_pruned(retention, test_session_maker):
+    now = datetime.utcnow()
+    async with test_session_maker() as session:
+        session.add_all([
+            UserRole(user_id=retention["user"], role_id=retention["role"],
+                     valid_from=now - timedelta(days=90), valid_to=now - timedelta(days=60)),
+            UserRole(user_id=retention["user"], role_id=retention["role"],
+                     valid_from=now - timedelta(days=10), valid_to=now - timedelta(days=5)),
+            UserRole(user_id=retention["user"], role_id=retention["role"], valid_from=now),
+        ])
+        await session.commit()
+
+    repo = UserRoleRepository()
+    assert await run_batches(repo.delete_expired_batch, now - timedelta(days=30), 10) == [1]
+
+    async with test_session_maker() as session:
+        left = (await session.execute(
+            text("SELECT count(*) FROM user_roles WHERE user_id = :user_id"), {"user_id": retention["user"]}
+        )).scalar_one()
+        assert left == 2
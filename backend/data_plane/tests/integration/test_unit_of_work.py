@@ -0,0 +1,240 @@
+# tests/integration/test_unit_of_work.py
+"""
+Единица работы: все репозитории запроса используют одно подключение и одну
+транзакцию, ошибка откатывает все изменения запроса, а сбой одного репозитория —
+только его часть. На время внешних вызовов подключение возвращается в пул,
+а сигналы воркфлоу отправляются только после фиксации.
+"""
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import patch, AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, HTTPException
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, select, func, text
+
+from backend.control_plane.db import engine as engine_module
+from backend.control_plane.db.engine import get_async_session, unit_of_work, release_connection, run_after_commit
+from backend.control_plane.db.models import User, Tag
+from backend.control_plane.db.repositories.tag import TagRepository
+from backend.control_plane.middlewares.unit_of_work import UnitOfWorkMiddleware
+from backend.control_plane.service.reminder_scheduler_service import ReminderSchedulerService
+from backend.control_plane.service.reminder_service import RemindersService
+from backend.control_plane.schemas.user import UserSchema
+from backend.control_plane.service.user_service import UserService
+
+pytestmark = [pytest.mark.integration, pytest.mark.asyncio]
+
+
+@pytest_asyncio.fixture
+async def uow_user(test_db_engine, test_session_maker):
+    async with test_session_maker() as session:
+        name = f"uow-{uuid4().hex[:8]}"
+        user = User(telegram_id=name, username=name)
+        session.add(user)
+        await session.commit()
+
+    checkouts = []
+    listener = lambda *args: checkouts.append(args)
+    event.listen(test_db_engine.sync_engine.pool, "checkout", listener)
+    with patch.object(engine_module, "engine", test_db_engine), \
+            patch.object(engine_module, "async_session_maker", test_session_maker):
+        yield user, checkouts
+    event.remove(test_db_engine.sync_engine.pool, "checkout", listener)
+
+
+async def count_tags(test_session_maker, user_id) -> int:
+    async with test_session_maker() as session:
+        return (await session.execute(
+            select(func.count()).select_from(Tag).where(Tag.user_id == user_id)
+        )).scalar_one()
+
+
+async def backend_pid() -> int:
+    async with get_async_session() as session:
+        return (await session.execute(text("SELECT pg_backend_pid()"))).scalar_one()
+
+
+async def test_repositories_share_connection_and_commit_once(uow_user, test_session_maker):
+    user, checkouts = uow_user
+    repo = TagRepository()
+
+    async with unit_of_work():
+        first = await repo.create(user.id, name="first", emoji="1")
+        second = await repo.create(user.id, name="second", emoji="2")
+        assert await repo.delete_model(user.id, second.id)
+        # Фиксация каждого репозитория — только точка сохранения
+        assert await count_tags(test_session_maker, user.id) == 0
+        checkouts.clear()
+        assert await backend_pid() == await backend_pid()
+        assert not checkouts
+
+    assert await count_tags(test_session_maker, user.id) == 1
+    assert await repo.get_by_model_id(first.id) is not None
+
+
+async def test_error_rolls_back_whole_unit(uow_user, test_session_maker):
+    user, _ = uow_user
+    repo = TagRepository()
+
+    with pytest.raises(RuntimeError):
+        async with unit_of_work():
+            await repo.create(user.id, name="lost", emoji="x")
+            raise RuntimeError("request failed")
+
+    assert await count_tags(test_session_maker, user.id) == 0
+
+
+async def test_repository_rollback_undoes_only_its_part(uow_user, test_session_maker):
+    user, _ = uow_user
+    repo = TagRepository()
+
+    async with unit_of_work():
+        tag = await repo.create(user.id, name="kept", emoji="k")
+        # Несуществующее напоминание: ошибка внешнего ключа откатывает только эту вставку
+        assert not await repo.add_tag_to_reminder(tag.id, uuid4())
+        await repo.create(user.id, name="after", emoji="a")
+
+    assert await count_tags(test_session_maker, user.id) == 2
+
+
+async def test_concurrent_tasks_and_detached_sessions_are_independent(uow_user, test_session_maker):
+    user, _ = uow_user
+
+    async def create_detached():
+        async with get_async_session(detached=True) as session:
+            session.add(Tag(user_id=user.id, name="detached", emoji="d"))
+            await session.commit()
+
+    with pytest.raises(RuntimeError):
+        async with unit_of_work():
+            pid = await backend_pid()
+            # Параллельные задачи не делят одно подключение
+            pids = await asyncio.gather(backend_pid(), backend_pid())
+            assert pid not in pids
+            await create_detached()
+            raise RuntimeError("request failed")
+
+    assert await count_tags(test_session_maker, user.id) == 1
+
+
+async def test_http_request_is_one_unit(uow_user, test_session_maker):
+    user, _ = uow_user
+    repo = TagRepository()
+    app = FastAPI()
+    app.add_middleware(UnitOfWorkMiddleware)
+
+    @app.post("/tags/{name}")
+    async def create_tag(name: str, fail: bool = False):
+        await repo.create(user.id, name=name, emoji="t")
+        await repo.create(user.id, name=f"{name}-copy", emoji="t")
+        if fail:
+            raise HTTPException(400, "rejected")
+        return {"ok": True}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.post("/tags/ok")).status_code == 200
+        assert await count_tags(test_session_maker, user.id) == 2
+
+        assert (await client.post("/tags/rejected", params={"fail": True})).status_code == 400
+        assert await count_tags(test_session_maker, user.id) == 2
+
+
+async def test_connection_released_for_external_call(uow_user, test_db_engine, test_session_maker):
+    user, _ = uow_user
+    repo = TagRepository()
+
+    async with unit_of_work():
+        await repo.create(user.id, name="before", emoji="b")
+        assert test_db_engine.pool.checkedout() == 1
+        await release_connection()
+        # Сделанное до внешнего вызова зафиксировано, подключение в пуле
+        assert test_db_engine.pool.checkedout() == 0
+        assert await count_tags(test_session_maker, user.id) == 1
+        await repo.create(user.id, name="after", emoji="a")
+
+    assert await count_tags(test_session_maker, user.id) == 2
+
+
+async def test_ai_prediction_does_not_hold_connection(uow_user, test_db_engine):
+    user, _ = uow_user
+    service = RemindersService()
+    predicted = datetime(2026, 10, 19, 9, 0, tzinfo=timezone.utc)
+    checked_out = []
+
+    async def predict_reminder_time(timezone_offset, text):
+        checked_out.append(test_db_engine.pool.checkedout())
+        return predicted, 10
+
+    reservation = MagicMock()
+    reservation.__aenter__ = AsyncMock(return_value=reservation)
+    reservation.__aexit__ = AsyncMock(return_value=False)
+    reservation.commit = AsyncMock()
+    with patch.object(service, "quota_service", MagicMock(
+                reserve_ai_llm_request=AsyncMock(return_value=reservation),
+                calc_ai_llm_cost=AsyncMock(return_value=1.0),
+            )), \
+            patch.object(service, "ai_provider", MagicMock(predict_reminder_time=predict_reminder_time)):
+        async with unit_of_work():
+            reminder = await service.create_with_ai_predicted_time(user.id, "позвонить маме")
+
+    assert reminder.time == predicted
+    assert checked_out == [0]
+
+
+async def test_after_commit_callbacks(uow_user, test_db_engine, test_session_maker):
+    user, _ = uow_user
+    repo = TagRepository()
+    seen = []
+
+    async def callback():
+        # Данные уже зафиксированы, подключение единицы работы возвращено в пул
+        seen.append((await count_tags(test_session_maker, user.id), test_db_engine.pool.checkedout()))
+
+    async with unit_of_work():
+        await repo.create(user.id, name="committed", emoji="c")
+        await run_after_commit(callback)
+        assert seen == []
+    assert seen == [(1, 0)]
+
+    with pytest.raises(RuntimeError):
+        async with unit_of_work():
+            await repo.create(user.id, name="lost", emoji="x")
+            await run_after_commit(callback)
+            raise RuntimeError("request failed")
+    assert seen == [(1, 0)]
+
+
+async def test_reminders_signal_sent_after_commit(uow_user, test_session_maker):
+    user, _ = uow_user
+    repo = TagRepository()
+    scheduler = ReminderSchedulerService()
+    signalled = []
+
+    async def signal(reminder_time):
+        signalled.append(await count_tags(test_session_maker, user.id))
+
+    with patch.object(scheduler, "_signal", signal):
+        async with unit_of_work():
+            await repo.create(user.id, name="changed", emoji="c")
+            await scheduler.notify_changed(None)
+            assert signalled == []
+
+    assert signalled == [1]
+
+
+async def test_user_cache_invalidated_after_commit(uow_user):
+    user, _ = uow_user
+    service = UserService()
+    await service.get_cached_user(user.id)
+
+    renamed = f"{user.username}-renamed"
+    async with unit_of_work():
+        await service.update_user(UserSchema(id=user.id, username=renamed))
+        # До фиксации в кеше остается зафиксированная строка
+        assert (await service.get_cached_user(user.id)).username == user.username
+
+    assert (await service.get_cached_user(user.id)).username == renamed
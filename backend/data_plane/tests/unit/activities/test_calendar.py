@@ -0,0 +1,174 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from backend.data_plane.activities import calendar as calendar_activities
+from backend.data_plane.services.calendar_service import CalendarChanges
+
+# Применяем маркеры
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+RESULTS = {"created": 1, "updated": 0, "deleted": 0, "unchanged": 2, "errors": 0}
+
+
+def integration():
+    return SimpleNamespace(id=uuid.uuid4(), user_id=uuid.uuid4(), caldav_url="https://caldav.example.com/",
+                           login="user", password="password", ctag=None, sync_token=None, event_etags=None)
+
+
+class TestCalendarActivities:
+    """Тесты для активностей синхронизации календаря"""
+
+    async def test_sync_page_concurrently_with_latency(self, mock_settings):
+        """Интеграции страницы синхронизируются одновременно, сбой одной не мешает остальным"""
+        mock_settings.CALENDAR_SYNC_PAGE_SIZE = 3
+        mock_settings.CALENDAR_SYNC_CONCURRENCY = 3
+        integrations = [integration() for _ in range(3)]
+        failing = str(integrations[1].id)
+        running, peak = 0, 0
+
+        async def fetch(user_data):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if user_data["integration_id"] == failing:
+                raise ConnectionError("CalDAV недоступен")
+            return CalendarChanges(ctag="1", sync_token="t1", full=True, etags={"/a.ics": '"1"'},
+                                   events={"/a.ics": [{"id": "event"}]})
+
+        with patch.object(calendar_activities, "get_settings", return_value=mock_settings), \
+                patch.object(calendar_activities.CalendarIntegrationRepository, "get_due_integrations",
+                             AsyncMock(return_value=integrations)), \
+                patch.object(calendar_activities, "fetch_calendar_changes", side_effect=fetch), \
+                patch.object(calendar_activities, "sync_calendar_events", AsyncMock(return_value=RESULTS)) as sync, \
+                patch.object(calendar_activities, "handle_sync_errors", AsyncMock()) as handle_errors:
+            result = await calendar_activities.sync_calendar_integrations(None)
+
+        assert peak == 3
+        assert sync.await_count == 2
+        assert sync.await_args.kwargs["deleted_event_ids"] is None
+        assert sync.await_args.kwargs["sync_state"]["event_etags"] == {"/a.ics": {"etag": '"1"', "ids": ["event"]}}
+        handle_errors.assert_awaited_once()
+        assert handle_errors.await_args.args[1] == failing
+        assert result["next_cursor"] == str(integrations[-1].id)
+        assert (result["integrations"], result["synced"], result["failed"]) == (3, 2, 1)
+        assert (result["created"], result["unchanged"]) == (2, 4)
+        assert len(result["latency_ms"]["slowest"]) == 3
+        assert result["latency_ms"]["max"] >= result["latency_ms"]["p50"] >= 10
+
+    async def test_last_page(self, mock_settings):
+        mock_settings.CALENDAR_SYNC_PAGE_SIZE = 10
+        mock_settings.CALENDAR_SYNC_CONCURRENCY = 2
+
+        with patch.object(calendar_activities, "get_settings", return_value=mock_settings), \
+                patch.object(calendar_activities.CalendarIntegrationRepository, "get_due_integrations",
+                             AsyncMock(return_value=[])):
+            result = await calendar_activities.sync_calendar_integrations(str(uuid.uuid4()))
+
+        assert result["next_cursor"] is None
+        assert result["latency_ms"] == {"p50": 0, "p95": 0, "max": 0, "slowest": []}
+
+    async def test_unchanged_ctag_skips_reconcile(self, mock_settings):
+        """При неизменном ctag напоминания не сверяются, обновляется только last_sync"""
+        mock_settings.CALENDAR_SYNC_PAGE_SIZE = 10
+        mock_settings.CALENDAR_SYNC_CONCURRENCY = 2
+        unchanged = CalendarChanges(ctag="1", sync_token="t1", unchanged=True)
+
+        with patch.object(calendar_activities, "get_settings", return_value=mock_settings), \
+                patch.object(calendar_activities.CalendarIntegrationRepository, "get_due_integrations",
+                             AsyncMock(return_value=[integration()])), \
+                patch.object(calendar_activities.CalendarIntegrationRepository, "update_model",
+                             AsyncMock()) as update_model, \
+                patch.object(calendar_activities, "fetch_calendar_changes", AsyncMock(return_value=unchanged)), \
+                patch.object(calendar_activities, "sync_calendar_events", AsyncMock()) as sync:
+            result = await calendar_activities.sync_calendar_integrations(None)
+
+        sync.assert_not_awaited()
+        assert set(update_model.await_args.kwargs) == {"model_id", "last_sync"}
+        assert (result["synced"], result["not_modified"]) == (1, 1)
+
+
+def test_apply_calendar_changes():
+    """Удаленные объекты и события, убранные из измененного объекта, попадают в удаленные ID"""
+    state = {
+        "/a.ics": {"etag": "a1", "ids": ["a"]},
+        "/b.ics": {"etag": "b1", "ids": ["b", "b-exception"]},
+        "/c.ics": {"etag": "c1", "ids": ["c"]},
+    }
+    changes = CalendarChanges(
+        ctag="2", sync_token="t2", deleted=["/c.ics", "/a.ics"],
+        etags={"/b.ics": "b2", "/d.ics": "d1"},
+        # Событие a перенесли в новый объект
+        events={"/b.ics": [{"id": "b"}], "/d.ics": [{"id": "d"}, {"id": "a"}]},
+    )
+
+    events, removed_ids, sync_state = calendar_activities.apply_calendar_changes(state, changes)
+
+    assert [event["id"] for event in events] == ["b", "d", "a"]
+    assert removed_ids == ["b-exception", "c"]
+    assert sync_state == {
+        "ctag": "2",
+        "sync_token": "t2",
+        "event_etags": {"/b.ics": {"etag": "b2", "ids": ["b"]}, "/d.ics": {"etag": "d1", "ids": ["d", "a"]}},
+    }
+    assert "/c.ics" in state
+
+
+async def test_sync_calendar_events_builds_reconcile_sets():
+    """Прошедшие события не создают напоминаний, но и не удаляются; при ошибке состояние не сохраняется"""
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    events = [
+        {"id": "past", "summary": "Было", "start": datetime.now(timezone.utc) - timedelta(days=1)},
+        {"id": "future", "summary": "Будет", "location": "Офис", "start": future.isoformat()},
+        {"id": "broken", "summary": "Сломано", "start": "не дата"},
+    ]
+    counters = {"created": 1, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    with patch.object(calendar_activities.ReminderRepository, "reconcile_calendar_events",
+                      AsyncMock(return_value=counters)) as reconcile:
+        result = await calendar_activities.sync_calendar_events(
+            str(uuid.uuid4()), str(uuid.uuid4()), events, sync_state={"ctag": "2"}
+        )
+
+    kwargs = reconcile.await_args.kwargs
+    assert [(r.calendar_event_id, r.text, r.time) for r in kwargs["events"]] == [("future", "Будет - Офис", future)]
+    assert kwargs["present_event_ids"] == ["past", "future", "broken"]
+    assert kwargs["deleted_event_ids"] is None
+    assert set(kwargs["integration_values"]) == {"last_sync"}
+    assert result == {**counters, "errors": 1}
+
+
+def test_apply_calendar_changes_expands_series():
+    """Вхождения, ушедшие из окна в прошлое, не удаляются; отмененные — удаляются"""
+    window = (datetime(2030, 1, 10, tzinfo=timezone.utc), datetime(2030, 2, 16, tzinfo=timezone.utc))
+    state = {"/s.ics": {"etag": "1", "ids": ["s#20300109T090000Z", "s#20300110T090000Z", "s#20300111T090000Z"],
+                        "expanded_until": "2030-02-15T00:00:00+00:00"}}
+    changes = CalendarChanges(ctag="1", sync_token="t", etags={"/s.ics": "1"}, recurring=["/s.ics"], window=window,
+                              events={"/s.ics": [{"id": "s#20300110T090000Z"}, {"id": "s#20300216T090000Z"}]})
+
+    _, removed_ids, sync_state = calendar_activities.apply_calendar_changes(state, changes)
+
+    assert removed_ids == ["s#20300111T090000Z"]
+    assert sync_state["event_etags"]["/s.ics"]["expanded_until"] == window[1].isoformat()
+
+
+async def test_fetch_refreshes_stale_series():
+    stale = datetime.now(timezone.utc).isoformat()
+    fresh = (datetime.now(timezone.utc) + timedelta(days=365)).isoformat()
+    user_data = {"user_id": "u", "caldav_url": "https://caldav.example.com/", "login": "user", "password": "p",
+                 "ctag": "1", "sync_token": "t",
+                 "event_etags": {"/stale.ics": {"etag": "a", "ids": [], "expanded_until": stale},
+                                 "/fresh.ics": {"etag": "b", "ids": [], "expanded_until": fresh},
+                                 "/single.ics": {"etag": "c", "ids": ["single"]}}}
+
+    with patch.object(calendar_activities.CalendarService, "get_changes", AsyncMock()) as get_changes:
+        await calendar_activities.fetch_calendar_changes(user_data)
+
+    assert get_changes.await_args.args == ("1", "t", {"/stale.ics": "a", "/fresh.ics": "b", "/single.ics": "c"},
+                                           ["/stale.ics"])
@@ -0,0 +1,101 @@
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from backend.data_plane.activities import maintenance
+
+# Применяем маркеры
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+
+class TestMaintenanceActivities:
+    """Тесты для активности очистки удаленных сущностей"""
+
+    async def test_deletes_in_batches_with_accurate_count(self, mock_settings):
+        """Пачки удаляются до первой неполной, неполная пачка считается по факту"""
+        mock_settings.CLEANUP_DAYS_THRESHOLD = 10
+        mock_settings.CLEANUP_BATCH_SIZE = 100
+
+        with patch.object(maintenance, "get_settings", return_value=mock_settings), \
+                patch.object(maintenance.ReminderRepository, "delete_removed_batch",
+                             AsyncMock(side_effect=[100, 100, 7])) as delete_batch:
+            result = await maintenance.delete_removed_items("reminders")
+
+        assert result == {"deleted": 207, "batches": 3}
+        removed_before, limit = delete_batch.await_args.args
+        assert limit == 100
+        expected = datetime.now(timezone.utc) - timedelta(days=10)
+        assert abs((removed_before - expected).total_seconds()) < 60
+
+    async def test_resumes_from_heartbeat(self, mock_settings):
+        """Повторная попытка продолжает с сохраненным порогом и счетчиком"""
+        mock_settings.CLEANUP_BATCH_SIZE = 50
+        progress = {"removed_before": "2026-10-08T00:00:00+00:00", "deleted": 150, "batches": 3}
+        heartbeats = []
+
+        with patch.object(maintenance, "get_settings", return_value=mock_settings), \
+                patch.object(maintenance.activity, "in_activity", return_value=True), \
+                patch.object(maintenance.activity, "info",
+                             return_value=SimpleNamespace(heartbeat_details=[dict(progress)])), \
+                patch.object(maintenance.activity, "heartbeat", side_effect=lambda details: heartbeats.append(dict(details))), \
+                patch.object(maintenance.HabitRepository, "delete_removed_batch",
+                             AsyncMock(side_effect=[50, 0])) as delete_batch:
+            result = await maintenance.delete_removed_items("habits")
+
+        assert result == {"deleted": 200, "batches": 5}
+        assert delete_batch.await_args.args[0] == datetime.fromisoformat(progress["removed_before"])
+        assert [heartbeat["deleted"] for heartbeat in heartbeats] == [200, 200]
+
+
+class TestRetentionActivities:
+    """Тесты для активности срока хранения"""
+
+    async def test_quota_usages_rolled_up_by_whole_months(self, mock_settings):
+        """Порог расхода квот — начало месяца, чтобы текущий период остался в дневных записях"""
+        mock_settings.QUOTA_USAGE_RETENTION_DAYS = 62
+        mock_settings.CLEANUP_BATCH_SIZE = 100
+
+        with patch.object(maintenance, "get_settings", return_value=mock_settings), \
+                patch.object(maintenance.QuotaUsageRepository, "rollup_usage",
+                             AsyncMock(side_effect=[100, 30])) as rollup:
+            result = await maintenance.apply_retention("quota_usages")
+
+        assert result == {"processed": 130, "batches": 2}
+        used_before, limit = rollup.await_args.args
+        assert limit == 100
+        expected = datetime.now(timezone.utc).date() - timedelta(days=62)
+        assert used_before == expected.replace(day=1)
+
+    async def test_user_roles_cutoff_is_naive(self, mock_settings):
+        """valid_to хранится без часового пояса, порог передается так же"""
+        mock_settings.USER_ROLE_RETENTION_DAYS = 30
+        mock_settings.CLEANUP_BATCH_SIZE = 100
+
+        with patch.object(maintenance, "get_settings", return_value=mock_settings), \
+                patch.object(maintenance.UserRoleRepository, "delete_expired_batch",
+                             AsyncMock(return_value=3)) as delete_expired:
+            result = await maintenance.apply_retention("user_roles")
+
+        assert result == {"processed": 3, "batches": 1}
+        expired_before = delete_expired.await_args.args[0]
+        assert expired_before.tzinfo is None
+        assert expired_before.date() == datetime.now(timezone.utc).date() - timedelta(days=30)
+
+    async def test_habit_progress_resumes_from_heartbeat(self, mock_settings):
+        """Повторная попытка архивирует с сохраненным порогом"""
+        mock_settings.CLEANUP_BATCH_SIZE = 50
+        progress = {"cutoff": "2025-09-13", "processed": 100, "batches": 2}
+
+        with patch.object(maintenance, "get_settings", return_value=mock_settings), \
+                patch.object(maintenance.activity, "in_activity", return_value=True), \
+                patch.object(maintenance.activity, "info",
+                             return_value=SimpleNamespace(heartbeat_details=[dict(progress)])), \
+                patch.object(maintenance.activity, "heartbeat"), \
+                patch.object(maintenance.HabitRepository, "archive_progress",
+                             AsyncMock(return_value=20)) as archive:
+            result = await maintenance.apply_retention("habit_progress")
+
+        assert result == {"processed": 120, "batches": 3}
+        assert archive.await_args.args == (date(2025, 9, 13), 50)
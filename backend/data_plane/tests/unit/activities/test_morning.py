@@ -0,0 +1,61 @@
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from backend.data_plane.activities.morning import send_morning_digest_page, _build_digest_message
+
+# Применяем маркеры
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+
+def digest_row(reminders=None, habits=None):
+    return {
+        "user_id": uuid.uuid4(),
+        "telegram_id": str(uuid.uuid4().int)[:9],
+        "reminders": reminders or [],
+        "habits": habits or [],
+    }
+
+
+class TestMorningActivities:
+    """Тесты для активностей утренней сводки"""
+
+    async def test_send_morning_digest_page(self, mock_settings, mock_telegram_service):
+        """Страница читается одним запросом, сводка уходит только пользователям с задачами"""
+        mock_settings.MORNING_DIGEST_PAGE_SIZE = 3
+        mock_settings.MORNING_DIGEST_SEND_CONCURRENCY = 2
+        rows = sorted(
+            [digest_row(["Позвонить"]), digest_row(), digest_row(habits=["Зарядка"])],
+            key=lambda row: row["user_id"]
+        )
+
+        with patch('backend.data_plane.activities.morning.get_settings', return_value=mock_settings), \
+                patch('backend.control_plane.db.repositories.user.UserRepository.get_morning_digest_page',
+                      AsyncMock(return_value=rows)) as get_page:
+            result = await send_morning_digest_page(300, "2026-10-18", None)
+
+        get_page.assert_awaited_once()
+        # Сутки пользователя с UTC+5 начинаются в 19:00 UTC предыдущего дня
+        offset, _, _, day_start, day_end = get_page.await_args.args
+        assert offset == 300
+        assert day_start == datetime(2026, 10, 17, 19, 0, tzinfo=timezone.utc)
+        assert day_end == datetime(2026, 10, 18, 19, 0, tzinfo=timezone.utc)
+        assert result == {"next_cursor": str(rows[-1]["user_id"]), "users": 3, "sent": 2, "failed": 0}
+        sent_to = {call.args[0] for call in mock_telegram_service.call_args_list}
+        assert sent_to == {row["telegram_id"] for row in rows if row["reminders"] or row["habits"]}
+
+    async def test_send_morning_digest_last_page(self, mock_settings, mock_telegram_service):
+        """Неполная страница — последняя, отказ отправки не роняет активность"""
+        mock_settings.MORNING_DIGEST_PAGE_SIZE = 10
+        mock_settings.MORNING_DIGEST_SEND_CONCURRENCY = 5
+        mock_telegram_service.side_effect = ValueError("Ошибка отправки")
+
+        with patch('backend.data_plane.activities.morning.get_settings', return_value=mock_settings), \
+                patch('backend.control_plane.db.repositories.user.UserRepository.get_morning_digest_page',
+                      AsyncMock(return_value=[digest_row(["Позвонить"])])):
+            result = await send_morning_digest_page(180, "2026-10-18", str(uuid.uuid4()))
+
+        assert result == {"next_cursor": None, "users": 1, "sent": 0, "failed": 1}
+        assert "🎯 Задачи на сегодня:\n– Позвонить" in _build_digest_message(["Позвонить"], [])
@@ -160,3 +160,45 @@ class TestReminderActivities:
         call_args = mock_reminder_repo['mark_sent'].call_args
         assert call_args[0][0] == uuid.UUID(reminder_id)  # Проверяем UUID напоминания
         assert call_args[1]["sent"] == False  # Проверяем параметр sent=False
+
+
+    async def test_send_telegram_notifications_batch(self, mock_user_repo, mock_telegram_service):
+        """Тестирует пакетную отправку с вектором результатов"""
+        reminders = [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": str(uuid.uuid4()),
+                "text": f"Batch reminder {i}",
+                "time": datetime.now().isoformat()
+            }
+            for i in range(3)
+        ]
+
+        async def fail_second(*args, **kwargs):
+            if reminders[1]["text"] in args[1]:
+                raise ValueError("Telegram error")
+            return True
+
+        mock_telegram_service.side_effect = fail_second
+
+        from backend.data_plane.activities.reminders import send_telegram_notifications_batch
+
+        result = await send_telegram_notifications_batch(reminders)
+
+        assert result == [True, False, True]
+        assert mock_telegram_service.call_count == 3
+        # Пользователи загружаются одним запросом
+        assert mock_user_repo['get_by_model_ids'].call_count == 1
+
+    async def test_abort_sent_batch(self, mock_reminder_repo):
+        """Тестирует пакетную отмену статуса отправки"""
+        reminder_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+
+        from backend.data_plane.activities.reminders import abort_sent_batch
+
+        result = await abort_sent_batch(reminder_ids)
+
+        assert result == 2
+        call_args = mock_reminder_repo['mark_sent_many'].call_args
+        assert call_args[0][0] == [uuid.UUID(reminder_id) for reminder_id in reminder_ids]
+        assert call_args[1]["sent"] == False
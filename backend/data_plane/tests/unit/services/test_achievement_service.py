@@ -0,0 +1,72 @@
+# tests/unit/services/test_achievement_service.py
+
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from backend.data_plane.services.achievement_service import AchievementService, evaluate_condition
+
+# Применяем маркеры ко всем тестам в этом файле
+pytestmark = [pytest.mark.unit]
+
+NOW = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+
+def user_stats(**overrides):
+    stats = {
+        "user_id": uuid.uuid4(),
+        "telegram_id": "1",
+        "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "streak": 0,
+        "created_reminders": 0,
+        "completed_reminders": 0,
+        "created_habits": 0,
+        "daily_habit_streak": 0,
+        "weekly_habit_streak": 0,
+        "monthly_habit_streak": 0,
+    }
+    stats.update(overrides)
+    return stats
+
+
+def template(name, condition="{}"):
+    return SimpleNamespace(id=uuid.uuid4(), name=name, condition=condition)
+
+
+class TestEvaluateCondition:
+
+    def test_counters(self):
+        stats = user_stats(created_reminders=10, weekly_habit_streak=8)
+        assert evaluate_condition({"created_reminders": 25}, stats, NOW) == (False, 40)
+        assert evaluate_condition({"created_reminders": 5}, stats, NOW) == (True, 100)
+        assert evaluate_condition({"weekly_habit_streak": 8}, stats, NOW) == (True, 100)
+
+    def test_system_conditions(self):
+        stats = user_stats(filled_first_name=True, filled_last_name=True)
+        assert evaluate_condition({"registered_before": "2025-12-31"}, stats, NOW) == (False, 0)
+        assert evaluate_condition({"active_days": 90}, stats, NOW) == (True, 100)
+        assert evaluate_condition(
+            {"profile_fields_filled": ["first_name", "last_name", "birth_date", "sex"]}, stats, NOW
+        ) == (False, 50)
+
+    def test_unknown_condition(self):
+        assert evaluate_condition({"unknown": 1}, user_stats(), NOW) is None
+
+
+class TestAchievementService:
+
+    def test_evaluate_batch_in_memory(self):
+        """Все шаблоны проверяются для всех пользователей пачки без обращений к БД"""
+        templates = [template("creator_beginner"), template("habit_master"), template("custom", '{"created_habits": 2}')]
+        active = user_stats(created_reminders=5, created_habits=1)
+        idle = user_stats()
+
+        achievements = AchievementService.__new__(AchievementService).evaluate([active, idle], templates, NOW)
+
+        assert [(a.user_id, a.template_id, a.unlocked, a.progress) for a in achievements] == [
+            (active["user_id"], templates[0].id, True, 100),
+            (active["user_id"], templates[1].id, False, 5),
+            (active["user_id"], templates[2].id, False, 50),
+        ]
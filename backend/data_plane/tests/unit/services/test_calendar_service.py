@@ -0,0 +1,55 @@
+# tests/unit/services/test_calendar_service.py
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend.data_plane.services import calendar_service as calendar_module
+from backend.data_plane.services.calendar_service import CalendarService
+from backend.control_plane.utils.offload import shutdown_offloader
+
+# Применяем маркеры ко всем тестам в этом файле
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+
+@pytest.fixture
+def dav_client():
+    calendar_module._connections = None
+    shutdown_offloader()
+    client = MagicMock()
+    calendar = MagicMock(id="work")
+    calendar.date_search.return_value = []
+    client.principal.return_value.calendars.return_value = [calendar]
+    with patch.object(calendar_module.caldav, "DAVClient", return_value=client) as client_class:
+        yield client_class, client, calendar
+    calendar_module._connections = None
+    shutdown_offloader()
+
+
+async def test_discovery_is_cached_per_integration(dav_client):
+    """principal() и calendars() выполняются один раз на интеграцию, клиент переиспользуется"""
+    client_class, client, calendar = dav_client
+
+    for _ in range(3):
+        service = CalendarService("https://caldav.example.com/dav/", "user", "password")
+        await service.get_events()
+
+    assert client_class.call_count == 1
+    assert client.principal.call_count == 1
+    assert calendar.date_search.call_count == 3
+    assert service.host == "caldav.example.com"
+
+
+async def test_failed_sync_rediscovers_calendars(dav_client):
+    """После ошибки календари ищутся заново; смена пароля дает новое подключение"""
+    client_class, client, calendar = dav_client
+    calendar.date_search.side_effect = [Exception("404"), []]
+
+    service = CalendarService("https://caldav.example.com/dav/", "user", "password")
+    with pytest.raises(Exception):
+        await service.get_events()
+    await CalendarService("https://caldav.example.com/dav/", "user", "password").get_events()
+    assert client.principal.call_count == 2
+
+    CalendarService("https://caldav.example.com/dav/", "user", "new-password")
+    assert client_class.call_count == 3
@@ -0,0 +1,303 @@
+# tests/unit/services/test_calendar_sync.py
+"""
+Инкрементальная синхронизация против минимального сервера CalDAV в духе Radicale:
+ctag коллекции, sync-token (RFC 6578), ETag объектов и calendar-multiget,
+разворачивание повторяющихся серий в окне синхронизации.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from lxml import etree
+
+from backend.control_plane.utils.offload import shutdown_offloader
+from backend.data_plane.services import calendar_service as calendar_module
+from backend.data_plane.services.calendar_service import CalendarService
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+COLLECTION = "/user/calendar/"
+NS = {"d": "DAV:", "c": "urn:ietf:params:xml:ns:caldav"}
+
+
+def vevent(uid: str, summary: str, start: str = "20300101T090000Z", extra: str = "", overrides: str = "") -> str:
+    return (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n"
+        f"BEGIN:VEVENT\r\nUID:{uid}\r\nDTSTAMP:20250101T000000Z\r\nDTSTART:{start}\r\n"
+        f"SUMMARY:{summary}\r\n{extra}END:VEVENT\r\n{overrides}END:VCALENDAR\r\n"
+    )
+
+
+def stamp(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def daily_series(summary: str = "Зарядка", count: int = 5) -> str:
+    """Ежедневная серия с завтрашнего дня: третье вхождение отменено, второе перенесено"""
+    first = datetime.combine(datetime.now(timezone.utc).date() + timedelta(days=1), datetime.min.time(),
+                             tzinfo=timezone.utc) + timedelta(hours=9)
+    moved = (
+        f"BEGIN:VEVENT\r\nUID:series\r\nDTSTAMP:20250101T000000Z\r\n"
+        f"RECURRENCE-ID:{stamp(first + timedelta(days=1))}\r\nDTSTART:{stamp(first + timedelta(days=1, hours=3))}\r\n"
+        f"SUMMARY:Перенесено\r\nEND:VEVENT\r\n"
+    )
+    return vevent("series", summary, stamp(first),
+                  extra=f"RRULE:FREQ=DAILY;COUNT={count}\r\nEXDATE:{stamp(first + timedelta(days=2))}\r\n",
+                  overrides=moved)
+
+
+class CalendarStore:
+    """Коллекция с журналом изменений: номер ревизии служит и ctag, и sync-token"""
+
+    def __init__(self, supports_sync: bool = True):
+        self.supports_sync = supports_sync
+        self.revision = 0
+        self.items = {}
+        self.changes = []
+        self.requests = Counter()
+        self.multiget_hrefs = []
+
+    def put(self, name: str, data: str):
+        self.revision += 1
+        self.items[COLLECTION + name] = (f'"{name}-{self.revision}"', data)
+        self.changes.append((self.revision, COLLECTION + name))
+
+    def delete(self, name: str):
+        self.revision += 1
+        del self.items[COLLECTION + name]
+        self.changes.append((self.revision, COLLECTION + name))
+
+    def token(self, revision: int) -> str:
+        return f"http://radicale.org/ns/sync/{revision}"
+
+
+def multistatus(responses: str, sync_token: str = "") -> bytes:
+    token = f"<d:sync-token>{sync_token}</d:sync-token>" if sync_token else ""
+    return (
+        '<?xml version="1.0"?><d:multistatus xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav" '
+        f'xmlns:cs="http://calendarserver.org/ns/">{responses}{token}</d:multistatus>'
+    ).encode()
+
+
+def ok(href: str, props: str) -> str:
+    return (f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>{props}</d:prop>"
+            "<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>")
+
+
+def make_handler(store: CalendarStore):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def body(self):
+            return etree.fromstring(self.rfile.read(int(self.headers["Content-Length"])))
+
+        def do_PROPFIND(self):
+            self.body()
+            depth = self.headers.get("Depth")
+            store.requests[f"PROPFIND {depth}"] += 1
+            props = f"<cs:getctag>{store.revision}</cs:getctag>"
+            if store.supports_sync:
+                props += f"<d:sync-token>{store.token(store.revision)}</d:sync-token>"
+            responses = ok(COLLECTION, props)
+            if depth == "1":
+                responses += "".join(ok(href, f"<d:getetag>{etag}</d:getetag>")
+                                     for href, (etag, _) in store.items.items())
+            self.reply(207, multistatus(responses))
+
+        def do_REPORT(self):
+            root = self.body()
+            report = etree.QName(root).localname
+            store.requests[report] += 1
+            if report == "calendar-multiget":
+                hrefs = [href.text for href in root.findall("d:href", NS)]
+                store.multiget_hrefs.extend(hrefs)
+                self.reply(207, multistatus("".join(
+                    ok(href, f"<d:getetag>{store.items[href][0]}</d:getetag>"
+                             f"<c:calendar-data>{store.items[href][1]}</c:calendar-data>")
+                    for href in hrefs if href in store.items
+                )))
+                return
+
+            token = root.findtext("d:sync-token", default="", namespaces=NS)
+            if token:
+                if not token.startswith(store.token("")):
+                    self.reply(409, b'<d:error xmlns:d="DAV:"><d:valid-sync-token/></d:error>')
+                    return
+                since = int(token.rsplit("/", 1)[1])
+                hrefs = dict.fromkeys(href for revision, href in store.changes if revision > since)
+            else:
+                hrefs = dict.fromkeys(store.items)
+            responses = ""
+            for href in hrefs:
+                if href in store.items:
+                    responses += ok(href, f"<d:getetag>{store.items[href][0]}</d:getetag>")
+                else:
+                    responses += (f"<d:response><d:href>{href}</d:href>"
+                                  "<d:status>HTTP/1.1 404 Not Found</d:status></d:response>")
+            self.reply(207, multistatus(responses, store.token(store.revision)))
+
+    return Handler
+
+
+@pytest.fixture
+def caldav_server():
+    calendar_module._connections = None
+    calendar_module._expansions = None
+    shutdown_offloader()
+    servers = []
+
+    def start(supports_sync: bool = True):
+        store = CalendarStore(supports_sync)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(store))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        url = f"http://127.0.0.1:{server.server_port}/"
+        service = CalendarService(url, "user", "password")
+        # Поиск principal не проверяем: календарь известен заранее
+        service.connection.calendars = [SimpleNamespace(id="calendar", url=url.rstrip("/") + COLLECTION)]
+        return store, service
+
+    yield start
+    for server in servers:
+        server.shutdown()
+    calendar_module._connections = None
+    calendar_module._expansions = None
+    shutdown_offloader()
+
+
+def known(changes):
+    return dict(changes.etags)
+
+
+async def test_first_sync_then_unchanged_ctag(caldav_server):
+    store, service = caldav_server()
+    store.put("a.ics", vevent("a", "Встреча"))
+    store.put("b.ics", vevent("b", "Звонок"))
+
+    first = await service.get_changes(None, None, {})
+    assert first.full and not first.deleted
+    assert set(first.events) == {COLLECTION + "a.ics", COLLECTION + "b.ics"}
+    event = first.events[COLLECTION + "a.ics"][0]
+    assert (event["id"], event["summary"], event["start"].isoformat()) == ("a", "Встреча", "2030-01-01T09:00:00+00:00")
+
+    store.requests.clear()
+    second = await service.get_changes(first.ctag, first.sync_token, known(first))
+
+    assert second.unchanged and not second.events
+    # Один PROPFIND по коллекции и ни одного REPORT
+    assert store.requests == Counter({"PROPFIND 0": 1})
+
+
+async def test_only_changed_objects_are_fetched(caldav_server):
+    store, service = caldav_server()
+    for name in ("a.ics", "b.ics", "c.ics"):
+        store.put(name, vevent(name[0], name))
+    first = await service.get_changes(None, None, {})
+
+    store.put("a.ics", vevent("a", "Перенесли", start="20300102T090000Z"))
+    store.delete("b.ics")
+    store.put("d.ics", vevent("d", "Новое"))
+    store.multiget_hrefs.clear()
+    store.requests.clear()
+
+    changes = await service.get_changes(first.ctag, first.sync_token, known(first))
+
+    assert not changes.full and not changes.unchanged
+    assert sorted(store.multiget_hrefs) == [COLLECTION + "a.ics", COLLECTION + "d.ics"]
+    assert changes.deleted == [COLLECTION + "b.ics"]
+    assert changes.events[COLLECTION + "a.ics"][0]["summary"] == "Перенесли"
+    assert changes.sync_token == store.token(store.revision)
+    assert store.requests["PROPFIND 1"] == 0
+
+
+async def test_expired_sync_token_falls_back_to_etags(caldav_server):
+    store, service = caldav_server()
+    store.put("a.ics", vevent("a", "a"))
+    store.put("b.ics", vevent("b", "b"))
+    first = await service.get_changes(None, None, {})
+
+    store.delete("a.ics")
+    store.multiget_hrefs.clear()
+    changes = await service.get_changes(first.ctag, "expired-token", known(first))
+
+    assert changes.deleted == [COLLECTION + "a.ics"]
+    # ETag объекта b не изменился — повторно он не загружается
+    assert store.multiget_hrefs == []
+    assert changes.sync_token == store.token(store.revision)
+
+
+async def test_server_without_sync_token(caldav_server):
+    store, service = caldav_server(supports_sync=False)
+    store.put("a.ics", vevent("a", "a"))
+    store.put("b.ics", vevent("b", "b"))
+    first = await service.get_changes(None, None, {})
+    assert first.sync_token is None and len(first.events) == 2
+
+    store.put("b.ics", vevent("b", "Изменено"))
+    store.multiget_hrefs.clear()
+    store.requests.clear()
+    changes = await service.get_changes(first.ctag, None, known(first))
+
+    assert store.multiget_hrefs == [COLLECTION + "b.ics"]
+    assert store.requests["sync-collection"] == 0 and store.requests["PROPFIND 1"] == 1
+
+
+async def test_recurring_series_expanded_with_stable_ids(caldav_server):
+    store, service = caldav_server()
+    store.put("series.ics", daily_series())
+
+    first = await service.get_changes(None, None, {})
+    occurrences = first.events[COLLECTION + "series.ics"]
+    assert first.recurring == [COLLECTION + "series.ics"]
+    # 5 вхождений без отмененного; перенесенное сохраняет ID по исходному времени
+    assert len(occurrences) == 4
+    moved = next(event for event in occurrences if event["summary"] == "Перенесено")
+    assert calendar_module.occurrence_time(moved["id"]) == moved["start"] - timedelta(hours=3)
+
+    store.put("series.ics", daily_series(summary="Зарядка утром"))
+    changes = await service.get_changes(first.ctag, first.sync_token, known(first))
+    assert [event["id"] for event in changes.events[COLLECTION + "series.ics"]] == \
+           [event["id"] for event in occurrences]
+
+
+async def test_stale_series_refetched_without_changes(caldav_server):
+    store, service = caldav_server()
+    store.put("series.ics", daily_series())
+    store.put("single.ics", vevent("single", "Разовое"))
+    first = await service.get_changes(None, None, {})
+
+    store.multiget_hrefs.clear()
+    changes = await service.get_changes(first.ctag, first.sync_token, known(first),
+                                        refresh_hrefs=[COLLECTION + "series.ics"])
+
+    assert not changes.unchanged
+    assert store.multiget_hrefs == [COLLECTION + "series.ics"]
+    assert changes.window[1] > datetime.now(timezone.utc)
+
+
+async def test_expansion_cached_per_etag():
+    calendar_module._expansions = None
+    window = calendar_module.expansion_window()
+    data = daily_series()
+
+    with patch.object(calendar_module, "parse_calendar_object",
+                      wraps=calendar_module.parse_calendar_object) as parse:
+        first, _ = calendar_module.expand_calendar_object("/series.ics", '"1"', data, window)
+        second, _ = calendar_module.expand_calendar_object("/series.ics", '"1"', data, window)
+        calendar_module.expand_calendar_object("/series.ics", '"2"', data, window)
+
+    assert parse.call_count == 2
+    assert first == second and first is not second
+    calendar_module._expansions = None
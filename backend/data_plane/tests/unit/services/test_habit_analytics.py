@@ -0,0 +1,98 @@
+# tests/unit/services/test_habit_analytics.py
+
+import random
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+from backend.control_plane.db.models.base import HabitInterval
+from backend.data_plane.services.habit_analytics import COMPLETION_WINDOWS, HabitStats, compute_habit_stats
+
+# Применяем маркеры ко всем тестам в этом файле
+pytestmark = [pytest.mark.unit]
+
+TODAY = date(2026, 10, 18)  # воскресенье
+
+
+def period(interval: HabitInterval, day: date) -> int:
+    if interval == HabitInterval.WEEKLY:
+        return (day - date(2000, 1, 3)).days // 7
+    if interval == HabitInterval.MONTHLY:
+        return day.year * 12 + day.month
+    return day.toordinal()
+
+
+def reference_stats(interval: HabitInterval, days, today: date) -> HabitStats:
+    """Построчный расчет для сравнения с пакетным"""
+    periods = sorted({period(interval, day) for day in days if day <= today})
+    best, current, run = 0, 0, 0
+    for i, value in enumerate(periods):
+        run = run + 1 if i and periods[i - 1] == value - 1 else 1
+        best = max(best, run)
+    if periods and periods[-1] >= period(interval, today) - 1:
+        current = run
+    window_start = today - COMPLETION_WINDOWS[interval]
+    done = len({period(interval, day) for day in days if window_start <= day <= today})
+    expected = period(interval, today) - period(interval, window_start) + 1
+    return HabitStats(completion_rate=done / expected, current_streak=current, best_streak=best)
+
+
+class TestComputeHabitStats:
+
+    def test_daily(self):
+        habit_id = uuid.uuid4()
+        # Текущая серия из трех дней, раньше — серия из пяти
+        days = [TODAY - timedelta(days=d) for d in (0, 1, 2, 10, 11, 12, 13, 14)]
+
+        stats = compute_habit_stats({habit_id: HabitInterval.DAILY}, [(habit_id, day) for day in days], TODAY)
+
+        assert stats[habit_id].current_streak == 3
+        assert stats[habit_id].best_streak == 5
+        assert stats[habit_id].completion_rate == pytest.approx(8 / 29)
+
+    def test_weekly_counts_periods_not_days(self):
+        habit_id = uuid.uuid4()
+        # Две отметки за одну неделю и одна за следующую; последние две недели пропущены
+        days = [date(2026, 9, 22), date(2026, 9, 23), date(2026, 9, 30)]
+
+        stats = compute_habit_stats({habit_id: HabitInterval.WEEKLY}, [(habit_id, day) for day in days], TODAY)
+
+        assert (stats[habit_id].current_streak, stats[habit_id].best_streak) == (0, 2)
+        assert stats[habit_id].completion_rate == pytest.approx(2 / 25)
+
+    def test_monthly_streak_crosses_year(self):
+        habit_id = uuid.uuid4()
+        days = [date(2025, 11, 3), date(2025, 12, 30), date(2026, 1, 2), date(2026, 9, 15), date(2026, 10, 1)]
+
+        stats = compute_habit_stats({habit_id: HabitInterval.MONTHLY}, [(habit_id, day) for day in days], TODAY)
+
+        assert (stats[habit_id].current_streak, stats[habit_id].best_streak) == (2, 3)
+
+    def test_empty_and_foreign_days(self):
+        idle, other = uuid.uuid4(), uuid.uuid4()
+        completed = [(other, TODAY), (idle, TODAY + timedelta(days=1))]
+
+        stats = compute_habit_stats({idle: HabitInterval.DAILY}, completed, TODAY)
+
+        assert stats == {idle: HabitStats(completion_rate=0.0, current_streak=0, best_streak=0)}
+        assert compute_habit_stats({}, completed, TODAY) == {}
+
+    def test_matches_reference(self):
+        rng = random.Random(42)
+        habits = {uuid.uuid4(): rng.choice(list(COMPLETION_WINDOWS)) for _ in range(60)}
+        completed = [
+            (habit_id, TODAY - timedelta(days=d))
+            for habit_id in habits
+            for d in range(-3, 500)
+            if rng.random() < 0.4
+        ]
+        rng.shuffle(completed)
+
+        stats = compute_habit_stats(habits, completed, TODAY)
+
+        for habit_id, interval in habits.items():
+            expected = reference_stats(interval, [day for owner, day in completed if owner == habit_id], TODAY)
+            assert stats[habit_id].current_streak == expected.current_streak
+            assert stats[habit_id].best_streak == expected.best_streak
+            assert stats[habit_id].completion_rate == pytest.approx(expected.completion_rate)
@@ -0,0 +1,149 @@
+# tests/unit/services/test_offload.py
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.control_plane.ai_clients import YandexGptProvider
+from backend.control_plane.utils.offload import Offloader, BackendLimits, get_offloader, shutdown_offloader
+from backend.data_plane.services.calendar_service import CalendarService
+from backend.data_plane.services.s3_service import YandexStorageService
+
+# Применяем маркеры ко всем тестам в этом файле
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+BLOCKING_CALL_SECONDS = 0.3
+TICK_SECONDS = 0.01
+# Допустимая задержка event loop, пока блокирующие вызовы выполняются в потоках
+MAX_LOOP_LAG_SECONDS = 0.05
+
+
+def blocking(result=None):
+    def call(*args, **kwargs):
+        time.sleep(BLOCKING_CALL_SECONDS)
+        return result
+    return call
+
+
+async def measure_loop_lag(awaitable) -> float:
+    """Выполняет awaitable и возвращает максимальное опоздание тиков event loop"""
+    done = asyncio.Event()
+    max_lag = 0.0
+
+    async def ticker():
+        nonlocal max_lag
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            max_lag = max(max_lag, time.perf_counter() - started - TICK_SECONDS)
+
+    ticker_task = asyncio.create_task(ticker())
+    try:
+        await awaitable
+    finally:
+        done.set()
+        await ticker_task
+    return max_lag
+
+
+@pytest.fixture
+def offloader():
+    shutdown_offloader()
+    yield get_offloader()
+    shutdown_offloader()
+
+
+async def test_blocking_clients_do_not_block_event_loop(offloader, mock_settings, mock_boto3_s3_client):
+    # boto3
+    mock_boto3_s3_client["s3_client"].put_object.side_effect = blocking()
+    storage = YandexStorageService()
+
+    # caldav
+    calendar = MagicMock()
+    calendar.date_search.side_effect = blocking([])
+    calendar_service = CalendarService("https://caldav.example.com/", "user", "password")
+    calendar_service.connection.client = MagicMock()
+    calendar_service.connection.calendars = [calendar]
+
+    # Yandex GPT: генерация и подсчет токенов
+    gpt = YandexGptProvider(folder_id="folder", auth="auth")
+    gpt.sdk = MagicMock()
+    alternative = MagicMock(role="assistant", text="ok")
+    gpt.sdk.models.completions.return_value.configure.return_value.run.side_effect = blocking(
+        MagicMock(alternatives=[alternative], usage=MagicMock(total_tokens=10))
+    )
+    gpt.cost_calculator.sdk = MagicMock()
+    gpt.cost_calculator.sdk.models.completions.return_value.tokenize.side_effect = blocking([1, 2, 3])
+    gpt.cost_calculator.tokenizer_mode = "remote"
+
+    started = time.perf_counter()
+    lag = await measure_loop_lag(asyncio.gather(
+        storage.save_image_async(b"image"),
+        calendar_service.get_events(),
+        gpt._query("system", "prompt"),
+        gpt.cost_calculator._count_tokens("text"),
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert lag < MAX_LOOP_LAG_SECONDS, f"event loop lag {lag * 1000:.1f} ms"
+    # Вызовы шли параллельно, а не по очереди
+    assert elapsed < BLOCKING_CALL_SECONDS * 3
+
+
+async def test_backend_concurrency_limit():
+    offloader = Offloader(max_workers=8, limits={"slow": BackendLimits(concurrency=2, timeout=5)})
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def call():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    try:
+        await asyncio.gather(*(offloader.run("slow", call) for _ in range(6)))
+    finally:
+        offloader.shutdown()
+
+    assert peak == 2
+
+
+async def test_per_key_concurrency_limit():
+    """Медленный хост упирается в свой лимит, не занимая слоты других хостов"""
+    offloader = Offloader(max_workers=8, limits={"caldav": BackendLimits(concurrency=4, timeout=5, per_key=1)})
+    running = {"slow": 0, "fast": 0}
+    peak = {"slow": 0, "fast": 0}
+    lock = threading.Lock()
+
+    def call(host):
+        with lock:
+            running[host] += 1
+            peak[host] = max(peak[host], running[host])
+        time.sleep(0.05)
+        with lock:
+            running[host] -= 1
+
+    try:
+        await asyncio.gather(*(
+            offloader.run_keyed("caldav", host, call, host) for host in ["slow"] * 4 + ["fast"] * 4
+        ))
+    finally:
+        offloader.shutdown()
+
+    assert peak == {"slow": 1, "fast": 1}
+
+
+async def test_backend_timeout():
+    offloader = Offloader(max_workers=2, limits={"slow": BackendLimits(concurrency=1, timeout=0.05)})
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await offloader.run("slow", time.sleep, BLOCKING_CALL_SECONDS)
+    finally:
+        offloader.shutdown()
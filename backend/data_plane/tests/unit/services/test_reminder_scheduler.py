@@ -0,0 +1,33 @@
+# tests/unit/services/test_reminder_scheduler.py
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from backend.control_plane.service.reminder_scheduler_service import ReminderSchedulerService
+
+# Применяем маркеры ко всем тестам в этом файле
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+MODULE = "backend.control_plane.service.reminder_scheduler_service"
+
+
+async def test_failed_connect_backs_off():
+    """После неудачного подключения сигналы пропускаются, пока не выйдет пауза"""
+    service = ReminderSchedulerService()
+    connect = AsyncMock(side_effect=ConnectionError("temporal is down"))
+
+    with patch(f"{MODULE}.Client.connect", connect), patch(f"{MODULE}.time.monotonic", return_value=100.0):
+        await service.notify_changed()
+        await service.notify_changed()
+    assert connect.await_count == 1
+
+    client = MagicMock()
+    client.get_workflow_handle.return_value.signal = AsyncMock()
+    connect = AsyncMock(return_value=client)
+    monotonic = 100.0 + ReminderSchedulerService.CONNECT_BACKOFF_SECONDS
+    with patch(f"{MODULE}.Client.connect", connect), patch(f"{MODULE}.time.monotonic", return_value=monotonic):
+        await service.notify_changed()
+        await service.notify_changed()
+    assert connect.await_count == 1
+    assert client.get_workflow_handle.return_value.signal.await_count == 2
@@ -0,0 +1,85 @@
+# tests/unit/services/test_telegram_rate_limit.py
+
+import time
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+
+from backend.data_plane.services.telegram_service import (
+    TelegramService,
+    TokenBucket,
+    close_telegram_client,
+)
+from backend.data_plane.tests.fake_telegram_server import FakeTelegramServer
+
+# Применяем маркеры ко всем тестам в этом файле
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+
+@pytest_asyncio.fixture
+async def fake_telegram(mock_settings):
+    """Поднимает локальный фейковый Bot API и направляет на него TelegramService."""
+    # Ускоренные лимиты, чтобы тесты шли быстро
+    mock_settings.TELEGRAM_GLOBAL_RATE_LIMIT = 50
+    mock_settings.TELEGRAM_CHAT_RATE_LIMIT = 20
+    mock_settings.TELEGRAM_MAX_RETRIES = 3
+
+    server = FakeTelegramServer(global_rate=50, chat_rate=20, retry_after=1)
+    await server.start()
+    mock_settings.TELEGRAM_API_URL = server.api_url
+
+    with patch('backend.data_plane.services.telegram_service._telegram_client', None):
+        yield server
+        await close_telegram_client()
+    await server.stop()
+
+
+async def test_token_bucket_limits_rate():
+    """Bucket без запаса выдает токены не чаще rate в секунду"""
+    bucket = TokenBucket(rate=20, capacity=1)
+    started = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire()
+    # Первый токен сразу, остальные четыре — по 50 мс
+    assert time.monotonic() - started >= 0.18
+
+
+async def test_send_messages_within_limits(fake_telegram):
+    """Лимитер не дает превысить лимиты: сервер не отвечает 429"""
+    import asyncio
+
+    service = TelegramService()
+    results = await asyncio.gather(
+        *(service.send_message(str(i % 5), f"message {i}") for i in range(40))
+    )
+
+    assert all(results)
+    assert fake_telegram.accepted == 40
+    assert fake_telegram.rejected == 0
+
+
+async def test_send_message_honours_retry_after(fake_telegram):
+    """При 429 клиент ждет retry_after и повторяет отправку"""
+    fake_telegram.forced_429 = 1
+
+    service = TelegramService()
+    started = time.monotonic()
+    result = await service.send_message("42", "retry me")
+
+    assert result is True
+    assert fake_telegram.rejected == 1
+    assert fake_telegram.accepted == 1
+    assert time.monotonic() - started >= 1.0
+
+
+async def test_send_message_gives_up_after_retries(fake_telegram, mock_settings):
+    """После исчерпания попыток 429 превращается в ошибку"""
+    mock_settings.TELEGRAM_MAX_RETRIES = 0
+    fake_telegram.forced_429 = 1
+
+    service = TelegramService()
+    with pytest.raises(ValueError) as excinfo:
+        await service.send_message("42", "no retries")
+
+    assert "429" in str(excinfo.value)
@@ -13,6 +13,13 @@ from backend.data_plane.services.telegram_service import TelegramService, ssl_co
 pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
 
 
+@pytest.fixture(autouse=True)
+def reset_telegram_client():
+    """Сбрасывает общий клиент Telegram, чтобы каждый тест создавал свою сессию."""
+    with patch('backend.data_plane.services.telegram_service._telegram_client', None):
+        yield
+
+
 @pytest.fixture
 def mock_aiohttp_session():
     """Мокирует aiohttp.ClientSession для изоляции от реальных HTTP запросов."""
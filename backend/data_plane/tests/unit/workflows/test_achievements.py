@@ -0,0 +1,54 @@
+import uuid
+
+import pytest
+
+from backend.data_plane.workflows import achievements
+
+# Применяем маркеры
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+WINDOW = {"since": "2026-10-18T10:55:00+00:00", "until": "2026-10-18T12:00:00+00:00"}
+
+
+class TestAchievementsWorkflow:
+    """Тесты для рабочего процесса проверки достижений"""
+
+    async def test_checks_changed_users_and_saves_checkpoint(self, mock_temporal):
+        """Пачки изменившихся пользователей проверяются по курсору, затем сдвигается отметка"""
+        cursors = [str(uuid.uuid4()), None]
+        calls = []
+
+        async def mock_execute(activity, *args, **kwargs):
+            calls.append((activity.__name__, kwargs.get("args")))
+            if activity.__name__ == "get_achievement_check_window":
+                return WINDOW
+            if activity.__name__ == "check_changed_users_achievements":
+                batch = len([name for name, _ in calls if name == activity.__name__])
+                return {"next_cursor": cursors[batch - 1], "users": 2, "evaluated": 3, "granted": 1}
+            return None
+
+        mock_temporal['execute_activity'].side_effect = mock_execute
+
+        totals = await achievements.CheckUserAchievementsWorkflow().run(2)
+
+        assert calls == [
+            ("get_achievement_check_window", None),
+            ("check_changed_users_achievements", [WINDOW["since"], WINDOW["until"], None, 2]),
+            ("check_changed_users_achievements", [WINDOW["since"], WINDOW["until"], cursors[0], 2]),
+            ("save_achievement_checkpoint", [WINDOW["until"]]),
+        ]
+        assert totals == {"users": 4, "evaluated": 6, "granted": 2}
+
+    async def test_continues_as_new_without_moving_checkpoint(self, mock_temporal):
+        """После MAX_BATCHES_PER_RUN пачек процесс продолжается с тем же окном"""
+        cursor = str(uuid.uuid4())
+
+        async def mock_execute(activity, *args, **kwargs):
+            return {"next_cursor": cursor, "users": 1, "evaluated": 0, "granted": 0}
+
+        mock_temporal['execute_activity'].side_effect = mock_execute
+
+        await achievements.CheckUserAchievementsWorkflow().run(10, WINDOW)
+
+        assert mock_temporal['execute_activity'].call_count == achievements.MAX_BATCHES_PER_RUN
+        mock_temporal['continue_as_new'].assert_called_once_with(args=[10, WINDOW, cursor])
@@ -0,0 +1,58 @@
+import uuid
+
+import pytest
+
+from backend.data_plane.workflows import calendar
+
+# Применяем маркеры
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+
+def page(next_cursor):
+    return {
+        "next_cursor": next_cursor, "integrations": 200, "synced": 199, "failed": 1,
+        "created": 5, "updated": 1, "deleted": 0, "unchanged": 100, "errors": 0,
+        "latency_ms": {"p50": 120, "p95": 900, "max": 1500, "slowest": []},
+    }
+
+
+class TestCalendarWorkflow:
+    """Тесты для рабочего процесса синхронизации календаря"""
+
+    async def test_sync_pages_then_continue_as_new(self, mock_temporal):
+        """Интеграции синхронизируются страницами без дочерних процессов на пользователя"""
+        cursors = [str(uuid.uuid4()), None]
+        calls = []
+
+        async def mock_execute(activity, *args, **kwargs):
+            calls.append(kwargs["args"][0])
+            return page(cursors[len(calls) - 1])
+
+        mock_temporal['execute_activity'].side_effect = mock_execute
+
+        await calendar.SyncCalendarsWorkflow().run(3)
+
+        assert calls == [None, cursors[0]]
+        assert not mock_temporal['start_child_workflow'].called
+        mock_temporal['continue_as_new'].assert_called_once_with(4)
+
+    async def test_replays_per_user_children(self, mock_temporal):
+        """История, записанная до синхронизации страницами, идет по старой ветке с дочерними процессами"""
+        mock_temporal['patched'].return_value = False
+        users = [{"user_id": str(uuid.uuid4()), "integration_id": str(uuid.uuid4())} for _ in range(2)]
+        activities = []
+
+        async def mock_execute(activity, *args, **kwargs):
+            activities.append(activity.__name__)
+            return users
+
+        mock_temporal['execute_activity'].side_effect = mock_execute
+
+        await calendar.SyncCalendarsWorkflow().run(3)
+
+        mock_temporal['patched'].assert_called_once_with("calendar-sync-pages")
+        assert activities == ["get_users_for_calendar_sync"]
+        children = mock_temporal['start_child_workflow'].call_args_list
+        assert [call[0][1] for call in children] == users
+        assert [call[1]["id"] for call in children] == [f"calendar_sync_{user['user_id']}_3" for user in users]
+        mock_temporal['continue_as_new'].assert_called_once_with(4)
@@ -0,0 +1,44 @@
+import pytest
+from temporalio.exceptions import ActivityError, RetryState
+
+from backend.data_plane.workflows import maintenance
+
+# Применяем маркеры
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+
+class TestMaintenanceWorkflow:
+    """Тесты для рабочего процесса очистки удаленных сущностей"""
+
+    async def test_cleanup_passes_only_kinds_and_counts(self, mock_temporal):
+        """Через историю проходят только вид сущности и счетчики; сбой одной очистки не мешает другой"""
+        calls = []
+
+        async def mock_execute(activity, kind, **kwargs):
+            calls.append((activity.__name__, kind))
+            if kind in ("habits", "user_roles"):
+                raise ActivityError("failed", scheduled_event_id=1, started_event_id=2, identity="worker",
+                                    activity_type=activity.__name__, activity_id="1",
+                                    retry_state=RetryState.MAXIMUM_ATTEMPTS_REACHED)
+            if activity.__name__ == "apply_retention":
+                return {"processed": 42, "batches": 1}
+            return {"deleted": 1234, "batches": 2}
+
+        mock_temporal['execute_activity'].side_effect = mock_execute
+
+        result = await maintenance.CleanupRemovedItemsWorkflow().run()
+
+        assert calls == [
+            ("delete_removed_items", "reminders"),
+            ("delete_removed_items", "habits"),
+            ("apply_retention", "quota_usages"),
+            ("apply_retention", "habit_progress"),
+            ("apply_retention", "user_roles"),
+        ]
+        assert result == {
+            "reminders": {"deleted": 1234, "success": True},
+            "habits": {"deleted": 0, "success": False},
+            "quota_usages": {"processed": 42, "success": True},
+            "habit_progress": {"processed": 42, "success": True},
+            "user_roles": {"processed": 0, "success": False},
+        }
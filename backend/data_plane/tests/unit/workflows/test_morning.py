@@ -0,0 +1,119 @@
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from backend.data_plane.workflows import morning
+
+# Применяем маркеры
+pytestmark = [pytest.mark.asyncio, pytest.mark.unit]
+
+
+def offsets_in(ranges):
+    return {offset for start, end in ranges for offset in range(start, end)}
+
+
+class TestMorningWorkflow:
+    """Тесты для рабочего процесса утренней сводки"""
+
+    async def test_due_timezone_offset_ranges(self):
+        """За сутки каждое смещение попадает ровно в один тик, и в нем у пользователя 06:00-06:14 (не раньше 06:00)"""
+        seen = {}
+        for minute in range(0, 24 * 60, 15):
+            now = datetime(2026, 10, 18, minute // 60, minute % 60, 7, tzinfo=timezone.utc)
+            for offset in offsets_in(morning.due_timezone_offset_ranges(now, 6, 15)):
+                assert offset not in seen
+                seen[offset] = now
+                local_minutes = (minute + offset) % (24 * 60)
+                assert 6 * 60 <= local_minutes < 6 * 60 + 15
+
+        assert set(seen) == set(range(morning.MIN_TIMEZONE_OFFSET, morning.MAX_TIMEZONE_OFFSET + 1))
+        # Москва (UTC+3) получает сводку в 03:00 UTC
+        assert seen[180].hour == 3 and seen[180].minute == 0
+
+    async def test_local_date(self):
+        now = datetime(2026, 10, 18, 19, 0, tzinfo=timezone.utc)
+        assert morning.local_date(now, 300).isoformat() == "2026-10-19"
+        assert morning.local_date(now, -600).isoformat() == "2026-10-18"
+
+    async def test_morning_workflow_starts_shard_per_offset(self, mock_temporal):
+        """На каждое смещение запускается отвязанный дочерний процесс с id по смещению и дате"""
+        mock_temporal['now'].return_value = datetime(2026, 10, 18, 3, 0, tzinfo=timezone.utc)
+
+        async def mock_execute(*args, **kwargs):
+            return [180, 195]
+
+        mock_temporal['execute_activity'].side_effect = mock_execute
+        shard = AsyncMock(side_effect=AssertionError("тик не ждет завершения шарда"))
+
+        async def start_child(*args, **kwargs):
+            return shard
+
+        mock_temporal['start_child_workflow'].side_effect = start_child
+
+        result = await morning.MorningMessageWorkflow().run(6, 15)
+
+        ranges = mock_temporal['execute_activity'].call_args.kwargs["args"][0]
+        assert 180 in offsets_in(ranges)
+        ids = [call.kwargs["id"] for call in mock_temporal['start_child_workflow'].call_args_list]
+        assert ids == ["morning-digest-180-2026-10-18", "morning-digest-195-2026-10-18"]
+        assert all(call.kwargs["parent_close_policy"] == morning.ParentClosePolicy.ABANDON
+                   for call in mock_temporal['start_child_workflow'].call_args_list)
+        assert all(call.kwargs["id_reuse_policy"] == morning.WorkflowIDReusePolicy.REJECT_DUPLICATE
+                   for call in mock_temporal['start_child_workflow'].call_args_list)
+        assert result == {"offsets": 2, "started": 2}
+        shard.assert_not_awaited()
+
+    async def test_morning_workflow_skips_completed_shard(self, mock_temporal):
+        """Повтор тика не запускает заново шард, который уже разослал сводку"""
+        mock_temporal['now'].return_value = datetime(2026, 10, 18, 3, 0, tzinfo=timezone.utc)
+
+        async def mock_execute(*args, **kwargs):
+            return [180, 195]
+
+        async def start_child(*args, **kwargs):
+            # Шард смещения 180 на эту дату уже завершен — сервер отклоняет его id
+            if kwargs["id"] == "morning-digest-180-2026-10-18":
+                raise WorkflowAlreadyStartedError(kwargs["id"], "MorningDigestShardWorkflow")
+            return AsyncMock()
+
+        mock_temporal['execute_activity'].side_effect = mock_execute
+        mock_temporal['start_child_workflow'].side_effect = start_child
+
+        result = await morning.MorningMessageWorkflow().run(6, 15)
+
+        assert result == {"offsets": 2, "started": 1}
+
+    async def test_shard_workflow_pages_through_users(self, mock_temporal):
+        """Шард идет по страницам, пока курсор не закончится"""
+        cursors = [str(uuid.uuid4()), str(uuid.uuid4()), None]
+        calls = []
+
+        async def mock_execute_page(*args, **kwargs):
+            calls.append(kwargs["args"])
+            return {"next_cursor": cursors[len(calls) - 1], "users": 500, "sent": 10, "failed": 1}
+
+        mock_temporal['execute_activity'].side_effect = mock_execute_page
+
+        totals = await morning.MorningDigestShardWorkflow().run(180, "2026-10-18")
+
+        assert [args[2] for args in calls] == [None, cursors[0], cursors[1]]
+        assert all(args[:2] == [180, "2026-10-18"] for args in calls)
+        assert totals == {"users": 1500, "sent": 30, "failed": 3}
+        assert not mock_temporal['continue_as_new'].called
+
+    async def test_shard_workflow_continues_as_new(self, mock_temporal):
+        """После MAX_PAGES_PER_RUN страниц шард продолжается с курсора"""
+        cursor = str(uuid.uuid4())
+
+        async def mock_execute_page(*args, **kwargs):
+            return {"next_cursor": cursor, "users": 10, "sent": 1, "failed": 0}
+
+        mock_temporal['execute_activity'].side_effect = mock_execute_page
+
+        await morning.MorningDigestShardWorkflow().run(180, "2026-10-18", None, 10)
+
+        assert mock_temporal['execute_activity'].call_count == morning.MAX_PAGES_PER_RUN
+        mock_temporal['continue_as_new'].assert_called_once_with(args=[180, "2026-10-18", cursor, 10])
@@ -1,6 +1,6 @@
 import asyncio
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -40,7 +40,7 @@ class TestReminderWorkflows:
 
         # Проверяем вызовы
         assert mock_temporal['execute_activity'].called
-        assert mock_temporal['execute_activity'].call_count == 1  # Только check_active_reminders
+        assert mock_temporal['execute_activity'].call_count == 2  # check_active_reminders и get_next_reminder_time
         assert not mock_temporal['start_child_workflow'].called  # Не должен вызывать дочерние процессы
         assert mock_temporal['continue_as_new'].called  # Должен продолжить как новый
 
@@ -97,6 +97,108 @@ class TestReminderWorkflows:
             # Второй аргумент должен быть напоминанием
             assert call[0][1] == test_reminders[i]
 
+    async def test_check_reminders_workflow_batch_mode(self, mock_temporal):
+        """Тестирует пакетный режим CheckRemindersWorkflow: откат только для неотправленных"""
+        test_reminders = [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": str(uuid.uuid4()),
+                "text": f"Batch reminder {i}",
+                "time": datetime.now().isoformat()
+            }
+            for i in range(3)
+        ]
+        called_activities = []
+
+        async def mock_execute_batch(*args, **kwargs):
+            activity_name = args[0].__name__ if args else "unknown"
+            called_activities.append((activity_name, kwargs.get("args")))
+            if activity_name == "check_active_reminders":
+                return test_reminders
+            if activity_name == "send_telegram_notifications_batch":
+                batch = kwargs["args"][0]
+                # Последнее напоминание не удалось отправить
+                return [reminder["id"] != test_reminders[-1]["id"] for reminder in batch]
+            return None
+
+        mock_temporal['execute_activity'].side_effect = mock_execute_batch
+
+        async def mock_sleep(*args, **kwargs):
+            return None
+
+        from backend.data_plane.workflows.reminders import CheckRemindersWorkflow, DISPATCH_MODE_BATCH
+
+        workflow = CheckRemindersWorkflow()
+        with patch('asyncio.sleep', side_effect=mock_sleep):
+            await workflow.run(0, DISPATCH_MODE_BATCH, 2)
+
+        # Дочерние процессы в пакетном режиме не запускаются
+        assert not mock_temporal['start_child_workflow'].called
+
+        batch_calls = [args for name, args in called_activities if name == "send_telegram_notifications_batch"]
+        assert [len(args[0]) for args in batch_calls] == [2, 1]
+
+        abort_calls = [args for name, args in called_activities if name == "abort_sent_batch"]
+        assert abort_calls == [[[test_reminders[-1]["id"]]]]
+
+        # Режим сохраняется между итерациями
+        assert mock_temporal['continue_as_new'].call_args[1]["args"] == [1, DISPATCH_MODE_BATCH, 2]
+
+    async def test_check_reminders_workflow_waits_until_next_reminder(self, mock_temporal):
+        """Тестирует ожидание ровно до ближайшего напоминания"""
+        now = mock_temporal['now'].return_value
+        next_time = now + timedelta(seconds=42)
+
+        async def mock_execute_next_time(*args, **kwargs):
+            activity_name = args[0].__name__ if args else "unknown"
+            if activity_name == "check_active_reminders":
+                return []
+            if activity_name == "get_next_reminder_time":
+                return next_time.isoformat()
+            return None
+
+        mock_temporal['execute_activity'].side_effect = mock_execute_next_time
+
+        from backend.data_plane.workflows.reminders import CheckRemindersWorkflow
+
+        workflow = CheckRemindersWorkflow()
+        await workflow.run(0)
+
+        assert mock_temporal['wait_condition'].call_args[1]["timeout"] == timedelta(seconds=42)
+        assert mock_temporal['continue_as_new'].called
+
+    async def test_check_reminders_workflow_replays_old_polling(self, mock_temporal):
+        """Тестирует старую ветку для истории, записанной до ожидания ближайшего напоминания"""
+        mock_temporal['patched'].return_value = False
+
+        from backend.data_plane.workflows.reminders import CheckRemindersWorkflow
+
+        workflow = CheckRemindersWorkflow()
+        await workflow.run(0)
+
+        mock_temporal['patched'].assert_called_once_with("next-reminder-wakeup")
+        activities = [call[0][0].__name__ for call in mock_temporal['execute_activity'].call_args_list]
+        assert activities == ["check_active_reminders"]
+        mock_temporal['sleep'].assert_awaited_once_with(15)
+        assert not mock_temporal['wait_condition'].called
+        assert mock_temporal['continue_as_new'].called
+
+    async def test_check_reminders_workflow_rearm_signal(self, mock_temporal):
+        """Тестирует перевзвод таймера сигналом о более раннем напоминании"""
+        from backend.data_plane.workflows.reminders import CheckRemindersWorkflow
+
+        now = datetime.now(timezone.utc)
+        workflow = CheckRemindersWorkflow()
+        workflow._wake_at = now + timedelta(minutes=10)
+
+        # Более позднее напоминание не будит процесс
+        await workflow.reminders_changed((now + timedelta(minutes=20)).isoformat())
+        assert not workflow._rearm
+
+        # Более раннее — будит
+        await workflow.reminders_changed((now + timedelta(minutes=1)).isoformat())
+        assert workflow._rearm
+
     async def test_send_reminder_notification_workflow(self, mock_temporal):
         """Тестирует рабочий процесс SendReminderNotificationWorkflow"""
         # Тестовые данные
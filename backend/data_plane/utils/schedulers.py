@@ -5,6 +5,7 @@ from temporalio.client import Schedule, ScheduleActionStartWorkflow, ScheduleSpe
     ScheduleAlreadyRunningError
 from temporalio.common import RetryPolicy
 from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
 
 from backend.config import get_settings
 from backend.data_plane.workflows.achievements import CheckUserAchievementsWorkflow
@@ -17,10 +18,11 @@ from backend.data_plane.workflows.reminders import CheckRemindersWorkflow
 
 async def ensure_workflows_running(client):
     """Запускает воркфлоу, если они ещё не запущены."""
-    async def start_if_not_exists(workflow_type, workflow_id):
+    async def start_if_not_exists(workflow_type, workflow_id, args=None):
         try:
             await client.start_workflow(
                 workflow_type,
+                args=args or [],
                 id=workflow_id,
                 task_queue=get_settings().TEMPORAL_TASK_QUEUE,
                 execution_timeout=None,
@@ -35,13 +37,14 @@ async def ensure_workflows_running(client):
         except WorkflowAlreadyStartedError:
             print(f"Workflow {workflow_id} уже запущен")
 
-    async def schedule_if_not_scheduled(workflow_type, workflow_id, schedule_calendar_spec):
+    async def schedule_if_not_scheduled(workflow_type, workflow_id, schedule_calendar_spec, args=None):
         try:
             await client.create_schedule(
                 f"{workflow_id}-schedule",
                 Schedule(
                     action=ScheduleActionStartWorkflow(
                         workflow_type.run,
+                        args=args or [],
                         id=workflow_id,
                         task_queue=get_settings().TEMPORAL_TASK_QUEUE,
                     ),
@@ -54,10 +57,30 @@ async def ensure_workflows_running(client):
         except ScheduleAlreadyRunningError:
             print(f"Workflow {workflow_id} уже запланирован")
 
+    async def delete_schedule_if_exists(workflow_id):
+        try:
+            await client.get_schedule_handle(f"{workflow_id}-schedule").delete()
+            print(f"Расписание {workflow_id} удалено")
+        except RPCError as e:
+            if e.status != RPCStatusCode.NOT_FOUND:
+                raise
+
+    settings = get_settings()
+    tick_minutes = int(settings.MORNING_DIGEST_TICK_MINUTES)
+
     await asyncio.gather(
-        start_if_not_exists(CheckRemindersWorkflow, "check-reminders"),
+        start_if_not_exists(
+            CheckRemindersWorkflow, get_settings().CHECK_REMINDERS_WORKFLOW_ID,
+            args=[0, get_settings().REMINDERS_DISPATCH_MODE, int(get_settings().REMINDERS_BATCH_SIZE)],
+        ),
         start_if_not_exists(SyncCalendarsWorkflow, "sync-calendars"),
-        schedule_if_not_scheduled(MorningMessageWorkflow, "morning-message", ScheduleCalendarSpec(hour=(ScheduleRange(6),))),
+        # Утренняя сводка рассылается по часовым поясам: тик каждые tick_minutes минут
+        delete_schedule_if_exists("morning-message"),
+        schedule_if_not_scheduled(
+            MorningMessageWorkflow, "morning-digest",
+            ScheduleCalendarSpec(minute=(ScheduleRange(0, 59, tick_minutes),), hour=(ScheduleRange(0, 23),)),
+            args=[int(settings.MORNING_DIGEST_LOCAL_HOUR), tick_minutes],
+        ),
         schedule_if_not_scheduled(CheckUserAchievementsWorkflow, "check-achievements", ScheduleCalendarSpec(minute=(ScheduleRange(0),))),
         schedule_if_not_scheduled(StartImagesGenerationWorkflow, "start-images-generation", ScheduleCalendarSpec(day_of_month=(ScheduleRange(27),))),
         schedule_if_not_scheduled(CleanupRemovedItemsWorkflow, "cleanup-removed-items", ScheduleCalendarSpec(day_of_week=(ScheduleRange(6),))),
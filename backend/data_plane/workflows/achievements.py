@@ -1,38 +1,42 @@
 """
 Рабочие процессы для обработки достижений пользователей
 """
-import asyncio
-import logging
 from datetime import timedelta
 from temporalio import workflow
 from temporalio.common import RetryPolicy
-from typing import List, Dict, Any, Optional
-
-from temporalio.exceptions import ActivityError
-from temporalio.workflow import ParentClosePolicy
-
-from backend.control_plane.utils import timeutils
+from typing import Dict, Optional
 
 with workflow.unsafe.imports_passed_through():
     from backend.data_plane.activities.achievements import (
-        get_users_for_achievement_check,
-        check_user_achievements,
-        grant_achievement,
-        update_achievement_progress
+        get_achievement_check_window,
+        check_changed_users_achievements,
+        save_achievement_checkpoint,
     )
     import logging
 
 logger = logging.getLogger("achievement_workflows")
 
+# Сколько пачек обработать до continue_as_new, чтобы не раздувать историю
+MAX_BATCHES_PER_RUN = 200
+
 
 @workflow.defn
 class CheckUserAchievementsWorkflow:
     """
-    Рабочий процесс для периодической проверки и выдачи достижений пользователям
+    Рабочий процесс для периодической проверки и выдачи достижений пользователям.
+
+    Проверяются только пользователи, у которых с прошлой проверки менялись
+    профиль, напоминания или привычки; после обработки окна отметка сдвигается.
     """
 
     @workflow.run
-    async def run(self):
+    async def run(self, batch_size: Optional[int] = None, window: Optional[Dict[str, Optional[str]]] = None,
+                  cursor: Optional[str] = None) -> Dict[str, int]:
+        """
+        Args:
+            batch_size: пользователей в пачке (по умолчанию ACHIEVEMENT_BATCH_SIZE)
+            window: окно изменений и cursor — для продолжения после continue_as_new
+        """
         # Настраиваем политику повторных попыток для активностей
         retry_policy = RetryPolicy(
             initial_interval=timedelta(seconds=1),
@@ -41,68 +45,33 @@ class CheckUserAchievementsWorkflow:
             maximum_attempts=5,
         )
 
-        # Получаем список пользователей для проверки достижений
-        users = await workflow.execute_activity(
-            get_users_for_achievement_check,
-            retry_policy=retry_policy,
-            schedule_to_close_timeout=timedelta(minutes=5)
-        )
-
-        # Для каждого пользователя запускаем проверку достижений
-        for user in users:
-            await workflow.start_child_workflow(
-                ProcessUserAchievementsWorkflow.run,
-                user,
-                id=f"process_achievements_{user['id']}",
-                retry_policy=RetryPolicy(
-                    initial_interval=timedelta(seconds=10),
-                    backoff_coefficient=2.0,
-                    maximum_interval=timedelta(minutes=10),
-                    maximum_attempts=3,
-                ),
-                parent_close_policy=ParentClosePolicy.ABANDON,
+        if window is None:
+            window = await workflow.execute_activity(
+                get_achievement_check_window,
+                retry_policy=retry_policy,
+                start_to_close_timeout=timedelta(minutes=1)
             )
 
+        totals = {"users": 0, "evaluated": 0, "granted": 0}
+        for _ in range(MAX_BATCHES_PER_RUN):
+            batch = await workflow.execute_activity(
+                check_changed_users_achievements,
+                args=[window["since"], window["until"], cursor, batch_size],
+                retry_policy=retry_policy,
+                start_to_close_timeout=timedelta(minutes=5)
+            )
+            for key in totals:
+                totals[key] += batch[key]
 
-@workflow.defn
-class ProcessUserAchievementsWorkflow:
-    """
-    Рабочий процесс для проверки и выдачи достижений конкретному пользователю
-    """
-
-    @workflow.run
-    async def run(self, user: Dict[str, Any]):
-        # Политика повторных попыток
-        retry_policy = RetryPolicy(
-            initial_interval=timedelta(seconds=10),
-            backoff_coefficient=2.0,
-            maximum_interval=timedelta(minutes=10),
-            maximum_attempts=3,
-        )
-
-        # Проверяем достижения пользователя
-        achievements_to_process = await workflow.execute_activity(
-            check_user_achievements,
-            args=[user["id"]],
-            retry_policy=retry_policy,
-            schedule_to_close_timeout=timedelta(minutes=5)
-        )
-
-        # Обрабатываем каждое достижение
-        for achievement in achievements_to_process:
-            if achievement["should_grant"]:
-                # Выдаем достижение
+            cursor = batch["next_cursor"]
+            if cursor is None:
                 await workflow.execute_activity(
-                    grant_achievement,
-                    args=[user["id"], achievement["template_id"]],
+                    save_achievement_checkpoint,
+                    args=[window["until"]],
                     retry_policy=retry_policy,
-                    schedule_to_close_timeout=timedelta(minutes=5)
-                )
-            else:
-                # Обновляем прогресс достижения
-                await workflow.execute_activity(
-                    update_achievement_progress,
-                    args=[user["id"], achievement["template_id"], achievement["progress"]],
-                    retry_policy=retry_policy,
-                    schedule_to_close_timeout=timedelta(minutes=5)
+                    start_to_close_timeout=timedelta(minutes=1)
                 )
+                logger.info(f"Проверка достижений завершена: {totals}")
+                return totals
+
+        workflow.continue_as_new(args=[batch_size, window, cursor])
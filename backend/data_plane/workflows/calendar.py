@@ -2,17 +2,17 @@
 Рабочие процессы для синхронизации с календарем
 """
 import asyncio
-import logging
 from datetime import timedelta
 from temporalio import workflow
 from temporalio.common import RetryPolicy
-from typing import List, Dict, Any
+from typing import Dict, Any
 
 from temporalio.exceptions import ActivityError
 from temporalio.workflow import ParentClosePolicy
 
 with workflow.unsafe.imports_passed_through():
     from backend.data_plane.activities.calendar import (
+        sync_calendar_integrations,
         get_users_for_calendar_sync,
         fetch_calendar_events,
         sync_calendar_events,
@@ -22,6 +22,13 @@ with workflow.unsafe.imports_passed_through():
 
 logger = logging.getLogger("calendar_sync_workflows")
 
+# Ограничение страниц за одну итерацию, чтобы не раздувать историю
+MAX_PAGES_PER_RUN = 500
+# Пауза между итерациями (в секундах)
+SYNC_PAUSE_SECONDS = 600
+
+TOTAL_KEYS = ("integrations", "synced", "not_modified", "failed", "created", "updated", "deleted", "unchanged", "errors")
+
 
 @workflow.defn
 class SyncCalendarsWorkflow:
@@ -39,6 +46,51 @@ class SyncCalendarsWorkflow:
             maximum_attempts=3,
         )
 
+        # Уже запущенные воркфлоу при воспроизведении идут по старой ветке с процессом на каждого пользователя
+        if workflow.patched("calendar-sync-pages"):
+            await self._sync_pages(retry_policy)
+        else:
+            await self._start_user_syncs(iteration, retry_policy)
+
+        # Ждем перед следующей проверкой
+        await asyncio.sleep(SYNC_PAUSE_SECONDS)
+        workflow.continue_as_new(iteration + 1)
+
+    @staticmethod
+    async def _sync_pages(retry_policy: RetryPolicy):
+        """Синхронизирует интеграции страницами внутри активностей"""
+        totals = {key: 0 for key in TOTAL_KEYS}
+        max_latency_ms = 0
+        cursor = None
+        try:
+            for _ in range(MAX_PAGES_PER_RUN):
+                page = await workflow.execute_activity(
+                    sync_calendar_integrations,
+                    args=[cursor, None],
+                    retry_policy=retry_policy,
+                    start_to_close_timeout=timedelta(minutes=30),
+                    heartbeat_timeout=timedelta(minutes=5),
+                )
+                for key in TOTAL_KEYS:
+                    totals[key] += page.get(key, 0)
+                latency = page["latency_ms"]
+                max_latency_ms = max(max_latency_ms, latency["max"])
+                logger.info(
+                    f"Страница синхронизации календарей: {page['integrations']} интеграций, "
+                    f"p50 {latency['p50']} мс, p95 {latency['p95']} мс, самые медленные {latency['slowest']}"
+                )
+
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+        except Exception as e:
+            logger.error(f"Ошибка в основном процессе синхронизации календаря: {e}")
+
+        logger.info(f"Синхронизация календарей завершена: {totals}, максимум {max_latency_ms} мс")
+
+    @staticmethod
+    async def _start_user_syncs(iteration: int, retry_policy: RetryPolicy):
+        """Прежняя синхронизация: дочерний процесс UserCalendarSyncWorkflow на каждого пользователя"""
         try:
             # Получаем список пользователей для синхронизации календаря
             users_for_sync = await workflow.execute_activity(
@@ -47,7 +99,7 @@ class SyncCalendarsWorkflow:
                 schedule_to_close_timeout=timedelta(minutes=5)
             )
 
-            workflow.logger.info(f"Найдено {len(users_for_sync)} пользователей для синхронизации календаря")
+            logger.info(f"Найдено {len(users_for_sync)} пользователей для синхронизации календаря")
 
             # Запускаем дочерние процессы для каждого пользователя
             for user_data in users_for_sync:
@@ -64,17 +116,16 @@ class SyncCalendarsWorkflow:
                     parent_close_policy=ParentClosePolicy.ABANDON,
                 )
         except Exception as e:
-            workflow.logger.error(f"Ошибка в основном процессе синхронизации календаря: {e}")
-
-        # Ждем перед следующей проверкой
-        await asyncio.sleep(600)
-        workflow.continue_as_new(iteration + 1)
+            logger.error(f"Ошибка в основном процессе синхронизации календаря: {e}")
 
 
 @workflow.defn
 class UserCalendarSyncWorkflow:
     """
     Рабочий процесс для синхронизации календаря конкретного пользователя
+
+    Запускается только прежней веткой SyncCalendarsWorkflow; остается зарегистрированным,
+    пока не завершатся процессы, запущенные до перехода на синхронизацию страницами
     """
 
     @workflow.run
@@ -23,6 +23,7 @@ with workflow.unsafe.imports_passed_through():
         save_image_to_db,
         update_describe_habit_text_quota,
         get_habit_completion_rate,
+        get_habits_completion_rates,
         update_illustrate_habit_quota
 )
     import logging
@@ -54,6 +55,16 @@ class StartImagesGenerationWorkflow:
         if len(active_habits) == 0:
             return active_habits
 
+        # Уже запущенные воркфлоу при воспроизведении идут по старой ветке с активностью на каждую привычку
+        batch_completion_rates = workflow.patched("batch-completion-rates")
+        if batch_completion_rates:
+            completion_rates = await workflow.execute_activity(
+                get_habits_completion_rates,
+                retry_policy=retry_policy,
+                start_to_close_timeout=timedelta(minutes=5),
+                args=(active_habits,)
+            )
+
         for active_habit in active_habits:
             updated = await workflow.execute_activity(
                 update_illustrate_habit_quota,
@@ -64,12 +75,15 @@ class StartImagesGenerationWorkflow:
             if not updated:
                 continue
 
-            completion_rate = await workflow.execute_activity(
-                get_habit_completion_rate,
-                retry_policy=retry_policy,
-                start_to_close_timeout=timedelta(minutes=5),
-                args=(active_habit["id"], active_habit["interval"])
-            )
+            if batch_completion_rates:
+                completion_rate = completion_rates[str(active_habit["id"])]
+            else:
+                completion_rate = await workflow.execute_activity(
+                    get_habit_completion_rate,
+                    retry_policy=retry_policy,
+                    start_to_close_timeout=timedelta(minutes=5),
+                    args=(active_habit["id"], active_habit["interval"])
+                )
 
             await workflow.start_child_workflow(
                 GenerateHabitImageWorkflow.run,
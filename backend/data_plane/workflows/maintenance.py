@@ -4,20 +4,16 @@
 from datetime import timedelta
 from temporalio import workflow
 from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError
 from typing import Dict, Any
 
-from backend.config import get_settings
-
 with workflow.unsafe.imports_passed_through():
     from backend.data_plane.activities.maintenance import (
-        get_removed_habits,
-        get_removed_reminders,
-        delete_habits,
-        delete_reminders
+        delete_removed_items, apply_retention, CLEANUP_REPOSITORIES, RETENTION_POLICIES
     )
     import logging
 
-logger = logging.getLogger("habit_workflows")
+logger = logging.getLogger("maintenance_workflows")
 
 
 @workflow.defn
@@ -25,47 +21,46 @@ class CleanupRemovedItemsWorkflow:
     @workflow.run
     async def run(self) -> Dict[str, Any]:
         """
-        Workflow that cleans up reminders and habits marked for removal.
-        """
-        # Get items marked for removal
-        reminder_ids = await workflow.execute_activity(
-            get_removed_reminders,
-            start_to_close_timeout=timedelta(minutes=5)
-        )
-
-        habit_ids = await workflow.execute_activity(
-            get_removed_habits,
-            start_to_close_timeout=timedelta(minutes=5)
-        )
-
-        # Delete the items
-        reminder_result = await workflow.execute_activity(
-            delete_reminders,
-            reminder_ids,
-            start_to_close_timeout=timedelta(minutes=10)
-        )
+        Workflow that cleans up reminders and habits marked for removal
+        and applies retention to quota usages, habit progress and user roles.
 
-        habit_result = await workflow.execute_activity(
-            delete_habits,
-            habit_ids,
-            start_to_close_timeout=timedelta(minutes=10)
+        Удаление выполняется пачками внутри активности: через историю
+        проходят только счетчики, а не списки ID.
+        """
+        retry_policy = RetryPolicy(
+            initial_interval=timedelta(seconds=5),
+            backoff_coefficient=2.0,
+            maximum_interval=timedelta(minutes=5),
+            maximum_attempts=5,
         )
 
-        # Return the results
-        return {
-            "reminders": {
-                "found": len(reminder_ids),
-                "deleted": reminder_result.get("count", 0),
-                "success": reminder_result.get("success", False)
-            },
-            "habits": {
-                "found": len(habit_ids),
-                "deleted": habit_result.get("count", 0),
-                "success": habit_result.get("success", False)
-            }
-        }
+        results = {}
+        for kind in CLEANUP_REPOSITORIES:
+            try:
+                result = await workflow.execute_activity(
+                    delete_removed_items,
+                    kind,
+                    retry_policy=retry_policy,
+                    start_to_close_timeout=timedelta(hours=1),
+                    heartbeat_timeout=timedelta(minutes=2),
+                )
+                results[kind] = {"deleted": result["deleted"], "success": True}
+            except ActivityError as e:
+                logger.error(f"Очистка {kind} не выполнена: {e}")
+                results[kind] = {"deleted": 0, "success": False}
 
-        # TODO: REMOVE OLD HabitProgress
-        # TODO: REMOVE OLD UserQuotaUsage
-        # TODO: REMOVE OLD UserRole
+        for kind in RETENTION_POLICIES:
+            try:
+                result = await workflow.execute_activity(
+                    apply_retention,
+                    kind,
+                    retry_policy=retry_policy,
+                    start_to_close_timeout=timedelta(hours=1),
+                    heartbeat_timeout=timedelta(minutes=2),
+                )
+                results[kind] = {"processed": result["processed"], "success": True}
+            except ActivityError as e:
+                logger.error(f"Срок хранения {kind} не применен: {e}")
+                results[kind] = {"processed": 0, "success": False}
 
+        return results
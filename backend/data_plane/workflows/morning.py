@@ -1,64 +1,137 @@
 """
-Рабочие процессы для обработки привычек
+Рабочие процессы для утренней сводки
 """
-import asyncio
-import logging
-from datetime import timedelta
+from datetime import date, datetime, timedelta
 from temporalio import workflow
-from temporalio.common import RetryPolicy
-from typing import List, Dict, Any
+from temporalio.common import RetryPolicy, WorkflowIDReusePolicy
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.workflow import ParentClosePolicy
+from typing import Dict, List, Optional, Tuple
 
 with workflow.unsafe.imports_passed_through():
-    from backend.data_plane.activities.morning import (
-        check_today_habits,
-        check_today_reminders,
-        send_telegram_message,
-        get_active_users
-    )
+    from backend.data_plane.activities.morning import send_morning_digest_page, get_morning_timezone_offsets
     import logging
 
 logger = logging.getLogger("morning_message_workflows")
 
+# Сколько страниц обработать до continue_as_new, чтобы не раздувать историю
+MAX_PAGES_PER_RUN = 200
+
+# Допустимые смещения часовых поясов в минутах (UTC-12:00 ... UTC+14:00)
+MIN_TIMEZONE_OFFSET = -12 * 60
+MAX_TIMEZONE_OFFSET = 14 * 60
+MINUTES_PER_DAY = 24 * 60
+
+# Настраиваем политику повторных попыток для активностей
+RETRY_POLICY = RetryPolicy(
+    initial_interval=timedelta(seconds=1),
+    backoff_coefficient=2.0,
+    maximum_interval=timedelta(minutes=10),
+    maximum_attempts=5,  # Ограничиваем число попыток
+)
+
+
+def due_timezone_offset_ranges(now: datetime, local_hour: int, tick_minutes: int) -> List[Tuple[int, int]]:
+    """
+    Полуинтервалы смещений [start, end), у которых на начало текущего тика
+    (now в UTC, округляется вниз до тика) местное время в [local_hour:00, local_hour:00 + tick_minutes)
+    """
+    utc_minutes = now.hour * 60 + now.minute
+    tick_start = utc_minutes - utc_minutes % tick_minutes
+    # Местное время на начало тика — tick_start + offset
+    base_start = local_hour * 60 - tick_start
+    ranges = []
+    for shift in (-MINUTES_PER_DAY, 0, MINUTES_PER_DAY):
+        start = max(base_start + shift, MIN_TIMEZONE_OFFSET)
+        end = min(base_start + tick_minutes + shift, MAX_TIMEZONE_OFFSET + 1)
+        if start < end:
+            ranges.append((start, end))
+    return ranges
+
+
+def local_date(now: datetime, timezone_offset: int) -> date:
+    """Дата у пользователя со смещением timezone_offset"""
+    return (now + timedelta(minutes=timezone_offset)).date()
+
 
 @workflow.defn
 class MorningMessageWorkflow:
 
     @workflow.run
-    async def run(self, iteration: int = 0):
-        # Настраиваем политику повторных попыток для активностей
-        retry_policy = RetryPolicy(
-            initial_interval=timedelta(seconds=1),
-            backoff_coefficient=2.0,
-            maximum_interval=timedelta(minutes=10),
-            maximum_attempts=5,  # Ограничиваем число попыток
-        )
+    async def run(self, local_hour: int = 6, tick_minutes: int = 15) -> Dict[str, int]:
+        """
+        Запускается по расписанию каждые tick_minutes минут и рассылает утреннюю
+        сводку часовым поясам, в которых сейчас наступает local_hour:00
+
+        Каждое смещение обрабатывает свой дочерний MorningDigestShardWorkflow.
+        Id дочернего процесса содержит смещение и локальную дату и не может быть
+        использован повторно (REJECT_DUPLICATE) даже после завершения шарда, поэтому
+        повтор тика, догоняющий запуск расписания или ручной запуск не отправят сводку второй раз.
 
-        user_ids = await workflow.execute_activity(
-            get_active_users,
-            retry_policy=retry_policy,
-            schedule_to_close_timeout=timedelta(minutes=5)
+        Шарды не ожидаются: тик завершается сразу после их запуска, иначе долгая
+        рассылка большого пояса перекрыла бы следующие тики расписания, и они
+        были бы пропущены вместе со своими часовыми поясами.
+
+        Returns:
+            offsets — смещений в тике, started — запущено шардов
+        """
+        now = workflow.now()
+        ranges = due_timezone_offset_ranges(now, local_hour, tick_minutes)
+        offsets = await workflow.execute_activity(
+            get_morning_timezone_offsets,
+            args=[ranges],
+            retry_policy=RETRY_POLICY,
+            start_to_close_timeout=timedelta(minutes=1),
         )
 
-        for user_id in user_ids:
-            # Проверяем активные напоминания
-            reminders = await workflow.execute_activity(
-                check_today_reminders,
-                retry_policy=retry_policy,
-                schedule_to_close_timeout=timedelta(minutes=5),
-                args=[user_id]
-            )
-            # Проверяем активные привычки
-            habits = await workflow.execute_activity(
-                check_today_habits,
-                retry_policy=retry_policy,
-                schedule_to_close_timeout=timedelta(minutes=5),
-                args=[user_id]
-            )
-            if len(reminders) > 0 or len(habits) > 0:
-                # Высылаем сообщение
-                await workflow.execute_activity(
-                    send_telegram_message,
-                    retry_policy=retry_policy,
-                    schedule_to_close_timeout=timedelta(minutes=5),
-                    args=[user_id, reminders, habits]
+        started = 0
+        for offset in offsets:
+            day = local_date(now, offset)
+            try:
+                await workflow.start_child_workflow(
+                    MorningDigestShardWorkflow.run,
+                    args=[offset, day.isoformat()],
+                    id=f"morning-digest-{offset}-{day.isoformat()}",
+                    id_reuse_policy=WorkflowIDReusePolicy.REJECT_DUPLICATE,
+                    parent_close_policy=ParentClosePolicy.ABANDON,
                 )
+                started += 1
+            except WorkflowAlreadyStartedError:
+                logger.info(f"Утренняя сводка для смещения {offset} на {day} уже разослана или рассылается")
+
+        return {"offsets": len(offsets), "started": started}
+
+
+@workflow.defn
+class MorningDigestShardWorkflow:
+
+    @workflow.run
+    async def run(self, timezone_offset: int, local_date: str,
+                  cursor: Optional[str] = None, page_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Проходит пользователей с заданным смещением страницами по id и рассылает утреннюю сводку
+
+        Args:
+            timezone_offset: смещение часового пояса пользователей в минутах
+            local_date: дата сводки у пользователей (ISO)
+            cursor: id пользователя, после которого продолжить (для continue_as_new)
+            page_size: размер страницы (по умолчанию MORNING_DIGEST_PAGE_SIZE)
+        """
+        totals = {"users": 0, "sent": 0, "failed": 0}
+        for _ in range(MAX_PAGES_PER_RUN):
+            page = await workflow.execute_activity(
+                send_morning_digest_page,
+                args=[timezone_offset, local_date, cursor, page_size],
+                retry_policy=RETRY_POLICY,
+                start_to_close_timeout=timedelta(minutes=30),
+                heartbeat_timeout=timedelta(minutes=2),
+            )
+            for key in totals:
+                totals[key] += page[key]
+
+            cursor = page["next_cursor"]
+            if cursor is None:
+                logger.info(f"Утренняя сводка для смещения {timezone_offset} разослана: {totals}")
+                return totals
+
+        workflow.continue_as_new(args=[timezone_offset, local_date, cursor, page_size])
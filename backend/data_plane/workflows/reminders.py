@@ -3,10 +3,10 @@
 """
 import asyncio
 import logging
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from temporalio import workflow
 from temporalio.common import RetryPolicy
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from temporalio.exceptions import ActivityError
 from temporalio.workflow import ParentClosePolicy
@@ -14,21 +14,59 @@ from temporalio.workflow import ParentClosePolicy
 with workflow.unsafe.imports_passed_through():
     from backend.data_plane.activities.reminders import (
         check_active_reminders,
-        send_telegram_notification, abort_sent
+        get_next_reminder_time,
+        send_telegram_notification, abort_sent,
+        send_telegram_notifications_batch, abort_sent_batch
 )
     import logging
 
 logger = logging.getLogger("reminder_workflows")
 
+DISPATCH_MODE_CHILD = "child"
+DISPATCH_MODE_BATCH = "batch"
+
+# Пауза, если ближайшее напоминание уже просрочено (например, отправка не удалась),
+# чтобы не крутить горячий цикл; верхняя граница — страховка на случай потерянного сигнала
+MIN_WAKEUP_INTERVAL = timedelta(seconds=5)
+MAX_WAKEUP_INTERVAL = timedelta(minutes=5)
+
+
+def _parse_utc(value: str) -> datetime:
+    """Разбирает ISO-время; наивное время считается UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
 
 @workflow.defn
 class CheckRemindersWorkflow:
     """
     Рабочий процесс для проверки активных напоминаний и отправки уведомлений
+
+    Между итерациями спит ровно до времени ближайшего напоминания.
+    Сигнал reminders_changed будит процесс раньше, если напоминание
+    создано или перенесено на время до запланированного пробуждения.
     """
 
+    def __init__(self):
+        self._wake_at: Optional[datetime] = None
+        self._rearm = False
+
+    @workflow.signal
+    async def reminders_changed(self, reminder_time: Optional[str] = None):
+        """
+        Сигнал об изменении напоминаний: перевзводит таймер, если новое
+        время раньше запланированного пробуждения
+        """
+        if reminder_time is None or self._wake_at is None:
+            self._rearm = True
+            return
+        if _parse_utc(reminder_time) < self._wake_at:
+            self._rearm = True
+
     @workflow.run
-    async def run(self, iteration: int = 0):
+    async def run(self, iteration: int = 0, dispatch_mode: str = DISPATCH_MODE_CHILD, batch_size: int = 50):
         # Настраиваем политику повторных попыток для активностей
         retry_policy = RetryPolicy(
             initial_interval=timedelta(seconds=1),
@@ -44,6 +82,47 @@ class CheckRemindersWorkflow:
             schedule_to_close_timeout=timedelta(minutes=5)
         )
 
+        if dispatch_mode == DISPATCH_MODE_BATCH:
+            await self._dispatch_batches(reminders, batch_size)
+        else:
+            await self._dispatch_children(reminders)
+
+        # Уже запущенные воркфлоу при воспроизведении идут по старой ветке с опросом раз в 15 секунд
+        if workflow.patched("next-reminder-wakeup"):
+            next_time = await workflow.execute_activity(
+                get_next_reminder_time,
+                retry_policy=retry_policy,
+                schedule_to_close_timeout=timedelta(minutes=5)
+            )
+            await self._wait_until(next_time)
+        else:
+            await asyncio.sleep(15)
+        workflow.continue_as_new(args=[iteration + 1, dispatch_mode, batch_size])
+
+    async def _wait_until(self, next_time: Optional[str]):
+        """
+        Ждет наступления next_time (не дольше MAX_WAKEUP_INTERVAL)
+        или сигнала о более раннем напоминании
+        """
+        now = workflow.now()
+        delay = MAX_WAKEUP_INTERVAL
+        if next_time:
+            delay = _parse_utc(next_time) - now
+            if delay <= timedelta(0):
+                delay = MIN_WAKEUP_INTERVAL
+            delay = min(delay, MAX_WAKEUP_INTERVAL)
+        self._wake_at = now + delay
+
+        # Сигнал мог прийти, пока выполнялись активности
+        if self._rearm:
+            return
+        try:
+            await workflow.wait_condition(lambda: self._rearm, timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    @staticmethod
+    async def _dispatch_children(reminders: List[Dict[str, Any]]):
         # Для каждого напоминания запускаем процесс отправки уведомления
         for reminder in reminders:
             # Запускаем дочерний рабочий процесс для отправки уведомления
@@ -60,8 +139,64 @@ class CheckRemindersWorkflow:
                 parent_close_policy=ParentClosePolicy.ABANDON,
             )
 
-        await asyncio.sleep(15)
-        workflow.continue_as_new(iteration + 1)
+    @staticmethod
+    async def _dispatch_batches(reminders: List[Dict[str, Any]], batch_size: int):
+        """
+        Отправляет напоминания пачками: одна активность на пачку вместо
+        дочернего воркфлоу на каждое напоминание. Откат выполняется
+        одной активностью только для неотправленных напоминаний.
+        """
+        if not reminders:
+            return
+
+        batch_size = max(1, batch_size)
+        batches = [reminders[i:i + batch_size] for i in range(0, len(reminders), batch_size)]
+
+        # Повторяем активность только при падении целиком: ошибки отдельных
+        # отправок возвращаются вектором результатов и не ретраятся
+        results = await asyncio.gather(
+            *(
+                workflow.execute_activity(
+                    send_telegram_notifications_batch,
+                    args=[batch],
+                    retry_policy=RetryPolicy(
+                        initial_interval=timedelta(seconds=10),
+                        backoff_coefficient=2.0,
+                        maximum_interval=timedelta(minutes=1),
+                        maximum_attempts=3,
+                    ),
+                    schedule_to_close_timeout=timedelta(minutes=5),
+                )
+                for batch in batches
+            ),
+            return_exceptions=True,
+        )
+
+        failed_ids = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                workflow.logger.error("Batch activity failed: %s", result)
+                failed_ids.extend(reminder["id"] for reminder in batch)
+                continue
+            failed_ids.extend(reminder["id"] for reminder, sent in zip(batch, result) if not sent)
+
+        if not failed_ids:
+            return
+
+        try:
+            await workflow.execute_activity(
+                abort_sent_batch,
+                args=[failed_ids],
+                schedule_to_close_timeout=timedelta(minutes=5),
+                retry_policy=RetryPolicy(
+                    initial_interval=timedelta(seconds=10),
+                    backoff_coefficient=2.0,
+                    maximum_interval=timedelta(hours=1),
+                    maximum_attempts=0,  # Откатываем до последнего
+                )
+            )
+        except ActivityError as comp_error:
+            workflow.logger.error("Compensation failed: %s", comp_error)
 
 
 @workflow.defn